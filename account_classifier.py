@@ -0,0 +1,349 @@
+"""
+Local Account Classifier
+Predicts a transaction's account from its description, explanation and amount
+with a per-user linear model, so most account suggestions are served locally
+and the LLM is only consulted when the model is unsure
+"""
+
+import atexit
+import copy
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+
+from models import Transaction
+from utils.model_store import ModelStore
+
+logger = logging.getLogger(__name__)
+
+# Hashed feature space shared by every user's model, so no vocabulary is stored
+HASH_FEATURES = 2 ** 16
+# Bumped when the feature space changes; models saved in another format are retrained
+MODEL_FORMAT = 2
+# Training policy
+MIN_TRAINING_SAMPLES = 10
+MIN_TRAINING_ACCOUNTS = 2
+TRAINING_EPOCHS = 15
+# Stronger regularization keeps probabilities from saturating on short descriptions
+REGULARIZATION = 1e-4
+# How long a user with too little history waits before training is retried
+UNTRAINABLE_RETRY = timedelta(hours=1)
+# Suggestions returned and the confidence below which callers should ask the LLM
+TOP_SUGGESTIONS = 3
+LOCAL_CONFIDENCE_THRESHOLD = 0.8
+# Confirmations folded into a model in memory before it is written back,
+# and the longest a folded confirmation waits for the write
+SAVE_BATCH_SIZE = 20
+SAVE_INTERVAL = timedelta(minutes=5)
+
+_vectorizer = HashingVectorizer(
+    analyzer='char_wb', ngram_range=(3, 5), n_features=HASH_FEATURES,
+    alternate_sign=False, norm='l2'
+)
+
+
+def build_features(descriptions: List[str], explanations: List[Optional[str]],
+                   amounts: List[float]) -> sparse.csr_matrix:
+    """
+    Hash transactions into the classifier's sparse feature space
+
+    Args:
+        descriptions: Transaction descriptions
+        explanations: Explanations (None or empty when missing)
+        amounts: Signed transaction amounts
+
+    Returns:
+        CSR matrix with character n-gram columns followed by amount columns
+    """
+    texts = [f"{description or ''} {explanation or ''}".strip()
+             for description, explanation in zip(descriptions, explanations)]
+    values = np.asarray(amounts, dtype=np.float64)
+    amount_features = np.column_stack((
+        values > 0,
+        values < 0,
+        np.log1p(np.abs(values)) / 10.0
+    )).astype(np.float64)
+    return sparse.hstack((_vectorizer.transform(texts), sparse.csr_matrix(amount_features)), format='csr')
+
+
+def predict_probabilities(model: SGDClassifier, features: sparse.csr_matrix) -> np.ndarray:
+    """
+    Class probabilities for a single feature row, equivalent to model.predict_proba
+
+    predict_proba multiplies by the full transposed coefficient matrix, which
+    copies hundreds of thousands of weights per call; a hashed row only has a
+    few dozen non-zero columns, so only those coefficients are gathered.
+    """
+    scores = model.coef_[:, features.indices] @ features.data + model.intercept_
+    positive = 1.0 / (1.0 + np.exp(-scores))
+    if len(model.classes_) == 2:
+        return np.array([1.0 - positive[0], positive[0]])
+    total = positive.sum()
+    if total == 0:
+        return np.full(len(positive), 1.0 / len(positive))
+    return positive / total
+
+
+class AccountModelStore(ModelStore):
+    """
+    Per-user account models on disk
+
+    Coefficients are written as float32, halving each save, and widened
+    back to float64 on load so partial_fit keeps working in full precision.
+    """
+
+    def __init__(self, model_dir: Optional[str] = None):
+        super().__init__(model_dir or os.environ.get(
+            'ACCOUNT_MODEL_DIR', os.path.join('instance', 'account_models')
+        ), kind='account model')
+
+    def encode(self, model_state: Dict) -> Dict:
+        model = copy.copy(model_state['model'])
+        model.coef_ = model.coef_.astype(np.float32)
+        return {**model_state, 'model': model, 'format': MODEL_FORMAT}
+
+    def decode(self, model_state: Dict) -> Optional[Dict]:
+        if model_state.get('format') != MODEL_FORMAT:
+            return None
+        model_state['model'].coef_ = model_state['model'].coef_.astype(np.float64)
+        return model_state
+
+
+class AccountClassifier:
+    """
+    Trains, updates and serves the per-user account models
+
+    Confirmations are folded into the cached model straight away but written
+    back in batches. If another worker saves the model in the meantime, the
+    pending confirmations are replayed onto its copy, both when the model is
+    next read and under the file lock before writing, so neither worker's
+    updates overwrite the other's.
+    """
+
+    def __init__(self, store: Optional[AccountModelStore] = None):
+        self.store = store or AccountModelStore()
+        # When each user's history was last found too small to train on
+        self._untrainable: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+        self._user_locks: Dict[int, threading.RLock] = {}
+        # Confirmations folded into a cached model but not yet written back,
+        # the cached state they were folded into, and when the first arrived
+        self._pending: Dict[int, List[Tuple[str, Optional[str], float, int]]] = {}
+        self._pending_base: Dict[int, Dict] = {}
+        self._pending_since: Dict[int, datetime] = {}
+        atexit.register(self.flush)
+
+    def _user_lock(self, user_id: int) -> threading.RLock:
+        with self._lock:
+            return self._user_locks.setdefault(user_id, threading.RLock())
+
+    def train(self, user_id: int) -> Optional[Dict]:
+        """
+        Fit a user's model from scratch on their categorized transactions
+
+        Args:
+            user_id: Owner of the transactions
+
+        Returns:
+            The new model state, or None when there is not enough history
+        """
+        try:
+            with self._user_lock(user_id):
+                rows = Transaction.query.with_entities(
+                    Transaction.description,
+                    Transaction.explanation,
+                    Transaction.amount,
+                    Transaction.account_id
+                ).filter(
+                    Transaction.user_id == user_id,
+                    Transaction.account_id.isnot(None)
+                ).all()
+
+                labels = np.asarray([row.account_id for row in rows], dtype=np.int64)
+                if len(rows) < MIN_TRAINING_SAMPLES or len(np.unique(labels)) < MIN_TRAINING_ACCOUNTS:
+                    with self._lock:
+                        self._untrainable[user_id] = datetime.utcnow()
+                    return None
+
+                features = build_features(
+                    [row.description for row in rows],
+                    [row.explanation for row in rows],
+                    [float(row.amount or 0) for row in rows]
+                )
+                model = SGDClassifier(
+                    loss='log_loss', alpha=REGULARIZATION, max_iter=TRAINING_EPOCHS,
+                    tol=None, random_state=42
+                )
+                model.fit(features, labels)
+
+                model_state = {
+                    'model': model,
+                    'trained_at': datetime.utcnow(),
+                    'training_samples': len(rows),
+                    'updates': 0
+                }
+                self.store.save(user_id, model_state)
+                # The retrain read every confirmation from the database
+                self._discard_pending(user_id)
+                with self._lock:
+                    self._untrainable.pop(user_id, None)
+            logger.info(f"Trained account classifier for user {user_id} on {len(rows)} transactions")
+            return model_state
+
+        except Exception as e:
+            logger.error(f"Error training account classifier for user {user_id}: {str(e)}")
+            return None
+
+    def _fold(self, model_state: Dict, samples: List[Tuple[str, Optional[str], float, int]]) -> None:
+        """partial_fit confirmations into a model; unknown accounts wait for the next retrain"""
+        model = model_state['model']
+        known = [sample for sample in samples if sample[3] in model.classes_]
+        if not known:
+            return
+        descriptions, explanations, amounts, account_ids = zip(*known)
+        features = build_features(list(descriptions), list(explanations), list(amounts))
+        model.partial_fit(features, np.asarray(account_ids, dtype=np.int64))
+        model_state['updates'] += len(known)
+
+    def _current_state(self, user_id: int) -> Optional[Dict]:
+        """The user's latest saved model with this worker's pending confirmations folded in"""
+        model_state = self.store.load(user_id)
+        pending = self._pending.get(user_id)
+        if pending and model_state is not self._pending_base.get(user_id):
+            # Another worker saved (or invalidated) the model since they were folded in
+            if model_state is None:
+                self._discard_pending(user_id)
+            else:
+                self._fold(model_state, pending)
+                self._pending_base[user_id] = model_state
+        return model_state
+
+    def _discard_pending(self, user_id: int) -> None:
+        self._pending.pop(user_id, None)
+        self._pending_base.pop(user_id, None)
+        self._pending_since.pop(user_id, None)
+
+    def _get_model_state(self, user_id: int) -> Optional[Dict]:
+        model_state = self._current_state(user_id)
+        if model_state is not None:
+            return model_state
+        with self._lock:
+            checked_at = self._untrainable.get(user_id)
+            if checked_at and datetime.utcnow() - checked_at < UNTRAINABLE_RETRY:
+                return None
+        return self.train(user_id)
+
+    def predict(self, user_id: int, description: str, explanation: Optional[str] = None,
+                amount: Optional[float] = None, top_k: int = TOP_SUGGESTIONS) -> List[Dict]:
+        """
+        Rank the user's accounts for a transaction
+
+        Args:
+            user_id: Owner of the model
+            description: Transaction description
+            explanation: Optional explanation text
+            amount: Signed amount (0 when unknown)
+            top_k: Number of suggestions to return
+
+        Returns:
+            Up to top_k dictionaries with account_id and confidence, best first
+        """
+        try:
+            features = build_features([description], [explanation], [float(amount or 0)])
+            with self._user_lock(user_id):
+                model_state = self._get_model_state(user_id)
+                if model_state is None:
+                    return []
+                model = model_state['model']
+                probabilities = predict_probabilities(model, features)
+                classes = model.classes_
+
+            best = np.argsort(probabilities)[::-1][:top_k]
+            return [{
+                'account_id': int(classes[i]),
+                'confidence': round(float(probabilities[i]), 4)
+            } for i in best]
+
+        except Exception as e:
+            logger.error(f"Error predicting account for user {user_id}: {str(e)}")
+            return []
+
+    def update(self, user_id: int, description: str, explanation: Optional[str],
+               amount: Optional[float], account_id: int) -> None:
+        """
+        Fold a confirmed categorization into the user's model
+
+        Known accounts are learned with a partial_fit step in memory and
+        written back once SAVE_BATCH_SIZE confirmations or SAVE_INTERVAL have
+        accumulated; an account the model has never seen changes the label
+        set, so it triggers a full retrain instead.
+        """
+        try:
+            with self._user_lock(user_id):
+                model_state = self._current_state(user_id)
+                if model_state is None or account_id not in model_state['model'].classes_:
+                    with self._lock:
+                        self._untrainable.pop(user_id, None)
+                    self.train(user_id)
+                    return
+
+                sample = (description, explanation, float(amount or 0), account_id)
+                self._fold(model_state, [sample])
+                self._pending.setdefault(user_id, []).append(sample)
+                self._pending_base[user_id] = model_state
+                since = self._pending_since.setdefault(user_id, datetime.utcnow())
+                if (len(self._pending[user_id]) >= SAVE_BATCH_SIZE
+                        or datetime.utcnow() - since >= SAVE_INTERVAL):
+                    self._flush_user(user_id)
+
+        except Exception as e:
+            logger.error(f"Error updating account classifier for user {user_id}: {str(e)}")
+
+    def _flush_user(self, user_id: int) -> None:
+        """Write a user's model back; the caller holds the user's lock"""
+        with self.store.locked(user_id):
+            # Re-read under the file lock so another worker's save is merged, not overwritten
+            model_state = self._current_state(user_id)
+            if model_state is not None and self._pending.get(user_id):
+                self.store.write(user_id, model_state)
+        self._discard_pending(user_id)
+
+    def flush(self) -> None:
+        """Write back every model with pending confirmations, e.g. at shutdown"""
+        for user_id in list(self._pending):
+            try:
+                with self._user_lock(user_id):
+                    if self._pending.get(user_id):
+                        self._flush_user(user_id)
+            except Exception as e:
+                logger.error(f"Error saving account classifier for user {user_id}: {str(e)}")
+
+    def record_confirmation(self, transaction: Transaction) -> None:
+        """Learn from a transaction whose account the user has just confirmed"""
+        if transaction.account_id is None:
+            return
+        self.update(
+            transaction.user_id,
+            transaction.description,
+            transaction.explanation,
+            float(transaction.amount) if transaction.amount is not None else 0.0,
+            transaction.account_id
+        )
+
+    def invalidate(self, user_id: int) -> None:
+        """Forget a user's model, e.g. after accounts are merged or deleted"""
+        with self._user_lock(user_id):
+            self._discard_pending(user_id)
+            with self._lock:
+                self._untrainable.pop(user_id, None)
+            self.store.invalidate(user_id)
+
+
+account_classifier = AccountClassifier()
@@ -242,6 +242,7 @@ class ScheduledAuditService:
         )
         db.session.add(audit)
         db.session.commit()
+        start_time = time.time()
         
         try:
             # Run security checks
@@ -276,6 +277,7 @@ class ScheduledAuditService:
             audit.status = status
             audit.summary = f"Security audit completed with status: {status}. Found {len(findings)} issues."
             audit.details = json.dumps(security_results)
+            audit.duration = time.time() - start_time
             db.session.commit()
             
             return {
@@ -295,6 +297,7 @@ class ScheduledAuditService:
                 'error': str(e),
                 'traceback': error_details
             })
+            audit.duration = time.time() - start_time
             db.session.commit()
             
             return {
@@ -317,6 +320,7 @@ class ScheduledAuditService:
         )
         db.session.add(audit)
         db.session.commit()
+        start_time = time.time()
         
         try:
             # Run performance checks
@@ -351,6 +355,7 @@ class ScheduledAuditService:
             audit.status = status
             audit.summary = f"Performance audit completed with status: {status}. Found {len(findings)} issues."
             audit.details = json.dumps(performance_results)
+            audit.duration = time.time() - start_time
             db.session.commit()
             
             return {
@@ -370,6 +375,7 @@ class ScheduledAuditService:
                 'error': str(e),
                 'traceback': error_details
             })
+            audit.duration = time.time() - start_time
             db.session.commit()
             
             return {
@@ -392,6 +398,7 @@ class ScheduledAuditService:
         )
         db.session.add(audit)
         db.session.commit()
+        start_time = time.time()
         
         try:
             # Run data integrity checks
@@ -426,6 +433,7 @@ class ScheduledAuditService:
             audit.status = status
             audit.summary = f"Data integrity audit completed with status: {status}. Found {len(findings)} issues."
             audit.details = json.dumps(integrity_results)
+            audit.duration = time.time() - start_time
             db.session.commit()
             
             return {
@@ -445,6 +453,7 @@ class ScheduledAuditService:
                 'error': str(e),
                 'traceback': error_details
             })
+            audit.duration = time.time() - start_time
             db.session.commit()
             
             return {
@@ -467,6 +476,7 @@ class ScheduledAuditService:
         )
         db.session.add(audit)
         db.session.commit()
+        start_time = time.time()
         
         try:
             # Run code analysis
@@ -504,6 +514,7 @@ class ScheduledAuditService:
             audit.status = status
             audit.summary = f"Code quality audit completed with status: {status}. Found {len(findings)} issues."
             audit.details = json.dumps(result.get_summary())
+            audit.duration = time.time() - start_time
             db.session.commit()
             
             return {
@@ -523,6 +534,7 @@ class ScheduledAuditService:
                 'error': str(e),
                 'traceback': error_details
             })
+            audit.duration = time.time() - start_time
             db.session.commit()
             
             return {
@@ -544,12 +556,12 @@ def configure_scheduled_audit(scheduler):
     # Schedule daily job at 8:00 PM ET
     eastern = pytz.timezone('US/Eastern')
     scheduler.add_job(
-        audit_service.run_daily_audit,
-        'cron',
+        id='daily_system_audit',
+        func=audit_service.run_daily_audit,
+        trigger='cron',
         hour=20,  # 8:00 PM
         minute=0,
         timezone=eastern,
-        id='daily_system_audit',
         replace_existing=True,
         name='Daily System Audit'
     )
@@ -11,8 +11,13 @@ import time
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 import json
 from difflib import SequenceMatcher
+import numpy as np
+import pandas as pd
 from sqlalchemy.exc import SQLAlchemyError
 from models import ErrorLog, db
+from account_classifier import account_classifier, LOCAL_CONFIDENCE_THRESHOLD
+from embedding_store import embedding_store
+from utils.description_dictionary import DescriptionDictionary
 
 
 # Configure logging with proper format
@@ -55,8 +60,8 @@ def get_openai_client() -> Optional[OpenAI]:
         
         while retry_count < max_retries:
             try:
-                # Use a simple, lightweight API call to test the connection
-                _openai_client.models.list(limit=1)
+                # Fetch the one model we use rather than listing every model
+                _openai_client.models.retrieve("gpt-3.5-turbo")
                 logger.info("OpenAI client initialized and tested successfully")
                 _last_client_error = None
                 return _openai_client
@@ -86,7 +91,7 @@ def get_openai_client() -> Optional[OpenAI]:
         logger.error(f"Failed to initialize OpenAI client after {max_retries} attempts")
         _openai_client = None
         _last_client_error = "Failed to initialize after multiple attempts"
-            return None
+        return None
 
     except Exception as e:
         logger.error(f"Unexpected error during client initialization: {str(e)}")
@@ -190,8 +195,31 @@ logger.setLevel(logging.DEBUG)
 # Global client instance
 
 
-def predict_account(description: str, explanation: str, available_accounts: List[Dict]) -> Tuple[bool, str, List[Dict]]:
-    """Account Suggestion Feature (ASF) with enhanced validation and pattern matching"""
+def _local_account_suggestions(user_id: int, description: str, explanation: str,
+                                amount: Optional[float], accounts: List[Dict]) -> List[Dict]:
+    """Account suggestions from the user's local classifier, in the LLM response format"""
+    accounts_by_id = {acc['id']: acc for acc in accounts}
+    suggestions = []
+    for prediction in account_classifier.predict(user_id, description, explanation, amount):
+        account = accounts_by_id.get(prediction['account_id'])
+        if account:
+            suggestions.append({
+                'account': account['name'],
+                'confidence': prediction['confidence'],
+                'reasoning': 'Matches how similar transactions were categorized before',
+                'source': 'local_classifier'
+            })
+    return suggestions
+
+
+def predict_account(description: str, explanation: str, available_accounts: List[Dict],
+                    user_id: Optional[int] = None, amount: Optional[float] = None) -> Tuple[bool, str, List[Dict]]:
+    """
+    Account Suggestion Feature (ASF) with enhanced validation and pattern matching
+
+    When user_id is given the user's local classifier is tried first and the
+    LLM is only called if its best suggestion is below LOCAL_CONFIDENCE_THRESHOLD.
+    """
     logger = logging.getLogger(__name__)
     processing_start = datetime.now()
 
@@ -280,9 +308,19 @@ def predict_account(description: str, explanation: str, available_accounts: List
             'start_time': start_time
         }
 
+        local_suggestions = []
+        if user_id is not None:
+            local_suggestions = _local_account_suggestions(
+                user_id, description, explanation, amount, valid_accounts
+            )
+            if local_suggestions and local_suggestions[0]['confidence'] >= LOCAL_CONFIDENCE_THRESHOLD:
+                return True, "", local_suggestions
+
         client = get_openai_client()
         if not client:
             logger.warning("OpenAI client unavailable, using fallback matching")
+            if local_suggestions:
+                return True, "", local_suggestions
             return False, "OpenAI client unavailable", []
 
         # Format account information
@@ -417,141 +455,89 @@ Provide analysis in this JSON structure:
         }
 
 def forecast_expenses(transactions, accounts, forecast_months=12):
-    """Generate expense forecasts based on historical transaction patterns."""
-    try:
-        client = get_openai_client()
-
-        # Format transaction data for analysis
-        transaction_summary = "\n".join([
-            f"- Amount: ${t['amount']}, Description: {t['description']}, "
-            f"Date: {t.get('date', 'N/A')}, Account: {t.get('account_name', 'Uncategorized')}"
-            for t in transactions[:50]  # Use recent transactions for pattern analysis
-        ])
-
-        # Format account information
-        account_summary = "\n".join([
-            f"- {acc['name']}: ${acc.get('balance', 0):.2f} ({acc['category']})"
-            for acc in accounts
-        ])
-
-        prompt = f"""Analyze these financial transactions and accounts to generate detailed expense forecasts:
-
-Transaction History:
-{transaction_summary}
-
-Account Balances:
-{account_summary}
-
-Instructions:
-1. Analyze Historical Patterns
-   - Identify recurring expenses and their frequencies
-   - Calculate growth rates and seasonal variations
-   - Consider account-specific trends
-   - Factor in both Description and Explanation fields for pattern recognition
-
-2. Generate Expense Forecasts
-   - Project monthly expenses for next {forecast_months} months
-   - Break down by expense categories
-   - Include confidence intervals
-   - Account for seasonality and trends
-   - Consider economic factors and business context
-
-3. Provide Risk Analysis
-   - Identify potential expense risks
-   - Calculate variance in projections
-   - Assess forecast reliability
-   - Consider external factors
-
-Format your response as a JSON object with this structure:
-{{
-    "monthly_forecasts": [
-        {{
-            "month": "YYYY-MM",
-            "total_expenses": float,
-            "confidence": float,
-            "breakdown": [
-                {{
-                    "category": string,
-                    "amount": float,
-                    "trend": "increasing|stable|decreasing"
-                }}
-            ]
-        }}
-    ],
-    "forecast_factors": {{
-        "key_drivers": [string],
-        "risk_factors": [string],
-        "assumptions": [string]
-    }},
-    "confidence_metrics": {{
-        "overall_confidence": float,
-        "variance_range": {{
-            "min": float,
-            "max": float
-        }},
-        "reliability_score": float
-    }},
-    "recommendations": [
-        {{
-            "action": string,
-            "potential_impact": string,
-            "implementation_timeline": string
-        }}
-    ]
-}}"""
+    """Generate expense forecasts based on historical transaction patterns.
 
-        # Make API call
-        try:
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an expert financial analyst specializing in expense forecasting and predictive analysis."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.2,
-                max_tokens=1000
-            )
-
-            # Parse and validate the forecast
-            try:
-                content = response.choices[0].message.content.strip()
-                if not content:
-                    logger.error("Empty response from AI model")
-                    return {
-                        "error": "Empty response from AI model",
-                        "monthly_forecasts": [],
-                        "forecast_factors": {"key_drivers": [], "risk_factors": [], "assumptions": []},
-                        "confidence_metrics": {"overall_confidence": 0, "variance_range": {"min": 0, "max": 0}, "reliability_score": 0},
-                        "recommendations": []
-                    }
+    Forecasts are produced locally by the exponential smoothing engine in
+    forecasting.py, so they are deterministic and available without the API.
+    """
+    from forecasting import monthly_series, fit_series_matrix, forecast_from_fit, seasonal_strength, TOTAL_KEY
 
-                forecast = json.loads(content)
-                return forecast
+    empty_forecast = {
+        "monthly_forecasts": [],
+        "forecast_factors": {"key_drivers": [], "risk_factors": [], "assumptions": []},
+        "confidence_metrics": {"overall_confidence": 0, "variance_range": {"min": 0, "max": 0}, "reliability_score": 0},
+        "recommendations": []
+    }
 
-            except json.JSONDecodeError as je:
-                logger.error(f"JSON parsing error in forecast: {str(je)}")
-                return {
-                    "error": "Invalid forecast format",
-                    "details": str(je),
-                    "monthly_forecasts": [],
-                    "forecast_factors": {"key_drivers": [], "risk_factors": [], "assumptions": []},
-                    "confidence_metrics": {"overall_confidence": 0, "variance_range": {"min": 0, "max": 0}, "reliability_score": 0},
-                    "recommendations": []
-                }
+    try:
+        df = pd.DataFrame([{
+            'date': t.get('date'),
+            'amount': float(t['amount']),
+            'category': t.get('account_name') or 'Uncategorized'
+        } for t in transactions if t.get('date')])
+        if df.empty:
+            return {"error": "No dated transactions to forecast", **empty_forecast}
+
+        matrix = monthly_series(df, key_column='category')
+        fits = dict(zip(matrix.columns, fit_series_matrix(matrix.to_numpy().T)))
+        forecasts = {key: forecast_from_fit(fit, forecast_months) for key, fit in fits.items()}
+
+        total = forecasts.pop(TOTAL_KEY)
+        future_months = [str(matrix.index[-1] + step) for step in range(1, forecast_months + 1)]
+
+        # Relative interval width drives the confidence figures
+        means = np.abs(np.array(total['mean']))
+        widths = np.array(total['upper']) - np.array(total['lower'])
+        relative_width = np.divide(widths, means, out=np.ones_like(widths), where=means > 0)
+        confidences = np.clip(1 - relative_width / 2, 0, 1)
+
+        def _trend(values):
+            slope = values[-1] - values[0]
+            tolerance = 0.05 * max(abs(values[0]), 1)
+            return 'increasing' if slope > tolerance else 'decreasing' if slope < -tolerance else 'stable'
+
+        monthly_forecasts = [{
+            "month": month,
+            "total_expenses": total['mean'][i],
+            "confidence": round(float(confidences[i]), 3),
+            "lower_bound": total['lower'][i],
+            "upper_bound": total['upper'][i],
+            "breakdown": [{
+                "category": category,
+                "amount": forecast['mean'][i],
+                "trend": _trend(forecast['mean'])
+            } for category, forecast in forecasts.items()]
+        } for i, month in enumerate(future_months)]
+
+        by_magnitude = sorted(forecasts.items(), key=lambda item: -abs(np.mean(item[1]['mean'])))
+        by_uncertainty = sorted(forecasts.items(), key=lambda item: -(item[1]['upper'][0] - item[1]['lower'][0]))
+        strength = seasonal_strength(matrix[TOTAL_KEY].to_numpy())
 
-        except Exception as e:
-            logger.error(f"Error in OpenAI API call: {str(e)}")
-            raise
+        return {
+            "monthly_forecasts": monthly_forecasts,
+            "forecast_factors": {
+                "key_drivers": [category for category, _ in by_magnitude[:3]],
+                "risk_factors": [f"Wide prediction interval for {category}" for category, _ in by_uncertainty[:3]],
+                "assumptions": [
+                    f"Based on {len(matrix)} months of history",
+                    f"Model: {fits[TOTAL_KEY]['method']}",
+                    f"Seasonal strength: {strength:.2f}"
+                ]
+            },
+            "confidence_metrics": {
+                "overall_confidence": round(float(confidences.mean()), 3),
+                "variance_range": {"min": min(total['lower']), "max": max(total['upper'])},
+                "reliability_score": round(float(confidences[0]), 3)
+            },
+            "recommendations": []
+        }
 
     except Exception as e:
         logger.error(f"Error generating expense forecast: {str(e)}")
         return {
             "error": "Failed to generate expense forecast",
             "details": str(e),
-            "monthly_forecasts": [],
-            "forecast_factors": {"key_drivers": [], "risk_factors": [], "assumptions": []},
-            "confidence_metrics": {"overall_confidence": 0, "variance_range": {"min": 0, "max": 0}, "reliability_score": 0},
-            "recommendations": []
+            **empty_forecast
         }
 
 def generate_financial_advice(transactions, accounts):
@@ -843,6 +829,7 @@ class ERFProcessor:
     def __init__(self):
         self.TEXT_SIMILARITY_THRESHOLD = 0.7
         self.SEMANTIC_SIMILARITY_THRESHOLD = 0.95
+        self.SEMANTIC_CANDIDATES = 50
         self.MAX_RETRIES = 3
         self.MIN_DESCRIPTION_LENGTH = 3
 
@@ -868,6 +855,10 @@ class ERFProcessor:
                                 user_id: int) -> Tuple[bool, str, List[Dict]]:
         """
         Enhanced ERF: Find transactions with similar descriptions using multiple similarity metrics
+
+        Rows whose description text is not close enough are still matched
+        when they are among the user's nearest neighbours in the embedding
+        store at SEMANTIC_SIMILARITY_THRESHOLD or above.
         """
         try:
             # Validate input
@@ -882,30 +873,26 @@ class ERFProcessor:
 
             logger.info(f"Processing ERF for description: {transaction_description}")
 
-            for transaction in transactions:
+            # Similarity is computed once per unique description, not per row
+            dictionary = DescriptionDictionary.from_records(transactions, normalize=str.lower)
+            matched_rows = []
+            for entry in dictionary:
                 try:
-                    processed_count += 1
+                    processed_count += entry.frequency
 
                     # Skip invalid transactions
-                    if not transaction.get('description'):
+                    if not entry.key:
                         continue
 
                     # Calculate similarity
-                    similarity = self.calculate_text_similarity(
-                        transaction_description,
-                        transaction['description']
-                    )
+                    similarity = self.calculate_text_similarity(transaction_description, entry.key)
 
                     if similarity >= self.TEXT_SIMILARITY_THRESHOLD:
-                        similar_transactions.append({
-                            'transaction': transaction,
-                            'similarity_score': similarity,
-                            'match_type': 'text'
-                        })
+                        matched_rows.extend((row, similarity) for row in entry.rows)
 
                 except Exception as e:
                     error_count += 1
-                    logger.error(f"Error processing transaction {transaction.get('id', 'unknown')}: {str(e)}")
+                    logger.error(f"Error processing description '{entry.key}': {str(e)}")
 
                     # Log error to database
                     self.log_error(user_id, 'ERF_PROCESSING_ERROR', str(e))
@@ -913,6 +900,29 @@ class ERFProcessor:
                     if error_count > self.MAX_RETRIES:
                         return False, "Exceeded maximum error threshold", []
 
+            for row, similarity in sorted(matched_rows):
+                similar_transactions.append({
+                    'transaction': transactions[row],
+                    'similarity_score': similarity,
+                    'match_type': 'text'
+                })
+
+            if user_id:
+                text_rows = {row for row, _ in matched_rows}
+                rows_by_id = {}
+                for row, transaction in enumerate(transactions):
+                    if row not in text_rows and transaction.get('id') is not None:
+                        rows_by_id.setdefault(transaction['id'], []).append(row)
+                for transaction_id, similarity in embedding_store.search(
+                        user_id, transaction_description, k=self.SEMANTIC_CANDIDATES,
+                        min_similarity=self.SEMANTIC_SIMILARITY_THRESHOLD):
+                    for row in rows_by_id.get(transaction_id, []):
+                        similar_transactions.append({
+                            'transaction': transactions[row],
+                            'similarity_score': similarity,
+                            'match_type': 'semantic'
+                        })
+
             # Sort by similarity score
             similar_transactions.sort(key=lambda x: x['similarity_score'], reverse=True)
 
@@ -946,7 +956,8 @@ def find_similar_transactions(transaction_description: str, transactions: list,
     Find transactions with similar descriptions based on:
     - 70% text similarity OR
     - 95% semantic similarity threshold
-    """    erf_processor = ERFProcessor()
+    """
+    erf_processor = ERFProcessor()
     success, message, similar_transactions = erf_processor.find_similar_transactions(
         transaction_description, transactions, user_id
     )
@@ -1,8 +1,359 @@
 """Alert system for monitoring and detecting anomalies"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import logging
-from models import Transaction, db, AlertConfiguration, AlertHistory, Account
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func
+
+from models import Transaction, db, AlertConfiguration, AlertHistory, Account, RecurringPayment
+from recurring_detection import MISSING_GRACE_DAYS, amount_bands, description_keys
+
+# Lookback windows per alert type, in days
+TRANSACTION_WINDOW_DAYS = 30
+PATTERN_WINDOW_DAYS = 90
+# Users evaluated per database round trip, and worker threads for scheduled runs
+EVALUATION_BATCH_SIZE = 50
+EVALUATION_MAX_WORKERS = 4
+
+TRANSACTION_COLUMNS = ['transaction_id', 'user_id', 'date', 'amount', 'description']
+BALANCE_COLUMNS = ['account_id', 'user_id', 'name', 'balance']
+OVERDUE_COLUMNS = ['user_id', 'description_key', 'amount_band', 'description', 'frequency',
+                   'expected_amount', 'last_date', 'next_expected_date']
+
+
+class AlertEvaluationEngine:
+    """
+    Evaluates every active alert configuration for a batch of users against a
+    single load of their data, then deduplicates and bulk-inserts the alerts
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+    def _load_batch(self, user_ids: List[int]) -> Tuple[List[AlertConfiguration], pd.DataFrame,
+                                                         pd.DataFrame, pd.DataFrame, set]:
+        """Load configs, recent transactions, balances, overdue recurring payments and open alerts at once"""
+        configurations = AlertConfiguration.query.filter(
+            AlertConfiguration.user_id.in_(user_ids),
+            AlertConfiguration.is_active == True
+        ).all()
+
+        cutoff_date = datetime.utcnow() - timedelta(days=PATTERN_WINDOW_DAYS)
+        transactions = pd.DataFrame(
+            db.session.query(
+                Transaction.id,
+                Transaction.user_id,
+                Transaction.date,
+                Transaction.amount,
+                Transaction.description
+            ).filter(
+                Transaction.user_id.in_(user_ids),
+                Transaction.date >= cutoff_date
+            ).order_by(Transaction.user_id, Transaction.date).all(),
+            columns=TRANSACTION_COLUMNS
+        )
+        if not transactions.empty:
+            transactions['amount'] = transactions['amount'].astype(float)
+
+        balances = pd.DataFrame(
+            db.session.query(
+                Account.id,
+                Account.user_id,
+                Account.name,
+                func.coalesce(func.sum(Transaction.amount), 0)
+            ).outerjoin(
+                Transaction, Transaction.account_id == Account.id
+            ).filter(
+                Account.user_id.in_(user_ids)
+            ).group_by(Account.id, Account.user_id, Account.name).all(),
+            columns=BALANCE_COLUMNS
+        )
+        if not balances.empty:
+            balances['balance'] = balances['balance'].astype(float)
+
+        # Calendar lookup via the (user_id, next_expected_date) index, no history scan
+        overdue = pd.DataFrame(
+            db.session.query(
+                RecurringPayment.user_id,
+                RecurringPayment.description_key,
+                RecurringPayment.amount_band,
+                RecurringPayment.description,
+                RecurringPayment.frequency,
+                RecurringPayment.expected_amount,
+                RecurringPayment.last_date,
+                RecurringPayment.next_expected_date
+            ).filter(
+                RecurringPayment.user_id.in_(user_ids),
+                RecurringPayment.is_active == True,
+                RecurringPayment.next_expected_date < datetime.utcnow() - timedelta(days=MISSING_GRACE_DAYS)
+            ).all(),
+            columns=OVERDUE_COLUMNS
+        )
+
+        open_alerts = set(
+            db.session.query(AlertHistory.alert_config_id, AlertHistory.alert_message).filter(
+                AlertHistory.user_id.in_(user_ids),
+                AlertHistory.status != 'resolved'
+            ).all()
+        )
+        return configurations, transactions, balances, overdue, open_alerts
+
+    @staticmethod
+    def _condition_mask(values: pd.Series, config: AlertConfiguration) -> pd.Series:
+        """Apply a configuration's threshold/condition to a series of magnitudes"""
+        threshold = float(config.threshold or 0)
+        if config.condition == 'below':
+            return values < threshold
+        if config.condition == 'equals':
+            return np.isclose(values, threshold)
+        return values > threshold
+
+    @staticmethod
+    def _severity(values: pd.Series, config: AlertConfiguration) -> np.ndarray:
+        """High when a value is far past the threshold in the configured direction"""
+        threshold = float(config.threshold or 0)
+        if config.condition == 'below':
+            return np.where(values < threshold * 0.5, 'high', 'medium')
+        if config.condition == 'equals':
+            return np.full(len(values), 'medium')
+        return np.where(values > threshold * 1.5, 'high', 'medium')
+
+    def _evaluate_transaction(self, config: AlertConfiguration, transactions: pd.DataFrame) -> List[Dict]:
+        cutoff_date = datetime.utcnow() - timedelta(days=TRANSACTION_WINDOW_DAYS)
+        recent = transactions[transactions['date'] >= cutoff_date]
+        magnitudes = recent['amount'].abs()
+        mask = self._condition_mask(magnitudes, config)
+        flagged = recent[mask]
+        return [{
+            'type': 'transaction',
+            'severity': severity,
+            'message': f'Large transaction detected: ${magnitude:,.2f} (Transaction ID: {transaction_id})',
+            'transaction_id': int(transaction_id),
+            'config_id': config.id
+        } for transaction_id, magnitude, severity in zip(
+            flagged['transaction_id'], magnitudes[mask], self._severity(magnitudes[mask], config)
+        )]
+
+    def _evaluate_balance(self, config: AlertConfiguration, balances: pd.DataFrame) -> List[Dict]:
+        magnitudes = balances['balance'].abs()
+        mask = self._condition_mask(magnitudes, config)
+        flagged = balances[mask]
+        return [{
+            'type': 'balance',
+            'severity': severity,
+            'message': f'Account balance threshold exceeded: {name}',
+            'account_id': int(account_id),
+            'config_id': config.id
+        } for account_id, name, severity in zip(
+            flagged['account_id'], flagged['name'], self._severity(magnitudes[mask], config)
+        )]
+
+    def _evaluate_pattern(self, config: AlertConfiguration, transactions: pd.DataFrame) -> List[Dict]:
+        # A transaction more than 3x both of its predecessors is unusual
+        magnitudes = transactions['amount'].abs()
+        mask = (magnitudes > magnitudes.shift(1) * 3) & (magnitudes > magnitudes.shift(2) * 3)
+        return [{
+            'type': 'pattern',
+            'severity': 'medium',
+            'message': f'Unusual transaction pattern detected (Transaction ID: {transaction_id})',
+            'transaction_id': int(transaction_id),
+            'config_id': config.id
+        } for transaction_id in transactions.loc[mask, 'transaction_id']]
+
+    def _evaluate_missing_payment(self, config: AlertConfiguration, transactions: pd.DataFrame,
+                                  overdue: pd.DataFrame) -> List[Dict]:
+        # A payment that arrived since the last calendar refresh settles the entry
+        if not transactions.empty:
+            recent = pd.DataFrame({
+                'description_key': description_keys(transactions['description']).to_numpy(),
+                'band': amount_bands(transactions['amount']),
+                'date': transactions['date'].to_numpy()
+            })
+            candidates = overdue.reset_index(drop=True).reset_index().merge(recent, on='description_key')
+            settled = candidates.loc[
+                ((candidates['band'] - candidates['amount_band']).abs() <= 1) &
+                (candidates['date'] > candidates['last_date']),
+                'index'
+            ].unique()
+            overdue = overdue.reset_index(drop=True).drop(index=settled)
+
+        return [{
+            'type': 'missing_payment',
+            'severity': 'medium',
+            'message': f"Expected {frequency} payment '{description}' of ${abs(float(amount)):,.2f} "
+                       f"was due {due:%Y-%m-%d}",
+            'config_id': config.id
+        } for description, frequency, amount, due in zip(
+            overdue['description'], overdue['frequency'],
+            overdue['expected_amount'], overdue['next_expected_date']
+        )]
+
+    def evaluate_configuration(self, config: AlertConfiguration, transactions: pd.DataFrame,
+                               balances: pd.DataFrame, overdue: Optional[pd.DataFrame] = None) -> List[Dict]:
+        """
+        Evaluate one configuration against a user's preloaded data
+
+        Args:
+            config: AlertConfiguration to evaluate
+            transactions: The user's recent transactions, ordered by date
+            balances: The user's account balances
+            overdue: The user's recurring payments past their expected date
+
+        Returns:
+            List of anomalies detected for this configuration
+        """
+        try:
+            if config.alert_type == 'transaction' and not transactions.empty:
+                return self._evaluate_transaction(config, transactions)
+            elif config.alert_type == 'balance' and not balances.empty:
+                return self._evaluate_balance(config, balances)
+            elif config.alert_type == 'pattern' and len(transactions) >= 3:
+                return self._evaluate_pattern(config, transactions)
+            elif config.alert_type == 'missing_payment' and overdue is not None and not overdue.empty:
+                return self._evaluate_missing_payment(config, transactions, overdue)
+            return []
+        except Exception as e:
+            self.logger.error(f"Error evaluating alert configuration {config.id}: {str(e)}")
+            return []
+
+    def detect(self, user_ids: List[int]) -> Dict[int, List[Dict]]:
+        """
+        Detect anomalies for a batch of users without persisting them
+
+        Args:
+            user_ids: IDs of the users to evaluate
+
+        Returns:
+            Mapping of user ID to the anomalies detected for that user
+        """
+        configurations, transactions, balances, overdue, _ = self._load_batch(user_ids)
+        return self._detect_loaded(configurations, transactions, balances, overdue)
+
+    def _detect_loaded(self, configurations, transactions, balances, overdue) -> Dict[int, List[Dict]]:
+        tx_by_user = dict(tuple(transactions.groupby('user_id'))) if not transactions.empty else {}
+        bal_by_user = dict(tuple(balances.groupby('user_id'))) if not balances.empty else {}
+        overdue_by_user = dict(tuple(overdue.groupby('user_id'))) if not overdue.empty else {}
+        empty_tx = pd.DataFrame(columns=TRANSACTION_COLUMNS)
+        empty_bal = pd.DataFrame(columns=BALANCE_COLUMNS)
+
+        results: Dict[int, List[Dict]] = {}
+        for config in configurations:
+            anomalies = self.evaluate_configuration(
+                config,
+                tx_by_user.get(config.user_id, empty_tx),
+                bal_by_user.get(config.user_id, empty_bal),
+                overdue_by_user.get(config.user_id)
+            )
+            results.setdefault(config.user_id, []).extend(anomalies)
+        return results
+
+    def evaluate_batch(self, user_ids: List[int]) -> int:
+        """
+        Evaluate, deduplicate and bulk-insert alerts for a batch of users
+
+        Args:
+            user_ids: IDs of the users to evaluate
+
+        Returns:
+            Number of alerts created
+        """
+        try:
+            configurations, transactions, balances, overdue, open_alerts = self._load_batch(user_ids)
+            detected = self._detect_loaded(configurations, transactions, balances, overdue)
+
+            now = datetime.utcnow()
+            new_alerts = []
+            triggered_configs = set()
+            for user_id, anomalies in detected.items():
+                for anomaly in anomalies:
+                    key = (anomaly['config_id'], anomaly['message'])
+                    if key in open_alerts:
+                        continue
+                    open_alerts.add(key)
+                    triggered_configs.add(anomaly['config_id'])
+                    new_alerts.append({
+                        'user_id': user_id,
+                        'alert_config_id': anomaly['config_id'],
+                        'alert_message': anomaly['message'][:255],
+                        'severity': anomaly['severity'],
+                        'status': 'active',
+                        'created_at': now
+                    })
+
+            if new_alerts:
+                db.session.bulk_insert_mappings(AlertHistory, new_alerts)
+                db.session.bulk_update_mappings(AlertConfiguration, [
+                    {'id': config_id, 'last_triggered': now} for config_id in triggered_configs
+                ])
+            db.session.commit()
+            return len(new_alerts)
+
+        except Exception as e:
+            self.logger.error(f"Error evaluating alert batch: {str(e)}")
+            db.session.rollback()
+            return 0
+
+    def evaluate_all_users(self, app, batch_size: int = EVALUATION_BATCH_SIZE,
+                           max_workers: int = EVALUATION_MAX_WORKERS) -> int:
+        """
+        Evaluate every user with an active alert configuration in parallel batches
+
+        Args:
+            app: Flask application used to open a context per worker
+            batch_size: Users per batch
+            max_workers: Concurrent batches
+
+        Returns:
+            Total number of alerts created
+        """
+        with app.app_context():
+            user_ids = [row[0] for row in db.session.query(AlertConfiguration.user_id).filter(
+                AlertConfiguration.is_active == True
+            ).distinct().all()]
+
+        batches = [user_ids[i:i + batch_size] for i in range(0, len(user_ids), batch_size)]
+
+        def _run(batch):
+            with app.app_context():
+                return self.evaluate_batch(batch)
+
+        created = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_run, batch) for batch in batches]
+            for future in as_completed(futures):
+                try:
+                    created += future.result()
+                except Exception as e:
+                    self.logger.error(f"Alert evaluation batch failed: {str(e)}")
+
+        self.logger.info(f"Alert evaluation created {created} alerts for {len(user_ids)} users")
+        return created
+
+
+def configure_alert_evaluation(scheduler, app, minutes: int = 15):
+    """
+    Configure the periodic bulk alert evaluation job
+
+    Args:
+        scheduler: APScheduler instance to register the job with
+        app: Flask application passed to the job for worker contexts
+        minutes: Interval between runs
+    """
+    engine = AlertEvaluationEngine()
+    scheduler.add_job(
+        func=engine.evaluate_all_users,
+        trigger='interval',
+        minutes=minutes,
+        args=[app],
+        id='bulk_alert_evaluation',
+        replace_existing=True,
+        name='Bulk Alert Evaluation'
+    )
+    logging.getLogger(__name__).info(f"Bulk alert evaluation scheduled every {minutes} minutes")
+
 
 class AlertSystem:
     def __init__(self):
@@ -92,20 +443,8 @@ class AlertSystem:
             List of detected anomalies
         """
         try:
-            # Get active alert configurations
-            configurations = AlertConfiguration.query.filter_by(
-                user_id=user_id,
-                is_active=True
-            ).all()
-            
-            detected_anomalies = []
-            
-            for config in configurations:
-                anomalies = self._process_alert_configuration(config)
-                if anomalies:
-                    detected_anomalies.extend(anomalies)
-                    
-            return detected_anomalies
+            # Load the user's data once and evaluate all configurations against it
+            return AlertEvaluationEngine().detect([user_id]).get(user_id, [])
             
         except Exception as e:
             self.logger.error(f"Error checking anomalies: {str(e)}")
@@ -160,6 +499,18 @@ class AlertSystem:
             self.logger.error(f"Error checking balance anomalies: {str(e)}")
             return []
 
+    def evaluate_and_store(self, user_id: int) -> int:
+        """
+        Detect anomalies for a user and bulk-insert any alerts not already open
+
+        Args:
+            user_id: ID of the user to check
+
+        Returns:
+            Number of alerts created
+        """
+        return AlertEvaluationEngine().evaluate_batch([user_id])
+
     def create_alert(self, user_id: int, anomaly: Dict, config_id: int) -> Optional[AlertHistory]:
         """
         Create alert history entry for detected anomaly
@@ -4,6 +4,7 @@ Provides automated detection of unusual patterns and anomalies in financial data
 """
 
 import logging
+import os
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 import numpy as np
@@ -13,11 +14,67 @@ import pandas as pd
 
 from models import db, Transaction, Account, AlertConfiguration, AlertHistory
 from ai_insights import FinancialInsightsGenerator
+from utils.model_store import ModelStore
+from utils.text_normalization import description_keys
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Feature columns fed to the Isolation Forest, in model order
+FEATURE_COLUMNS = [
+    'amount',
+    'log_amount',
+    'day_of_week',
+    'day_of_month',
+    'description_frequency',
+    'account_frequency'
+]
+
+# Refit policy for persisted per-user models
+MIN_TRAINING_SAMPLES = 10
+MIN_NEW_SAMPLES_FOR_REFIT = 25
+REFIT_GROWTH_RATIO = 0.2
+MODEL_MAX_AGE = timedelta(days=30)
+
+
+def _transactions_to_frame(transactions: List[Transaction]) -> pd.DataFrame:
+    """Convert Transaction rows into the DataFrame layout used for analysis"""
+    return pd.DataFrame([{
+        'date': t.date,
+        'amount': float(t.amount),
+        'description': t.description,
+        'category': t.account.category if t.account else 'Uncategorized',
+        'account_id': t.account_id,
+        'transaction_id': t.id
+    } for t in transactions])
+
+
+def _frame_to_anomalies(flagged: pd.DataFrame, method: str, reason: Optional[str]) -> List[Dict]:
+    """Convert a DataFrame of flagged rows into anomaly dictionaries"""
+    return [{
+        'transaction_id': int(row['transaction_id']),
+        'date': row['date'].isoformat(),
+        'amount': float(row['amount']),
+        'description': row['description'],
+        'anomaly_score': float(row['anomaly_score']),
+        'detection_method': method,
+        'reason': reason
+    } for row in flagged.to_dict('records')]
+
+
+class AnomalyModelStore(ModelStore):
+    """Per-user fitted anomaly models on disk"""
+
+    def __init__(self, model_dir: Optional[str] = None):
+        super().__init__(model_dir or os.environ.get(
+            'ANOMALY_MODEL_DIR', os.path.join('instance', 'anomaly_models')
+        ), kind='anomaly model')
+
+
+_model_store = AnomalyModelStore()
+
+
 class AnomalyDetectionService:
     """Service for detecting anomalies in financial transactions"""
     
@@ -52,13 +109,7 @@ class AnomalyDetectionService:
                 }
             
             # Convert to DataFrame for analysis
-            df = pd.DataFrame([{
-                'date': t.date,
-                'amount': float(t.amount),
-                'description': t.description,
-                'category': t.account.category if t.account else 'Uncategorized',
-                'transaction_id': t.id
-            } for t in transactions])
+            df = _transactions_to_frame(transactions)
             
             # Perform multiple types of anomaly detection
             statistical_anomalies = self._detect_statistical_anomalies(df)
@@ -96,37 +147,125 @@ class AnomalyDetectionService:
                 'message': f'Error detecting anomalies: {str(e)}'
             }
     
+    def _build_feature_matrix(self, df: pd.DataFrame, model_state: Dict) -> pd.DataFrame:
+        """
+        Build the multi-feature matrix used by the Isolation Forest in a single
+        vectorized pass
+
+        Args:
+            df: Transaction DataFrame as produced by detect_anomalies
+            model_state: Model state holding the description and account
+                frequency tables learned from the training data
+
+        Returns:
+            DataFrame with one column per feature in FEATURE_COLUMNS
+        """
+        dates = pd.to_datetime(df['date'])
+        amounts = df['amount'].astype(float)
+
+        return pd.DataFrame({
+            'amount': amounts,
+            'log_amount': np.sign(amounts) * np.log1p(np.abs(amounts)),
+            'day_of_week': dates.dt.dayofweek,
+            'day_of_month': dates.dt.day,
+            'description_frequency': description_keys(df['description'])
+                .map(model_state['description_frequencies']).fillna(0.0),
+            'account_frequency': df['account_id'].fillna(0).astype(int)
+                .map(model_state['account_frequencies']).fillna(0.0)
+        }, index=df.index)[FEATURE_COLUMNS]
+
+    def _fit_model(self, df: pd.DataFrame) -> Dict:
+        """Fit a new scaler/Isolation Forest pair on df and persist it"""
+        model_state = {
+            'description_frequencies': description_keys(df['description'])
+                .value_counts(normalize=True),
+            'account_frequencies': df['account_id'].fillna(0).astype(int)
+                .value_counts(normalize=True)
+        }
+        features = self._build_feature_matrix(df, model_state)
+
+        scaler = StandardScaler()
+        scaled_features = scaler.fit_transform(features.to_numpy())
+
+        iso_forest = IsolationForest(contamination=0.1, random_state=42)
+        iso_forest.fit(scaled_features)
+
+        model_state.update({
+            'scaler': scaler,
+            'model': iso_forest,
+            'n_samples': len(df),
+            'max_transaction_id': int(df['transaction_id'].max()),
+            'fitted_at': datetime.utcnow()
+        })
+        _model_store.save(self.user_id, model_state)
+        logger.info(f"Fitted anomaly model for user {self.user_id} on {len(df)} transactions")
+        return model_state
+
+    def _needs_refit(self, model_state: Optional[Dict], df: pd.DataFrame) -> bool:
+        """Refit only when the model is missing, stale, or enough new data arrived"""
+        if model_state is None:
+            return True
+        if datetime.utcnow() - model_state['fitted_at'] > MODEL_MAX_AGE:
+            return True
+        new_rows = int((df['transaction_id'] > model_state['max_transaction_id']).sum())
+        return new_rows >= max(MIN_NEW_SAMPLES_FOR_REFIT, int(model_state['n_samples'] * REFIT_GROWTH_RATIO))
+
+    def get_model(self, df: Optional[pd.DataFrame] = None) -> Optional[Dict]:
+        """
+        Get the fitted model state for this user, refitting only when required
+
+        Args:
+            df: Training window; when omitted the cached model is returned as-is
+
+        Returns:
+            Model state dictionary or None if no model could be fitted
+        """
+        model_state = _model_store.load(self.user_id)
+        if df is not None and len(df) >= MIN_TRAINING_SAMPLES and self._needs_refit(model_state, df):
+            model_state = self._fit_model(df)
+        return model_state
+
+    def score_transactions(self, transactions: List[Transaction]) -> List[Dict]:
+        """
+        Score new transactions (e.g. a fresh upload) against the cached model
+        without refitting
+
+        Args:
+            transactions: Transactions to score
+
+        Returns:
+            List of anomaly dictionaries for the transactions flagged as outliers
+        """
+        try:
+            model_state = self.get_model()
+            if model_state is None or not transactions:
+                return []
+            return self._extract_statistical_anomalies(_transactions_to_frame(transactions), model_state)
+        except Exception as e:
+            logger.error(f"Error scoring transactions: {str(e)}")
+            return []
+
+    def _extract_statistical_anomalies(self, df: pd.DataFrame, model_state: Dict) -> List[Dict]:
+        """Score df with a fitted model and extract outliers by boolean masking"""
+        features = self._build_feature_matrix(df, model_state)
+        scaled_features = model_state['scaler'].transform(features.to_numpy())
+
+        predictions = model_state['model'].predict(scaled_features)
+        scores = model_state['model'].score_samples(scaled_features)
+
+        mask = predictions == -1
+        flagged = df.loc[mask, ['transaction_id', 'date', 'amount', 'description']].copy()
+        flagged['anomaly_score'] = scores[mask]
+        return _frame_to_anomalies(flagged, 'statistical', 'Unusual transaction amount')
+
     def _detect_statistical_anomalies(self, df: pd.DataFrame) -> List[Dict]:
         """Detect anomalies using statistical methods"""
         try:
-            # Prepare features for anomaly detection
-            features = df[['amount']].copy()
-            scaler = StandardScaler()
-            scaled_features = scaler.fit_transform(features)
-            
-            # Use Isolation Forest for anomaly detection
-            iso_forest = IsolationForest(contamination=0.1, random_state=42)
-            predictions = iso_forest.fit_predict(scaled_features)
-            
-            # Get anomaly scores
-            scores = iso_forest.score_samples(scaled_features)
-            
-            anomalies = []
-            for idx, (pred, score) in enumerate(zip(predictions, scores)):
-                if pred == -1:  # Anomaly detected
-                    transaction = df.iloc[idx]
-                    anomalies.append({
-                        'transaction_id': int(transaction.transaction_id),
-                        'date': transaction.date.isoformat(),
-                        'amount': float(transaction.amount),
-                        'description': transaction.description,
-                        'anomaly_score': float(score),
-                        'detection_method': 'statistical',
-                        'reason': 'Unusual transaction amount'
-                    })
-            
-            return anomalies
-            
+            model_state = self.get_model(df)
+            if model_state is None:
+                return []
+            return self._extract_statistical_anomalies(df, model_state)
+
         except Exception as e:
             logger.error(f"Error in statistical anomaly detection: {str(e)}")
             return []
@@ -134,32 +273,20 @@ class AnomalyDetectionService:
     def _detect_pattern_anomalies(self, df: pd.DataFrame) -> List[Dict]:
         """Detect anomalies based on transaction patterns"""
         try:
-            anomalies = []
-            
-            # Group by category and calculate statistics
-            category_stats = df.groupby('category')['amount'].agg(['mean', 'std']).reset_index()
-            
-            for _, row in df.iterrows():
-                category_mean = category_stats[
-                    category_stats['category'] == row['category']
-                ]['mean'].values[0]
-                category_std = category_stats[
-                    category_stats['category'] == row['category']
-                ]['std'].values[0]
-                
-                # Check for transactions significantly different from category average
-                z_score = abs(row['amount'] - category_mean) / category_std if category_std > 0 else 0
-                if z_score > 3:  # More than 3 standard deviations
-                    anomalies.append({
-                        'transaction_id': int(row['transaction_id']),
-                        'date': row['date'].isoformat(),
-                        'amount': float(row['amount']),
-                        'description': row['description'],
-                        'anomaly_score': float(z_score),
-                        'detection_method': 'pattern',
-                        'reason': f'Unusual amount for {row["category"]} category'
-                    })
-            
+            # Category statistics broadcast back onto each row
+            grouped = df.groupby('category')['amount']
+            category_mean = grouped.transform('mean')
+            category_std = grouped.transform('std')
+
+            # Check for transactions significantly different from category average
+            z_scores = ((df['amount'] - category_mean).abs() / category_std).where(category_std > 0, 0.0)
+            mask = z_scores > 3  # More than 3 standard deviations
+
+            flagged = df.loc[mask, ['transaction_id', 'date', 'amount', 'description', 'category']].copy()
+            flagged['anomaly_score'] = z_scores[mask]
+            anomalies = _frame_to_anomalies(flagged, 'pattern', None)
+            for anomaly, category in zip(anomalies, flagged['category']):
+                anomaly['reason'] = f'Unusual amount for {category} category'
             return anomalies
             
         except Exception as e:
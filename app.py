@@ -108,31 +108,54 @@ def init_database(app):
     logger.critical("Failed to initialize database after maximum retries")
     return False
 
-def health_check_routine():
-    """Periodic health check for database connections"""
+def health_check_routine(app=None, minutes: int = 5):
+    """
+    Periodic health check for database connections
+
+    Args:
+        app: Application whose scheduler should run the check; with the leased
+            scheduler it then runs in one worker instead of a thread per process
+        minutes: Interval between checks
+    """
     import threading
     from utils.db_health import DatabaseHealth
     import time
     
     db_health = DatabaseHealth.get_instance()
+
+    def _check_once():
+        # Check connection
+        success, error = db_health.check_connection()
+        
+        # If the check failed and we should initiate failover
+        if not success and db_health.should_failover():
+            logger.warning("Database health check failed, initiating failover procedure")
+            failover_success, failover_error = db_health.perform_failover()
+            if failover_success:
+                logger.info("Database failover completed successfully")
+            else:
+                logger.error(f"Database failover failed: {failover_error}")
+
+    scheduler = getattr(app, 'apscheduler', None) if app is not None else None
+    if scheduler is not None:
+        scheduler.add_job(
+            id='database_health_check',
+            func=_check_once,
+            trigger='interval',
+            minutes=minutes,
+            replace_existing=True,
+            name='Database Health Check'
+        )
+        logger.info(f"Database health check scheduled every {minutes} minutes")
+        return
     
     def _check_periodically():
         while True:
             try:
-                # Check connection
-                success, error = db_health.check_connection()
-                
-                # If the check failed and we should initiate failover
-                if not success and db_health.should_failover():
-                    logger.warning("Database health check failed, initiating failover procedure")
-                    failover_success, failover_error = db_health.perform_failover()
-                    if failover_success:
-                        logger.info("Database failover completed successfully")
-                    else:
-                        logger.error(f"Database failover failed: {failover_error}")
+                _check_once()
                 
-                # Sleep for 5 minutes between checks (adjust as needed)
-                time.sleep(300)
+                # Sleep between checks
+                time.sleep(minutes * 60)
             except Exception as e:
                 logger.error(f"Error in health check routine: {str(e)}")
                 # Sleep a bit and try again
@@ -156,8 +179,8 @@ def create_app(config_name=None):
         config = get_config(config_name)
         app.config.from_object(config)
         
-        # Explicitly set CSRF protection (Flask-WTF)
-        app.config['WTF_CSRF_ENABLED'] = True
+        # Explicitly set CSRF protection (Flask-WTF); only the testing config opts out
+        app.config['WTF_CSRF_ENABLED'] = getattr(config, 'WTF_CSRF_ENABLED', True)
         app.config['WTF_CSRF_TIME_LIMIT'] = None  # No time limit for CSRF tokens
         app.config['WTF_CSRF_SSL_STRICT'] = False  # Allow CSRF token on HTTP
         app.config['WTF_CSRF_SECRET_KEY'] = app.config['SECRET_KEY']  # Use same secret key
@@ -199,20 +222,59 @@ def create_app(config_name=None):
             # Initialize audit service
             from utils.audit_service import audit_service
             audit_service.init_app(app)
+
+            # Compile keyword rules before any worker processes fork
+            from utils.rule_engine import rule_engine
+            rule_engine.warm()
+
+            # Score inserted transactions for anomalies at ingest
+            from streaming_anomaly import streaming_scorer
+            streaming_scorer.init_app(app)
+
+            # Version each user's data so derived caches know when to rebuild
+            from utils.data_version import data_versions
+            data_versions.init_app(app)
+
+            # Drop similar-transaction vectors of deleted or re-described transactions
+            from embedding_store import embedding_store
+            embedding_store.init_app(app)
             
             # Initialize scheduler for automated tasks
             from utils.scheduler import init_scheduler
-            init_scheduler(app)
+            scheduler = init_scheduler(app)
+
+            # Periodic bulk evaluation of alert configurations
+            from alert_system import configure_alert_evaluation
+            configure_alert_evaluation(scheduler, app)
+
+            # Nightly refresh of the recurring payment calendar
+            from recurring_detection import configure_recurring_detection
+            configure_recurring_detection(scheduler, app)
+
+            # Keep each user's iCountant queue of precomputed suggestions topped up
+            from icountant_queue import configure_icountant_queue
+            configure_icountant_queue(scheduler, app)
 
             from reports import reports as reports_bp
             app.register_blueprint(reports_bp, url_prefix='/reports')
 
+            from chat import chat as chat_bp
+            app.register_blueprint(chat_bp)
+
+            # Chat messages are saved by a background writer
+            from chat.history import history_writer
+            history_writer.init_app(app)
+
             from risk_assessment import risk_assessment as risk_bp
             app.register_blueprint(risk_bp)
 
             from historical_data import historical_data as historical_bp
             app.register_blueprint(historical_bp)
 
+            # Linked from the navigation bar in base.html
+            from bank_statements import bank_statements as bank_statements_bp
+            app.register_blueprint(bank_statements_bp)
+
             @app.route('/')
             def index():
                 return redirect(url_for('main.index'))
@@ -228,7 +290,7 @@ if __name__ == '__main__':
     if app:
         # Start database health check routine in production mode
         if not app.debug or os.environ.get('FLASK_ENV') == 'production':
-            health_check_routine()
+            health_check_routine(app)
             
         # Always use port 5000 on Replit, which is the non-firewalled port
         port = int(os.environ.get('PORT', 5000))
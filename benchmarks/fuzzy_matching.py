@@ -0,0 +1,99 @@
+"""
+Fuzzy Matching Benchmark
+
+Compares full-distance threshold scoring with the prefiltered, bounded scoring
+in utils.fuzzy_scoring on a synthetic description history, and checks both
+return the same matches.
+
+    python -m benchmarks.fuzzy_matching --rows 100000 --queries 20
+"""
+
+import argparse
+import random
+import time
+from difflib import SequenceMatcher
+
+from benchmarks.ledger import synthetic_descriptions
+from utils.fuzzy_scoring import (CandidateFilter, levenshtein_matches, levenshtein_similarity,
+                                 ratio_matches)
+from utils.text_normalization import normalize_description, normalize_text
+
+
+def full_levenshtein(query, texts, threshold):
+    matches = []
+    for index, text in enumerate(texts):
+        similarity = levenshtein_similarity(query, text)
+        if similarity >= threshold:
+            matches.append((index, similarity))
+    return matches
+
+
+def full_ratio(query, texts, threshold):
+    matches = []
+    for index, text in enumerate(texts):
+        if not query or not text:
+            continue
+        ratio = SequenceMatcher(None, query, text).ratio()
+        if ratio >= threshold:
+            matches.append((index, ratio))
+    return matches
+
+
+def _time(func, queries):
+    start = time.perf_counter()
+    results = [func(query) for query in queries]
+    return time.perf_counter() - start, results
+
+
+def run(rows: int, queries: int, seed: int = 7) -> dict:
+    descriptions = synthetic_descriptions(rows, seed)
+    rng = random.Random(seed + 1)
+    samples = rng.sample(descriptions, queries)
+
+    report = {'rows': rows, 'queries': queries}
+    for name, normalize, threshold, full, bounded in (
+        ('levenshtein', normalize_description, 0.85, full_levenshtein, levenshtein_matches),
+        ('sequence_ratio', normalize_text, 0.8, full_ratio, ratio_matches),
+    ):
+        texts = [normalize(description) for description in descriptions]
+        query_texts = [normalize(sample) for sample in samples]
+
+        start = time.perf_counter()
+        candidate_filter = CandidateFilter(texts)
+        build_seconds = time.perf_counter() - start
+
+        full_seconds, expected = _time(lambda q: full(q, texts, threshold), query_texts)
+        bounded_seconds, actual = _time(
+            lambda q: bounded(q, texts, threshold, candidate_filter), query_texts
+        )
+        report[name] = {
+            'threshold': threshold,
+            'full_seconds': round(full_seconds, 3),
+            'bounded_seconds': round(bounded_seconds, 3),
+            'filter_build_seconds': round(build_seconds, 3),
+            'speedup': round(full_seconds / max(bounded_seconds, 1e-9), 1),
+            'matches': sum(len(result) for result in actual),
+            'identical': expected == actual
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    report = run(args.rows, args.queries, args.seed)
+    print(f"{report['rows']} descriptions, {report['queries']} queries")
+    for name in ('levenshtein', 'sequence_ratio'):
+        result = report[name]
+        print(f"  {name:<15} full {result['full_seconds']:>8.3f}s  "
+              f"bounded {result['bounded_seconds']:>7.3f}s  "
+              f"(filter build {result['filter_build_seconds']:.3f}s)  "
+              f"x{result['speedup']}  matches {result['matches']}  identical={result['identical']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+"""
+Synthetic Ledger Generator
+
+Builds a reproducible SQLite ledger for benchmarks and load tests: bank-style
+descriptions drawn from a merchant catalog, monthly recurring payments on
+stable days and amounts, log-normal one-off spend, a chart of accounts per
+user, keyword rules and company settings. The same seed always produces the
+same database.
+
+    python -m benchmarks.ledger --rows 100k --output instance/benchmarks/ledger.db
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine, insert
+
+from utils.text_normalization import normalize_description
+
+# Rows inserted per executemany call
+INSERT_BATCH_SIZE = 10000
+# Ledgers end on this date so every run spans the same calendar
+LEDGER_END = datetime(2024, 12, 31)
+DEFAULT_MONTHS = 24
+# Share of rows that already carry an account and explanation
+CATEGORIZED_SHARE = 0.7
+# Rows attached to the uploaded file used by the ingestion benchmarks
+UPLOAD_FILE_ROWS = 50
+DEFAULT_PASSWORD = 'benchmark'
+
+# Bumped whenever generated ledgers change, so stale cached files are not reused
+LEDGER_FORMAT = 2
+
+# name, type
+ACCOUNTS = [
+    ('Sales', 'Income'),
+    ('Bank Interest', 'Income'),
+    ('Rent', 'Expense'),
+    ('Utilities', 'Expense'),
+    ('Telephone and Internet', 'Expense'),
+    ('Motor and Travel', 'Expense'),
+    ('Office Supplies', 'Expense'),
+    ('Software Subscriptions', 'Expense'),
+    ('Meals and Entertainment', 'Expense'),
+    ('Postage and Courier', 'Expense'),
+    ('Bank Charges', 'Expense'),
+    ('Taxes', 'Liability'),
+]
+
+# Statements are uploaded against a bank account, which forms find by its ca.810 code
+BANK_ACCOUNT = ('Business Current Account', 'Asset')
+
+# merchant, account, explanation, log-normal mu, sigma
+MERCHANTS = [
+    ('tesco stores', 'Meals and Entertainment', 'Team refreshments', 3.2, 0.6),
+    ('sainsburys', 'Meals and Entertainment', 'Team refreshments', 3.0, 0.6),
+    ('costa coffee', 'Meals and Entertainment', 'Client coffee meeting', 2.0, 0.4),
+    ('deliveroo', 'Meals and Entertainment', 'Working lunch', 3.1, 0.5),
+    ('amazon marketplace', 'Office Supplies', 'Office consumables', 3.5, 0.9),
+    ('staples business', 'Office Supplies', 'Stationery', 3.3, 0.7),
+    ('office depot', 'Office Supplies', 'Stationery', 3.4, 0.7),
+    ('screwfix direct', 'Office Supplies', 'Maintenance materials', 3.6, 0.8),
+    ('ikea', 'Office Supplies', 'Office furniture', 4.6, 0.9),
+    ('shell petrol', 'Motor and Travel', 'Vehicle fuel', 3.9, 0.3),
+    ('bp fuel', 'Motor and Travel', 'Vehicle fuel', 3.9, 0.3),
+    ('uber trip', 'Motor and Travel', 'Taxi to client', 2.8, 0.5),
+    ('trainline', 'Motor and Travel', 'Rail fare', 3.7, 0.6),
+    ('premier inn', 'Motor and Travel', 'Hotel for site visit', 4.4, 0.4),
+    ('royal mail', 'Postage and Courier', 'Postage', 2.2, 0.7),
+    ('dhl express', 'Postage and Courier', 'Courier delivery', 3.1, 0.6),
+    ('currys pc world', 'Office Supplies', 'IT equipment', 5.2, 0.8),
+]
+
+# merchant, account, explanation, amount, day of month, sign
+RECURRING = [
+    ('landmark properties rent', 'Rent', 'Monthly office rent', 1850.00, 1, -1),
+    ('british gas', 'Utilities', 'Gas and electricity', 164.20, 5, -1),
+    ('thames water', 'Utilities', 'Water rates', 42.75, 12, -1),
+    ('vodafone uk', 'Telephone and Internet', 'Mobile contract', 58.00, 14, -1),
+    ('bt broadband', 'Telephone and Internet', 'Office broadband', 39.99, 20, -1),
+    ('microsoft azure', 'Software Subscriptions', 'Cloud hosting', 212.40, 3, -1),
+    ('google workspace', 'Software Subscriptions', 'Email and documents', 55.20, 8, -1),
+    ('adobe systems', 'Software Subscriptions', 'Design software', 45.98, 17, -1),
+    ('hmrc vat', 'Taxes', 'Quarterly VAT', 2400.00, 7, -1),
+    ('account fee', 'Bank Charges', 'Monthly account fee', 6.50, 28, -1),
+    ('interest paid', 'Bank Interest', 'Deposit interest', 3.12, 28, 1),
+]
+
+# customer names for incoming payments, booked to Sales
+CUSTOMERS = ['acme holdings', 'northwind traders', 'contoso ltd', 'fabrikam inc', 'globex corp',
+             'initech', 'umbrella services', 'stark industries', 'wayne enterprises', 'hooli']
+
+PREFIXES = ['card payment to', 'direct debit', 'payment to', 'faster payment', 'pos', 'dd', '']
+PLACES = ['london', 'leeds', 'manchester', 'bristol', 'glasgow', 'cardiff', 'online', '']
+MONTHS = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+
+
+def parse_size(size: str) -> int:
+    """Row count from a size such as 10000, 10k or 1m"""
+    size = str(size).strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(size[-1:], 1)
+    return int(float(size.rstrip('km')) * multiplier)
+
+
+def bank_description(rng: random.Random, merchant: str, date: Optional[datetime] = None) -> str:
+    """A bank-statement style description for a merchant with optional references"""
+    parts = [rng.choice(PREFIXES), merchant, rng.choice(PLACES)]
+    if rng.random() < 0.6:
+        parts.append(f"ref {rng.randint(1000, 999999)}")
+    if rng.random() < 0.3:
+        day = date.day if date else rng.randint(1, 28)
+        month = MONTHS[date.month - 1] if date else rng.choice(MONTHS)
+        parts.append(f"{day:02d}{month}")
+    return ' '.join(part for part in parts if part)
+
+
+def synthetic_descriptions(rows: int, seed: int = 7) -> List[str]:
+    """Bank-style descriptions with shared merchants and varying references"""
+    rng = random.Random(seed)
+    merchants = [m[0] for m in MERCHANTS] + [r[0] for r in RECURRING] + CUSTOMERS
+    return [bank_description(rng, rng.choice(merchants)) for _ in range(rows)]
+
+
+def _recurring_rows(rng: random.Random, months: int) -> List[Dict]:
+    """One row per recurring payment per month, on a stable day with small jitter"""
+    rows = []
+    for offset in range(months):
+        month_start = (LEDGER_END.replace(day=1) - timedelta(days=offset * 30.44)).replace(day=1)
+        for merchant, account, explanation, amount, day, sign in RECURRING:
+            # VAT is quarterly
+            if merchant == 'hmrc vat' and month_start.month % 3:
+                continue
+            date = month_start + timedelta(days=min(day + rng.randint(0, 2), 28) - 1)
+            # Metered bills drift month to month, subscriptions do not
+            value = amount * rng.uniform(0.9, 1.1) if account == 'Utilities' else amount
+            rows.append({
+                'date': date,
+                'amount': round(sign * value, 2),
+                'merchant': merchant,
+                'account': account,
+                'explanation': explanation
+            })
+    return rows
+
+
+def _one_off_row(rng: random.Random, months: int) -> Dict:
+    date = LEDGER_END - timedelta(days=rng.uniform(0, months * 30.44))
+    if rng.random() < 0.12:
+        return {
+            'date': date,
+            'amount': round(math.exp(rng.gauss(7.2, 0.8)), 2),
+            'merchant': rng.choice(CUSTOMERS),
+            'account': 'Sales',
+            'explanation': 'Customer invoice payment'
+        }
+    merchant, account, explanation, mu, sigma = rng.choice(MERCHANTS)
+    return {
+        'date': date,
+        'amount': -round(math.exp(rng.gauss(mu, sigma)), 2),
+        'merchant': merchant,
+        'account': account,
+        'explanation': explanation
+    }
+
+
+def generate_ledger(database_url: str, rows: int, users: int = 1, seed: int = 7,
+                    months: int = DEFAULT_MONTHS) -> Dict:
+    """
+    Create the schema and write a synthetic ledger
+
+    Args:
+        database_url: SQLAlchemy URL of an empty database
+        rows: Total transactions across all users
+        users: Number of users the rows are split between
+        seed: Random seed; equal seeds produce equal ledgers
+        months: Calendar span of the ledger
+
+    Returns:
+        Summary with user ids, the upload file id per user and row counts
+    """
+    # Import here so the models register on the metadata before create_all
+    from extensions import db
+    from models import (Account, CompanySettings, KeywordRule, Transaction, UploadedFile,
+                        User)
+    from werkzeug.security import generate_password_hash
+
+    rng = random.Random(seed)
+    engine = create_engine(database_url)
+    db.metadata.create_all(engine)
+    now = datetime.utcnow()
+    password_hash = generate_password_hash(DEFAULT_PASSWORD)
+    summary = {'rows': rows, 'users': [], 'seed': seed, 'months': months}
+
+    with engine.begin() as connection:
+        connection.execute(insert(KeywordRule.__table__), [
+            {'keyword': merchant, 'category': account, 'priority': 2, 'is_regex': False,
+             'is_active': True, 'created_at': now}
+            for merchant, account, *_ in RECURRING + MERCHANTS
+        ])
+
+        for user_number in range(1, users + 1):
+            user_id = connection.execute(insert(User.__table__).values(
+                username=f'bench{user_number}', email=f'bench{user_number}@example.com',
+                password_hash=password_hash, created_at=now, is_active=True, is_admin=False
+            )).inserted_primary_key[0]
+            connection.execute(insert(CompanySettings.__table__).values(
+                company_name=f'Benchmark Company {user_number}', currency='GBP',
+                fiscal_year_start=datetime(LEDGER_END.year, 1, 1), user_id=user_id,
+                created_at=now, updated_at=now
+            ))
+            account_ids = {}
+            for number, (name, account_type) in enumerate(ACCOUNTS, start=1):
+                account_ids[name] = connection.execute(insert(Account.__table__).values(
+                    name=name, type=account_type, code=f'{user_id}-{number:03d}',
+                    user_id=user_id, created_at=now, is_active=True
+                )).inserted_primary_key[0]
+            bank_name, bank_type = BANK_ACCOUNT
+            account_ids[bank_name] = connection.execute(insert(Account.__table__).values(
+                name=bank_name, type=bank_type, code=f'ca.810.{user_id:03d}',
+                user_id=user_id, created_at=now, is_active=True
+            )).inserted_primary_key[0]
+            file_id = connection.execute(insert(UploadedFile.__table__).values(
+                filename='benchmark_statement.csv', file_path='benchmark_statement.csv',
+                user_id=user_id, upload_date=now, status='processed'
+            )).inserted_primary_key[0]
+
+            user_rows = rows // users + (1 if user_number <= rows % users else 0)
+            ledger = _recurring_rows(rng, months)[:user_rows]
+            ledger.extend(_one_off_row(rng, months) for _ in range(user_rows - len(ledger)))
+            ledger.sort(key=lambda row: row['date'])
+
+            batch = []
+            for index, row in enumerate(ledger):
+                description = bank_description(rng, row['merchant'], row['date'])
+                categorized = rng.random() < CATEGORIZED_SHARE
+                in_upload = index >= len(ledger) - UPLOAD_FILE_ROWS
+                batch.append({
+                    'user_id': user_id,
+                    'date': row['date'],
+                    'amount': row['amount'],
+                    'description': description,
+                    'normalized_description': normalize_description(description),
+                    'account_id': account_ids[row['account']] if categorized else None,
+                    'explanation': row['explanation'] if categorized else None,
+                    'explanation_confidence': 1.0 if categorized else 0.0,
+                    'explanation_source': 'user' if categorized else None,
+                    'is_processed': categorized and not in_upload,
+                    'file_id': file_id if in_upload else None,
+                    'created_at': now,
+                    'updated_at': now
+                })
+                if len(batch) >= INSERT_BATCH_SIZE:
+                    connection.execute(insert(Transaction.__table__), batch)
+                    batch = []
+            if batch:
+                connection.execute(insert(Transaction.__table__), batch)
+
+            summary['users'].append({
+                'id': user_id, 'username': f'bench{user_number}', 'rows': len(ledger),
+                'file_id': file_id, 'account_ids': account_ids
+            })
+
+    engine.dispose()
+    return summary
+
+
+def ensure_ledger(rows: int, directory: str, users: int = 1, seed: int = 7) -> Dict:
+    """
+    Path and summary of a cached ledger, generating it on first use
+
+    Ledgers are keyed by format, rows, users and seed, so repeated benchmark
+    runs reuse the same database instead of regenerating it.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.abspath(os.path.join(directory, f'ledger_v{LEDGER_FORMAT}_{rows}_{users}_{seed}.db'))
+    summary_path = path + '.json'
+    if os.path.exists(path) and os.path.exists(summary_path):
+        with open(summary_path) as f:
+            summary = json.load(f)
+    else:
+        if os.path.exists(path):
+            os.remove(path)
+        summary = generate_ledger(f'sqlite:///{path}', rows, users, seed)
+        with open(summary_path, 'w') as f:
+            json.dump(summary, f, indent=2)
+    summary['path'] = path
+    summary['database_url'] = f'sqlite:///{path}'
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic SQLite ledger')
+    parser.add_argument('--rows', default='10k', help='Row count, e.g. 1k, 10k, 100k, 1m')
+    parser.add_argument('--users', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', required=True, help='SQLite file to create')
+    args = parser.parse_args()
+
+    if os.path.exists(args.output):
+        parser.error(f'{args.output} already exists')
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    summary = generate_ledger(f'sqlite:///{os.path.abspath(args.output)}',
+                              parse_size(args.rows), args.users, args.seed)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
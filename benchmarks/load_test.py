@@ -0,0 +1,394 @@
+"""
+Load Test
+
+Measures how many concurrent users the app sustains. It seeds a synthetic
+ledger, starts the OpenAI stub, serves create_app('testing') on a threaded
+local server (or targets an already running deployment), then replays
+realistic user sessions at a fixed concurrency and reports throughput,
+latency percentiles and error rates per endpoint.
+
+    python -m benchmarks.load_test --rows 10k --users 20 --concurrency 20 --duration 60
+    python -m benchmarks.load_test --latency 0.8 --rate-limit 0.1 --output load.json
+
+To load a gunicorn deployment instead, pass --target and a fixed --stub-port,
+and start the deployment with the environment printed at startup.
+"""
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.ledger import DEFAULT_PASSWORD, ensure_ledger, parse_size
+from benchmarks.openai_stub import OpenAIStubServer, StubSettings
+
+DEFAULT_LEDGER_DIR = os.path.join('instance', 'benchmarks')
+DEFAULT_THINK_TIME = 0.5
+REQUEST_TIMEOUT = 60
+# Rows in each statement posted by the upload scenario
+UPLOAD_ROWS = 100
+
+# name, weight, steps. UPLOAD posts a generated statement to the bank account
+# on the page; CHAT streams an assistant reply and SUGGEST asks for account
+# suggestions, both as JSON with the CSRF token from the last page carrying one
+SCENARIOS: List[Tuple[str, int, List[Tuple[str, str]]]] = [
+    ('bookkeeper', 5, [
+        ('GET', '/dashboard'),
+        ('GET', '/icountant'),
+        ('GET', '/icountant_interface'),
+        ('GET', '/icountant_interface'),
+        ('GET', '/analyze_list'),
+    ]),
+    ('reporting', 3, [
+        ('GET', '/dashboard'),
+        ('GET', '/reports/cashbook'),
+        ('GET', '/reports/trial-balance'),
+        ('GET', '/reports/income-statement'),
+        ('GET', '/reports/financial-position'),
+    ]),
+    ('uploader', 1, [
+        ('GET', '/upload'),
+        ('UPLOAD', '/upload'),
+        ('GET', '/analyze_list'),
+    ]),
+    ('assistant', 2, [
+        ('GET', '/chat/interface'),
+        ('CHAT', '/chat/stream'),
+        ('SUGGEST', '/analyze/suggest-account'),
+        ('CHAT', '/chat/stream'),
+    ]),
+]
+
+# Where a request may redirect on success; the app's error handlers redirect
+# to the dashboard or the login page, so any other redirect is a failure
+ALLOWED_REDIRECTS = {
+    'POST /auth/login': '/dashboard',
+    'POST /upload': '/upload',
+}
+
+CHAT_QUESTIONS = [
+    'What did I spend most on last month?',
+    'How much did I pay for software subscriptions this year?',
+    'Are there any unusual transactions recently?',
+    'Summarize my cash flow for the last quarter.',
+]
+SUGGEST_DESCRIPTIONS = [
+    'CARD PAYMENT TO OFFICE DEPOT',
+    'DIRECT DEBIT BRITISH GAS',
+    'AMAZON WEB SERVICES INVOICE',
+    'TRAINLINE TICKET PURCHASE',
+]
+
+_CSRF_FIELD = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"|value="([^"]+)"[^>]*name="csrf_token"')
+_ACCOUNT_OPTION = re.compile(r'<select[^>]*name="account"[^>]*>\s*<option[^>]*value="([^"]+)"')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Report redirects as responses so each request is measured on its own"""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Metrics:
+    """Latencies and outcomes per endpoint, shared by every virtual user"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float, status: int, failed: bool):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            self.statuses[endpoint][status] += 1
+            if failed:
+                self.errors[endpoint] += 1
+
+    def fail(self, endpoint: str):
+        """Count a recorded request as failed once a follow-up shows it was"""
+        with self._lock:
+            self.errors[endpoint] += 1
+
+    def report(self, elapsed: float) -> Dict:
+        """Per-endpoint throughput, latency percentiles and error rate, plus the total"""
+        with self._lock:
+            endpoints = {name: _summarize(latencies, self.errors[name], self.statuses[name], elapsed)
+                         for name, latencies in sorted(self.latencies.items())}
+            all_latencies = [value for values in self.latencies.values() for value in values]
+            all_statuses = sum(self.statuses.values(), Counter())
+            total = _summarize(all_latencies, sum(self.errors.values()), all_statuses, elapsed)
+        # An endpoint that never succeeded is broken, not slow
+        failing = [name for name, result in endpoints.items() if result['error_rate'] >= 1.0]
+        return {'elapsed_seconds': round(elapsed, 2), 'endpoints': endpoints, 'total': total,
+                'failing_endpoints': failing}
+
+
+def _percentile(ordered: List[float], percent: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(percent / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def _summarize(latencies: List[float], errors: int, statuses: Counter, elapsed: float) -> Dict:
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'throughput_rps': round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(_percentile(ordered, 50) * 1000, 1),
+        'p90_ms': round(_percentile(ordered, 90) * 1000, 1),
+        'p95_ms': round(_percentile(ordered, 95) * 1000, 1),
+        'p99_ms': round(_percentile(ordered, 99) * 1000, 1),
+        'max_ms': round(ordered[-1] * 1000, 1) if ordered else 0.0,
+        'error_rate': round(errors / len(ordered), 4) if ordered else 0.0,
+        'statuses': {str(status): count for status, count in sorted(statuses.items())}
+    }
+
+
+class VirtualUser(threading.Thread):
+    """Logs in once, then replays weighted scenarios with think time until the deadline"""
+
+    def __init__(self, number: int, base_url: str, email: str, metrics: Metrics, deadline: float,
+                 think_time: float, start_delay: float, seed: int):
+        super().__init__(daemon=True, name=f'virtual-user-{number}')
+        self.base_url = base_url.rstrip('/')
+        self.email = email
+        self.metrics = metrics
+        self.deadline = deadline
+        self.think_time = think_time
+        self.start_delay = start_delay
+        self.rng = random.Random(seed + number)
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect()
+        )
+        self.last_page = ''
+        self.csrf_token = ''
+
+    def _request(self, label: str, method: str, path: str, body: Optional[bytes] = None,
+                 content_type: Optional[str] = None, expect: Optional[str] = None) -> bool:
+        """
+        Send one request and record it; returns whether it succeeded
+
+        Connection failures and timeouts (status 0), 4xx/5xx, redirects not in
+        ALLOWED_REDIRECTS and bodies missing the expected text are failures.
+        """
+        request = urllib.request.Request(self.base_url + path, data=body, method=method)
+        if content_type:
+            request.add_header('Content-Type', content_type)
+        if self.csrf_token:
+            request.add_header('X-CSRFToken', self.csrf_token)
+        location = None
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=REQUEST_TIMEOUT) as response:
+                self.last_page = response.read().decode('utf-8', 'replace')
+                status = response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            status = e.code
+            location = e.headers.get('Location')
+        except Exception:
+            status = 0
+        seconds = time.perf_counter() - start
+
+        if 300 <= status < 400:
+            failed = urllib.parse.urlparse(location or '').path != ALLOWED_REDIRECTS.get(label)
+        else:
+            failed = status == 0 or status >= 400 or bool(expect and expect not in self.last_page)
+        self.metrics.record(label, seconds, status, failed)
+
+        match = _CSRF_FIELD.search(self.last_page) if 200 <= status < 300 else None
+        if match:
+            self.csrf_token = match.group(1) or match.group(2)
+        return not failed
+
+    def login(self) -> bool:
+        body = urllib.parse.urlencode({'email': self.email, 'password': DEFAULT_PASSWORD}).encode()
+        return self._request('POST /auth/login', 'POST', '/auth/login', body,
+                             'application/x-www-form-urlencoded')
+
+    def _post_json(self, path: str, payload: Dict, expect: Optional[str] = None):
+        self._request(f'POST {path}', 'POST', path, json.dumps(payload).encode(),
+                      'application/json', expect)
+
+    def _upload(self, path: str):
+        match = _ACCOUNT_OPTION.search(self.last_page)
+        account = match.group(1) if match else ''
+        lines = ['Date,Description,Amount'] + [
+            f"2024-12-{self.rng.randint(1, 28):02d},card payment to office depot ref "
+            f"{self.rng.randint(1000, 99999)},{-self.rng.uniform(5, 200):.2f}"
+            for _ in range(UPLOAD_ROWS)
+        ]
+        boundary = uuid.uuid4().hex
+        body = (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="csrf_token"\r\n\r\n{self.csrf_token}\r\n'
+            f'--{boundary}\r\nContent-Disposition: form-data; name="account"\r\n\r\n{account}\r\n'
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="statement.csv"\r\n'
+            f'Content-Type: text/csv\r\n\r\n' + '\n'.join(lines) + f'\r\n--{boundary}--\r\n'
+        ).encode()
+        label = f'POST {path}'
+        if not self._request(label, 'POST', path, body, f'multipart/form-data; boundary={boundary}'):
+            return
+        # Rejected uploads redirect to the same page, so only the flashed
+        # message on the page it redirects to shows whether this one was stored
+        if not self._request(f'GET {path}', 'GET', path, expect='File uploaded successfully'):
+            self.metrics.fail(label)
+
+    def run(self):
+        time.sleep(self.start_delay)
+        if not self.login():
+            return
+        weights = [weight for _, weight, _ in SCENARIOS]
+        while time.monotonic() < self.deadline:
+            _, _, steps = self.rng.choices(SCENARIOS, weights)[0]
+            for method, path in steps:
+                if time.monotonic() >= self.deadline:
+                    return
+                if method == 'UPLOAD':
+                    self._upload(path)
+                elif method == 'CHAT':
+                    self._post_json(path, {'message': self.rng.choice(CHAT_QUESTIONS)},
+                                    expect='event: done')
+                elif method == 'SUGGEST':
+                    self._post_json(path, {'description': self.rng.choice(SUGGEST_DESCRIPTIONS)})
+                else:
+                    self._request(f'{method} {path}', method, path)
+                time.sleep(max(0.0, self.rng.gauss(self.think_time, self.think_time / 3)))
+
+
+def _serve_app(host: str):
+    """Serve create_app('testing') on a threaded local server; returns (server, base_url)"""
+    from werkzeug.serving import make_server
+    from app import create_app
+
+    app = create_app('testing')
+    if app is None:
+        raise RuntimeError('Application creation failed')
+    server = make_server(host, 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_port}'
+
+
+def run(rows: int, users: int, concurrency: int, duration: float, think_time: float,
+        latency: float, rate_limit: float, ledger_dir: str, seed: int = 7,
+        target: Optional[str] = None, ramp_up: float = 5.0, stub_port: int = 0) -> Dict:
+    """
+    Seed, serve and load the app, returning the report
+
+    Args:
+        rows: Ledger size, split across users
+        users: Distinct accounts the virtual users log in as
+        concurrency: Virtual users running at once
+        duration: Seconds of load after ramp-up begins
+        think_time: Mean pause between a virtual user's requests
+        latency, rate_limit: OpenAI stub behaviour
+        ledger_dir: Where seeded ledgers are cached
+        target: Base URL of an already running app; served locally when omitted
+        ramp_up: Seconds over which virtual users start
+        stub_port: OpenAI stub port, 0 for any free port
+    """
+    summary = ensure_ledger(rows, ledger_dir, users=users, seed=seed)
+    stub = OpenAIStubServer(port=stub_port,
+                            settings=StubSettings(latency, latency / 4, rate_limit, seed)).start()
+    environment = {
+        'TEST_DATABASE_URL': summary['database_url'],
+        'OPENAI_BASE_URL': stub.base_url,
+        'OPENAI_API_KEY': 'stub'
+    }
+    os.environ.update(environment)
+
+    server = None
+    try:
+        if target:
+            base_url = target
+            print('Target must run with FLASK_ENV=testing and:')
+            for name, value in environment.items():
+                print(f'  {name}={value}')
+        else:
+            server, base_url = _serve_app('127.0.0.1')
+
+        metrics = Metrics()
+        started = time.monotonic()
+        deadline = started + duration
+        virtual_users = [
+            VirtualUser(number, base_url, f"{summary['users'][number % users]['username']}@example.com",
+                        metrics, deadline, think_time, ramp_up * number / max(concurrency, 1), seed)
+            for number in range(concurrency)
+        ]
+        for virtual_user in virtual_users:
+            virtual_user.start()
+        for virtual_user in virtual_users:
+            virtual_user.join(timeout=duration + REQUEST_TIMEOUT)
+
+        report = metrics.report(time.monotonic() - started)
+        report.update({
+            'rows': rows, 'users': users, 'concurrency': concurrency, 'think_time': think_time,
+            'openai_stub': dict(stub.settings.stats(), latency=latency, rate_limit=rate_limit)
+        })
+        return report
+    finally:
+        if server is not None:
+            server.shutdown()
+        stub.stop()
+
+
+def _print_report(report: Dict):
+    print(f"{report['concurrency']} virtual users, {report['rows']} rows, "
+          f"{report['elapsed_seconds']}s")
+    header = f"{'endpoint':<34} {'reqs':>6} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'err%':>6}"
+    print(header)
+    print('-' * len(header))
+    rows = list(report['endpoints'].items()) + [('TOTAL', report['total'])]
+    for name, result in rows:
+        print(f"{name:<34} {result['requests']:>6} {result['throughput_rps']:>7.2f} "
+              f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+              f"{result['max_ms']:>8.1f} {result['error_rate'] * 100:>6.1f}")
+    stub = report['openai_stub']
+    print(f"OpenAI stub: {sum(stub['requests'].values())} requests, "
+          f"{sum(stub['rate_limited'].values())} rate limited")
+    for name in report['failing_endpoints']:
+        statuses = ', '.join(f'{status} x{count}' for status, count in
+                             report['endpoints'][name]['statuses'].items())
+        print(f"FAILING: every request to {name} failed ({statuses})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the app against a seeded ledger')
+    parser.add_argument('--rows', default='10k', help='Ledger size, e.g. 1k, 10k, 100k')
+    parser.add_argument('--users', type=int, default=10, help='Seeded user accounts')
+    parser.add_argument('--concurrency', type=int, default=10, help='Concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds of load')
+    parser.add_argument('--ramp-up', type=float, default=5, help='Seconds to start all users')
+    parser.add_argument('--think-time', type=float, default=DEFAULT_THINK_TIME)
+    parser.add_argument('--latency', type=float, default=0.3, help='OpenAI stub mean latency')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='OpenAI stub 429 share')
+    parser.add_argument('--target', help='Base URL of a running app instead of a local server')
+    parser.add_argument('--stub-port', type=int, default=0, help='OpenAI stub port (0 picks one)')
+    parser.add_argument('--ledger-dir', default=DEFAULT_LEDGER_DIR)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='Write the report as JSON')
+    args = parser.parse_args()
+
+    report = run(parse_size(args.rows), args.users, args.concurrency, args.duration,
+                 args.think_time, args.latency, args.rate_limit, args.ledger_dir, args.seed,
+                 args.target, args.ramp_up, args.stub_port)
+    _print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
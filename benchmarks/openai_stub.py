@@ -0,0 +1,231 @@
+"""
+OpenAI Stub Server
+
+A local stand-in for the OpenAI API used by load tests and benchmarks. It
+answers the endpoints the app calls (models, chat completions with or without
+streaming, embeddings) after a configurable latency and rejects a
+configurable share of requests with 429, so throughput can be measured
+without network access, cost or provider rate limits.
+
+The app's OpenAI clients pick it up through the standard environment:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub
+
+    python -m benchmarks.openai_stub --port 8765 --latency 0.4 --rate-limit 0.05
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+DEFAULT_LATENCY = 0.3
+DEFAULT_JITTER = 0.1
+DEFAULT_RATE_LIMIT = 0.0
+# Delay between streamed chunks
+STREAM_CHUNK_INTERVAL = 0.02
+EMBEDDING_DIMENSIONS = 1536
+
+STUB_REPLY = ('Based on your recent transactions this looks like an office supplies expense. '
+              'Categorize it under Office Supplies with the explanation "Stationery".')
+
+
+class StubSettings:
+    """Mutable behaviour shared by every request handler"""
+
+    def __init__(self, latency: float = DEFAULT_LATENCY, jitter: float = DEFAULT_JITTER,
+                 rate_limit: float = DEFAULT_RATE_LIMIT, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.requests = Counter()
+        self.rate_limited = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def admit(self, endpoint: str) -> bool:
+        """Count a request and decide whether it is rate limited"""
+        with self._lock:
+            self.requests[endpoint] += 1
+            limited = self._rng.random() < self.rate_limit
+            if limited:
+                self.rate_limited[endpoint] += 1
+            return not limited
+
+    def delay(self) -> float:
+        with self._lock:
+            return max(0.0, self._rng.gauss(self.latency, self.jitter))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'requests': dict(self.requests), 'rate_limited': dict(self.rate_limited)}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    settings: StubSettings = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict] = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _rate_limited(self):
+        self._send_json(429, {'error': {
+            'message': 'Rate limit reached (stub)', 'type': 'requests', 'code': 'rate_limit_exceeded'
+        }}, headers={'Retry-After': '1'})
+
+    def do_GET(self):
+        path = self.path.rstrip('/')
+        prefix, _, model_id = path.rpartition('/models/')
+        if not (path.endswith('/models') or (prefix and model_id)):
+            self._send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+            return
+        if not self.settings.admit('models'):
+            self._rate_limited()
+            return
+        if model_id:
+            self._send_json(200, {'id': model_id, 'object': 'model', 'created': 0, 'owned_by': 'stub'})
+            return
+        self._send_json(200, {'object': 'list', 'data': [
+            {'id': 'gpt-3.5-turbo', 'object': 'model', 'created': 0, 'owned_by': 'stub'}
+        ]})
+
+    def do_POST(self):
+        request = self._read_json()
+        if self.path.endswith('/chat/completions'):
+            endpoint = 'chat.completions'
+        elif self.path.endswith('/embeddings'):
+            endpoint = 'embeddings'
+        else:
+            self._send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+            return
+
+        if not self.settings.admit(endpoint):
+            self._rate_limited()
+            return
+        time.sleep(self.settings.delay())
+
+        if endpoint == 'embeddings':
+            inputs = request.get('input') or ['']
+            inputs = inputs if isinstance(inputs, list) else [inputs]
+            self._send_json(200, {
+                'object': 'list',
+                'model': request.get('model', 'text-embedding-ada-002'),
+                'data': [{'object': 'embedding', 'index': i,
+                          'embedding': [0.0] * EMBEDDING_DIMENSIONS} for i in range(len(inputs))],
+                'usage': {'prompt_tokens': len(inputs), 'total_tokens': len(inputs)}
+            })
+        elif request.get('stream'):
+            self._stream_completion(request)
+        else:
+            self._send_json(200, {
+                'id': 'chatcmpl-stub', 'object': 'chat.completion', 'created': int(time.time()),
+                'model': request.get('model', 'gpt-3.5-turbo'),
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': STUB_REPLY}}],
+                'usage': {'prompt_tokens': 100, 'completion_tokens': 40, 'total_tokens': 140}
+            })
+
+    def _stream_completion(self, request: Dict):
+        """Send the reply word by word as server-sent events, like the real API"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        def event(delta: Dict, finish_reason: Optional[str] = None):
+            chunk = {
+                'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                'model': request.get('model', 'gpt-3.5-turbo'),
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]
+            }
+            self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode())
+            self.wfile.flush()
+
+        event({'role': 'assistant', 'content': ''})
+        for word in STUB_REPLY.split(' '):
+            time.sleep(STREAM_CHUNK_INTERVAL)
+            event({'content': word + ' '})
+        event({}, 'stop')
+        self.wfile.write(b'data: [DONE]\n\n')
+        self.wfile.flush()
+
+
+class OpenAIStubServer:
+    """Runs the stub in a background thread"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, settings: Optional[StubSettings] = None):
+        self.settings = settings or StubSettings()
+        handler = type('BoundStubHandler', (StubHandler,), {'settings': self.settings})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def start(self) -> 'OpenAIStubServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local OpenAI stub server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY, help='Mean seconds per call')
+    parser.add_argument('--jitter', type=float, default=DEFAULT_JITTER, help='Latency standard deviation')
+    parser.add_argument('--rate-limit', type=float, default=DEFAULT_RATE_LIMIT,
+                        help='Share of calls answered with 429')
+    args = parser.parse_args()
+
+    server = OpenAIStubServer(args.host, args.port,
+                              StubSettings(args.latency, args.jitter, args.rate_limit))
+    print(f"OpenAI stub listening on {server.base_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.settings.stats(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
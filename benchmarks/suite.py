@@ -0,0 +1,392 @@
+"""
+Benchmark Suite
+
+Times the matching engine, report builders and ingestion routes against
+synthetic ledgers, writes the results as JSON and compares them with a stored
+baseline so regressions are flagged.
+
+    python -m benchmarks.suite --sizes 1k,10k
+    python -m benchmarks.suite --sizes 1k,10k --update-baseline
+    python -m benchmarks.suite --sizes 100k --only pattern_matcher,keyword_matcher
+
+Each ledger size runs in its own process against its own SQLite file, so
+module-level caches (compiled rules, embeddings, account models) never leak
+between sizes. The exit status is 1 when any benchmark regressed.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.ledger import BANK_ACCOUNT, ensure_ledger, parse_size
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+DEFAULT_LEDGER_DIR = os.path.join('instance', 'benchmarks')
+DEFAULT_SIZES = '1k,10k'
+# Median slowdown over the baseline that counts as a regression
+DEFAULT_TOLERANCE = 0.25
+# Timings this short are dominated by noise and never flagged
+MIN_COMPARABLE_SECONDS = 0.005
+# Descriptions each matcher benchmark queries per repetition
+QUERY_COUNT = 20
+# Rows posted by the upload benchmark
+UPLOAD_ROWS = 200
+# Session CSRF token the benchmark client submits with its forms
+CSRF_TOKEN = 'benchmark-csrf-token'
+
+
+class BenchmarkError(Exception):
+    """Raised by a timed operation that did not do the work it measures"""
+
+
+@dataclass
+class BenchmarkContext:
+    """Everything a benchmark needs, prepared once per ledger"""
+    app: Any
+    user_id: int
+    file_id: int
+    bank_account_id: int
+    queries: List[Tuple[str, float]]
+    history: List[Dict] = field(default_factory=list)
+    transactions: List[Any] = field(default_factory=list)
+
+    def client(self):
+        """Test client logged in as the benchmark user, holding CSRF_TOKEN"""
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(self.user_id)
+            session['_fresh'] = True
+            session['csrf_token'] = CSRF_TOKEN
+        return client
+
+
+# name -> (repeat, setup); setup(context) returns the callable that is timed
+BENCHMARKS: Dict[str, Tuple[int, Callable[[BenchmarkContext], Callable[[], Any]]]] = {}
+
+
+def benchmark(name: str, repeat: int = 5):
+    """Register a benchmark whose setup returns the operation to time"""
+    def register(setup):
+        BENCHMARKS[name] = (repeat, setup)
+        return setup
+    return register
+
+
+@benchmark('pattern_matcher.suggest_from_patterns', repeat=3)
+def _pattern_suggestions(context):
+    from utils.pattern_matching import PatternMatcher
+    matcher = PatternMatcher()
+    return lambda: [matcher.suggest_from_patterns(description, amount, context.history)
+                    for description, amount in context.queries]
+
+
+@benchmark('pattern_matcher.find_similar_explanations')
+def _pattern_explanations(context):
+    from utils.pattern_matching import PatternMatcher
+    matcher = PatternMatcher()
+    return lambda: [matcher.find_similar_explanations(description, context.history)
+                    for description, _ in context.queries]
+
+
+@benchmark('predictive_utils.find_similar_transactions', repeat=3)
+def _predictive_utils_similar(context):
+    from predictive_utils import find_similar_transactions
+    return lambda: [find_similar_transactions(description, context.transactions)
+                    for description, _ in context.queries]
+
+
+@benchmark('predictive_features.find_similar_transactions')
+def _predictive_features_similar(context):
+    from predictive_features import PredictiveFeatures
+    features = PredictiveFeatures()
+    # The first query builds the embedding index; only steady state is timed
+    features.find_similar_transactions(context.queries[0][0], context.user_id)
+    return lambda: [features.find_similar_transactions(description, context.user_id)
+                    for description, _ in context.queries]
+
+
+@benchmark('keyword_matcher.suggest_categories', repeat=10)
+def _keyword_matcher(context):
+    from utils.keyword_matcher import KeywordMatcher
+    matcher = KeywordMatcher()
+    return lambda: [matcher.suggest_categories(description) for description, _ in context.queries]
+
+
+def _get(context, path):
+    client = context.client()
+    return lambda: client.get(path).status_code
+
+
+for _name, _path in (
+    ('routes.dashboard', '/dashboard'),
+    ('reports.cashbook', '/reports/cashbook'),
+    ('reports.trial_balance', '/reports/trial-balance'),
+    ('reports.income_statement', '/reports/income-statement'),
+    ('reports.financial_position', '/reports/financial-position'),
+):
+    benchmark(_name, repeat=3)(lambda context, path=_path: _get(context, path))
+
+
+@benchmark('ingestion.analyze_file', repeat=3)
+def _analyze_file(context):
+    return _get(context, f'/analyze/{context.file_id}')
+
+
+@benchmark('ingestion.upload', repeat=3)
+def _upload(context):
+    client = context.client()
+    rng = random.Random(11)
+    lines = ['Date,Description,Amount'] + [
+        f"2024-12-{rng.randint(1, 28):02d},{description},{amount:.2f}"
+        for description, amount in (rng.choice(context.queries) for _ in range(UPLOAD_ROWS))
+    ]
+    payload = '\n'.join(lines).encode()
+
+    # Success and failure both redirect back to the upload page, so the
+    # redirect is followed and the flashed message tells them apart
+    def post():
+        response = client.post('/upload', follow_redirects=True, data={
+            'csrf_token': CSRF_TOKEN,
+            'account': str(context.bank_account_id),
+            'file': (io.BytesIO(payload), 'benchmark_upload.csv')
+        }, content_type='multipart/form-data')
+        if b'File uploaded successfully' not in response.data:
+            raise BenchmarkError('upload was not accepted')
+        return response.status_code
+    return post
+
+
+def _time(operation: Callable[[], Any], repeat: int) -> Dict:
+    timings = []
+    outcome = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            outcome = operation()
+        except BenchmarkError as e:
+            return {'error': str(e)}
+        timings.append(time.perf_counter() - start)
+        # Route benchmarks return status codes; the app's error handlers
+        # redirect, so anything but 2xx is an error path, not the route
+        if isinstance(outcome, int) and not 200 <= outcome < 300:
+            return {'error': f'HTTP {outcome}', 'status': outcome}
+    result = {
+        'repeat': repeat,
+        'min': round(min(timings), 6),
+        'median': round(statistics.median(timings), 6),
+        'mean': round(statistics.mean(timings), 6)
+    }
+    if isinstance(outcome, int):
+        result['status'] = outcome
+    return result
+
+
+def _build_context(app, summary: Dict, seed: int) -> BenchmarkContext:
+    from models import Transaction
+    user = summary['users'][0]
+    with app.app_context():
+        transactions = Transaction.query.filter_by(user_id=user['id']).all()
+        history = [{
+            'description': t.description,
+            'normalized_description': t.normalized_description,
+            'explanation': t.explanation,
+            'amount': float(t.amount),
+            'date': t.date,
+            'account_name': t.account_id
+        } for t in transactions]
+    rng = random.Random(seed)
+    samples = rng.sample(history, min(QUERY_COUNT, len(history)))
+    return BenchmarkContext(
+        app=app,
+        user_id=user['id'],
+        file_id=user['file_id'],
+        bank_account_id=user['account_ids'][BANK_ACCOUNT[0]],
+        queries=[(row['description'], row['amount']) for row in samples],
+        history=history,
+        transactions=transactions
+    )
+
+
+def run_size(rows: int, ledger_dir: str, seed: int, only: Optional[List[str]] = None) -> Dict:
+    """
+    Run the selected benchmarks against one ledger in this process
+
+    TEST_DATABASE_URL must already point at the ledger, since the testing
+    config reads it at import time.
+    """
+    summary = ensure_ledger(rows, ledger_dir, seed=seed)
+    from app import create_app
+    app = create_app('testing')
+    if app is None:
+        raise RuntimeError('Application creation failed')
+    context = _build_context(app, summary, seed)
+
+    results = {}
+    for name, (repeat, setup) in BENCHMARKS.items():
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        with app.app_context():
+            try:
+                results[name] = _time(setup(context), repeat)
+            except Exception as e:
+                results[name] = {'error': f'{type(e).__name__}: {e}'}
+        print(f"  {name:<48} {_describe(results[name])}", file=sys.stderr)
+    return results
+
+
+def _run_size_subprocess(rows: int, ledger_dir: str, seed: int, only: Optional[List[str]]) -> Dict:
+    """Generate the ledger, then run its benchmarks in a fresh interpreter"""
+    summary = ensure_ledger(rows, ledger_dir, seed=seed)
+    scratch = tempfile.mkdtemp(prefix='benchmark_')
+    env = dict(os.environ,
+               TEST_DATABASE_URL=summary['database_url'],
+               EMBEDDING_STORE_DIR=os.path.join(scratch, 'embeddings'),
+               ACCOUNT_MODEL_DIR=os.path.join(scratch, 'account_models'),
+               UPLOAD_FOLDER=os.path.join(scratch, 'uploads'))
+    output = os.path.join(scratch, 'results.json')
+    command = [sys.executable, '-m', 'benchmarks.suite', '--worker', str(rows),
+               '--ledger-dir', ledger_dir, '--seed', str(seed), '--output', output]
+    if only:
+        command += ['--only', ','.join(only)]
+    subprocess.run(command, env=env, check=True)
+    with open(output) as f:
+        return json.load(f)
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _describe(result: Dict) -> str:
+    if 'error' in result:
+        return f"error  {result['error']}"
+    status = f"  [{result['status']}]" if 'status' in result else ''
+    return f"median {result['median'] * 1000:10.2f} ms  min {result['min'] * 1000:10.2f} ms{status}"
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float = DEFAULT_TOLERANCE) -> List[Dict]:
+    """
+    Benchmarks whose median is slower than the baseline by more than tolerance
+
+    Args:
+        results: Output of a run, keyed by size then benchmark name
+        baseline: A previous run in the same format
+        tolerance: Allowed relative slowdown, e.g. 0.25 for 25%
+
+    Returns:
+        One entry per regression with both medians and the ratio
+    """
+    regressions = []
+    for size, benchmarks in results.get('sizes', {}).items():
+        for name, result in benchmarks.items():
+            reference = baseline.get('sizes', {}).get(size, {}).get(name)
+            # Errored runs time failure handling, which says nothing about the route
+            if not reference or 'error' in reference or 'error' in result:
+                continue
+            if 'median' not in reference or 'median' not in result:
+                continue
+            if result['median'] < MIN_COMPARABLE_SECONDS:
+                continue
+            ratio = result['median'] / max(reference['median'], 1e-9)
+            if ratio > 1 + tolerance:
+                regressions.append({
+                    'size': size, 'benchmark': name, 'baseline': reference['median'],
+                    'current': result['median'], 'ratio': round(ratio, 2)
+                })
+    return regressions
+
+
+def successful(report: Dict) -> Dict:
+    """Copy of a report without errored benchmarks, as stored for the baseline"""
+    return dict(report, sizes={
+        size: {name: result for name, result in benchmarks.items() if 'error' not in result}
+        for size, benchmarks in report.get('sizes', {}).items()
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the benchmark suite')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='Ledger sizes, e.g. 1k,10k,100k,1m')
+    parser.add_argument('--only', help='Comma-separated benchmark name prefixes')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--ledger-dir', default=DEFAULT_LEDGER_DIR)
+    parser.add_argument('--output', help='Where to write the results JSON')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='Store this run as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    only = [prefix.strip() for prefix in args.only.split(',')] if args.only else None
+
+    if args.worker:
+        results = run_size(args.worker, args.ledger_dir, args.seed, only)
+        with open(args.output, 'w') as f:
+            json.dump(results, f)
+        return
+
+    report = {
+        'created_at': datetime.utcnow().isoformat(),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'sizes': {}
+    }
+    for size in args.sizes.split(','):
+        rows = parse_size(size)
+        print(f"{rows} rows", file=sys.stderr)
+        report['sizes'][str(rows)] = _run_size_subprocess(rows, args.ledger_dir, args.seed, only)
+
+    output = args.output or os.path.join(
+        args.ledger_dir, f"results_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    errors = [(size, name, result['error']) for size, benchmarks in report['sizes'].items()
+              for name, result in benchmarks.items() if 'error' in result]
+    for size, name, error in errors:
+        print(f"ERROR {name} at {size} rows: {error}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(successful(report), f, indent=2)
+        print(f"Baseline updated: {args.baseline}"
+              + (f" ({len(errors)} errored benchmarks left out)" if errors else ''))
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        return
+    with open(args.baseline) as f:
+        regressions = compare(report, json.load(f), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression['benchmark']} at {regression['size']} rows: "
+              f"{regression['baseline'] * 1000:.2f} ms -> {regression['current'] * 1000:.2f} ms "
+              f"(x{regression['ratio']})")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""
+Bulk Categorization Service
+Applies many account assignments in one request: ownership is validated with
+one query per resource type, the change is a set-based UPDATE and the audit
+trail is a single bulk insert, all in one database transaction
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, delete, update
+
+from account_classifier import account_classifier
+from models import db, Account, CategorizationSuggestion, Transaction
+from utils.audit_service import audit_service
+from utils.data_version import data_versions
+from utils.text_normalization import normalize_description
+
+logger = logging.getLogger(__name__)
+
+# Largest number of items accepted in one request
+MAX_BULK_ITEMS = 5000
+# Rows per UPDATE statement, keeping bind parameters well under driver limits
+UPDATE_CHUNK_SIZE = 1000
+MAX_EXPLANATION_LENGTH = 500
+
+
+class BulkCategorizer:
+    """Validates and applies bulk account assignments for a user"""
+
+    def _parse_items(self, items: List[Dict]) -> Tuple[Dict[int, Dict], List[Dict]]:
+        """Well-formed items keyed by transaction id (last one wins) and the rejected rest"""
+        parsed, rejected = {}, []
+        for index, item in enumerate(items):
+            try:
+                transaction_id = int(item['transaction_id'])
+                account_id = int(item['account_id'])
+            except (KeyError, TypeError, ValueError):
+                rejected.append({'index': index, 'error': 'transaction_id and account_id must be integers'})
+                continue
+
+            explanation = item.get('explanation')
+            if explanation is not None and not isinstance(explanation, str):
+                rejected.append({'index': index, 'transaction_id': transaction_id,
+                                 'error': 'explanation must be a string'})
+                continue
+
+            parsed[transaction_id] = {
+                'transaction_id': transaction_id,
+                'account_id': account_id,
+                'explanation': explanation.strip()[:MAX_EXPLANATION_LENGTH] if explanation else None
+            }
+        return parsed, rejected
+
+    def categorize(self, user_id: int, items: List[Dict]) -> Tuple[bool, str, Dict]:
+        """
+        Assign accounts (and optionally explanations) to many transactions
+
+        Args:
+            user_id: Owner of the transactions and accounts
+            items: Dictionaries with transaction_id, account_id and optional
+                explanation
+
+        Returns:
+            Tuple of (success, message, result) where result holds the
+            updated count and the rejected items with reasons
+        """
+        if not isinstance(items, list) or not items:
+            return False, "No items provided", {}
+        if len(items) > MAX_BULK_ITEMS:
+            return False, f"At most {MAX_BULK_ITEMS} items can be categorized per request", {}
+
+        parsed, rejected = self._parse_items(items)
+        if not parsed:
+            return False, "No valid items provided", {'updated': 0, 'rejected': rejected}
+
+        try:
+            account_ids = {item['account_id'] for item in parsed.values()}
+            valid_accounts = {row[0] for row in db.session.query(Account.id).filter(
+                Account.user_id == user_id,
+                Account.is_active == True,
+                Account.id.in_(account_ids)
+            ).all()}
+            owned = {row[0] for row in db.session.query(Transaction.id).filter(
+                Transaction.user_id == user_id,
+                Transaction.id.in_(list(parsed))
+            ).all()}
+
+            assignments = []
+            for transaction_id, item in parsed.items():
+                if transaction_id not in owned:
+                    rejected.append({'transaction_id': transaction_id, 'error': 'Transaction not found'})
+                elif item['account_id'] not in valid_accounts:
+                    rejected.append({'transaction_id': transaction_id, 'error': 'Account not found or inactive'})
+                else:
+                    assignments.append(item)
+
+            updated = self._apply(user_id, assignments, action='bulk_categorize')
+            return True, f"Categorized {updated} transactions", {'updated': updated, 'rejected': rejected}
+
+        except Exception as e:
+            logger.error(f"Error bulk categorizing for user {user_id}: {str(e)}")
+            db.session.rollback()
+            return False, f"Error: {str(e)}", {}
+
+    def categorize_by_description(self, user_id: int, description: str, account_id: int,
+                                  explanation: Optional[str] = None,
+                                  include_categorized: bool = False) -> Tuple[bool, str, Dict]:
+        """
+        Assign an account to every transaction sharing a normalized description
+
+        Args:
+            user_id: Owner of the transactions and account
+            description: Description to match; normalized before matching
+            account_id: Account to assign
+            explanation: Optional explanation to set on every match
+            include_categorized: Also recategorize transactions that already
+                have an account
+
+        Returns:
+            Tuple of (success, message, result) with the updated count
+        """
+        key = normalize_description(description)
+        if not key:
+            return False, "Description is required", {}
+        if explanation is not None and not isinstance(explanation, str):
+            return False, "Explanation must be a string", {}
+        explanation = explanation.strip()[:MAX_EXPLANATION_LENGTH] if explanation else None
+
+        try:
+            account = Account.query.filter_by(id=account_id, user_id=user_id, is_active=True).first()
+            if not account:
+                return False, "Account not found or inactive", {}
+
+            # Served by the (user_id, normalized_description) index
+            query = db.session.query(Transaction.id).filter(
+                Transaction.user_id == user_id,
+                Transaction.normalized_description == key
+            )
+            if not include_categorized:
+                query = query.filter(Transaction.account_id.is_(None))
+            transaction_ids = [row[0] for row in query.all()]
+
+            assignments = [{'transaction_id': transaction_id, 'account_id': account.id,
+                            'explanation': explanation} for transaction_id in transaction_ids]
+
+            updated = self._apply(user_id, assignments, action='bulk_categorize_rule',
+                                  rule={'normalized_description': key, 'account_id': account.id})
+            return True, f"Categorized {updated} transactions", {'updated': updated, 'rejected': []}
+
+        except Exception as e:
+            logger.error(f"Error applying description rule for user {user_id}: {str(e)}")
+            db.session.rollback()
+            return False, f"Error: {str(e)}", {}
+
+    def _apply(self, user_id: int, assignments: List[Dict], action: str, rule: Optional[Dict] = None) -> int:
+        """Write validated assignments, their audit records and version bump in one commit"""
+        if not assignments:
+            return 0
+
+        now = datetime.utcnow()
+        for start in range(0, len(assignments), UPDATE_CHUNK_SIZE):
+            chunk = assignments[start:start + UPDATE_CHUNK_SIZE]
+            ids = [item['transaction_id'] for item in chunk]
+            accounts = {item['transaction_id']: item['account_id'] for item in chunk}
+            explanations = {item['transaction_id']: item['explanation'] for item in chunk if item['explanation']}
+
+            values = {
+                'account_id': case(accounts, value=Transaction.id),
+                'processed_date': now,
+                'is_processed': True,
+                'updated_at': now
+            }
+            if explanations:
+                values['explanation'] = case(explanations, value=Transaction.id, else_=Transaction.explanation)
+
+            db.session.execute(update(Transaction).where(
+                Transaction.user_id == user_id,
+                Transaction.id.in_(ids)
+            ).values(**values).execution_options(synchronize_session=False))
+
+            # Categorized transactions leave the iCountant queue
+            db.session.execute(delete(CategorizationSuggestion).where(
+                CategorizationSuggestion.transaction_id.in_(ids)
+            ).execution_options(synchronize_session=False))
+
+        audit_service.log_bulk_activity(user_id, action, 'transaction', [{
+            'resource_id': item['transaction_id'],
+            'description': f"Categorized transaction {item['transaction_id']} to account {item['account_id']}",
+            'additional_data': dict(item, **({'rule': rule} if rule else {}))
+        } for item in assignments])
+
+        # Set-based writes skip the flush hook that versions the user's data
+        data_versions.bump([user_id])
+        db.session.commit()
+        # Objects already in the session still hold the old values
+        db.session.expire_all()
+
+        # Many labels changed at once: retrain on next use instead of one partial_fit per row
+        account_classifier.invalidate(user_id)
+        logger.info(f"Bulk categorized {len(assignments)} transactions for user {user_id} ({action})")
+        return len(assignments)
+
+
+bulk_categorizer = BulkCategorizer()
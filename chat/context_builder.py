@@ -0,0 +1,227 @@
+"""
+Chat Financial Context Builder
+Assembles the financial context sent with each chat message from aggregate
+queries and the dashboard rollups, caches it per user for a short time and
+until the user's data changes, and renders it into a token-budgeted prompt
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, desc, func
+from sqlalchemy.orm import joinedload
+
+from dashboard_service import dashboard_service
+from models import db, Account, AlertHistory, Transaction
+from utils.data_version import data_versions
+from utils.versioned_cache import VersionedCache
+
+logger = logging.getLogger(__name__)
+
+# Alerts and the current month move without a data change, so entries also expire
+CONTEXT_TTL = timedelta(minutes=5)
+CONTEXT_CACHE_SIZE = 1024
+RECENT_TRANSACTIONS = 5
+TOP_CATEGORIES = 5
+UNCATEGORIZED_LABEL = 'Uncategorized'
+TREND_MONTHS = 3
+ANOMALY_LOOKBACK = timedelta(days=30)
+MAX_ANOMALIES = 3
+# Prompt budget for the context block; roughly four characters per token
+CONTEXT_TOKEN_BUDGET = 600
+CHARS_PER_TOKEN = 4
+
+
+def _month_bounds(now: datetime):
+    start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def _percent_change(previous: float, current: float) -> Optional[float]:
+    if not previous:
+        return None
+    return round((current - previous) / abs(previous) * 100, 1)
+
+
+class FinancialContextBuilder:
+    """Per-user chat context with TTL and data-version invalidation"""
+
+    def __init__(self, ttl: timedelta = CONTEXT_TTL, cache_size: int = CONTEXT_CACHE_SIZE):
+        self._cache = VersionedCache(cache_size, ttl=ttl)
+
+    def get_context(self, user_id: int) -> Dict:
+        """
+        Financial context for a user's chat turn
+
+        Args:
+            user_id: Owner of the data
+
+        Returns:
+            Dictionary with the current month's income, expenses, balance,
+            transaction count and top_categories, plus recent_transactions,
+            trends and anomalies
+        """
+        version = data_versions.version(user_id)
+        now = datetime.utcnow()
+        if version is not None:
+            context = self._cache.get(user_id, version, now)
+            if context is not None:
+                return context
+
+        context = self._build(user_id, now)
+        if version is not None:
+            self._cache.put(user_id, version, context, now)
+        return context
+
+    def _build(self, user_id: int, now: datetime) -> Dict:
+        start, end = _month_bounds(now)
+        count, income, expenses = db.session.query(
+            func.count(Transaction.id),
+            func.coalesce(func.sum(case((Transaction.amount > 0, Transaction.amount), else_=0)), 0),
+            func.coalesce(func.sum(case((Transaction.amount < 0, -Transaction.amount), else_=0)), 0)
+        ).filter(
+            Transaction.user_id == user_id,
+            Transaction.date >= start,
+            Transaction.date < end
+        ).one()
+
+        expense = func.coalesce(func.sum(-Transaction.amount), 0)
+        categories = db.session.query(
+            func.coalesce(Account.name, UNCATEGORIZED_LABEL), expense
+        ).select_from(Transaction).outerjoin(
+            Account, Transaction.account_id == Account.id
+        ).filter(
+            Transaction.user_id == user_id,
+            Transaction.amount < 0,
+            Transaction.date >= start,
+            Transaction.date < end
+        ).group_by(Account.name).order_by(expense.desc()).limit(TOP_CATEGORIES).all()
+
+        recent = Transaction.query.options(joinedload(Transaction.account)).filter(
+            Transaction.user_id == user_id
+        ).order_by(desc(Transaction.date), desc(Transaction.id)).limit(RECENT_TRANSACTIONS).all()
+
+        summary = dashboard_service.get_summary(user_id)
+
+        return {
+            'income': round(float(income), 2),
+            'expenses': round(float(expenses), 2),
+            'balance': round(float(income) - float(expenses), 2),
+            'total_transactions': int(count),
+            'recent_transactions': [{
+                'date': tx.date.strftime('%Y-%m-%d'),
+                'description': tx.description,
+                'amount': float(tx.amount),
+                'category': tx.account.name if tx.account else UNCATEGORIZED_LABEL,
+                'analyzed': bool(tx.account_id and tx.explanation)
+            } for tx in recent],
+            # Same month as the totals above, so the figures add up
+            'top_categories': [
+                {'category': label, 'amount': round(float(amount), 2)} for label, amount in categories
+            ],
+            'trends': self._trends(summary),
+            'anomalies': self._anomalies(user_id, now),
+            'uncategorized_count': summary.get('uncategorized_count', 0)
+        }
+
+    @staticmethod
+    def _trends(summary: Dict) -> List[Dict]:
+        """
+        The last few months from the dashboard rollup with month-over-month change
+
+        The rollup only has months with transactions; the months between
+        them are filled with zeros first, so a change is always measured
+        against the calendar month before.
+        """
+        totals = {
+            datetime.strptime(label, '%b %Y'): (month_income, month_expenses)
+            for label, month_income, month_expenses in zip(
+                summary['monthly_labels'], summary['monthly_income'], summary['monthly_expenses'])
+        }
+        months = []
+        if totals:
+            month, last = min(totals), max(totals)
+            while month <= last:
+                months.append(month)
+                month = (month + timedelta(days=32)).replace(day=1)
+        months = months[-(TREND_MONTHS + 1):]
+        labels = [month.strftime('%b %Y') for month in months]
+        income = [totals.get(month, (0.0, 0.0))[0] for month in months]
+        expenses = [totals.get(month, (0.0, 0.0))[1] for month in months]
+        trends = []
+        for i in range(1, len(labels)):
+            trends.append({
+                'month': labels[i],
+                'income': income[i],
+                'expenses': expenses[i],
+                'expense_change_pct': _percent_change(expenses[i - 1], expenses[i])
+            })
+        return trends
+
+    @staticmethod
+    def _anomalies(user_id: int, now: datetime) -> List[Dict]:
+        """Active alerts raised at ingest by the streaming anomaly scorer"""
+        alerts = AlertHistory.query.filter(
+            AlertHistory.user_id == user_id,
+            AlertHistory.status == 'active',
+            AlertHistory.created_at >= now - ANOMALY_LOOKBACK
+        ).order_by(desc(AlertHistory.created_at)).limit(MAX_ANOMALIES).all()
+        return [{
+            'date': alert.created_at.strftime('%Y-%m-%d'),
+            'severity': alert.severity,
+            'message': alert.alert_message
+        } for alert in alerts]
+
+    def to_prompt(self, context: Dict, token_budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+        """
+        Render context as prompt text, most important sections first
+
+        Sections that would push the text over token_budget are dropped
+        whole, so the prompt size stays fixed however large the ledger is.
+        """
+        sections = [
+            "Monthly Summary:\n"
+            f"- Income: ${context['income']:,.2f}\n"
+            f"- Expenses: ${context['expenses']:,.2f}\n"
+            f"- Balance: ${context['balance']:,.2f}\n"
+            f"- Transactions this month: {context['total_transactions']}"
+        ]
+        if context.get('recent_transactions'):
+            sections.append("Recent Transactions:\n" + "\n".join(
+                f"- {tx['date']}: {tx['description']} (${tx['amount']:,.2f}, {tx['category']})"
+                for tx in context['recent_transactions']
+            ))
+        if context.get('top_categories'):
+            sections.append("Top Expense Categories This Month:\n" + "\n".join(
+                f"- {item['category']}: ${item['amount']:,.2f}" for item in context['top_categories']
+            ))
+        if context.get('trends'):
+            sections.append("Monthly Trend:\n" + "\n".join(
+                f"- {item['month']}: income ${item['income']:,.2f}, expenses ${item['expenses']:,.2f}"
+                + (f" ({item['expense_change_pct']:+.1f}% vs prior month)"
+                   if item['expense_change_pct'] is not None else '')
+                for item in context['trends']
+            ))
+        if context.get('anomalies'):
+            sections.append("Recent Anomaly Alerts:\n" + "\n".join(
+                f"- {item['date']} [{item['severity']}]: {item['message']}" for item in context['anomalies']
+            ))
+        if context.get('uncategorized_count'):
+            sections.append(f"Uncategorized transactions: {context['uncategorized_count']}")
+
+        budget = token_budget * CHARS_PER_TOKEN
+        included = []
+        for section in sections:
+            if included and len('\n\n'.join(included + [section])) > budget:
+                continue
+            included.append(section)
+        return '\n\n'.join(included)
+
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        """Drop cached context for one user, or for everyone"""
+        self._cache.invalidate(user_id)
+
+
+context_builder = FinancialContextBuilder()
@@ -0,0 +1,118 @@
+"""
+Chat History Persistence
+Queues chat messages in memory and writes them in batches from a background
+thread, so saving the conversation never delays a response.
+
+The queue lives only in the worker's memory: messages are written at exit
+through flush(), but any still queued when a worker is killed or crashes
+are lost.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from models import db, ChatMessage
+
+logger = logging.getLogger(__name__)
+
+# Messages written per insert
+HISTORY_BATCH_SIZE = 100
+# Seconds the writer waits for more messages before writing a partial batch
+HISTORY_FLUSH_INTERVAL = 0.5
+HISTORY_PAGE_SIZE = 50
+
+
+class ChatHistoryWriter:
+    """Background batch writer for ChatMessage rows"""
+
+    def __init__(self):
+        self._app = None
+        self._queue: 'queue.Queue[Dict]' = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self._app = app
+        atexit.register(self.flush)
+
+    def _ensure_thread(self) -> None:
+        # Started on first use so each forked worker runs its own writer
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='chat-history-writer', daemon=True)
+                self._thread.start()
+
+    def record(self, user_id: int, sender: str, content: str) -> None:
+        """Queue a message for persistence"""
+        if not content:
+            return
+        self._queue.put({
+            'user_id': user_id,
+            'sender': sender,
+            'content': content,
+            'created_at': datetime.utcnow()
+        })
+        if self._app is not None:
+            self._ensure_thread()
+
+    def _drain(self, first: Dict) -> List[Dict]:
+        batch = [first]
+        while len(batch) < HISTORY_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get(timeout=HISTORY_FLUSH_INTERVAL))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Dict]) -> None:
+        try:
+            with self._app.app_context():
+                db.session.bulk_insert_mappings(ChatMessage, batch)
+                db.session.commit()
+        except Exception as e:
+            logger.error(f"Error saving {len(batch)} chat messages: {str(e)}")
+
+    def _run(self) -> None:
+        while True:
+            batch = self._drain(self._queue.get())
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Write everything queued so far; used at shutdown and in tests"""
+        if self._app is None:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+            return
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def recent(self, user_id: int, limit: int = HISTORY_PAGE_SIZE) -> List[Dict]:
+        """A user's latest messages, oldest first"""
+        messages = ChatMessage.query.filter_by(user_id=user_id).order_by(
+            ChatMessage.created_at.desc(), ChatMessage.id.desc()
+        ).limit(limit).all()
+        return [{
+            'sender': message.sender,
+            'content': message.content,
+            'created_at': message.created_at.isoformat()
+        } for message in reversed(messages)]
+
+
+history_writer = ChatHistoryWriter()
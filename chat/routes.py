@@ -5,15 +5,17 @@ context management, and financial insights generation.
 """
 
 import logging
-from datetime import datetime, timedelta
 from typing import Dict, List
-from flask import Blueprint, jsonify, request, render_template
+from flask import Blueprint, Response, jsonify, request, render_template, stream_with_context
 from flask_login import login_required, current_user
-from sqlalchemy import desc, or_
+from sqlalchemy import or_
 
-from models import db, Transaction, Account
+from models import Transaction
 from ai_insights import FinancialInsightsGenerator
 from nlp_utils import get_openai_client
+from .context_builder import context_builder
+from .history import history_writer
+from .streaming import sse_event, stream_completion, stream_limiter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -76,6 +78,9 @@ def send_message():
             logger.error(f"Error generating AI response: {str(e)}")
             response = "I apologize, but I'm having trouble analyzing your request right now. Please try again in a moment."
 
+        history_writer.record(current_user.id, 'user', message)
+        history_writer.record(current_user.id, 'assistant', response)
+
         return jsonify({
             'success': True,
             'response': response,
@@ -89,17 +94,72 @@ def send_message():
             'error': str(e)
         })
 
+@chat.route('/stream', methods=['POST'])
+@login_required
+def stream_message():
+    """Stream the assistant's reply as server-sent events while it is generated."""
+    data = request.get_json(silent=True) or {}
+    message = (data.get('message') or '').strip()
+    if not message:
+        return jsonify({'success': False, 'error': 'Empty message'}), 400
+
+    user_id = current_user.id
+    slot = stream_limiter.acquire(user_id)
+    if slot is None:
+        return jsonify({
+            'success': False,
+            'error': 'Please wait for the current response to finish'
+        }), 429
+
+    try:
+        client = get_openai_client()
+        if not client:
+            logger.error("Failed to initialize OpenAI client")
+            stream_limiter.release(slot)
+            return jsonify({'success': False, 'error': 'AI service temporarily unavailable'}), 503
+
+        context = get_financial_context(user_id)
+        messages = build_chat_messages(message, context)
+    except Exception as e:
+        stream_limiter.release(slot)
+        logger.error(f"Error preparing chat stream: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    history_writer.record(user_id, 'user', message)
+
+    def generate():
+        parts = []
+        try:
+            yield sse_event('context', context)
+            for delta in stream_completion(client, messages, temperature=0.7, max_tokens=200):
+                parts.append(delta)
+                yield sse_event('token', {'content': delta})
+            yield sse_event('done', {'response': ''.join(parts).strip()})
+        except Exception as e:
+            logger.error(f"Error streaming AI response: {str(e)}")
+            yield sse_event('error', {
+                'error': "I apologize, but I'm having trouble generating a response right now. Please try again in a moment."
+            })
+        finally:
+            # Also runs when the client disconnects mid-stream
+            history_writer.record(user_id, 'assistant', ''.join(parts).strip())
+            stream_limiter.release(slot)
+
+    # The request context stays open while streaming so the slot can be released
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @chat.route('/history', methods=['GET'])
 @login_required
 def get_chat_history():
     """Retrieve chat history for the current user."""
     try:
-        # For now, return empty history since we haven't implemented chat history storage yet
-        # This prevents the 404 error while maintaining a valid response
         logger.info(f"Retrieving chat history for user {current_user.id}")
         return jsonify({
             'success': True,
-            'history': []  # Will be implemented with chat history storage
+            'history': history_writer.recent(current_user.id)
         })
     except Exception as e:
         logger.error(f"Error retrieving chat history: {str(e)}")
@@ -129,47 +189,10 @@ def get_context():
 def get_financial_context(user_id: int) -> Dict:
     """
     Get current financial context including recent transactions,
-    monthly summary, and key metrics.
+    monthly summary, top categories, trends and anomaly alerts.
     """
     try:
-        # Get current month's transactions
-        start_date = datetime.now().replace(day=1)
-        end_date = (start_date + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-
-        transactions = Transaction.query.filter(
-            Transaction.user_id == user_id,
-            Transaction.date.between(start_date, end_date)
-        ).order_by(desc(Transaction.date)).all()
-
-        # Calculate monthly totals
-        income = sum(t.amount for t in transactions if t.amount > 0)
-        expenses = abs(sum(t.amount for t in transactions if t.amount < 0))
-        balance = income - expenses
-
-        # Get recent transactions
-        recent = Transaction.query.filter_by(user_id=user_id)\
-            .order_by(desc(Transaction.date))\
-            .limit(5)\
-            .all()
-
-        recent_transactions = [{
-            'date': tx.date.strftime('%Y-%m-%d'),
-            'description': tx.description,
-            'amount': float(tx.amount),
-            'category': tx.account.category if tx.account else 'Uncategorized',
-            'analyzed': bool(tx.account_id and tx.explanation)
-        } for tx in recent]
-
-        context = {
-            'income': float(income),
-            'expenses': float(expenses),
-            'balance': float(balance),
-            'recent_transactions': recent_transactions,
-            'total_transactions': len(transactions)
-        }
-
-        logger.info(f"Financial context generated for user {user_id}")
-        return context
+        return context_builder.get_context(user_id)
 
     except Exception as e:
         logger.error(f"Error getting financial context: {str(e)}")
@@ -183,30 +206,27 @@ def get_financial_context(user_id: int) -> Dict:
             'error': str(e)
         }
 
-def generate_ai_response(client, message: str, context: Dict) -> str:
-    """Generate AI response with financial context."""
-    try:
-        # Create prompt with context
-        prompt = f"""As a financial AI assistant, help the user with their query. Here's the current context:
-
-Monthly Summary:
-- Income: ${context['income']:,.2f}
-- Expenses: ${context['expenses']:,.2f}
-- Balance: ${context['balance']:,.2f}
+def build_chat_messages(message: str, context: Dict) -> List[Dict]:
+    """Chat completion messages for a user query with its financial context."""
+    prompt = f"""As a financial AI assistant, help the user with their query. Here's the current context:
 
-Recent Transactions:
-{format_transactions_for_prompt(context['recent_transactions'])}
+{context_builder.to_prompt(context)}
 
 User Query: {message}
 
 Provide a helpful, concise response focusing on their financial situation."""
 
+    return [
+        {"role": "system", "content": "You are a helpful financial assistant focused on providing clear, actionable advice based on the user's financial data."},
+        {"role": "user", "content": prompt}
+    ]
+
+def generate_ai_response(client, message: str, context: Dict) -> str:
+    """Generate AI response with financial context."""
+    try:
         response = client.chat.completions.create(
             model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful financial assistant focused on providing clear, actionable advice based on the user's financial data."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=build_chat_messages(message, context),
             temperature=0.7,
             max_tokens=200
         )
@@ -216,10 +236,3 @@ Provide a helpful, concise response focusing on their financial situation."""
     except Exception as e:
         logger.error(f"Error generating AI response: {str(e)}")
         return "I apologize, but I'm having trouble generating a response right now. Please try again in a moment."
-
-def format_transactions_for_prompt(transactions: List[Dict]) -> str:
-    """Format recent transactions for the AI prompt."""
-    return "\n".join([
-        f"- {tx['date']}: {tx['description']} (${tx['amount']:,.2f})"
-        for tx in transactions
-    ])
\ No newline at end of file
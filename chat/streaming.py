@@ -0,0 +1,115 @@
+"""
+Chat Response Streaming
+Server-sent event framing and per-user limits for streamed assistant replies
+"""
+
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import insert, or_, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from models import db, ChatStreamSlot
+
+logger = logging.getLogger(__name__)
+
+# Streams a single user may hold open at once, across all workers
+MAX_STREAMS_PER_USER = 2
+# A slot whose stream died without releasing it frees itself after this long
+STREAM_SLOT_TTL = timedelta(minutes=5)
+
+
+def sse_event(event: str, data: Dict) -> str:
+    """One server-sent event frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class StreamLimiter:
+    """
+    Counts open streams per user and refuses those over the limit
+
+    Each user has limit slot rows in ChatStreamSlot, shared by every worker
+    process. A stream claims a free or expired slot with one conditional
+    UPDATE, or creates the slot row, so two workers can never hold the same
+    slot; a worker that dies mid-stream frees its slot after STREAM_SLOT_TTL.
+    """
+
+    def __init__(self, limit: int = MAX_STREAMS_PER_USER, ttl: timedelta = STREAM_SLOT_TTL):
+        self.limit = limit
+        self.ttl = ttl
+
+    def acquire(self, user_id: int) -> Optional[str]:
+        """
+        Claim one of a user's stream slots
+
+        Returns:
+            Token to pass to release, or None when every slot is taken
+        """
+        token = uuid.uuid4().hex
+        now = datetime.utcnow()
+        try:
+            for slot in range(self.limit):
+                result = db.session.execute(update(ChatStreamSlot).where(
+                    ChatStreamSlot.user_id == user_id,
+                    ChatStreamSlot.slot == slot,
+                    or_(ChatStreamSlot.owner.is_(None), ChatStreamSlot.expires_at < now)
+                ).values(owner=token, expires_at=now + self.ttl))
+                claimed = result.rowcount == 1
+                if not claimed:
+                    try:
+                        with db.session.begin_nested():
+                            db.session.execute(insert(ChatStreamSlot).values(
+                                user_id=user_id, slot=slot, owner=token, expires_at=now + self.ttl))
+                        claimed = True
+                    except IntegrityError:
+                        # The slot exists and is held
+                        pass
+                if claimed:
+                    db.session.commit()
+                    return token
+            db.session.commit()
+            return None
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Failed to claim a chat stream slot for user {user_id}: {str(e)}")
+            return None
+
+    def release(self, token: str) -> None:
+        """Free the slot claimed with token"""
+        try:
+            db.session.execute(update(ChatStreamSlot).where(
+                ChatStreamSlot.owner == token
+            ).values(owner=None, expires_at=None))
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Failed to release chat stream slot: {str(e)}")
+
+
+def stream_completion(client, messages: List[Dict], **options) -> Iterator[str]:
+    """
+    Yield the text deltas of a streamed chat completion
+
+    Args:
+        client: OpenAI client
+        messages: Chat messages for the request
+        **options: Extra completion parameters (temperature, max_tokens, ...)
+    """
+    stream = client.chat.completions.create(
+        model=options.pop('model', 'gpt-3.5-turbo'),
+        messages=messages,
+        stream=True,
+        **options
+    )
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
+
+stream_limiter = StreamLimiter()
@@ -14,6 +14,13 @@ class Config:
     # In production, always set SECRET_KEY in environment variables
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-for-icountant-platform'
 
+    # Uploaded statements are stored per user below this directory
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', 'uploads')
+
+    # Scheduled backups: 'full' (pg_dump / SQLite copy) or 'incremental'
+    # (deduplicated chunks, restored with utils.restore_pipeline)
+    BACKUP_MODE = os.environ.get('BACKUP_MODE', 'full')
+
     # Database configuration with enhanced connection handling
     # Try to use PostgreSQL connection from environment variables first
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
@@ -131,6 +138,12 @@ class Config:
     PERMANENT_SESSION_LIFETIME = timedelta(minutes=60)
     SESSION_TYPE = 'filesystem'
 
+    # Background jobs: 'leased' runs each job in exactly one worker process,
+    # 'local' runs every job in every process
+    SCHEDULER_MODE = os.environ.get('SCHEDULER_MODE', 'leased')
+    # Missed runs are coalesced into one if the delay is within the grace time
+    SCHEDULER_JOB_DEFAULTS = {'coalesce': True, 'misfire_grace_time': 300, 'max_instances': 1}
+
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
@@ -140,7 +153,10 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     DEBUG = True
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    # Benchmarks and load tests point this at a seeded SQLite file
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL', 'sqlite:///:memory:')
+    # SQLite pools accept none of the PostgreSQL pool settings
+    SQLALCHEMY_ENGINE_OPTIONS = {'pool_pre_ping': True}
     WTF_CSRF_ENABLED = False
 
 class ProductionConfig(Config):
@@ -0,0 +1,123 @@
+"""
+Dashboard Data Service
+Computes dashboard totals, monthly series and top categories with aggregate
+SQL and caches them per user until the user's data version moves, so the
+dashboard costs the same whatever the size of the ledger
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import joinedload
+
+from models import db, Account, Transaction
+from utils.data_version import data_versions
+from utils.versioned_cache import VersionedCache
+
+logger = logging.getLogger(__name__)
+
+# Users whose summaries are kept in memory per process
+DASHBOARD_CACHE_SIZE = 1024
+# Months shown in the income/expense chart, ending at the latest active month
+CHART_MONTHS = 12
+# Expense categories shown in the breakdown chart
+TOP_CATEGORIES = 6
+RECENT_TRANSACTIONS = 5
+UNCATEGORIZED_LABEL = 'Uncategorized'
+
+
+def _income():
+    return func.coalesce(func.sum(case((Transaction.amount > 0, Transaction.amount), else_=0)), 0)
+
+
+def _expenses():
+    return func.coalesce(func.sum(case((Transaction.amount < 0, -Transaction.amount), else_=0)), 0)
+
+
+def _money(value) -> float:
+    return round(float(value or 0), 2)
+
+
+class DashboardService:
+    """Per-user dashboard aggregates with data-version invalidation"""
+
+    def __init__(self, cache_size: int = DASHBOARD_CACHE_SIZE):
+        self._cache = VersionedCache(cache_size)
+
+    def get_summary(self, user_id: int) -> Dict:
+        """
+        Dashboard aggregates for a user, rebuilt only when their data changed
+
+        Args:
+            user_id: Owner of the transactions
+
+        Returns:
+            Dictionary with total_income, total_expenses, net, transaction_count,
+            uncategorized_count, monthly_labels, monthly_income, monthly_expenses,
+            category_labels, category_amounts and financial_years
+        """
+        version = data_versions.version(user_id)
+        if version is not None:
+            summary = self._cache.get(user_id, version)
+            if summary is not None:
+                return summary
+
+        summary = self._build_summary(user_id)
+        if version is not None:
+            self._cache.put(user_id, version, summary)
+        return summary
+
+    def _build_summary(self, user_id: int) -> Dict:
+        mine = Transaction.user_id == user_id
+
+        count, uncategorized, income, expenses = db.session.query(
+            func.count(Transaction.id),
+            func.coalesce(func.sum(case((Transaction.account_id.is_(None), 1), else_=0)), 0),
+            _income(),
+            _expenses()
+        ).filter(mine).one()
+
+        year = func.extract('year', Transaction.date)
+        month = func.extract('month', Transaction.date)
+        monthly = db.session.query(year, month, _income(), _expenses()).filter(mine).group_by(
+            year, month
+        ).order_by(year, month).all()
+        chart = monthly[-CHART_MONTHS:]
+
+        categories = db.session.query(
+            func.coalesce(Account.name, UNCATEGORIZED_LABEL), _expenses()
+        ).select_from(Transaction).outerjoin(
+            Account, Transaction.account_id == Account.id
+        ).filter(mine, Transaction.amount < 0).group_by(
+            Account.name
+        ).order_by(_expenses().desc()).limit(TOP_CATEGORIES).all()
+
+        return {
+            'total_income': _money(income),
+            'total_expenses': _money(expenses),
+            'net': _money(float(income or 0) - float(expenses or 0)),
+            'transaction_count': int(count or 0),
+            'uncategorized_count': int(uncategorized or 0),
+            'monthly_labels': [datetime(int(y), int(m), 1).strftime('%b %Y') for y, m, _, _ in chart],
+            'monthly_income': [_money(value) for _, _, value, _ in chart],
+            'monthly_expenses': [_money(value) for _, _, _, value in chart],
+            'category_labels': [name for name, _ in categories],
+            'category_amounts': [_money(amount) for _, amount in categories],
+            'financial_years': sorted({int(y) for y, _, _, _ in monthly}, reverse=True),
+            'built_at': datetime.utcnow().isoformat()
+        }
+
+    def recent_transactions(self, user_id: int, limit: int = RECENT_TRANSACTIONS) -> List[Transaction]:
+        """Latest transactions with their accounts loaded in the same query"""
+        return Transaction.query.options(joinedload(Transaction.account)).filter(
+            Transaction.user_id == user_id
+        ).order_by(Transaction.date.desc(), Transaction.id.desc()).limit(limit).all()
+
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        """Drop cached summaries for one user, or for everyone"""
+        self._cache.invalidate(user_id)
+
+
+dashboard_service = DashboardService()
@@ -0,0 +1,505 @@
+"""
+Transaction Embedding Store
+Embeds transaction descriptions into dense vectors kept in a per-user
+memory-mapped float32 matrix, with an inverted-file (IVF) index over it so
+semantic similar-transaction lookups only scan a few clusters of the history.
+Vectors of deleted transactions and of edited descriptions or explanations
+are marked dead when the change commits; edited ones are embedded again on
+the next sync. Each row records whether its transaction had an explanation,
+so explanation lookups filter while searching instead of after.
+"""
+
+import fcntl
+import json
+import logging
+import math
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.feature_extraction.text import HashingVectorizer
+from sqlalchemy import event, inspect, or_
+from sqlalchemy.orm import Session
+
+from models import Transaction
+
+logger = logging.getLogger(__name__)
+
+# Dimension of the deterministic hashing embedder used when no model is configured
+HASH_EMBEDDING_DIM = 512
+# Transactions embedded per batch when catching up with the ledger
+EMBED_BATCH_SIZE = 512
+# Below this many vectors an exact scan is cheaper than probing an index
+IVF_MIN_ROWS = 2048
+# Clusters probed per query, and growth that triggers re-clustering
+IVF_PROBES = 8
+IVF_REBUILD_GROWTH = 0.25
+# Share of dead vectors at which a user's files are rewritten without them
+COMPACT_DEAD_FRACTION = 0.25
+
+VECTORS_FILE = 'vectors.f32'
+IDS_FILE = 'ids.npy'
+EXPLAINED_FILE = 'explained.npy'
+DEAD_FILE = 'dead.npy'
+INDEX_FILE = 'index.npz'
+META_FILE = 'meta.json'
+# Bumped when the file layout changes; stores in another layout are re-embedded
+STORE_FORMAT = 2
+# Session.info key for transactions whose vectors a pending commit makes stale
+_STALE_INFO_KEY = 'embedding_store_stale'
+
+
+class HashingEmbedder:
+    """Deterministic character n-gram embedder; needs no model files"""
+
+    def __init__(self, dim: int = HASH_EMBEDDING_DIM):
+        self.dim = dim
+        self.name = f'hashing-{dim}'
+        self._vectorizer = HashingVectorizer(
+            analyzer='char_wb', ngram_range=(3, 5), n_features=dim,
+            alternate_sign=True, norm='l2'
+        )
+
+    def embed(self, texts: Iterable[str]) -> np.ndarray:
+        """Unit-length float32 vectors, one row per text"""
+        return self._vectorizer.transform([text or '' for text in texts]).toarray().astype(np.float32)
+
+
+class SentenceTransformerEmbedder:
+    """Sentence embedding model loaded from a local path or model cache"""
+
+    def __init__(self, model_path: str):
+        from sentence_transformers import SentenceTransformer
+
+        self._model = SentenceTransformer(model_path, device='cpu')
+        self.dim = self._model.get_sentence_embedding_dimension()
+        self.name = f'sentence-transformer:{os.path.basename(model_path.rstrip(os.sep))}'
+
+    def embed(self, texts: Iterable[str]) -> np.ndarray:
+        """Unit-length float32 vectors, one row per text"""
+        return self._model.encode(
+            [text or '' for text in texts], normalize_embeddings=True, convert_to_numpy=True
+        ).astype(np.float32)
+
+
+def load_embedder():
+    """The configured sentence embedding model, or the hashing embedder when none is usable"""
+    model_path = os.environ.get('EMBEDDING_MODEL_PATH')
+    if model_path:
+        try:
+            return SentenceTransformerEmbedder(model_path)
+        except Exception as e:
+            logger.warning(f"Could not load embedding model {model_path}, using hashing embedder: {str(e)}")
+    return HashingEmbedder()
+
+
+class IVFIndex:
+    """Inverted-file index: vectors grouped by their nearest k-means centroid"""
+
+    def __init__(self, centroids: np.ndarray, rows: np.ndarray, offsets: np.ndarray):
+        """
+        Args:
+            centroids: Unit-length cluster centroids, one row per list
+            rows: Vector row numbers ordered by list
+            offsets: Start of each list in rows, plus a final end offset
+        """
+        self.centroids = centroids
+        self.rows = rows
+        self.offsets = offsets
+
+    @property
+    def size(self) -> int:
+        return len(self.rows)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray) -> 'IVFIndex':
+        """Cluster vectors into about sqrt(n) lists"""
+        n_lists = max(1, int(math.sqrt(len(vectors))))
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, batch_size=2048, n_init=3, random_state=0)
+        kmeans.fit(vectors)
+        centroids = kmeans.cluster_centers_.astype(np.float32)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        centroids /= np.where(norms > 0, norms, 1.0)
+
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), 8192):
+            block = np.asarray(vectors[start:start + 8192])
+            assignments[start:start + 8192] = np.argmax(block @ centroids.T, axis=1)
+
+        rows = np.argsort(assignments, kind='stable')
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=n_lists))))
+        return cls(centroids, rows, offsets)
+
+    def candidates(self, query: np.ndarray, probes: int) -> np.ndarray:
+        """Row numbers in the lists whose centroids are closest to query"""
+        scores = self.centroids @ query
+        probes = min(probes, len(scores))
+        nearest = np.argpartition(-scores, probes - 1)[:probes]
+        return np.concatenate([self.rows[self.offsets[i]:self.offsets[i + 1]] for i in nearest])
+
+    def save(self, path: str) -> None:
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, centroids=self.centroids, rows=self.rows, offsets=self.offsets)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'IVFIndex':
+        with np.load(path) as data:
+            return cls(data['centroids'], data['rows'], data['offsets'])
+
+
+@dataclass
+class UserVectors:
+    """Snapshot of one user's embedded transactions; replaced, never mutated"""
+    embedder: str
+    ids: np.ndarray
+    vectors: np.ndarray
+    index: Optional[IVFIndex] = None
+    # Rows whose transaction was deleted or re-embedded since they were written
+    dead: Optional[np.ndarray] = None
+    # Rows whose transaction had an explanation when it was embedded
+    explained: Optional[np.ndarray] = None
+    last_transaction_id: int = 0
+    # Modification time of the meta file this snapshot was opened from
+    meta_mtime: int = 0
+
+    def search(self, query: np.ndarray, k: int, explained_only: bool = False) -> List[Tuple[int, float]]:
+        """Top k (transaction_id, cosine similarity) pairs for a unit query vector"""
+        if not len(self.ids):
+            return []
+        if self.index is None:
+            rows = np.arange(len(self.ids))
+            scores = np.asarray(self.vectors @ query)
+        else:
+            # Vectors appended since the index was built are scanned exactly;
+            # sorted rows keep reads from the mapped file sequential
+            rows = np.sort(np.concatenate((self.index.candidates(query, IVF_PROBES),
+                                           np.arange(self.index.size, len(self.ids)))))
+            scores = np.asarray(self.vectors[rows] @ query)
+
+        keep = None
+        if self.dead is not None:
+            keep = ~self.dead[rows]
+        if explained_only:
+            keep = self.explained[rows] if keep is None else keep & self.explained[rows]
+        if keep is not None:
+            rows, scores = rows[keep], scores[keep]
+            if not len(rows):
+                return []
+
+        k = min(k, len(rows))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(self.ids[rows[i]]), float(scores[i])) for i in best]
+
+
+class EmbeddingStore:
+    """Per-user description vectors on disk with an in-process cache of open snapshots"""
+
+    def __init__(self, store_dir: Optional[str] = None, embedder=None):
+        self.store_dir = store_dir or os.environ.get(
+            'EMBEDDING_STORE_DIR', os.path.join('instance', 'embeddings')
+        )
+        self._embedder = embedder
+        self._states: Dict[int, UserVectors] = {}
+        self._user_locks: Dict[int, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._listeners_registered = False
+
+    def init_app(self, app):
+        """Register session hooks that drop vectors of deleted or re-described transactions"""
+        if not self._listeners_registered:
+            event.listen(Session, 'after_flush', self._collect_stale)
+            event.listen(Session, 'after_commit', self._discard_stale)
+            event.listen(Session, 'after_soft_rollback', self._forget_stale)
+            self._listeners_registered = True
+
+    def _collect_stale(self, session: Session, flush_context) -> None:
+        """Remember transactions this flush deleted or whose description or explanation it changed"""
+        stale = session.info.setdefault(_STALE_INFO_KEY, {})
+        for obj in session.deleted:
+            if isinstance(obj, Transaction) and obj.id is not None:
+                stale.setdefault(obj.user_id, set()).add(obj.id)
+        for obj in session.dirty:
+            if isinstance(obj, Transaction) and obj.id is not None and (
+                    inspect(obj).attrs.description.history.has_changes()
+                    or inspect(obj).attrs.explanation.history.has_changes()):
+                stale.setdefault(obj.user_id, set()).add(obj.id)
+
+    def _discard_stale(self, session: Session) -> None:
+        for user_id, transaction_ids in session.info.pop(_STALE_INFO_KEY, {}).items():
+            self.discard(user_id, transaction_ids)
+
+    def _forget_stale(self, session: Session, previous_transaction) -> None:
+        # Rolled-back changes leave the stored vectors valid
+        if previous_transaction.parent is None:
+            session.info.pop(_STALE_INFO_KEY, None)
+
+    @property
+    def embedder(self):
+        # Loading a sentence model is slow, so it happens on first use
+        if self._embedder is None:
+            with self._lock:
+                if self._embedder is None:
+                    self._embedder = load_embedder()
+        return self._embedder
+
+    def _user_dir(self, user_id: int) -> str:
+        return os.path.join(self.store_dir, f'user_{user_id}')
+
+    def _user_lock(self, user_id: int) -> threading.Lock:
+        with self._lock:
+            return self._user_locks.setdefault(user_id, threading.Lock())
+
+    @contextmanager
+    def _locked(self, user_id: int):
+        """Serialize writers to one user's files across threads and processes"""
+        user_dir = self._user_dir(user_id)
+        os.makedirs(user_dir, exist_ok=True)
+        with self._user_lock(user_id):
+            with open(os.path.join(user_dir, '.lock'), 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield user_dir
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_meta(self, user_dir: str) -> Optional[Dict]:
+        try:
+            with open(os.path.join(user_dir, META_FILE)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _meta_mtime(self, user_dir: str) -> int:
+        try:
+            return os.stat(os.path.join(user_dir, META_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def _write_meta(self, user_dir: str, meta: Dict) -> None:
+        tmp_path = os.path.join(user_dir, META_FILE + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(user_dir, META_FILE))
+
+    def _dead_rows(self, user_dir: str, meta: Dict) -> np.ndarray:
+        if not meta.get('dead_count'):
+            return np.empty(0, dtype=np.int64)
+        return np.load(os.path.join(user_dir, DEAD_FILE))[:meta['dead_count']]
+
+    def _open(self, user_dir: str, meta: Dict) -> UserVectors:
+        """Map a user's files as written by the last sync in any process"""
+        count, dim = meta['count'], meta['dim']
+        ids = np.load(os.path.join(user_dir, IDS_FILE))[:count]
+        explained = np.load(os.path.join(user_dir, EXPLAINED_FILE))[:count]
+        if count:
+            vectors = np.memmap(os.path.join(user_dir, VECTORS_FILE), dtype=np.float32,
+                                mode='r', shape=(count, dim))
+        else:
+            vectors = np.empty((0, dim), dtype=np.float32)
+        index = None
+        if meta.get('indexed_count'):
+            index = IVFIndex.load(os.path.join(user_dir, INDEX_FILE))
+        dead = None
+        dead_rows = self._dead_rows(user_dir, meta)
+        if len(dead_rows):
+            dead = np.zeros(count, dtype=bool)
+            dead[dead_rows] = True
+        last_id = meta.get('last_id', int(ids.max()) if len(ids) else 0)
+        return UserVectors(meta['embedder'], ids, vectors, index, dead, explained, last_id,
+                           self._meta_mtime(user_dir))
+
+    def _compact(self, user_dir: str, meta: Dict) -> None:
+        """Rewrite a user's vectors without the dead rows; the index is rebuilt afterwards"""
+        dead_rows = self._dead_rows(user_dir, meta)
+        ids = np.load(os.path.join(user_dir, IDS_FILE))[:meta['count']]
+        live = np.ones(len(ids), dtype=bool)
+        live[dead_rows] = False
+        vectors = np.array(np.memmap(os.path.join(user_dir, VECTORS_FILE), dtype=np.float32,
+                                     mode='r', shape=(meta['count'], meta['dim']))[live])
+        with open(os.path.join(user_dir, VECTORS_FILE), 'wb') as f:
+            f.write(vectors.tobytes())
+        np.save(os.path.join(user_dir, IDS_FILE), ids[live])
+        explained = np.load(os.path.join(user_dir, EXPLAINED_FILE))[:meta['count']]
+        np.save(os.path.join(user_dir, EXPLAINED_FILE), explained[live])
+        for name in (DEAD_FILE, INDEX_FILE):
+            try:
+                os.remove(os.path.join(user_dir, name))
+            except FileNotFoundError:
+                pass
+        meta.update(count=int(live.sum()), dead_count=0, indexed_count=0)
+
+    def _reset_files(self, user_dir: str) -> None:
+        for name in (VECTORS_FILE, IDS_FILE, EXPLAINED_FILE, DEAD_FILE, INDEX_FILE, META_FILE):
+            try:
+                os.remove(os.path.join(user_dir, name))
+            except FileNotFoundError:
+                pass
+
+    def sync(self, user_id: int) -> Optional[UserVectors]:
+        """
+        Embed any of the user's transactions added since the last sync
+
+        Args:
+            user_id: Owner of the transactions
+
+        Returns:
+            The user's current vectors, or None if they could not be loaded
+        """
+        try:
+            state = self._states.get(user_id)
+            last_id = state.last_transaction_id if state else 0
+            # A changed meta file means another process synced or discarded vectors
+            if state is not None and state.meta_mtime == self._meta_mtime(self._user_dir(user_id)) \
+                    and not Transaction.query.with_entities(Transaction.id).filter(
+                        Transaction.user_id == user_id, Transaction.id > last_id).limit(1).first():
+                return state
+
+            embedder = self.embedder
+            with self._locked(user_id) as user_dir:
+                meta = self._read_meta(user_dir)
+                if meta is not None and (meta['embedder'] != embedder.name
+                                         or meta.get('format') != STORE_FORMAT):
+                    logger.info(f"Embedder or store format changed for user {user_id}, "
+                                f"re-embedding all transactions")
+                    self._reset_files(user_dir)
+                    meta = None
+                if meta is None:
+                    meta = {'embedder': embedder.name, 'dim': embedder.dim, 'count': 0, 'indexed_count': 0,
+                            'format': STORE_FORMAT}
+                    np.save(os.path.join(user_dir, IDS_FILE), np.empty(0, dtype=np.int64))
+                    np.save(os.path.join(user_dir, EXPLAINED_FILE), np.empty(0, dtype=bool))
+                    open(os.path.join(user_dir, VECTORS_FILE), 'wb').close()
+
+                # Another process may have appended since this process last looked
+                ids = np.load(os.path.join(user_dir, IDS_FILE))[:meta['count']]
+                explained = np.load(os.path.join(user_dir, EXPLAINED_FILE))[:meta['count']]
+                last_id = meta.get('last_id', int(ids.max()) if len(ids) else 0)
+                # Transactions discarded by an edit are embedded again; deleted ones no longer match
+                pending = meta.get('pending', [])
+                new_rows = Transaction.id > last_id
+                if pending:
+                    new_rows = or_(new_rows, Transaction.id.in_(pending))
+                rows = Transaction.query.with_entities(
+                    Transaction.id, Transaction.description, Transaction.explanation
+                ).filter(
+                    Transaction.user_id == user_id,
+                    new_rows
+                ).order_by(Transaction.id).all()
+
+                if rows or pending:
+                    if meta.get('dead_count', 0) > meta['count'] * COMPACT_DEAD_FRACTION:
+                        self._compact(user_dir, meta)
+                        ids = np.load(os.path.join(user_dir, IDS_FILE))
+                        explained = np.load(os.path.join(user_dir, EXPLAINED_FILE))
+                    with open(os.path.join(user_dir, VECTORS_FILE), 'r+b') as f:
+                        # Drop any tail left by a sync that died before updating meta
+                        f.truncate(meta['count'] * meta['dim'] * 4)
+                        f.seek(0, os.SEEK_END)
+                        for start in range(0, len(rows), EMBED_BATCH_SIZE):
+                            batch = rows[start:start + EMBED_BATCH_SIZE]
+                            f.write(embedder.embed([row.description for row in batch]).tobytes())
+                    ids = np.concatenate((ids, np.asarray([row.id for row in rows], dtype=np.int64)))
+                    np.save(os.path.join(user_dir, IDS_FILE), ids)
+                    explained = np.concatenate((explained, np.asarray(
+                        [bool(row.explanation) for row in rows], dtype=bool)))
+                    np.save(os.path.join(user_dir, EXPLAINED_FILE), explained)
+                    meta['count'] = len(ids)
+                    meta['last_id'] = max([last_id] + [row.id for row in rows])
+                    meta['pending'] = []
+
+                    indexed = meta.get('indexed_count', 0)
+                    if meta['count'] >= IVF_MIN_ROWS and meta['count'] > indexed * (1 + IVF_REBUILD_GROWTH):
+                        vectors = np.memmap(os.path.join(user_dir, VECTORS_FILE), dtype=np.float32,
+                                            mode='r', shape=(meta['count'], meta['dim']))
+                        IVFIndex.build(vectors).save(os.path.join(user_dir, INDEX_FILE))
+                        meta['indexed_count'] = meta['count']
+                        logger.info(f"Rebuilt embedding index for user {user_id} over {meta['count']} vectors")
+
+                    self._write_meta(user_dir, meta)
+
+                state = self._open(user_dir, meta)
+
+            self._states[user_id] = state
+            return state
+
+        except Exception as e:
+            logger.error(f"Error syncing embeddings for user {user_id}: {str(e)}")
+            return self._states.get(user_id)
+
+    def search(self, user_id: int, text: str, k: int = 10, min_similarity: float = 0.0,
+               explained_only: bool = False) -> List[Tuple[int, float]]:
+        """
+        Transactions whose descriptions are semantically closest to text
+
+        Args:
+            user_id: Owner of the transactions
+            text: Description to match
+            k: Maximum number of results
+            min_similarity: Cosine similarity a result must reach
+            explained_only: Only return transactions that have an explanation
+
+        Returns:
+            List of (transaction_id, similarity) pairs, most similar first
+        """
+        try:
+            state = self.sync(user_id)
+            if state is None:
+                return []
+            query = self.embedder.embed([text])[0]
+            return [(transaction_id, similarity) for transaction_id, similarity in state.search(query, k, explained_only)
+                    if similarity >= min_similarity]
+        except Exception as e:
+            logger.error(f"Error searching embeddings for user {user_id}: {str(e)}")
+            return []
+
+    def discard(self, user_id: int, transaction_ids: Iterable[int]) -> None:
+        """
+        Drop the vectors of transactions that were deleted or edited
+
+        Their rows are masked out of searches at once; transactions that
+        still exist are embedded again by the next sync.
+
+        Args:
+            user_id: Owner of the transactions
+            transaction_ids: Transactions whose vectors are stale
+        """
+        transaction_ids = {int(transaction_id) for transaction_id in transaction_ids}
+        if not transaction_ids:
+            return
+        try:
+            with self._locked(user_id) as user_dir:
+                meta = self._read_meta(user_dir)
+                if meta is None:
+                    return
+                ids = np.load(os.path.join(user_dir, IDS_FILE))[:meta['count']]
+                stale_rows = np.flatnonzero(np.isin(ids, list(transaction_ids)))
+                dead_rows = np.union1d(self._dead_rows(user_dir, meta), stale_rows).astype(np.int64)
+                np.save(os.path.join(user_dir, DEAD_FILE), dead_rows)
+                meta['dead_count'] = len(dead_rows)
+                # Ids above last_id have not been embedded yet and need no re-embedding
+                last_id = meta.get('last_id', int(ids.max()) if len(ids) else 0)
+                meta['pending'] = sorted(set(meta.get('pending', [])) |
+                                         {i for i in transaction_ids if i <= last_id})
+                meta['last_id'] = last_id
+                self._write_meta(user_dir, meta)
+            self._states.pop(user_id, None)
+        except Exception as e:
+            logger.error(f"Error discarding embeddings for user {user_id}: {str(e)}")
+
+    def invalidate(self, user_id: int) -> None:
+        """Forget a user's vectors, e.g. after descriptions were edited in bulk"""
+        self._states.pop(user_id, None)
+        try:
+            with self._locked(user_id) as user_dir:
+                self._reset_files(user_dir)
+        except Exception as e:
+            logger.error(f"Error removing embeddings for user {user_id}: {str(e)}")
+
+
+embedding_store = EmbeddingStore()
@@ -0,0 +1,451 @@
+"""
+Local Time-Series Forecasting Engine
+Provides deterministic, offline monthly forecasts with prediction intervals
+using seasonal decomposition and exponential smoothing models
+"""
+
+import hashlib
+import itertools
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func
+
+from models import db, Transaction
+from utils.data_version import data_versions
+from utils.versioned_cache import VersionedCache
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SEASONAL_PERIOD = 12
+DEFAULT_HORIZON = 6
+# z-values for the supported two-sided prediction interval levels
+INTERVAL_Z = {0.8: 1.2816, 0.9: 1.6449, 0.95: 1.9600, 0.99: 2.5758}
+TOTAL_KEY = 'total'
+# Users whose fitted models are kept in memory per process
+FORECAST_CACHE_SIZE = 1024
+
+# Smoothing parameter grids (alpha, beta, gamma) searched for every series at once
+_TREND_GRID = np.array(list(itertools.product(
+    [0.1, 0.3, 0.5, 0.7, 0.9], [0.0, 0.1, 0.3], [0.0]
+)))
+_SEASONAL_GRID = np.array(list(itertools.product(
+    [0.1, 0.3, 0.5, 0.7, 0.9], [0.0, 0.1, 0.3], [0.05, 0.2, 0.4]
+)))
+
+
+def monthly_series(df: pd.DataFrame, key_column: Optional[str] = None) -> pd.DataFrame:
+    """
+    Bucket transactions into a dense month x key matrix in one vectorized pass
+
+    Args:
+        df: DataFrame with 'date' and 'amount' columns (and key_column if given)
+        key_column: Optional column to split the series by (e.g. account_id)
+
+    Returns:
+        DataFrame indexed by monthly Period with one column per key plus
+        TOTAL_KEY; an incomplete final month is dropped
+    """
+    if df.empty:
+        return pd.DataFrame()
+
+    months = pd.to_datetime(df['date']).dt.to_period('M')
+    amounts = df['amount'].astype(float)
+    if key_column:
+        matrix = amounts.groupby([months, df[key_column].fillna(0)]).sum().unstack(fill_value=0.0)
+    else:
+        matrix = pd.DataFrame(index=amounts.groupby(months).sum().index)
+
+    full_range = pd.period_range(months.min(), months.max(), freq='M')
+    matrix = matrix.reindex(full_range, fill_value=0.0)
+    matrix[TOTAL_KEY] = amounts.groupby(months).sum().reindex(full_range, fill_value=0.0)
+
+    # A trailing month that has not ended yet would read as a sharp drop
+    last_date = pd.to_datetime(df['date']).max()
+    if len(matrix) > 1 and last_date < full_range[-1].end_time.normalize():
+        matrix = matrix.iloc[:-1]
+    return matrix
+
+
+def seasonal_decompose(values: np.ndarray, period: int = SEASONAL_PERIOD) -> Dict[str, np.ndarray]:
+    """
+    Classical additive decomposition using a centred moving average trend
+
+    Args:
+        values: 1-D series
+        period: Seasonal period
+
+    Returns:
+        Dictionary with 'trend', 'seasonal' and 'residual' arrays (trend is NaN
+        at the edges where the centred window does not fit)
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    trend = np.full(n, np.nan)
+    if n >= period + 1:
+        # 2 x period moving average for even periods, plain moving average otherwise
+        window = period + 1 if period % 2 == 0 else period
+        weights = np.ones(window)
+        if period % 2 == 0:
+            weights[0] = weights[-1] = 0.5
+        weights /= period
+        half = window // 2
+        trend[half:n - half] = np.convolve(values, weights[::-1], mode='valid')
+
+    detrended = values - trend
+    positions = np.arange(n) % period
+    seasonal_means = np.zeros(period)
+    for position in range(period):
+        observed = detrended[positions == position]
+        observed = observed[~np.isnan(observed)]
+        if len(observed):
+            seasonal_means[position] = observed.mean()
+    seasonal_means -= seasonal_means.mean()
+    seasonal = seasonal_means[positions]
+
+    return {
+        'trend': trend,
+        'seasonal': seasonal,
+        'residual': values - trend - seasonal
+    }
+
+
+def seasonal_strength(values: np.ndarray, period: int = SEASONAL_PERIOD) -> float:
+    """Share of detrended variance explained by seasonality (0 to 1)"""
+    if len(values) < 2 * period:
+        return 0.0
+    parts = seasonal_decompose(values, period)
+    mask = ~np.isnan(parts['residual'])
+    denominator = np.var(parts['seasonal'][mask] + parts['residual'][mask])
+    if denominator <= 0:
+        return 0.0
+    return float(max(0.0, 1 - np.var(parts['residual'][mask]) / denominator))
+
+
+def _smooth(Y: np.ndarray, grid: np.ndarray, period: Optional[int]) -> Dict[str, np.ndarray]:
+    """
+    Run additive Holt(-Winters) recursions for every series and every grid
+    point simultaneously; the only Python loop is over time
+
+    Args:
+        Y: (k, n) matrix of k series
+        grid: (P, 3) matrix of (alpha, beta, gamma) candidates
+        period: Seasonal period, or None for a trend-only model
+
+    Returns:
+        Final states and in-sample SSE with shapes (k, P[, period])
+    """
+    k, n = Y.shape
+    alpha, beta, gamma = grid[:, 0], grid[:, 1], grid[:, 2]
+    P = len(grid)
+
+    if period:
+        init_level = Y[:, :period].mean(axis=1)
+        init_trend = (Y[:, period:2 * period].mean(axis=1) - init_level) / period
+        # Remove the first season's own trend so it does not leak into the indices
+        offsets = np.arange(period) - (period - 1) / 2
+        init_season = Y[:, :period] - init_level[:, None] - init_trend[:, None] * offsets
+        season = np.repeat(init_season[:, None, :], P, axis=1)
+    else:
+        init_level = Y[:, 0]
+        init_trend = Y[:, 1] - Y[:, 0]
+        season = None
+
+    level = np.repeat(init_level[:, None], P, axis=1)
+    trend = np.repeat(init_trend[:, None], P, axis=1)
+    sse = np.zeros((k, P))
+
+    for t in range(n):
+        y = Y[:, t][:, None]
+        s_prev = season[:, :, t % period] if period else 0.0
+        error = y - (level + trend + s_prev)
+        if t > 0:
+            sse += error ** 2
+        new_level = alpha * (y - s_prev) + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        if period:
+            season[:, :, t % period] = gamma * (y - new_level) + (1 - gamma) * s_prev
+        level = new_level
+
+    return {'level': level, 'trend': trend, 'season': season, 'sse': sse}
+
+
+def _interval_multipliers(alpha: float, beta: float, gamma: float,
+                          horizon: int, period: Optional[int]) -> np.ndarray:
+    """Forecast variance multipliers for steps 1..horizon (additive ETS approximation)"""
+    steps = np.arange(1, horizon)
+    coefficients = alpha * (1 + steps * beta)
+    if period:
+        coefficients = coefficients + gamma * (steps % period == 0)
+    return np.concatenate([[1.0], 1.0 + np.cumsum(coefficients ** 2)])
+
+
+def fit_series_matrix(Y: np.ndarray, period: int = SEASONAL_PERIOD) -> List[Dict]:
+    """
+    Fit the best exponential smoothing model to every row of Y
+
+    Trend-only and seasonal Holt-Winters models are both searched when the
+    series is long enough; the one with the lower AIC wins per series.
+
+    Args:
+        Y: (k, n) matrix of monthly series
+        period: Seasonal period
+
+    Returns:
+        One fitted-model dictionary per row
+    """
+    Y = np.asarray(Y, dtype=float)
+    k, n = Y.shape
+
+    if n < 3:
+        # Too short to smooth: fall back to a mean forecast
+        means = Y.mean(axis=1)
+        spreads = Y.std(axis=1) if n > 1 else np.abs(means) * 0.25
+        return [{
+            'method': 'mean',
+            'level': float(means[i]),
+            'trend': 0.0,
+            'season': None,
+            'params': (0.0, 0.0, 0.0),
+            'sigma': float(spreads[i]),
+            'n': n
+        } for i in range(k)]
+
+    candidates = [(None, _TREND_GRID, 2)]
+    if n >= 2 * period:
+        candidates.append((period, _SEASONAL_GRID, 3 + period))
+
+    best: List[Optional[Dict]] = [None] * k
+    for model_period, grid, n_params in candidates:
+        states = _smooth(Y, grid, model_period)
+        best_index = states['sse'].argmin(axis=1)
+        rows = np.arange(k)
+        sse = np.maximum(states['sse'][rows, best_index], 1e-9)
+        aic = (n - 1) * np.log(sse / (n - 1)) + 2 * n_params
+        for i in range(k):
+            if best[i] is not None and best[i]['aic'] <= aic[i]:
+                continue
+            p = best_index[i]
+            best[i] = {
+                'method': 'holt_winters' if model_period else 'holt',
+                'level': float(states['level'][i, p]),
+                'trend': float(states['trend'][i, p]),
+                'season': states['season'][i, p].copy() if model_period else None,
+                'params': tuple(float(v) for v in grid[p]),
+                'sigma': float(np.sqrt(sse[i] / (n - 1))),
+                'aic': float(aic[i]),
+                'n': n
+            }
+    return best
+
+
+def forecast_from_fit(fit: Dict, horizon: int = DEFAULT_HORIZON, level: float = 0.95) -> Dict[str, List[float]]:
+    """
+    Project a fitted model forward with prediction intervals
+
+    Args:
+        fit: Fitted model from fit_series_matrix
+        horizon: Number of months to forecast
+        level: Prediction interval level (0.8, 0.9, 0.95 or 0.99)
+
+    Returns:
+        Dictionary with 'mean', 'lower' and 'upper' lists of length horizon
+    """
+    steps = np.arange(1, horizon + 1)
+    mean = fit['level'] + steps * fit['trend']
+    period = len(fit['season']) if fit['season'] is not None else None
+    if period:
+        mean = mean + fit['season'][(fit['n'] + steps - 1) % period]
+
+    alpha, beta, gamma = fit['params']
+    if fit['method'] == 'mean':
+        multipliers = np.ones(horizon)
+    else:
+        multipliers = _interval_multipliers(alpha, beta, gamma, horizon, period)
+    half_width = INTERVAL_Z.get(level, INTERVAL_Z[0.95]) * fit['sigma'] * np.sqrt(multipliers)
+
+    return {
+        'mean': mean.round(2).tolist(),
+        'lower': (mean - half_width).round(2).tolist(),
+        'upper': (mean + half_width).round(2).tolist()
+    }
+
+
+def forecast_confidence(fit: Dict, forecast: Dict[str, List[float]], history: np.ndarray,
+                        period: int = SEASONAL_PERIOD) -> Dict[str, float]:
+    """
+    Confidence scores for a forecast, from its intervals and its fit
+
+    overall_confidence is one minus the average interval half-width relative
+    to the forecast, so wide intervals read as low confidence.
+    reliability_score is one minus the in-sample error relative to the
+    average monthly amount, scaled down while there are fewer than two
+    seasons of history.
+
+    Args:
+        fit: Fitted model from fit_series_matrix
+        forecast: Output of forecast_from_fit for the same fit
+        history: Series the model was fitted to
+
+    Returns:
+        Dictionary with overall_confidence and reliability_score, both 0 to 1
+    """
+    mean = np.asarray(forecast['mean'], dtype=float)
+    half_width = (np.asarray(forecast['upper'], dtype=float) - np.asarray(forecast['lower'], dtype=float)) / 2
+    relative_width = half_width / np.maximum(np.abs(mean), 1e-9)
+    overall = float(np.clip(1 - relative_width.mean(), 0.0, 1.0)) if len(mean) else 0.0
+
+    scale = float(np.abs(history).mean()) if len(history) else 0.0
+    fit_quality = float(np.clip(1 - fit['sigma'] / scale, 0.0, 1.0)) if scale > 0 else 0.0
+    coverage = min(1.0, len(history) / (2 * period))
+
+    return {
+        'overall_confidence': round(overall, 3),
+        'reliability_score': round(fit_quality * coverage, 3)
+    }
+
+
+def forecast_series(values, horizon: int = DEFAULT_HORIZON, level: float = 0.95,
+                    period: int = SEASONAL_PERIOD) -> Dict[str, List[float]]:
+    """Convenience wrapper to fit and forecast a single series"""
+    fit = fit_series_matrix(np.asarray(values, dtype=float)[None, :], period)[0]
+    result = forecast_from_fit(fit, horizon, level)
+    result['method'] = fit['method']
+    return result
+
+
+class ForecastEngine:
+    """
+    Per-user forecasting service with cached, incrementally refreshed fits
+
+    Monthly series are rebuilt from the database only when the user's data
+    version changes, and only series whose values changed are refitted.
+    """
+
+    _cache = VersionedCache(FORECAST_CACHE_SIZE)
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+
+    def _data_version(self) -> Tuple:
+        """Version that changes whenever the user's transactions change"""
+        version = data_versions.version(self.user_id)
+        if version is not None:
+            return ('data_version', version)
+        # Fall back to an aggregate when the version row cannot be read
+        return tuple(db.session.query(
+            func.count(Transaction.id),
+            func.max(Transaction.id),
+            func.max(Transaction.updated_at)
+        ).filter(Transaction.user_id == self.user_id).one())
+
+    def _load_matrix(self) -> pd.DataFrame:
+        # One row per month and account instead of one per transaction; the
+        # latest date in each group keeps the month and the trailing-month check
+        year = func.extract('year', Transaction.date)
+        month = func.extract('month', Transaction.date)
+        rows = db.session.query(
+            func.max(Transaction.date),
+            func.sum(Transaction.amount),
+            Transaction.account_id
+        ).filter(Transaction.user_id == self.user_id).group_by(
+            year, month, Transaction.account_id
+        ).all()
+        df = pd.DataFrame(rows, columns=['date', 'amount', 'account_id'])
+        df['account_id'] = df['account_id'].fillna(0).astype(int)
+        return monthly_series(df, key_column='account_id')
+
+    @staticmethod
+    def _fingerprint(values: np.ndarray) -> str:
+        return hashlib.sha1(np.ascontiguousarray(values, dtype=float).tobytes()).hexdigest()
+
+    def refresh(self) -> Dict:
+        """
+        Bring the cached fits up to date with the database
+
+        Returns:
+            Cache entry with the monthly matrix and per-series fits
+        """
+        version = self._data_version()
+        entry = self._cache.get(self.user_id, version)
+        if entry is not None:
+            return entry
+        # Fits from an older version are reused for series that did not change
+        entry = self._cache.latest(self.user_id)
+
+        matrix = self._load_matrix()
+        previous_fits = entry['fits'] if entry else {}
+        previous_prints = entry['fingerprints'] if entry else {}
+
+        fingerprints = {key: self._fingerprint(matrix[key].to_numpy()) for key in matrix.columns}
+        fits = {key: previous_fits[key] for key in matrix.columns
+                if key in previous_fits and previous_prints.get(key) == fingerprints[key]}
+        stale = [key for key in matrix.columns if key not in fits]
+
+        if stale:
+            new_fits = fit_series_matrix(matrix[stale].to_numpy().T)
+            fits.update(zip(stale, new_fits))
+            logger.info(f"Refitted {len(stale)} of {len(matrix.columns)} forecast series for user {self.user_id}")
+
+        entry = {
+            'version': version,
+            'matrix': matrix,
+            'fingerprints': fingerprints,
+            'fits': fits,
+            'refreshed_at': datetime.utcnow()
+        }
+        self._cache.put(self.user_id, version, entry)
+        return entry
+
+    def forecast(self, horizon: int = DEFAULT_HORIZON, level: float = 0.95) -> Dict:
+        """
+        Forecast the user's total and per-account monthly amounts
+
+        Args:
+            horizon: Number of months to forecast
+            level: Prediction interval level
+
+        Returns:
+            Dictionary with history, total forecast, per-account forecasts
+            and confidence scores for the total
+        """
+        entry = self.refresh()
+        matrix = entry['matrix']
+        if matrix.empty:
+            return {'status': 'error', 'message': 'No transaction data available for forecasting'}
+
+        last_month = matrix.index[-1]
+        future_months = [last_month + step for step in range(1, horizon + 1)]
+        total_values = matrix[TOTAL_KEY].to_numpy()
+        total_fit = entry['fits'][TOTAL_KEY]
+        total_forecast = forecast_from_fit(total_fit, horizon, level)
+
+        return {
+            'status': 'success',
+            'history': {
+                'months': [str(month) for month in matrix.index],
+                'total': total_values.round(2).tolist()
+            },
+            'months': [str(month) for month in future_months],
+            'total': {
+                **total_forecast,
+                'method': total_fit['method']
+            },
+            'confidence': forecast_confidence(total_fit, total_forecast, total_values),
+            'accounts': {
+                key: forecast_from_fit(entry['fits'][key], horizon, level)
+                for key in matrix.columns if key != TOTAL_KEY
+            },
+            'seasonal_strength': seasonal_strength(total_values),
+            'interval_level': level
+        }
+
+    @classmethod
+    def invalidate(cls, user_id: Optional[int] = None) -> None:
+        """Drop cached fits for one user, or for everyone"""
+        cls._cache.invalidate(user_id)
@@ -8,6 +8,7 @@ from datetime import datetime
 from decimal import Decimal, InvalidOperation
 from models import db, Transaction, Account
 from predictive_features import PredictiveFeatures
+from account_classifier import account_classifier
 
 logger = logging.getLogger(__name__)
 
@@ -235,6 +236,9 @@ class ICountant:
                     if retry_count == max_retries:
                         raise db_error
 
+            # The user's choice is the label the local account classifier learns from
+            account_classifier.record_confirmation(transaction)
+
             logger.info(f"Transaction {transaction_id} completed successfully")
             return True, "Transaction processed successfully", {
                 'transaction_id': transaction.id,
@@ -0,0 +1,435 @@
+"""
+iCountant Work Queue
+Precomputes account suggestions for each user's next uncategorized
+transactions in the background, so the iCountant screen only reads the head
+of an indexed queue instead of loading and analyzing the backlog per click
+"""
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from account_classifier import account_classifier, LOCAL_CONFIDENCE_THRESHOLD
+from ai_utils import predict_account
+from models import db, Account, CategorizationSuggestion, Transaction
+from utils.audit_service import audit_service
+from utils.data_version import data_versions
+from utils.rule_engine import rule_engine
+
+logger = logging.getLogger(__name__)
+
+# Suggestions kept ready per user
+QUEUE_DEPTH = 25
+# Transactions suggested inline, without the LLM, when a user's queue is empty
+SYNC_FILL_SIZE = 3
+# Minimum confidence for "accept all high-confidence"
+HIGH_CONFIDENCE_THRESHOLD = 0.9
+MAX_ALTERNATIVES = 3
+REFILL_MAX_WORKERS = 4
+# Stale heads skipped per pop before giving up and refilling
+MAX_STALE_SKIPS = 50
+
+
+def _account_dicts(accounts: List[Account]) -> List[Dict]:
+    """Accounts in the format predict_account expects"""
+    return [{
+        'id': account.id,
+        'name': account.name,
+        'category': account.type,
+        'description': account.description or ''
+    } for account in accounts]
+
+
+class ICountantWorkQueue:
+    """Fills, serves and resolves the per-user categorization queue"""
+
+    def active_accounts(self, user_id: int) -> List[Account]:
+        return Account.query.filter_by(user_id=user_id, is_active=True).order_by(Account.type, Account.name).all()
+
+    def suggest(self, transaction: Transaction, accounts: List[Account], use_ai: bool = True) -> List[Dict]:
+        """
+        Rank accounts for a transaction: keyword rules, then the local
+        classifier, then the LLM when neither is confident
+
+        The session is committed before the LLM is called, so pass detached
+        objects or call this with nothing pending.
+
+        Args:
+            transaction: Uncategorized transaction
+            accounts: The user's active accounts
+            use_ai: Whether the LLM may be called
+
+        Returns:
+            Up to MAX_ALTERNATIVES dictionaries with account_id, confidence,
+            reason and source, best first
+        """
+        by_key = {}
+        for account in accounts:
+            by_key.setdefault(account.name.lower(), account)
+            by_key.setdefault((account.type or '').lower(), account)
+        by_name = {account.name: account for account in accounts}
+
+        candidates: Dict[int, Dict] = {}
+
+        def add(account_id: int, confidence: float, reason: str, source: str):
+            current = candidates.get(account_id)
+            if current is None or confidence > current['confidence']:
+                candidates[account_id] = {
+                    'account_id': account_id,
+                    'confidence': round(float(confidence), 4),
+                    'reason': reason,
+                    'source': source
+                }
+
+        description = transaction.description or ''
+        for match in rule_engine.match(description):
+            account = by_key.get(match['category'].lower())
+            if account:
+                add(account.id, match['confidence'],
+                    f"Matches keyword rule for {match['category']}", 'keyword_rule')
+
+        best = max((c['confidence'] for c in candidates.values()), default=0.0)
+        if best < LOCAL_CONFIDENCE_THRESHOLD and len(description.strip()) >= 3:
+            amount = float(transaction.amount or 0)
+            if use_ai:
+                # End the read the rule lookup began so no transaction stays
+                # open while the LLM answers
+                db.session.commit()
+                success, _, suggestions = predict_account(
+                    description, transaction.explanation, _account_dicts(accounts),
+                    user_id=transaction.user_id, amount=amount
+                )
+                for suggestion in (suggestions if success else []):
+                    account = by_name.get(suggestion.get('account'))
+                    if account:
+                        add(account.id, suggestion.get('confidence', 0.0),
+                            suggestion.get('reasoning', ''), suggestion.get('source', 'ai'))
+            else:
+                active_ids = {account.id for account in accounts}
+                for prediction in account_classifier.predict(
+                        transaction.user_id, description, transaction.explanation, amount):
+                    if prediction['account_id'] in active_ids:
+                        add(prediction['account_id'], prediction['confidence'],
+                            'Matches how similar transactions were categorized before', 'local_classifier')
+
+        ranked = sorted(candidates.values(), key=lambda c: c['confidence'], reverse=True)
+        return ranked[:MAX_ALTERNATIVES]
+
+    def purge_resolved(self, user_id: int) -> int:
+        """Drop queued suggestions whose transaction was categorized elsewhere"""
+        categorized = db.session.query(Transaction.id).filter(
+            Transaction.user_id == user_id,
+            Transaction.account_id.isnot(None)
+        )
+        result = db.session.execute(delete(CategorizationSuggestion).where(
+            CategorizationSuggestion.user_id == user_id,
+            CategorizationSuggestion.transaction_id.in_(categorized)
+        ).execution_options(synchronize_session=False))
+        return result.rowcount or 0
+
+    def _pending_work(self, user_id: int, depth: int) -> Tuple[List[Transaction], List[Account]]:
+        """
+        Uncategorized transactions that would top a user's queue up to depth,
+        and the user's active accounts
+
+        Read on a short-lived session of its own, so no transaction stays
+        open while suggestions are computed; the returned objects are
+        detached with their columns loaded.
+        """
+        with Session(db.engine) as reader:
+            queued_ids = select(CategorizationSuggestion.transaction_id).join(
+                Transaction, CategorizationSuggestion.transaction_id == Transaction.id
+            ).where(
+                CategorizationSuggestion.user_id == user_id,
+                Transaction.account_id.is_(None)
+            )
+            queued = reader.scalar(select(func.count()).select_from(queued_ids.subquery()))
+            needed = depth - queued
+            if needed <= 0:
+                return [], []
+
+            transactions = reader.scalars(select(Transaction).where(
+                Transaction.user_id == user_id,
+                Transaction.account_id.is_(None),
+                ~Transaction.id.in_(
+                    select(CategorizationSuggestion.transaction_id).where(
+                        CategorizationSuggestion.user_id == user_id))
+            ).order_by(Transaction.date, Transaction.id).limit(needed)).all()
+            if not transactions:
+                return [], []
+
+            accounts = reader.scalars(select(Account).where(
+                Account.user_id == user_id, Account.is_active == True
+            ).order_by(Account.type, Account.name)).all()
+            return transactions, accounts
+
+    def fill(self, user_id: int, depth: int = QUEUE_DEPTH, use_ai: bool = True) -> int:
+        """
+        Top a user's queue up to depth ready suggestions
+
+        Suggestions, which may wait on the LLM, are computed with no
+        transaction open; resolved items are then purged and the new ones
+        inserted in one short transaction, skipping any transaction that was
+        categorized or queued by another worker in the meantime.
+
+        Args:
+            user_id: Owner of the queue
+            depth: Number of suggestions to keep ready
+            use_ai: Whether the LLM may be called for low-confidence items
+
+        Returns:
+            Number of suggestions added
+        """
+        try:
+            transactions, accounts = self._pending_work(user_id, depth)
+            if not transactions or not accounts:
+                return 0
+
+            rows = []
+            for transaction in transactions:
+                ranked = self.suggest(transaction, accounts, use_ai=use_ai)
+                best = ranked[0] if ranked else {}
+                rows.append({
+                    'user_id': user_id,
+                    'transaction_id': transaction.id,
+                    'transaction_date': transaction.date,
+                    'account_id': best.get('account_id'),
+                    'confidence': best.get('confidence', 0.0),
+                    'source': best.get('source'),
+                    'reason': (best.get('reason') or '')[:500],
+                    'alternatives': json.dumps(ranked),
+                    'created_at': datetime.utcnow()
+                })
+
+            self.purge_resolved(user_id)
+            candidate_ids = [row['transaction_id'] for row in rows]
+            open_ids = set(db.session.scalars(select(Transaction.id).where(
+                Transaction.id.in_(candidate_ids),
+                Transaction.account_id.is_(None),
+                ~Transaction.id.in_(select(CategorizationSuggestion.transaction_id).where(
+                    CategorizationSuggestion.transaction_id.in_(candidate_ids)))
+            )))
+            rows = [row for row in rows if row['transaction_id'] in open_ids]
+            if rows:
+                db.session.bulk_insert_mappings(CategorizationSuggestion, rows)
+            db.session.commit()
+            logger.info(f"Queued {len(rows)} iCountant suggestions for user {user_id}")
+            return len(rows)
+
+        except IntegrityError:
+            # Another worker queued the same transactions first
+            db.session.rollback()
+            return 0
+        except Exception as e:
+            logger.error(f"Error filling iCountant queue for user {user_id}: {str(e)}")
+            db.session.rollback()
+            return 0
+
+    def refill_all_users(self, app, max_workers: int = REFILL_MAX_WORKERS) -> int:
+        """Top up the queue of every user with uncategorized transactions"""
+        with app.app_context():
+            user_ids = [row[0] for row in db.session.query(Transaction.user_id).filter(
+                Transaction.account_id.is_(None)
+            ).distinct().all()]
+
+        def _run(user_id):
+            with app.app_context():
+                return self.fill(user_id)
+
+        added = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_run, user_id) for user_id in user_ids]
+            for future in as_completed(futures):
+                try:
+                    added += future.result()
+                except Exception as e:
+                    logger.error(f"iCountant queue refill failed: {str(e)}")
+
+        logger.info(f"iCountant queue refill added {added} suggestions for {len(user_ids)} users")
+        return added
+
+    def next_item(self, user_id: int) -> Optional[CategorizationSuggestion]:
+        """
+        Head of a user's queue, read from the (user_id, transaction_date) index
+
+        Heads whose transaction has since been categorized are dropped on the
+        way. When the queue is empty a few items are suggested inline with
+        the local matchers so the user never waits on the LLM.
+        """
+        try:
+            for _ in range(MAX_STALE_SKIPS):
+                item = CategorizationSuggestion.query.filter_by(user_id=user_id).order_by(
+                    CategorizationSuggestion.transaction_date,
+                    CategorizationSuggestion.transaction_id
+                ).first()
+                if item is None:
+                    if not self.fill(user_id, depth=SYNC_FILL_SIZE, use_ai=False):
+                        return None
+                    continue
+                if item.transaction.account_id is None:
+                    return item
+                db.session.delete(item)
+                db.session.commit()
+
+            # Many heads were stale: clear them in one statement and try once more
+            self.purge_resolved(user_id)
+            db.session.commit()
+            return CategorizationSuggestion.query.filter_by(user_id=user_id).order_by(
+                CategorizationSuggestion.transaction_date,
+                CategorizationSuggestion.transaction_id
+            ).first()
+
+        except Exception as e:
+            logger.error(f"Error reading iCountant queue for user {user_id}: {str(e)}")
+            db.session.rollback()
+            return None
+
+    def alternatives(self, item: CategorizationSuggestion) -> List[Dict]:
+        try:
+            return json.loads(item.alternatives or '[]')
+        except ValueError:
+            return []
+
+    def transaction_info(self, item: CategorizationSuggestion, accounts: List[Account]) -> Dict:
+        """Template context for a queued item, in the shape icountant.html renders"""
+        transaction = item.transaction
+        accounts_by_id = {account.id: account for account in accounts}
+        return {
+            'insights': {
+                'amount_formatted': f"${abs(transaction.amount):,.2f}",
+                'transaction_type': 'credit' if transaction.amount < 0 else 'debit',
+                'ai_insights': item.reason or '',
+                'suggested_accounts': [{
+                    'account': accounts_by_id[suggestion['account_id']],
+                    'confidence': suggestion['confidence'],
+                    'reason': suggestion['reason']
+                } for suggestion in self.alternatives(item) if suggestion['account_id'] in accounts_by_id]
+            }
+        }
+
+    def pending_count(self, user_id: int) -> int:
+        return db.session.query(func.count(CategorizationSuggestion.id)).filter(
+            CategorizationSuggestion.user_id == user_id
+        ).scalar()
+
+    def accept(self, user_id: int, transaction_id: int, account_id: int) -> bool:
+        """
+        Categorize a queued transaction and pop it from the queue
+
+        Args:
+            user_id: Owner of the transaction
+            transaction_id: Transaction being categorized
+            account_id: Account chosen by the user
+
+        Returns:
+            True when the transaction was categorized
+        """
+        try:
+            transaction = Transaction.query.filter_by(id=transaction_id, user_id=user_id).first()
+            account = Account.query.filter_by(id=account_id, user_id=user_id).first()
+            if not transaction or not account:
+                return False
+
+            item = CategorizationSuggestion.query.filter_by(transaction_id=transaction_id).first()
+            transaction.account_id = account.id
+            transaction.processed_date = datetime.utcnow()
+            transaction.is_processed = True
+            if item is not None:
+                db.session.delete(item)
+            db.session.commit()
+
+            # The user's choice is the label the local account classifier learns from
+            account_classifier.record_confirmation(transaction)
+            return True
+
+        except Exception as e:
+            logger.error(f"Error accepting iCountant suggestion for transaction {transaction_id}: {str(e)}")
+            db.session.rollback()
+            return False
+
+    def accept_high_confidence(self, user_id: int, threshold: float = HIGH_CONFIDENCE_THRESHOLD) -> int:
+        """
+        Apply every queued suggestion at or above threshold in one transaction
+
+        Args:
+            user_id: Owner of the queue
+            threshold: Minimum suggestion confidence
+
+        Returns:
+            Number of transactions categorized
+        """
+        try:
+            rows = db.session.query(
+                CategorizationSuggestion.transaction_id,
+                CategorizationSuggestion.account_id
+            ).join(
+                Transaction, CategorizationSuggestion.transaction_id == Transaction.id
+            ).join(
+                Account, CategorizationSuggestion.account_id == Account.id
+            ).filter(
+                CategorizationSuggestion.user_id == user_id,
+                CategorizationSuggestion.confidence >= threshold,
+                Transaction.account_id.is_(None),
+                Account.is_active == True
+            ).all()
+            if not rows:
+                return 0
+
+            now = datetime.utcnow()
+            db.session.bulk_update_mappings(Transaction, [{
+                'id': transaction_id,
+                'account_id': account_id,
+                'processed_date': now,
+                'is_processed': True
+            } for transaction_id, account_id in rows])
+            db.session.execute(delete(CategorizationSuggestion).where(
+                CategorizationSuggestion.transaction_id.in_([row[0] for row in rows])
+            ).execution_options(synchronize_session=False))
+            # Bulk mappings skip the flush hook that versions the user's data
+            data_versions.bump([user_id])
+            db.session.commit()
+
+            audit_service.log_activity(
+                user_id=user_id,
+                action='bulk_categorize',
+                resource_type='transaction',
+                description=f"Accepted {len(rows)} high-confidence iCountant suggestions",
+                additional_data={'threshold': threshold, 'transaction_ids': [row[0] for row in rows]}
+            )
+            logger.info(f"Accepted {len(rows)} high-confidence suggestions for user {user_id}")
+            return len(rows)
+
+        except Exception as e:
+            logger.error(f"Error accepting high-confidence suggestions for user {user_id}: {str(e)}")
+            db.session.rollback()
+            return 0
+
+
+def configure_icountant_queue(scheduler, app, minutes: int = 5):
+    """
+    Configure the periodic iCountant queue refill
+
+    Args:
+        scheduler: APScheduler instance to register the job with
+        app: Flask application passed to the job for worker contexts
+        minutes: Interval between runs
+    """
+    scheduler.add_job(
+        func=icountant_queue.refill_all_users,
+        trigger='interval',
+        minutes=minutes,
+        args=[app],
+        id='icountant_queue_refill',
+        replace_existing=True,
+        name='iCountant Queue Refill'
+    )
+    logger.info(f"iCountant queue refill scheduled every {minutes} minutes")
+
+
+icountant_queue = ICountantWorkQueue()
@@ -1,13 +1,18 @@
 """Main routes for the application"""
 import os
 import logging
+from datetime import datetime
 from werkzeug.utils import secure_filename
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, abort
 from flask_login import login_required, current_user
 from models import db, Account, AdminChartOfAccounts, Transaction, UploadedFile
 from icountant import ICountant
-from utils.hybrid_predictor import HybridPredictor
 from predictive_features import PredictiveFeatures
+from dashboard_service import dashboard_service
+from icountant_queue import icountant_queue, HIGH_CONFIDENCE_THRESHOLD
+from bulk_categorization import bulk_categorizer
+from forecasting import ForecastEngine
+from alert_system import AlertSystem
 
 logger = logging.getLogger(__name__)
 
@@ -30,26 +35,32 @@ def home():
 @login_required
 def dashboard():
     """Main dashboard route"""
-    # Initialize labels as empty list if no data
-    monthly_labels = []
+    summary = {
+        'total_income': 0.0, 'total_expenses': 0.0, 'transaction_count': 0,
+        'monthly_labels': [], 'monthly_income': [], 'monthly_expenses': [],
+        'category_labels': [], 'category_amounts': [], 'financial_years': []
+    }
+    transactions = []
     try:
-        # Get transactions and calculate totals
-        transactions = Transaction.query.filter_by(user_id=current_user.id).all()
-
-        total_income = sum(t.amount for t in transactions if t.amount > 0)
-        total_expenses = sum(abs(t.amount) for t in transactions if t.amount < 0)
-
-        # Your existing label generation logic here (this part was not provided and remains unchanged)
-        pass
+        # Totals and chart series come from cached SQL aggregates
+        summary = dashboard_service.get_summary(current_user.id)
+        transactions = dashboard_service.recent_transactions(current_user.id)
     except Exception as e:
-        logger.error(f"Error generating monthly labels: {e}")
+        logger.error(f"Error building dashboard: {e}")
 
+    financial_years = summary['financial_years']
     return render_template('dashboard.html',
-                           total_income=total_income,
-                           total_expenses=total_expenses,
-                           transaction_count=len(transactions),
-                           transactions=transactions[:5], # Latest 5 transactions
-                           monthly_labels=monthly_labels)  # Now guaranteed to be JSON serializable
+                           total_income=summary['total_income'],
+                           total_expenses=summary['total_expenses'],
+                           transaction_count=summary['transaction_count'],
+                           transactions=transactions,
+                           monthly_labels=summary['monthly_labels'],
+                           monthly_income=summary['monthly_income'],
+                           monthly_expenses=summary['monthly_expenses'],
+                           category_labels=summary['category_labels'],
+                           category_amounts=summary['category_amounts'],
+                           financial_years=financial_years,
+                           current_year=financial_years[0] if financial_years else None)
 
 
 @bp.route('/analyze_list')
@@ -235,7 +246,8 @@ def icountant():
         return render_template('icountant.html',
                            accounts=accounts,
                            unprocessed_transactions=unprocessed_transactions,
-                           recent_transactions=recent_transactions)
+                           recent_transactions=recent_transactions,
+                           high_confidence_threshold=HIGH_CONFIDENCE_THRESHOLD)
 
     except Exception as e:
         logger.error(f"Error in iCountant interface: {str(e)}", exc_info=True)
@@ -268,6 +280,45 @@ def process_transaction(transaction, account_id, icountant_agent):
         db.session.rollback()
         return False, f'Error processing transaction: {str(e)}'
 
+@bp.route('/api/transactions/categorize', methods=['POST'])
+@login_required
+def bulk_categorize():
+    """
+    Categorize many transactions in one request
+
+    Accepts either {"items": [{"transaction_id", "account_id", "explanation"}, ...]}
+    or {"rule": {"description", "account_id", "explanation", "include_categorized"}}
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not data:
+            return jsonify({'success': False, 'error': 'Request must be a JSON object'}), 400
+
+        if 'rule' in data:
+            rule = data['rule'] or {}
+            if not isinstance(rule, dict):
+                return jsonify({'success': False, 'error': 'rule must be a JSON object'}), 400
+            account_id = rule.get('account_id')
+            if not isinstance(account_id, int):
+                return jsonify({'success': False, 'error': 'account_id must be an integer'}), 400
+            success, message, result = bulk_categorizer.categorize_by_description(
+                current_user.id,
+                rule.get('description') or rule.get('normalized_description') or '',
+                account_id,
+                explanation=rule.get('explanation'),
+                include_categorized=bool(rule.get('include_categorized', False))
+            )
+        else:
+            success, message, result = bulk_categorizer.categorize(current_user.id, data.get('items'))
+
+        if not success:
+            return jsonify({'success': False, 'error': message, **result}), 400
+        return jsonify({'success': True, 'message': message, **result})
+
+    except Exception as e:
+        logger.error(f"Error in bulk categorize route: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @bp.route('/settings', methods=['GET', 'POST'])
 @login_required
 def settings():
@@ -341,6 +392,78 @@ def financial_insights():
         flash('Error accessing Financial Insights', 'error')
         return redirect(url_for('main.dashboard'))
 
+@bp.route('/expense-forecast')
+@login_required
+def expense_forecast():
+    """Expense forecast from cached per-account exponential smoothing models"""
+    try:
+        result = ForecastEngine(current_user.id).forecast(horizon=6)
+        if result['status'] != 'success':
+            flash('No transaction data available for forecasting')
+            return redirect(url_for('main.dashboard'))
+
+        forecast = {
+            'confidence_metrics': {
+                'overall_confidence': result['confidence']['overall_confidence'],
+                'variance_range': {
+                    'min': min(result['total']['lower']),
+                    'max': max(result['total']['upper'])
+                },
+                'reliability_score': result['confidence']['reliability_score']
+            },
+            'forecast_factors': {
+                'key_drivers': []
+            },
+            'recommendations': []
+        }
+
+        # History followed by the forecast horizon; intervals only cover the forecast
+        history_months = result['history']['months']
+        all_months = history_months + result['months']
+        monthly_labels = [datetime.strptime(m, '%Y-%m').strftime('%b %Y') for m in all_months]
+        monthly_amounts = result['history']['total'] + result['total']['mean']
+        confidence_upper = [None] * len(history_months) + result['total']['upper']
+        confidence_lower = [None] * len(history_months) + result['total']['lower']
+
+        # Predicted monthly average per account over the horizon
+        account_names = dict(Account.query.with_entities(Account.id, Account.name).filter(
+            Account.user_id == current_user.id
+        ).all())
+        category_labels = []
+        category_amounts = []
+        for account_id, account_forecast in result['accounts'].items():
+            category_labels.append(account_names.get(account_id, 'Uncategorized'))
+            category_amounts.append(round(sum(account_forecast['mean']) / len(account_forecast['mean']), 2))
+
+        return render_template('expense_forecast.html',
+                               forecast=forecast,
+                               monthly_labels=monthly_labels,
+                               monthly_amounts=monthly_amounts,
+                               confidence_upper=confidence_upper,
+                               confidence_lower=confidence_lower,
+                               category_labels=category_labels,
+                               category_amounts=category_amounts)
+
+    except Exception as e:
+        logger.error(f"Error in expense forecast: {str(e)}")
+        flash('Error generating expense forecast')
+        return redirect(url_for('main.dashboard'))
+
+@bp.route('/alerts/check')
+@login_required
+def check_alerts():
+    """Evaluate the user's alert configurations and store new alerts"""
+    try:
+        alerts_created = AlertSystem().evaluate_and_store(current_user.id)
+        return jsonify({
+            'success': True,
+            'alerts_created': alerts_created
+        })
+
+    except Exception as e:
+        logger.error(f"Error checking alerts: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @bp.route('/analyze/suggest-account', methods=['POST'])
 @login_required
 def suggest_account():
@@ -444,9 +567,8 @@ def handle_file_upload(file, account_id):
 
         upload = UploadedFile(
             filename=filename,
-            filepath=file_path,
-            user_id=current_user.id,
-            account_id=account_id  # Assuming UploadForm has an account field
+            file_path=file_path,
+            user_id=current_user.id
         )
         db.session.add(upload)
         db.session.commit()
@@ -462,69 +584,62 @@ def handle_file_upload(file, account_id):
 @bp.route('/icountant_interface', methods=['GET', 'POST'])
 @login_required
 def icountant_interface():
-    """Handle iCountant interface interactions"""
+    """Serve the head of the user's precomputed iCountant queue"""
     try:
-        return render_template('icountant.html')
+        accounts = icountant_queue.active_accounts(current_user.id)
+
+        if request.method == 'POST':
+            transaction_id = request.form.get('transaction_id', type=int)
+            account_id = request.form.get('selected_account', type=int)
+            # Only the user's active accounts, as listed on the page, may be chosen
+            if transaction_id and account_id in {account.id for account in accounts}:
+                if icountant_queue.accept(current_user.id, transaction_id, account_id):
+                    flash('Transaction processed successfully', 'success')
+                else:
+                    flash('Error processing transaction', 'error')
+            else:
+                flash('Please select an account', 'warning')
+            return redirect(url_for('main.icountant_interface'))
+
+        item = icountant_queue.next_item(current_user.id)
+        transaction = item.transaction if item else None
+        transaction_info = icountant_queue.transaction_info(item, accounts) if item else None
+
+        total_count = Transaction.query.filter_by(user_id=current_user.id).count()
+        processed_count = Transaction.query.filter(
+            Transaction.user_id == current_user.id,
+            Transaction.account_id.isnot(None)
+        ).count()
+        recently_processed = Transaction.query.filter(
+            Transaction.user_id == current_user.id,
+            Transaction.account_id.isnot(None)
+        ).order_by(Transaction.processed_date.desc(), Transaction.id.desc()).limit(5).all()
+
+        return render_template('icountant.html',
+                               transaction=transaction,
+                               transaction_info=transaction_info,
+                               accounts=accounts,
+                               message=None if item else 'No transactions pending for processing',
+                               recently_processed=recently_processed,
+                               processed_count=processed_count,
+                               total_count=total_count,
+                               high_confidence_threshold=HIGH_CONFIDENCE_THRESHOLD)
     except Exception as e:
         logger.error(f"Error in iCountant interface: {str(e)}", exc_info=True)
         flash('Error processing request', 'error')
         return redirect(url_for('main.dashboard'))
 
-class PredictiveFeatures:
-    """Enhanced implementation of predictive features"""
-    def __init__(self):
-        self.hybrid_predictor = HybridPredictor()
-
-    def suggest_account(self, description: str, explanation: str = ""):
-        """Suggest account based on transaction description and explanation"""
-        try:
-            # Use synchronous keyword suggestions instead of async method
-            keyword_suggestions = self.hybrid_predictor.get_keyword_suggestions(description)
-
-            # Convert to standard format
-            suggestions = []
-            for suggestion in keyword_suggestions:
-                suggestions.append({
-                    'account': suggestion.get('category', ''),
-                    'confidence': suggestion.get('confidence', 0),
-                    'reasoning': 'Based on keyword matching',
-                    'source': 'keyword'
-                })
-
-            return suggestions
-
-        except Exception as e:
-            logger.error(f"Error suggesting account: {str(e)}")
-            return []
-
-    def find_similar_transactions(self, description: str):
-        """Find similar transactions based on description with enhanced pattern matching"""
-        try:
-            # Use keyword matcher for initial filtering
-            similar_descriptions = self.hybrid_predictor.get_keyword_suggestions(description)
-
-            transactions = []
-            for match in similar_descriptions:
-                if match.get('confidence', 0) > 0.7:  # Confidence threshold
-                    transactions.append({
-                        'explanation': match.get('category', ''),
-                        'confidence': match.get('confidence', 0),
-                        'match_type': match.get('match_type', 'pattern'),
-                        'source': 'hybrid'
-                    })
-
-            return {
-                'success': True, 
-                'similar_transactions': transactions,
-                'analysis': {
-                    'pattern_count': len(transactions),
-                    'confidence_avg': sum(t['confidence'] for t in transactions) / len(transactions) if transactions else 0
-                }
-            }
+@bp.route('/icountant_interface/accept_high_confidence', methods=['POST'])
+@login_required
+def icountant_accept_high_confidence():
+    """Apply every queued suggestion at or above the high-confidence threshold"""
+    accepted = icountant_queue.accept_high_confidence(current_user.id)
+    if accepted:
+        flash(f'Categorized {accepted} high-confidence transactions', 'success')
+    else:
+        flash('No high-confidence suggestions are ready yet', 'info')
+    return redirect(url_for('main.icountant_interface'))
 
-        except Exception as e:
-            logger.error(f"Error finding similar transactions: {str(e)}")
-            return {'success': False, 'error': str(e), 'similar_transactions': []}
 def check_anomalies(analyzed_transactions):
     """Check for anomalies in analyzed transactions"""
     try:
@@ -537,13 +652,13 @@ def check_anomalies(analyzed_transactions):
         }
 
         # Analyze amount patterns
-        amounts = [t['transaction'].amount for t in analyzed_transactions]
+        amounts = [float(t['transaction'].amount) for t in analyzed_transactions]
         avg_amount = sum(amounts) / len(amounts) if amounts else 0
         std_dev = (sum((x - avg_amount) ** 2 for x in amounts) / len(amounts)) ** 0.5 if amounts else 0
 
         # Check for amount anomalies
         for idx, transaction in enumerate(analyzed_transactions):
-            amount = transaction['transaction'].amount
+            amount = float(transaction['transaction'].amount)
             if abs(amount - avg_amount) > 2 * std_dev:
                 anomalies['anomalies'].append({
                     'transaction_index': idx,
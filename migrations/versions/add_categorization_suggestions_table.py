@@ -0,0 +1,43 @@
+"""Add iCountant categorization suggestions queue table
+
+Revision ID: c586451321ea
+Revises: b586451321ea
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c586451321ea'
+down_revision = 'b586451321ea'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('categorization_suggestions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('transaction_id', sa.Integer(), nullable=False),
+        sa.Column('transaction_date', sa.DateTime(), nullable=False),
+        sa.Column('account_id', sa.Integer(), nullable=True),
+        sa.Column('confidence', sa.Float(), nullable=True),
+        sa.Column('source', sa.String(length=30), nullable=True),
+        sa.Column('reason', sa.String(length=500), nullable=True),
+        sa.Column('alternatives', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['transaction_id'], ['transactions.id'], ),
+        sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('transaction_id')
+    )
+    op.create_index('ix_categorization_suggestions_user_queue', 'categorization_suggestions',
+                    ['user_id', 'transaction_date', 'transaction_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_categorization_suggestions_user_queue', table_name='categorization_suggestions')
+    op.drop_table('categorization_suggestions')
@@ -0,0 +1,35 @@
+"""Add chat messages table for assistant conversation history
+
+Revision ID: d586451321ea
+Revises: c586451321ea
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd586451321ea'
+down_revision = 'c586451321ea'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('chat_messages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('sender', sa.String(length=20), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_chat_messages_user_created', 'chat_messages',
+                    ['user_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_chat_messages_user_created', table_name='chat_messages')
+    op.drop_table('chat_messages')
@@ -0,0 +1,31 @@
+"""Add chat stream slots table for the per-user stream limit
+
+Revision ID: a686451321ea
+Revises: f586451321ea
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a686451321ea'
+down_revision = 'f586451321ea'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('chat_stream_slots',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('slot', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('owner', sa.String(length=32), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'slot')
+    )
+
+
+def downgrade():
+    op.drop_table('chat_stream_slots')
@@ -0,0 +1,35 @@
+"""Add keyword rules table
+
+Revision ID: e486451321ea
+Revises: d486451321ea
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e486451321ea'
+down_revision = 'd486451321ea'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('keyword_rules',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('keyword', sa.String(length=200), nullable=False),
+        sa.Column('category', sa.String(length=100), nullable=False),
+        sa.Column('priority', sa.Integer(), nullable=True),
+        sa.Column('is_regex', sa.Boolean(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_keyword_rules_is_active', 'keyword_rules', ['is_active'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_keyword_rules_is_active', table_name='keyword_rules')
+    op.drop_table('keyword_rules')
@@ -0,0 +1,49 @@
+"""Add recurring payments calendar table
+
+Revision ID: d486451321ea
+Revises: c486451321ea
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd486451321ea'
+down_revision = 'c486451321ea'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('recurring_payments',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('description_key', sa.String(length=200), nullable=False),
+        sa.Column('amount_band', sa.Integer(), nullable=False),
+        sa.Column('description', sa.String(length=200), nullable=True),
+        sa.Column('account_id', sa.Integer(), nullable=True),
+        sa.Column('frequency', sa.String(length=20), nullable=False),
+        sa.Column('interval_days', sa.Float(), nullable=False),
+        sa.Column('expected_amount', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('occurrence_count', sa.Integer(), nullable=True),
+        sa.Column('confidence', sa.Float(), nullable=True),
+        sa.Column('first_date', sa.DateTime(), nullable=True),
+        sa.Column('last_date', sa.DateTime(), nullable=False),
+        sa.Column('next_expected_date', sa.DateTime(), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'description_key', 'amount_band', name='uq_recurring_payment_key')
+    )
+    op.create_index('ix_recurring_payments_user_next', 'recurring_payments',
+                    ['user_id', 'next_expected_date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_recurring_payments_user_next', table_name='recurring_payments')
+    op.drop_table('recurring_payments')
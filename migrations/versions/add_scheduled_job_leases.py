@@ -0,0 +1,36 @@
+"""Add worker lease and execution policy columns to scheduled jobs
+
+Revision ID: e586451321ea
+Revises: d586451321ea
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e586451321ea'
+down_revision = 'd586451321ea'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('scheduled_jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('lease_owner', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('lease_expires_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('max_instances', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('misfire_grace_time', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('jitter', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('scheduled_jobs', schema=None) as batch_op:
+        batch_op.drop_column('jitter')
+        batch_op.drop_column('misfire_grace_time')
+        batch_op.drop_column('max_instances')
+        batch_op.drop_column('heartbeat_at')
+        batch_op.drop_column('lease_expires_at')
+        batch_op.drop_column('lease_owner')
@@ -0,0 +1,72 @@
+"""Add normalized description column to transactions
+
+Revision ID: a586451321ea
+Revises: f486451321ea
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a586451321ea'
+down_revision = 'f486451321ea'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+# Frozen copy of utils.text_normalization.normalize_description as of this
+# revision, so later changes to the live normalizer cannot change the backfill
+_TRANSFER_PREFIX = re.compile(r'^(payment to |payment from |trans to |trans from )')
+_SPECIAL_CHARS = re.compile(r'[^\w\s-]')
+_WHITESPACE = re.compile(r'\s+')
+_TRAILING_REFERENCE = re.compile(r'\s+\d+$')
+
+
+def normalize_description(description):
+    if not description:
+        return ''
+    processed = _TRANSFER_PREFIX.sub('', description.lower().strip())
+    processed = _WHITESPACE.sub(' ', _SPECIAL_CHARS.sub('', processed))
+    return _TRAILING_REFERENCE.sub('', processed)
+
+
+def upgrade():
+    op.add_column('transactions', sa.Column('normalized_description', sa.String(length=200), nullable=True))
+
+    # Backfill existing rows in id order so memory stays bounded on large ledgers
+    connection = op.get_bind()
+    transactions = sa.table('transactions',
+        sa.column('id', sa.Integer),
+        sa.column('description', sa.String),
+        sa.column('normalized_description', sa.String)
+    )
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(transactions.c.id, transactions.c.description)
+            .where(transactions.c.id > last_id)
+            .order_by(transactions.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        connection.execute(
+            transactions.update()
+            .where(transactions.c.id == sa.bindparam('row_id'))
+            .values(normalized_description=sa.bindparam('normalized')),
+            [{'row_id': row.id, 'normalized': normalize_description(row.description)} for row in rows]
+        )
+        last_id = rows[-1].id
+
+    op.create_index('ix_transactions_user_normalized_description', 'transactions',
+                    ['user_id', 'normalized_description'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_transactions_user_normalized_description', table_name='transactions')
+    op.drop_column('transactions', 'normalized_description')
@@ -0,0 +1,31 @@
+"""Delete categorization suggestions together with their transaction
+
+Revision ID: f586451321ea
+Revises: e586451321ea
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f586451321ea'
+down_revision = 'e586451321ea'
+branch_labels = None
+depends_on = None
+
+# PostgreSQL's name for the unnamed constraint created with the table
+CONSTRAINT = 'categorization_suggestions_transaction_id_fkey'
+
+
+def upgrade():
+    with op.batch_alter_table('categorization_suggestions', schema=None) as batch_op:
+        batch_op.drop_constraint(CONSTRAINT, type_='foreignkey')
+        batch_op.create_foreign_key(CONSTRAINT, 'transactions', ['transaction_id'], ['id'],
+                                    ondelete='CASCADE')
+
+
+def downgrade():
+    with op.batch_alter_table('categorization_suggestions', schema=None) as batch_op:
+        batch_op.drop_constraint(CONSTRAINT, type_='foreignkey')
+        batch_op.create_foreign_key(CONSTRAINT, 'transactions', ['transaction_id'], ['id'])
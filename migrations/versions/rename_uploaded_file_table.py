@@ -0,0 +1,36 @@
+"""Rename uploaded_file table to uploaded_files
+
+Schema fix, separate from the benchmark suite it shipped with: the initial
+migration created uploaded_file, while transactions.file_id, setup_database
+and the UploadedFile model all use uploaded_files. On a database built from
+migrations every upload and file lookup failed against the missing table.
+The rename only runs where the old name exists, so databases created by
+setup_database are left as they are.
+
+Revision ID: b586451321ea
+Revises: a586451321ea
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b586451321ea'
+down_revision = 'a586451321ea'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by setup_database already use the plural name
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'uploaded_file' in tables and 'uploaded_files' not in tables:
+        op.rename_table('uploaded_file', 'uploaded_files')
+
+
+def downgrade():
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'uploaded_files' in tables and 'uploaded_file' not in tables:
+        op.rename_table('uploaded_files', 'uploaded_file')
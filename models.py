@@ -1,9 +1,11 @@
 """Database models for the application with enhanced documentation"""
-from datetime import datetime
+from datetime import datetime, timedelta
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from extensions import db
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import validates
+from utils.text_normalization import normalize_description
 
 # Create a base for standalone table creation during migrations
 Base = declarative_base()
@@ -50,6 +52,7 @@ def get_base():
             date = Column(DateTime, nullable=False)
             amount = Column(Numeric(10, 2), nullable=False)
             description = Column(String(200))
+            normalized_description = Column(String(200))
             account_id = Column(Integer, ForeignKey('accounts.id'), nullable=True)
             processed_date = Column(DateTime, nullable=True)
             is_processed = Column(Boolean, default=False)
@@ -134,6 +137,11 @@ class Account(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
 
+    # Reports, settings and the chart of accounts refer to the type as the
+    # category and to the code as the link
+    category = db.synonym('type')
+    link = db.synonym('code')
+
     # Relationships
     user = db.relationship('User', backref=db.backref('accounts', lazy=True))
 
@@ -148,6 +156,9 @@ class Transaction(db.Model):
     amount = db.Column(db.Numeric(10, 2), nullable=False)
     description = db.Column(db.String(200))
     account_id = db.Column(db.Integer, db.ForeignKey('accounts.id'), nullable=True)
+
+    # Matching key derived from description when it is set, so queries never normalize
+    normalized_description = db.Column(db.String(200))
     
     # Processing status
     processed_date = db.Column(db.DateTime, nullable=True)
@@ -166,11 +177,20 @@ class Transaction(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_transactions_user_normalized_description', 'user_id', 'normalized_description'),
+    )
+
     # Relationships
     user = db.relationship('User', backref=db.backref('transactions', lazy=True))
     account = db.relationship('Account', backref=db.backref('transactions', lazy=True))
     similar_transaction = db.relationship('Transaction', remote_side=[id])
 
+    @validates('description')
+    def _normalize_description(self, key, description):
+        self.normalized_description = normalize_description(description)
+        return description
+
 class RiskAssessment(db.Model):
     """Model for storing risk assessment results"""
     __tablename__ = 'risk_assessments'
@@ -215,6 +235,22 @@ class CompanySettings(db.Model):
 
     user = db.relationship('User', backref=db.backref('company_settings', lazy=True))
 
+    @property
+    def financial_year_end(self):
+        """Month (1-12) in which the financial year ends: the month before it starts"""
+        if not self.fiscal_year_start:
+            return 12
+        return (self.fiscal_year_start.month - 2) % 12 + 1
+
+    def get_financial_year(self, on=None):
+        """Start and end of the financial year containing the given date (default: now)"""
+        on = on or datetime.utcnow()
+        start_month = self.financial_year_end % 12 + 1
+        start_year = on.year if on.month >= start_month else on.year - 1
+        start_date = datetime(start_year, start_month, 1)
+        end_date = datetime(start_year + 1, start_month, 1) - timedelta(microseconds=1)
+        return {'start_date': start_date, 'end_date': end_date}
+
 class FinancialGoal(db.Model):
     """Model for tracking user financial goals"""
     id = db.Column(db.Integer, primary_key=True)
@@ -245,6 +281,8 @@ class AdminChartOfAccounts(db.Model):
 
 class UploadedFile(db.Model):
     """Model for tracking uploaded files"""
+    __tablename__ = 'uploaded_files'
+
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
     file_path = db.Column(db.String(500), nullable=False)
@@ -289,7 +327,7 @@ class AlertConfiguration(db.Model):
     """Model for managing alert settings and notifications"""
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    alert_type = db.Column(db.String(50), nullable=False)  # balance, transaction, goal, anomaly
+    alert_type = db.Column(db.String(50), nullable=False)  # balance, transaction, goal, anomaly, pattern, missing_payment
     threshold = db.Column(db.Numeric(10, 2))  # Amount threshold if applicable
     condition = db.Column(db.String(50))  # above, below, equals
     is_active = db.Column(db.Boolean, default=True)
@@ -471,8 +509,133 @@ class ScheduledJob(db.Model):
     last_error = db.Column(db.Text)
     success_count = db.Column(db.Integer, default=0)
     error_count = db.Column(db.Integer, default=0)
+    # Worker lease: only the worker holding an unexpired lease runs the job
+    lease_owner = db.Column(db.String(100))  # host:pid of the leasing worker
+    lease_expires_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    # Execution policy; NULL falls back to the scheduler defaults
+    max_instances = db.Column(db.Integer)
+    misfire_grace_time = db.Column(db.Integer)  # Seconds
+    jitter = db.Column(db.Integer)  # Seconds
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def __repr__(self):
-        return f"<ScheduledJob {self.job_id}>"
\ No newline at end of file
+        return f"<ScheduledJob {self.job_id}>"
+
+
+class RecurringPayment(db.Model):
+    """Calendar entry for a detected recurring payment and its next expected occurrence"""
+    __tablename__ = 'recurring_payments'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    description_key = db.Column(db.String(200), nullable=False)  # Normalized description
+    amount_band = db.Column(db.Integer, nullable=False)  # Signed log-scale amount bucket
+    description = db.Column(db.String(200))  # Most recent raw description
+    account_id = db.Column(db.Integer, db.ForeignKey('accounts.id'), nullable=True)
+    frequency = db.Column(db.String(20), nullable=False)  # weekly, biweekly, monthly, quarterly, annual
+    interval_days = db.Column(db.Float, nullable=False)
+    expected_amount = db.Column(db.Numeric(10, 2), nullable=False)
+    occurrence_count = db.Column(db.Integer, default=0)
+    confidence = db.Column(db.Float, default=0.0)
+    first_date = db.Column(db.DateTime)
+    last_date = db.Column(db.DateTime, nullable=False)
+    next_expected_date = db.Column(db.DateTime, nullable=False)
+    is_active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'description_key', 'amount_band', name='uq_recurring_payment_key'),
+        db.Index('ix_recurring_payments_user_next', 'user_id', 'next_expected_date'),
+    )
+
+    user = db.relationship('User', backref=db.backref('recurring_payments', lazy=True))
+    account = db.relationship('Account', backref=db.backref('recurring_payments', lazy=True))
+
+    def __repr__(self):
+        return f"<RecurringPayment {self.description_key} {self.frequency}>"
+
+
+class KeywordRule(db.Model):
+    """Keyword or regex rule mapping transaction descriptions to an account category"""
+    __tablename__ = 'keyword_rules'
+    id = db.Column(db.Integer, primary_key=True)
+    keyword = db.Column(db.String(200), nullable=False)  # Lowercased keyword or regex pattern
+    category = db.Column(db.String(100), nullable=False)
+    priority = db.Column(db.Integer, default=1)
+    is_regex = db.Column(db.Boolean, default=False)
+    is_active = db.Column(db.Boolean, default=True, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<KeywordRule {self.keyword} -> {self.category}>"
+
+
+class CategorizationSuggestion(db.Model):
+    """Precomputed account suggestion for an uncategorized transaction in a user's iCountant queue"""
+    __tablename__ = 'categorization_suggestions'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.id', ondelete='CASCADE'),
+                               nullable=False, unique=True)
+    transaction_date = db.Column(db.DateTime, nullable=False)  # Queue order, copied from the transaction
+    account_id = db.Column(db.Integer, db.ForeignKey('accounts.id'), nullable=True)  # Best suggestion
+    confidence = db.Column(db.Float, default=0.0)
+    source = db.Column(db.String(30))  # keyword_rule, local_classifier, ai
+    reason = db.Column(db.String(500))
+    alternatives = db.Column(db.Text)  # JSON list of {account_id, confidence, reason, source}
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_categorization_suggestions_user_queue', 'user_id', 'transaction_date', 'transaction_id'),
+    )
+
+    # A suggestion goes with its transaction, whether deleted through the session or in bulk
+    transaction = db.relationship('Transaction', backref=db.backref(
+        'categorization_suggestion', uselist=False, cascade='all, delete-orphan'
+    ))
+    account = db.relationship('Account')
+
+    def __repr__(self):
+        return f"<CategorizationSuggestion {self.transaction_id} -> {self.account_id}>"
+
+
+class ChatMessage(db.Model):
+    """A message in a user's conversation with the financial assistant"""
+    __tablename__ = 'chat_messages'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    sender = db.Column(db.String(20), nullable=False)  # user, assistant
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_chat_messages_user_created', 'user_id', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f"<ChatMessage {self.user_id} {self.sender}>"
+
+
+class ChatStreamSlot(db.Model):
+    """One of a user's concurrent chat stream slots, shared by every worker"""
+    __tablename__ = 'chat_stream_slots'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    slot = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    owner = db.Column(db.String(32))  # token of the stream holding the slot, None when free
+    expires_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<ChatStreamSlot {self.user_id}/{self.slot} {self.owner}>"
+
+
+class CacheVersion(db.Model):
+    """Shared version counter that lets every worker detect changes to cached data"""
+    __tablename__ = 'cache_versions'
+    name = db.Column(db.String(50), primary_key=True)  # e.g. keyword_rules
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<CacheVersion {self.name}={self.version}>"
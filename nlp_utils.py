@@ -12,6 +12,8 @@ from datetime import datetime, timedelta
 import time
 from collections import deque
 
+from utils import text_normalization
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -44,8 +46,8 @@ def get_openai_client() -> Optional[OpenAI]:
         # Initialize client without proxies
         _openai_client = OpenAI(api_key=api_key)
 
-        # Verify client with API call
-        _openai_client.models.list(limit=1)
+        # Verify client by fetching the model we use, not the full model list
+        _openai_client.models.retrieve("gpt-3.5-turbo")
 
         _last_client_init = time.time()
         _client_error_count = 0
@@ -62,10 +64,7 @@ def get_openai_client() -> Optional[OpenAI]:
 def clean_text(text: str) -> str:
     """Clean and sanitize text input for API calls"""
     try:
-        # Remove special characters and excessive whitespace
-        cleaned = ' '.join(str(text).split())
-        # Truncate if too long to avoid token limits
-        return cleaned[:1000] if len(cleaned) > 1000 else cleaned
+        return text_normalization.clean_text(text)
     except Exception as e:
         logger.error(f"Error cleaning text: {str(e)}")
         return str(text)
@@ -13,6 +13,7 @@ from sqlalchemy import func
 
 from models import db, Transaction, Account
 from ai_insights import FinancialInsightsGenerator
+from forecasting import forecast_series, monthly_series, TOTAL_KEY
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -111,10 +112,10 @@ class FinancialTrendAnalyzer:
             return {}
             
     def _generate_predictions(self, df: pd.DataFrame) -> Dict:
-        """Generate financial predictions using simple statistical methods"""
+        """Generate financial predictions using exponential smoothing"""
         try:
-            # Group by month
-            monthly_totals = df.groupby(df['date'].dt.strftime('%Y-%m'))['amount'].sum()
+            # Dense monthly totals (empty months count as zero)
+            monthly_totals = monthly_series(df)[TOTAL_KEY]
             
             if len(monthly_totals) < 2:
                 return {
@@ -123,19 +124,23 @@ class FinancialTrendAnalyzer:
                     'trend': 'insufficient_data'
                 }
                 
-            # Calculate simple moving average
-            sma = monthly_totals.rolling(window=3).mean()
-            
+            # Exponential smoothing forecast with a 95% prediction interval
+            forecast = forecast_series(monthly_totals.to_numpy(), horizon=1)
+            next_month = forecast['mean'][0]
+            lower, upper = forecast['lower'][0], forecast['upper'][0]
+
             # Calculate basic trend
-            trend = 'upward' if monthly_totals.iloc[-1] > monthly_totals.iloc[-2] else 'downward'
-            
-            # Simple prediction for next month
-            next_month = monthly_totals.iloc[-1] * (1 + monthly_totals.pct_change().mean())
-            
+            trend = 'upward' if next_month > monthly_totals.iloc[-1] else 'downward'
+
+            # Confidence shrinks as the interval widens relative to the prediction
+            relative_width = (upper - lower) / (2 * abs(next_month)) if next_month else 1.0
+
             return {
                 'next_month_prediction': float(next_month),
-                'confidence': min(max(float(monthly_totals.pct_change().std() * 100), 0), 100),
-                'trend': trend
+                'prediction_interval': {'lower': lower, 'upper': upper},
+                'confidence': min(max((1 - relative_width) * 100, 0), 100),
+                'trend': trend,
+                'method': forecast['method']
             }
             
         except Exception as e:
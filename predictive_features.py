@@ -8,10 +8,13 @@ from difflib import SequenceMatcher
 from typing import Dict, Any, List, Tuple, Optional
 
 from models import Transaction
+from embedding_store import embedding_store
 
 class PredictiveFeatures:
     def __init__(self):
         self.TEXT_SIMILARITY_THRESHOLD = 0.7
+        self.SEMANTIC_SIMILARITY_THRESHOLD = 0.8
+        self.SEMANTIC_CANDIDATES = 50
         self.MIN_DESCRIPTION_LENGTH = 3
         self.max_results = 5
         self.logger = logging.getLogger('predictive_features')
@@ -76,9 +79,16 @@ class PredictiveFeatures:
                 Transaction.description.isnot(None)
             )
             
-            # Apply user filter if available 
+            # With a known user, only the nearest explained neighbours in
+            # embedding space are compared instead of the whole history
+            semantic_scores = {}
             if user_id:
                 query = query.filter(Transaction.user_id == user_id)
+                semantic_scores = dict(embedding_store.search(
+                    user_id, description, k=self.SEMANTIC_CANDIDATES, explained_only=True
+                ))
+                if semantic_scores:
+                    query = query.filter(Transaction.id.in_(list(semantic_scores)))
             
             # Get transactions
             transactions = query.all()
@@ -90,10 +100,6 @@ class PredictiveFeatures:
                 try:
                     metrics['processed'] += 1
                     
-                    # Skip transactions with same id if comparing with existing transaction
-                    if hasattr(transaction, 'id') and getattr(transaction, 'id', None) == getattr(transaction, 'id', None):
-                        continue
-                        
                     # Calculate similarity using SequenceMatcher
                     text_similarity = SequenceMatcher(
                         None,
@@ -108,20 +114,25 @@ class PredictiveFeatures:
                         # Boost similarity for substring matches
                         text_similarity = max(text_similarity, 0.75)
                     
+                    semantic_similarity = semantic_scores.get(transaction.id, 0.0)
+                    
                     # Analysis stats to include in results
                     analysis = {
                         'text_similarity': round(text_similarity, 2),
+                        'semantic_similarity': round(semantic_similarity, 2),
                         'substring_match': substring_match,
                         'confidence_avg': round(text_similarity, 2)
                     }
                     
-                    if text_similarity >= self.TEXT_SIMILARITY_THRESHOLD:
+                    is_text_match = text_similarity >= self.TEXT_SIMILARITY_THRESHOLD
+                    is_semantic_match = semantic_similarity >= self.SEMANTIC_SIMILARITY_THRESHOLD
+                    if is_text_match or is_semantic_match:
                         similar_transactions.append({
                             'id': transaction.id,
                             'description': transaction.description,
                             'explanation': transaction.explanation,
-                            'confidence': round(text_similarity, 2),
-                            'match_type': 'text',
+                            'confidence': round(max(text_similarity, semantic_similarity), 2),
+                            'match_type': 'text' if is_text_match else 'semantic',
                             'account_id': transaction.account_id,
                             'account': transaction.account.name if transaction.account else None,
                             'date': transaction.date.strftime('%Y-%m-%d') if transaction.date else None,
@@ -174,8 +185,11 @@ class PredictiveFeatures:
             from flask_login import current_user
             from flask import current_app
 
+            # Only the current user's accounts and history are candidates
+            user_id = current_user.id if current_user and current_user.is_authenticated else None
+
             # Get all accounts
-            accounts = Account.query.filter_by(is_active=True).all()
+            accounts = Account.query.filter_by(user_id=user_id, is_active=True).all()
             if not accounts:
                 self.logger.warning("No accounts found for suggestions")
                 return []
@@ -213,6 +227,7 @@ class PredictiveFeatures:
             
             # Method 2: Historical pattern matching from past transactions
             similar_transactions = Transaction.query.filter(
+                Transaction.user_id == user_id,
                 Transaction.explanation.isnot(None),
                 Transaction.account_id.isnot(None),
                 Transaction.description.ilike(f"%{description}%")
@@ -1,12 +1,59 @@
 import logging
 import re
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
-from sqlalchemy import func, text
+from sqlalchemy import text
 from models import Transaction, Account, db
+from ai_utils import predict_account as suggest_accounts
+from recurring_detection import recurring_calendar
+from embedding_store import embedding_store
+from utils.description_dictionary import DescriptionDictionary
+from utils.rule_engine import CompiledRuleSet
+from utils.text_normalization import normalize_description
 
 logger = logging.getLogger(__name__)
 
+# Keyword -> account category used by predict_account, in priority order
+ACCOUNT_KEYWORDS = {
+    'salary': 'Income',
+    'rent': 'Rent Expense',
+    'fuel': 'Vehicle Expenses',
+    'interest': 'Interest Income',
+    'utilities': 'Utilities',
+    'insurance': 'Insurance Expense',
+    'maintenance': 'Maintenance Expense',
+    'supplies': 'Office Supplies',
+    'advertising': 'Marketing Expense'
+}
+ACCOUNT_KEYWORD_RULESET = CompiledRuleSet([
+    {'keyword': keyword, 'category': category} for keyword, category in ACCOUNT_KEYWORDS.items()
+])
+
+# Keyword rules applied by PredictiveEngine.apply_keyword_rules
+ENGINE_KEYWORD_RULES = [
+    {
+        'keywords': ['salary', 'payroll', 'wage'],
+        'category': 'Income',
+        'confidence': 0.9
+    },
+    {
+        'keywords': ['rent', 'lease'],
+        'category': 'Rent Expense',
+        'confidence': 0.85
+    },
+    {
+        'keywords': ['fuel', 'petrol', 'gas'],
+        'category': 'Vehicle Expenses',
+        'confidence': 0.8
+    }
+]
+ENGINE_KEYWORD_RULESET = CompiledRuleSet([
+    {'keyword': keyword, 'category': rule['category'], 'rule_index': index}
+    for index, rule in enumerate(ENGINE_KEYWORD_RULES)
+    for keyword in rule['keywords']
+])
+
 def find_similar_transactions(description: str, transactions: List[Transaction]) -> Tuple[bool, str, List[Dict]]:
     """Find similar transactions using pattern matching and frequency analysis with enhanced validation"""
     logger = logging.getLogger(__name__)
@@ -27,46 +74,53 @@ def find_similar_transactions(description: str, transactions: List[Transaction])
         total_transactions = len(transactions)
         start_time = time.time()
         description_lower = description.lower().strip()
-        frequency_map = {}
         
-        # First pass: Build frequency map and find direct matches
-        for transaction in transactions:
-            if not transaction.description:
+        # First pass: score each unique description once. A pattern match's
+        # frequency is a running count, the number of rows with its
+        # description up to and including it, as when rows were scanned in order
+        dictionary = DescriptionDictionary.from_records(transactions)
+        pattern_matches = []
+        for entry in dictionary:
+            if not entry.key:
                 continue
                 
-            # Update frequency map
-            trans_desc = transaction.description.lower().strip()
-            frequency_map[trans_desc] = frequency_map.get(trans_desc, 0) + 1
-            
             # Calculate similarity
-            similarity = calculate_similarity(description_lower, trans_desc)
+            similarity = calculate_similarity(description_lower, entry.key)
             
             if similarity >= TEXT_THRESHOLD:
-                # Boost score based on frequency
-                frequency_boost = min(0.1, frequency_map[trans_desc] / 10)
-                adjusted_similarity = min(0.99, similarity + frequency_boost)
-                
-                matches.append({
-                    'transaction': transaction,
-                    'similarity': adjusted_similarity,
-                    'match_type': 'pattern',
-                    'frequency': frequency_map[trans_desc]
-                })
+                for occurrence, row in enumerate(entry.rows, start=1):
+                    # Boost score based on frequency
+                    frequency_boost = min(0.1, occurrence / 10)
+                    pattern_matches.append((row, {
+                        'transaction': transactions[row],
+                        'similarity': min(0.99, similarity + frequency_boost),
+                        'match_type': 'pattern',
+                        'frequency': occurrence
+                    }))
+        # Back in row order, so ties keep their original order in the sort below
+        pattern_matches.sort(key=lambda item: item[0])
+        matched_rows = {row for row, _ in pattern_matches}
+        matches.extend(match for _, match in pattern_matches)
         
         # Second pass: Look for pattern matches in explanations
-        for transaction in transactions:
-            if not transaction.explanation or transaction in [m['transaction'] for m in matches]:
+        explanation_scores = {}
+        for row, transaction in enumerate(transactions):
+            if not transaction.explanation or row in matched_rows:
                 continue
                 
-            explanation_similarity = calculate_similarity(description_lower, 
-                                                       transaction.explanation.lower().strip())
+            explanation_key = transaction.explanation.lower().strip()
+            if explanation_key not in explanation_scores:
+                explanation_scores[explanation_key] = calculate_similarity(description_lower, explanation_key)
+            explanation_similarity = explanation_scores[explanation_key]
             
             if explanation_similarity >= SEMANTIC_THRESHOLD:
+                # Explanation matches carry the description's total count
+                entry = dictionary.get(transaction.description)
                 matches.append({
                     'transaction': transaction,
                     'similarity': explanation_similarity * 0.9,  # Slightly lower confidence for explanation matches
                     'match_type': 'semantic',
-                    'frequency': frequency_map.get(transaction.description.lower().strip(), 0)
+                    'frequency': entry.frequency if entry and entry.key else 0
                 })
         
         # Sort by similarity and frequency
@@ -77,6 +131,37 @@ def find_similar_transactions(description: str, transactions: List[Transaction])
         logger.error(f"Error finding similar transactions: {str(e)}")
         return []
 
+def find_semantic_matches(description: str, user_id: int, limit: int = 5) -> List[Dict]:
+    """
+    Find the user's transactions closest to description in embedding space
+
+    Args:
+        description: Transaction description to match
+        user_id: Owner of the history searched
+        limit: Maximum number of matches
+
+    Returns:
+        Matches in the find_similar_transactions format, most similar first
+    """
+    try:
+        hits = embedding_store.search(user_id, description, k=limit, min_similarity=EMBEDDING_THRESHOLD)
+        if not hits:
+            return []
+
+        transactions = {
+            t.id: t for t in Transaction.query.filter(Transaction.id.in_([tid for tid, _ in hits])).all()
+        }
+        return [{
+            'transaction': transactions[transaction_id],
+            'similarity': similarity,
+            'match_type': 'semantic',
+            'frequency': 0
+        } for transaction_id, similarity in hits if transaction_id in transactions]
+
+    except Exception as e:
+        logger.error(f"Error finding semantic matches: {str(e)}")
+        return []
+
 def predict_account(description: str, explanation: str, accounts: List[Dict]) -> Optional[int]:
     """Predict account based on description and explanation patterns with enhanced validation"""
     try:
@@ -89,19 +174,6 @@ def predict_account(description: str, explanation: str, accounts: List[Dict]) ->
             logger.error("No valid accounts provided for prediction")
             return None
             
-        # Enhanced keyword matching with validation
-        keywords = {
-            'salary': 'Income',
-            'rent': 'Rent Expense',
-            'fuel': 'Vehicle Expenses',
-            'interest': 'Interest Income',
-            'utilities': 'Utilities',
-            'insurance': 'Insurance Expense',
-            'maintenance': 'Maintenance Expense',
-            'supplies': 'Office Supplies',
-            'advertising': 'Marketing Expense'
-        }
-        
         # Validate accounts structure
         valid_accounts = [
             acc for acc in accounts 
@@ -115,15 +187,14 @@ def predict_account(description: str, explanation: str, accounts: List[Dict]) ->
             logger.error("No valid accounts found after validation")
             return None
         
-        description_lower = description.lower()
-        for keyword, category in keywords.items():
-            if keyword in description_lower:
-                matching_accounts = [
-                    acc for acc in accounts 
-                    if acc.get('category', '').lower() == category.lower()
-                ]
-                if matching_accounts:
-                    return matching_accounts[0].get('id')
+        for rule in ACCOUNT_KEYWORD_RULESET.matched_rules(description):
+            category = rule['category'].lower()
+            matching_accounts = [
+                acc for acc in accounts 
+                if acc.get('category', '').lower() == category
+            ]
+            if matching_accounts:
+                return matching_accounts[0].get('id')
         
         return None
         
@@ -209,11 +280,23 @@ class PredictiveEngine:
         """Find recurring patterns in historical transactions using multiple matching strategies"""
         try:
             patterns = []
+
+            # 0. Known recurring payment - calendar lookup, no history scan
+            recurring = recurring_calendar.match(user_id, description)
+            if recurring and recurring['account_id']:
+                patterns.append({
+                    'description': recurring['description'],
+                    'account_id': recurring['account_id'],
+                    'explanation': f"Recurring {recurring['frequency']} payment",
+                    'frequency': recurring['occurrence_count'],
+                    'confidence': min(0.95, 0.7 + recurring['confidence'] * 0.25),
+                    'match_type': 'recurring'
+                })
             
-            # 1. Exact match - highest confidence
+            # 1. Exact match on the stored normalized description - highest confidence
             exact_matches = Transaction.query.filter(
                 Transaction.user_id == user_id,
-                func.lower(Transaction.description) == description.lower()
+                Transaction.normalized_description == normalize_description(description)
             ).order_by(Transaction.date.desc()).limit(5).all()
             
             for match in exact_matches:
@@ -256,37 +339,16 @@ class PredictiveEngine:
     def apply_keyword_rules(self, description: str, amount: float) -> List[Dict]:
         """Apply keyword-based rules for transaction matching"""
         try:
-            rules = [
-                {
-                    'keywords': ['salary', 'payroll', 'wage'],
-                    'category': 'Income',
-                    'confidence': 0.9
-                },
-                {
-                    'keywords': ['rent', 'lease'],
-                    'category': 'Rent Expense',
-                    'confidence': 0.85
-                },
-                {
-                    'keywords': ['fuel', 'petrol', 'gas'],
-                    'category': 'Vehicle Expenses',
-                    'confidence': 0.8
-                }
-            ]
-            
-            matches = []
-            description_lower = description.lower()
-            
-            for rule in rules:
-                if any(keyword in description_lower for keyword in rule['keywords']):
-                    matches.append({
-                        'category': rule['category'],
-                        'confidence': rule['confidence'],
-                        'match_type': 'keyword_rule',
-                        'matched_keywords': [k for k in rule['keywords'] if k in description_lower]
-                    })
-            
-            return matches
+            matched_keywords: Dict[int, List[str]] = {}
+            for rule in ENGINE_KEYWORD_RULESET.matched_rules(description):
+                matched_keywords.setdefault(rule['rule_index'], []).append(rule['keyword'])
+
+            return [{
+                'category': ENGINE_KEYWORD_RULES[index]['category'],
+                'confidence': ENGINE_KEYWORD_RULES[index]['confidence'],
+                'match_type': 'keyword_rule',
+                'matched_keywords': keywords
+            } for index, keywords in sorted(matched_keywords.items())]
             
         except Exception as e:
             self.logger.error(f"Error applying keyword rules: {str(e)}")
@@ -367,38 +429,34 @@ class PredictiveEngine:
             # Apply user-defined rules
             rule_matches = self.apply_user_rules(description, amount, user_id)
             
-            # Get all transactions for this user to use with ERF
+            # Recent history for the text match below
             try:
                 historical_transactions = Transaction.query.filter_by(
                     user_id=user_id
                 ).order_by(Transaction.date.desc()).limit(100).all()
-                
-                # Initialize ERF processor
-                erf_processor = ERFProcessor()
-                
-                # Process similar transactions
-                success, message, similar_transactions = erf_processor.find_similar_transactions(
-                    description,
-                    [t.to_dict() for t in historical_transactions],
-                    user_id
-                )
-                
-                if not success:
-                    self.logger.warning(f"ERF processing warning: {message}")
-                    
             except Exception as e:
-                self.logger.error(f"Error in ERF processing: {str(e)}")
+                self.logger.error(f"Error loading transaction history: {str(e)}")
                 historical_transactions = []
 
             # Apply ERF to find similar transactions
             similar_trans = find_similar_transactions(description, historical_transactions)
             
+            # Semantic neighbours from the full history catch rewordings the
+            # recent-window text match misses
+            seen_ids = {match['transaction'].id for match in similar_trans}
+            similar_trans += [
+                match for match in find_semantic_matches(description, user_id)
+                if match['transaction'].id not in seen_ids
+            ]
+            similar_trans.sort(key=lambda x: x['similarity'], reverse=True)
+            similar_trans = similar_trans[:AI_FEATURES_CONFIG['ERF']['max_matches']]
+            
             # Get account data for ASF
             account_data = [
                 {
                     'id': acc.id,
                     'name': acc.name,
-                    'category': acc.category,
+                    'category': acc.type,
                     'link': getattr(acc, 'link', None)
                 }
                 for acc in accounts
@@ -430,7 +488,17 @@ class PredictiveEngine:
                 # ASF: Get account suggestions
                 asf_account = None
                 if AI_FEATURES_CONFIG['ASF']['enabled']:
-                    asf_account = predict_account(description, erf_explanation or '', account_data)
+                    success, message, account_suggestions = suggest_accounts(
+                        description, erf_explanation or '', account_data,
+                        user_id=user_id, amount=amount
+                    )
+                    if success and account_suggestions:
+                        account_ids = {acc['name']: acc['id'] for acc in account_data}
+                        asf_account = account_ids.get(account_suggestions[0].get('account'))
+                    else:
+                        self.logger.warning(f"ASF suggestion unavailable: {message}")
+                    if asf_account is None:
+                        asf_account = predict_account(description, erf_explanation or '', account_data)
 
                 # ESF: Get explanation suggestions
                 esf_explanation = None
@@ -561,6 +629,7 @@ AI_FEATURES_CONFIG = {
         'enabled': True,
         'text_threshold': 0.8,
         'semantic_threshold': 0.7,
+        'embedding_threshold': 0.8,
         'max_matches': 5
     },
     'ASF': {
@@ -578,3 +647,4 @@ AI_FEATURES_CONFIG = {
 # Constants for similarity thresholds
 TEXT_THRESHOLD = AI_FEATURES_CONFIG['ERF']['text_threshold']
 SEMANTIC_THRESHOLD = AI_FEATURES_CONFIG['ERF']['semantic_threshold']
+EMBEDDING_THRESHOLD = AI_FEATURES_CONFIG['ERF']['embedding_threshold']
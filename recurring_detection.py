@@ -0,0 +1,384 @@
+"""
+Recurring Payment Detection
+Clusters a user's history by normalized description and amount band in one
+pass, fits a periodicity to each cluster and keeps a calendar of expected next
+occurrences so missing-payment checks and lookups never rescan history
+"""
+
+import logging
+import math
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from flask import g, has_request_context
+from sqlalchemy import func
+
+from models import db, Transaction, RecurringPayment
+from utils.text_normalization import description_key, description_keys
+
+logger = logging.getLogger(__name__)
+
+# Supported periodicities: (name, period in days, tolerance in days, minimum occurrences)
+PERIODICITIES = [
+    ('weekly', 7.0, 1.5, 4),
+    ('biweekly', 14.0, 2.5, 3),
+    ('monthly', 30.44, 4.0, 3),
+    ('quarterly', 91.31, 10.0, 3),
+    ('annual', 365.25, 20.0, 2),
+]
+# Calendar periodicities advance by whole months so the day of month is kept
+PERIOD_MONTHS = {'monthly': 1, 'quarterly': 3, 'annual': 12}
+# Amounts within this relative distance of each other share a cluster
+AMOUNT_BAND_TOLERANCE = 0.15
+# Share of a cluster's intervals that must match the fitted period
+MIN_REGULARITY = 0.6
+# A series unseen for this many periods is treated as cancelled
+MAX_MISSED_PERIODS = 3
+# Days past the expected date before a payment counts as missing
+MISSING_GRACE_DAYS = 3
+# Request-scoped memo so each user's calendar version is read at most once per request
+_REQUEST_VERSIONS_ATTR = '_recurring_calendar_versions'
+
+_PERIOD_NAMES = np.array([p[0] for p in PERIODICITIES])
+_PERIOD_DAYS = np.array([p[1] for p in PERIODICITIES])
+_PERIOD_TOLERANCE = np.array([p[2] for p in PERIODICITIES])
+_PERIOD_MIN_COUNT = np.array([p[3] for p in PERIODICITIES])
+
+
+def amount_band(amount: float) -> int:
+    """Signed log-scale bucket of an amount, AMOUNT_BAND_TOLERANCE wide"""
+    band = int(round(math.log1p(abs(amount)) / math.log1p(AMOUNT_BAND_TOLERANCE)))
+    return band if amount >= 0 else -band
+
+
+def amount_bands(amounts: pd.Series) -> np.ndarray:
+    """Vectorized amount_band over a Series"""
+    bands = np.rint(np.log1p(amounts.abs()) / math.log1p(AMOUNT_BAND_TOLERANCE)).astype(int)
+    return np.where(amounts >= 0, bands, -bands)
+
+
+def detect_recurring(df: pd.DataFrame, as_of: Optional[datetime] = None) -> pd.DataFrame:
+    """
+    Detect recurring payment series in a transaction history
+
+    Args:
+        df: DataFrame with 'date', 'amount', 'description' and 'account_id' columns
+        as_of: Reference time for deciding whether a series is still active
+
+    Returns:
+        DataFrame with one row per recurring series: description_key, amount_band,
+        description, account_id, frequency, interval_days, expected_amount,
+        occurrence_count, confidence, first_date, last_date, next_expected_date
+    """
+    if df.empty:
+        return pd.DataFrame()
+
+    as_of = as_of or datetime.utcnow()
+    frame = df.assign(
+        key=description_keys(df['description']),
+        amount=df['amount'].astype(float),
+        date=pd.to_datetime(df['date'])
+    )
+    frame = frame[frame['key'] != '']
+    if frame.empty:
+        return pd.DataFrame()
+
+    # Amount clusters: walk each description's amounts in sorted order and
+    # start a new cluster wherever the relative gap exceeds the tolerance
+    frame['sign'] = np.sign(frame['amount'])
+    frame['magnitude'] = frame['amount'].abs()
+    frame = frame.sort_values(['key', 'sign', 'magnitude'], kind='mergesort')
+    previous = frame['magnitude'].shift()
+    new_cluster = (
+        (frame['key'] != frame['key'].shift()) |
+        (frame['sign'] != frame['sign'].shift()) |
+        (frame['magnitude'] - previous > previous * AMOUNT_BAND_TOLERANCE)
+    )
+    frame['cluster'] = new_cluster.cumsum()
+
+    # Intervals between consecutive occurrences within each cluster
+    frame = frame.sort_values(['cluster', 'date'], kind='mergesort')
+    frame['interval'] = frame.groupby('cluster')['date'].diff().dt.total_seconds() / 86400
+
+    grouped = frame.groupby('cluster')
+    clusters = pd.DataFrame({
+        'description_key': grouped['key'].first(),
+        'description': grouped['description'].last(),
+        'account_id': grouped['account_id'].last(),
+        'expected_amount': grouped['amount'].median(),
+        'occurrence_count': grouped.size(),
+        'first_date': grouped['date'].first(),
+        'last_date': grouped['date'].last(),
+        'interval_days': grouped['interval'].median()
+    })
+    clusters = clusters[clusters['occurrence_count'] >= 2]
+    if clusters.empty:
+        return pd.DataFrame()
+
+    # Fit the nearest periodicity to each cluster's median interval
+    distance = np.abs(clusters['interval_days'].to_numpy()[:, None] - _PERIOD_DAYS[None, :])
+    period_index = distance.argmin(axis=1)
+    within = distance[np.arange(len(clusters)), period_index] <= _PERIOD_TOLERANCE[period_index]
+    clusters['period_index'] = period_index
+
+    # Regularity: share of intervals close to the fitted period
+    intervals = frame.dropna(subset=['interval'])
+    intervals = intervals[intervals['cluster'].isin(clusters.index)]
+    fitted = clusters.loc[intervals['cluster'], 'period_index'].to_numpy()
+    on_period = np.abs(intervals['interval'].to_numpy() - _PERIOD_DAYS[fitted]) <= _PERIOD_TOLERANCE[fitted]
+    regularity = pd.Series(on_period, index=intervals['cluster'].to_numpy()).groupby(level=0).mean()
+    clusters['regularity'] = regularity.reindex(clusters.index).fillna(0.0)
+
+    # Stale series (several missed periods) are treated as cancelled
+    overdue_days = (pd.Timestamp(as_of) - clusters['last_date']).dt.total_seconds() / 86400
+    active = overdue_days <= _PERIOD_DAYS[period_index] * MAX_MISSED_PERIODS
+
+    keep = (
+        within &
+        (clusters['occurrence_count'].to_numpy() >= _PERIOD_MIN_COUNT[period_index]) &
+        (clusters['regularity'].to_numpy() >= MIN_REGULARITY) &
+        active.to_numpy()
+    )
+    clusters = clusters[keep].copy()
+    if clusters.empty:
+        return pd.DataFrame()
+
+    period_index = clusters['period_index'].to_numpy()
+    clusters['frequency'] = _PERIOD_NAMES[period_index]
+    clusters['confidence'] = clusters['regularity'] * np.minimum(clusters['occurrence_count'] / 6, 1.0)
+    clusters['amount_band'] = amount_bands(clusters['expected_amount'])
+
+    # Next expected occurrence, month-based periods keep the day of month
+    next_dates = clusters['last_date'] + pd.to_timedelta(_PERIOD_DAYS[period_index], unit='D')
+    for frequency, months in PERIOD_MONTHS.items():
+        mask = clusters['frequency'] == frequency
+        if mask.any():
+            next_dates[mask] = clusters.loc[mask, 'last_date'] + pd.DateOffset(months=months)
+    clusters['next_expected_date'] = next_dates
+
+    # Two clusters can round into the same band; keep the stronger one
+    clusters = clusters.sort_values('confidence', ascending=False).drop_duplicates(
+        subset=['description_key', 'amount_band']
+    )
+    return clusters.drop(columns=['period_index', 'regularity']).reset_index(drop=True)
+
+
+class RecurringPaymentCalendar:
+    """Persisted calendar of recurring payments with an in-process lookup index"""
+
+    def __init__(self):
+        self._index: Dict[int, Tuple[tuple, Dict[str, Dict[int, Dict]]]] = {}
+        self._lock = threading.Lock()
+
+    def refresh(self, user_id: int, as_of: Optional[datetime] = None) -> int:
+        """
+        Re-detect a user's recurring payments and sync the calendar table
+
+        Args:
+            user_id: ID of the user to refresh
+            as_of: Reference time for activity checks (defaults to now)
+
+        Returns:
+            Number of active recurring series
+        """
+        try:
+            df = pd.DataFrame(
+                db.session.query(
+                    Transaction.date,
+                    Transaction.amount,
+                    Transaction.description,
+                    Transaction.account_id
+                ).filter(
+                    Transaction.user_id == user_id
+                ).order_by(Transaction.date).all(),
+                columns=['date', 'amount', 'description', 'account_id']
+            )
+            detected = detect_recurring(df, as_of)
+
+            existing = {
+                (entry.description_key, entry.amount_band): entry
+                for entry in RecurringPayment.query.filter_by(user_id=user_id).all()
+            }
+            seen = set()
+            for row in detected.itertuples(index=False):
+                key = (row.description_key, int(row.amount_band))
+                seen.add(key)
+                entry = existing.get(key)
+                if entry is None:
+                    entry = RecurringPayment(
+                        user_id=user_id,
+                        description_key=row.description_key,
+                        amount_band=int(row.amount_band)
+                    )
+                    db.session.add(entry)
+                entry.description = row.description
+                entry.account_id = int(row.account_id) if pd.notna(row.account_id) else None
+                entry.frequency = row.frequency
+                entry.interval_days = float(row.interval_days)
+                entry.expected_amount = round(float(row.expected_amount), 2)
+                entry.occurrence_count = int(row.occurrence_count)
+                entry.confidence = float(row.confidence)
+                entry.first_date = row.first_date.to_pydatetime()
+                entry.last_date = row.last_date.to_pydatetime()
+                entry.next_expected_date = row.next_expected_date.to_pydatetime()
+                entry.is_active = True
+
+            for key, entry in existing.items():
+                if key not in seen and entry.is_active:
+                    entry.is_active = False
+
+            db.session.commit()
+            self.invalidate(user_id)
+            logger.info(f"Recurring payment calendar for user {user_id}: {len(seen)} active series")
+            return len(seen)
+
+        except Exception as e:
+            logger.error(f"Error refreshing recurring payments for user {user_id}: {str(e)}")
+            db.session.rollback()
+            return 0
+
+    def refresh_all_users(self, app) -> int:
+        """Refresh the calendar for every user with transactions"""
+        with app.app_context():
+            user_ids = [row[0] for row in db.session.query(Transaction.user_id).distinct().all()]
+            return sum(self.refresh(user_id) for user_id in user_ids)
+
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        """Drop the cached lookup index for one user, or for everyone"""
+        with self._lock:
+            if user_id is None:
+                self._index.clear()
+            else:
+                self._index.pop(user_id, None)
+        if has_request_context():
+            memo = g.get(_REQUEST_VERSIONS_ATTR)
+            if memo and user_id is None:
+                memo.clear()
+            elif memo:
+                memo.pop(user_id, None)
+
+    def _version(self, user_id: int) -> tuple:
+        """Cheap change marker for a user's calendar rows, read at most once per request"""
+        memo = None
+        if has_request_context():
+            memo = g.setdefault(_REQUEST_VERSIONS_ATTR, {})
+            if user_id in memo:
+                return memo[user_id]
+
+        version = tuple(db.session.query(
+            func.count(RecurringPayment.id),
+            func.max(RecurringPayment.updated_at)
+        ).filter(RecurringPayment.user_id == user_id).one())
+        if memo is not None:
+            memo[user_id] = version
+        return version
+
+    def _get_index(self, user_id: int) -> Dict[str, Dict[int, Dict]]:
+        """Active entries keyed by description key, then amount band"""
+        version = self._version(user_id)
+        with self._lock:
+            cached = self._index.get(user_id)
+            if cached and cached[0] == version:
+                return cached[1]
+
+        index: Dict[str, Dict[int, Dict]] = {}
+        for entry in RecurringPayment.query.filter_by(user_id=user_id, is_active=True).all():
+            index.setdefault(entry.description_key, {})[entry.amount_band] = self._to_dict(entry)
+        with self._lock:
+            self._index[user_id] = (version, index)
+        return index
+
+    @staticmethod
+    def _to_dict(entry: RecurringPayment) -> Dict:
+        return {
+            'id': entry.id,
+            'description': entry.description,
+            'description_key': entry.description_key,
+            'account_id': entry.account_id,
+            'frequency': entry.frequency,
+            'interval_days': entry.interval_days,
+            'expected_amount': float(entry.expected_amount),
+            'occurrence_count': entry.occurrence_count,
+            'confidence': entry.confidence,
+            'last_date': entry.last_date,
+            'next_expected_date': entry.next_expected_date
+        }
+
+    def match(self, user_id: int, description: str, amount: Optional[float] = None) -> Optional[Dict]:
+        """
+        Find the recurring series a transaction belongs to
+
+        Args:
+            user_id: Owner of the transaction
+            description: Transaction description
+            amount: Transaction amount; when omitted the most confident series
+                for the description is returned
+
+        Returns:
+            Calendar entry dictionary, or None when the transaction is not recurring
+        """
+        try:
+            key = description_key(description)
+            if not key:
+                return None
+            bands = self._get_index(user_id).get(key)
+            if not bands:
+                return None
+            if amount is None:
+                return max(bands.values(), key=lambda entry: entry['confidence'])
+            band = amount_band(float(amount))
+            # Neighbouring bands absorb amounts that round across a band boundary
+            for candidate in (band, band - 1, band + 1):
+                if candidate in bands:
+                    return bands[candidate]
+            return None
+        except Exception as e:
+            logger.error(f"Error matching recurring payment: {str(e)}")
+            return None
+
+    def expected_between(self, user_id: int, start: datetime, end: datetime) -> List[Dict]:
+        """Recurring payments expected in [start, end), ordered by expected date"""
+        try:
+            entries = RecurringPayment.query.filter(
+                RecurringPayment.user_id == user_id,
+                RecurringPayment.is_active == True,
+                RecurringPayment.next_expected_date >= start,
+                RecurringPayment.next_expected_date < end
+            ).order_by(RecurringPayment.next_expected_date).all()
+            return [self._to_dict(entry) for entry in entries]
+        except Exception as e:
+            logger.error(f"Error loading expected recurring payments: {str(e)}")
+            return []
+
+    def missing_payments(self, user_id: int, as_of: Optional[datetime] = None,
+                         grace_days: int = MISSING_GRACE_DAYS) -> List[Dict]:
+        """Recurring payments whose expected date passed more than grace_days ago"""
+        as_of = as_of or datetime.utcnow()
+        return self.expected_between(user_id, datetime.min, as_of - timedelta(days=grace_days))
+
+
+def configure_recurring_detection(scheduler, app, hour: int = 2):
+    """
+    Configure the nightly recurring payment calendar refresh
+
+    Args:
+        scheduler: APScheduler instance to register the job with
+        app: Flask application passed to the job
+        hour: Hour of day (server time) to run the refresh
+    """
+    scheduler.add_job(
+        func=recurring_calendar.refresh_all_users,
+        trigger='cron',
+        hour=hour,
+        args=[app],
+        id='recurring_payment_refresh',
+        replace_existing=True,
+        name='Recurring Payment Calendar Refresh'
+    )
+    logger.info(f"Recurring payment calendar refresh scheduled daily at {hour:02d}:00")
+
+
+recurring_calendar = RecurringPaymentCalendar()
@@ -0,0 +1,350 @@
+"""
+Streaming Anomaly Scoring
+Scores transactions as they are inserted using per-user running statistics,
+so alerts are raised at ingest instead of on the next anomaly page view.
+
+Statistics live in each worker process, in an LRU of STATE_CACHE_SIZE users.
+Inserted rows are scored during the flush but only folded into the
+statistics after the transaction commits, so a rolled-back upload leaves
+them untouched. Each user's statistics remember the data version
+(utils.data_version) they reflect; when another worker, or a write that
+bypassed this scorer, moves the version past that, they are rebuilt from
+the database on next use.
+"""
+
+import logging
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import Transaction, AlertConfiguration, AlertHistory, CacheVersion
+from utils.data_version import version_name
+from utils.text_normalization import description_key
+
+logger = logging.getLogger(__name__)
+
+# EWMA smoothing factor for amount and interval statistics
+EWMA_ALPHA = 0.1
+# Observations required before a key is scored at all
+MIN_OBSERVATIONS = 5
+# Z-score above which a transaction is reported, and above which it is high severity
+Z_SCORE_THRESHOLD = 3.0
+HIGH_SEVERITY_Z_SCORE = 5.0
+# Recurring payment detection
+MIN_RECURRING_OCCURRENCES = 3
+MAX_INTERVAL_VARIATION = 0.25
+RECURRING_AMOUNT_TOLERANCE = 0.2
+# History replayed when a user's statistics are first needed in this process
+WARMUP_DAYS = 90
+# Users whose statistics each process keeps
+STATE_CACHE_SIZE = 1024
+
+# Session.info keys: rows awaiting scoring in this flush, and per user the
+# rows scored but not yet folded in, the data version the statistics were
+# checked against, the latest version seen, the flushes counted so far and
+# whether the statistics were rebuilt inside the transaction
+_PENDING_KEY = 'streaming_anomaly_pending'
+_STAGED_KEY = 'streaming_anomaly_staged'
+_BASE_VERSION_KEY = 'streaming_anomaly_base_version'
+_VERSION_KEY = 'streaming_anomaly_version'
+_FLUSHES_KEY = 'streaming_anomaly_flushes'
+_WARMED_KEY = 'streaming_anomaly_warmed'
+
+
+@dataclass
+class RunningStat:
+    """Exponentially weighted running mean and variance"""
+    count: int = 0
+    mean: float = 0.0
+    variance: float = 0.0
+
+    def z_score(self, value: float) -> Optional[float]:
+        """Distance of value from the running mean in standard deviations"""
+        if self.count < MIN_OBSERVATIONS or self.variance <= 0:
+            return None
+        return abs(value - self.mean) / math.sqrt(self.variance)
+
+    def update(self, value: float) -> None:
+        if self.count == 0:
+            self.mean = value
+        else:
+            diff = value - self.mean
+            increment = EWMA_ALPHA * diff
+            self.mean += increment
+            self.variance = (1 - EWMA_ALPHA) * (self.variance + diff * increment)
+        self.count += 1
+
+
+@dataclass
+class RecurringStat:
+    """Expected amount and interval for a repeating description"""
+    last_date: Optional[datetime] = None
+    amount: RunningStat = field(default_factory=RunningStat)
+    interval_days: RunningStat = field(default_factory=RunningStat)
+
+    def is_recurring(self) -> bool:
+        if self.amount.count < MIN_RECURRING_OCCURRENCES or self.interval_days.mean <= 0:
+            return False
+        return math.sqrt(self.interval_days.variance) <= self.interval_days.mean * MAX_INTERVAL_VARIATION
+
+    def expected_next_date(self) -> Optional[datetime]:
+        if not self.last_date or not self.is_recurring():
+            return None
+        return self.last_date + timedelta(days=self.interval_days.mean)
+
+    def update(self, date: datetime, amount: float) -> None:
+        if self.last_date is not None:
+            if date < self.last_date:
+                # A backfilled payment says nothing about the current cadence
+                return
+            self.interval_days.update((date - self.last_date).total_seconds() / 86400)
+        self.last_date = date
+        self.amount.update(amount)
+
+
+@dataclass
+class UserStreamState:
+    """Running statistics for a single user"""
+    categories: Dict[int, RunningStat] = field(default_factory=dict)
+    recurring: Dict[str, RecurringStat] = field(default_factory=dict)
+    # Data version of the user's rows these statistics reflect
+    version: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class StreamingAnomalyScorer:
+    """Incremental O(1) anomaly scorer hooked into transaction inserts"""
+
+    def __init__(self, cache_size: int = STATE_CACHE_SIZE):
+        self._states: 'OrderedDict[int, UserStreamState]' = OrderedDict()
+        self._cache_size = cache_size
+        self._states_lock = threading.Lock()
+        self._enabled = False
+        self._listeners_registered = False
+
+    def init_app(self, app):
+        """Register session hooks so every inserted Transaction is scored"""
+        self._enabled = app.config.get('STREAMING_ANOMALY_SCORING', True)
+        if self._enabled and not self._listeners_registered:
+            event.listen(Session, 'after_flush', self._collect_inserted)
+            event.listen(Session, 'after_flush_postexec', self._score_inserted)
+            event.listen(Session, 'after_commit', self._apply_staged)
+            event.listen(Session, 'after_soft_rollback', self._discard_staged)
+            self._listeners_registered = True
+        logger.info(f"Streaming anomaly scoring {'enabled' if self._enabled else 'disabled'}")
+
+    def reset(self, user_id: Optional[int] = None) -> None:
+        """Drop cached statistics for one user, or for everyone"""
+        with self._states_lock:
+            if user_id is None:
+                self._states.clear()
+            else:
+                self._states.pop(user_id, None)
+
+    def _get_state(self, session: Session, user_id: int, version: int,
+                   exclude_ids: List[int]) -> UserStreamState:
+        """
+        Get a user's state, replaying recent history when this process has
+        none or the one it has does not reflect the given data version
+
+        Args:
+            session: Session whose transaction is being scored
+            user_id: Owner of the statistics
+            version: Data version the statistics must reflect
+            exclude_ids: Uncommitted transactions the replay must skip
+        """
+        with self._states_lock:
+            state = self._states.get(user_id)
+            if state is not None and state.version == version:
+                self._states.move_to_end(user_id)
+                return state
+            state = UserStreamState(version=version)
+            # Hold the new state's lock until warm-up finishes so concurrent
+            # scorers never see a half-built state
+            state.lock.acquire()
+            self._states[user_id] = state
+            while len(self._states) > self._cache_size:
+                self._states.popitem(last=False)
+
+        try:
+            cutoff = datetime.utcnow() - timedelta(days=WARMUP_DAYS)
+            with session.no_autoflush:
+                rows = session.query(
+                    Transaction.date,
+                    Transaction.amount,
+                    Transaction.description,
+                    Transaction.account_id
+                ).filter(
+                    Transaction.user_id == user_id,
+                    Transaction.date >= cutoff,
+                    Transaction.id.notin_(exclude_ids)
+                ).order_by(Transaction.date).all()
+
+            for date, amount, description, account_id in rows:
+                self._update(state, date, float(amount), description, account_id)
+            logger.debug(f"Warmed streaming anomaly state for user {user_id} from {len(rows)} transactions")
+        finally:
+            state.lock.release()
+        return state
+
+    def _update(self, state: UserStreamState, date: datetime, amount: float,
+                description: Optional[str], account_id: Optional[int]) -> None:
+        state.categories.setdefault(account_id or 0, RunningStat()).update(amount)
+        key = description_key(description)
+        if key:
+            if not isinstance(date, datetime):
+                date = datetime.combine(date, datetime.min.time())
+            state.recurring.setdefault(key, RecurringStat()).update(date, amount)
+
+    def score(self, state: UserStreamState, transaction: Transaction) -> List[Dict]:
+        """
+        Score one transaction against the running statistics
+
+        The statistics are not changed; inserted rows are folded in once
+        their transaction commits.
+
+        Args:
+            state: The owning user's running statistics
+            transaction: Newly inserted transaction
+
+        Returns:
+            List of anomaly dictionaries (empty when the transaction looks normal)
+        """
+        amount = float(transaction.amount)
+        anomalies = []
+
+        with state.lock:
+            category_stat = state.categories.get(transaction.account_id or 0)
+            z_score = category_stat.z_score(amount) if category_stat else None
+            if z_score is not None and z_score > Z_SCORE_THRESHOLD:
+                anomalies.append({
+                    'transaction_id': transaction.id,
+                    'anomaly_score': z_score,
+                    'severity': 'high' if z_score > HIGH_SEVERITY_Z_SCORE else 'medium',
+                    'reason': f'Amount ${abs(amount):,.2f} is {z_score:.1f} standard deviations '
+                              f'from the usual ${abs(category_stat.mean):,.2f}'
+                })
+
+            recurring_stat = state.recurring.get(description_key(transaction.description))
+            if recurring_stat and recurring_stat.is_recurring():
+                expected = recurring_stat.amount.mean
+                if expected and abs(amount - expected) > abs(expected) * RECURRING_AMOUNT_TOLERANCE:
+                    anomalies.append({
+                        'transaction_id': transaction.id,
+                        'anomaly_score': abs(amount - expected) / abs(expected),
+                        'severity': 'medium',
+                        'reason': f'Recurring payment changed from ${abs(expected):,.2f} to ${abs(amount):,.2f}'
+                    })
+
+        return anomalies
+
+    def _collect_inserted(self, session: Session, flush_context) -> None:
+        """Remember transactions inserted by this flush"""
+        if not self._enabled:
+            return
+        inserted = [obj for obj in session.new if isinstance(obj, Transaction)]
+        if inserted:
+            session.info.setdefault(_PENDING_KEY, []).extend(inserted)
+
+    def _score_inserted(self, session: Session, flush_context) -> None:
+        """Score transactions from the finished flush and queue alerts on the same session"""
+        pending = session.info.pop(_PENDING_KEY, None)
+        if not pending:
+            return
+
+        try:
+            by_user: Dict[int, List[Transaction]] = {}
+            for transaction in pending:
+                by_user.setdefault(transaction.user_id, []).append(transaction)
+
+            staged = session.info.setdefault(_STAGED_KEY, {})
+            base_versions = session.info.setdefault(_BASE_VERSION_KEY, {})
+            versions = session.info.setdefault(_VERSION_KEY, {})
+            flushes = session.info.setdefault(_FLUSHES_KEY, {})
+
+            for user_id, transactions in by_user.items():
+                with session.no_autoflush:
+                    config = session.query(AlertConfiguration).filter_by(
+                        user_id=user_id,
+                        alert_type='anomaly',
+                        is_active=True
+                    ).first()
+                    version = session.query(CacheVersion.version).filter_by(
+                        name=version_name(user_id)
+                    ).scalar() or 0
+
+                # Every flush that inserted this user's rows bumped their
+                # version once; anything beyond that was written elsewhere
+                flushes[user_id] = flushes.get(user_id, 0) + 1
+                user_staged = staged.setdefault(user_id, [])
+                base_version = base_versions.setdefault(user_id, version - flushes[user_id])
+                if version != base_version + flushes[user_id]:
+                    base_version = base_versions[user_id] = None
+                versions[user_id] = version
+
+                with self._states_lock:
+                    cached = self._states.get(user_id)
+                state = self._get_state(
+                    session, user_id, base_version if base_version is not None else -1,
+                    [row[0] for row in user_staged] + [t.id for t in transactions]
+                )
+                if state is not cached:
+                    session.info.setdefault(_WARMED_KEY, set()).add(user_id)
+                for transaction in sorted(transactions, key=lambda t: t.date):
+                    user_staged.append((transaction.id, transaction.date, float(transaction.amount),
+                                        transaction.description, transaction.account_id))
+                    for anomaly in self.score(state, transaction):
+                        if config is None:
+                            continue
+                        session.add(AlertHistory(
+                            user_id=user_id,
+                            alert_config_id=config.id,
+                            alert_message=f"{anomaly['reason']} "
+                                          f"(Transaction ID: {anomaly['transaction_id']})"[:255],
+                            severity=anomaly['severity']
+                        ))
+                        config.last_triggered = datetime.utcnow()
+
+        except Exception as e:
+            # Scoring must never break ingestion
+            logger.error(f"Error in streaming anomaly scoring: {str(e)}")
+
+    def _apply_staged(self, session: Session) -> None:
+        """Fold committed inserts into the statistics they were scored against"""
+        staged = session.info.pop(_STAGED_KEY, {})
+        base_versions = session.info.pop(_BASE_VERSION_KEY, {})
+        versions = session.info.pop(_VERSION_KEY, {})
+        session.info.pop(_FLUSHES_KEY, None)
+        session.info.pop(_WARMED_KEY, None)
+
+        for user_id, rows in staged.items():
+            with self._states_lock:
+                state = self._states.get(user_id)
+            if state is None:
+                continue
+            with state.lock:
+                if base_versions.get(user_id) is None or state.version != base_versions[user_id]:
+                    # Written alongside other changes; rebuild from the database on next use
+                    self.reset(user_id)
+                    continue
+                for _, date, amount, description, account_id in sorted(rows, key=lambda row: row[1]):
+                    self._update(state, date, amount, description, account_id)
+                state.version = versions[user_id]
+
+    def _discard_staged(self, session: Session, previous_transaction) -> None:
+        """Forget rolled-back inserts; statistics warmed inside the transaction may have seen its writes"""
+        if previous_transaction.parent is not None:
+            return
+        for user_id in session.info.pop(_WARMED_KEY, set()):
+            self.reset(user_id)
+        for key in (_PENDING_KEY, _STAGED_KEY, _BASE_VERSION_KEY, _VERSION_KEY, _FLUSHES_KEY):
+            session.info.pop(key, None)
+
+
+streaming_scorer = StreamingAnomalyScorer()
@@ -0,0 +1,72 @@
+"""
+Shared pytest fixtures
+
+The app runs with the testing config against a throwaway SQLite file. The
+environment is set before anything from the app is imported, because the
+config classes read it at import time. Tests share one database, so each
+test creates its own user and data.
+"""
+
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+_TEST_DIR = tempfile.mkdtemp(prefix='app-tests-')
+os.environ['TEST_DATABASE_URL'] = f"sqlite:///{os.path.join(_TEST_DIR, 'test.db')}"
+os.environ['ACCOUNT_MODEL_DIR'] = os.path.join(_TEST_DIR, 'account_models')
+os.environ['EMBEDDING_STORE_DIR'] = os.path.join(_TEST_DIR, 'embeddings')
+os.environ['ANOMALY_MODEL_DIR'] = os.path.join(_TEST_DIR, 'anomaly_models')
+# No test may reach the real OpenAI API; tests that need it start the stub
+os.environ.pop('OPENAI_API_KEY', None)
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+    from models import db
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
+
+
+@pytest.fixture
+def make_user(app_context):
+    """Create a user with a unique name; returns the User"""
+    from models import User, db
+
+    def _make_user(password='password123'):
+        name = f"user_{uuid.uuid4().hex[:10]}"
+        user = User(username=name, email=f"{name}@example.com")
+        user.set_password(password)
+        db.session.add(user)
+        db.session.commit()
+        return user
+
+    return _make_user
+
+
+@pytest.fixture
+def login(app):
+    """Log a test client in as the given user"""
+    def _login(client, user, password='password123'):
+        return client.post('/auth/login', data={
+            'email': user.email,
+            'password': password
+        })
+
+    return _login
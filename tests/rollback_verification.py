@@ -1,10 +1,15 @@
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, Any, Optional, List, Tuple
 from sqlalchemy import func, text
 from flask import current_app
 from models import User, Account, Transaction, CompanySettings, UploadedFile, db
 
+# Verification checks run at the same time
+VERIFICATION_WORKERS = 4
+
 class RollbackVerificationTest:
     """Test suite for verifying data integrity after rollback operations"""
     
@@ -559,8 +564,9 @@ class RollbackVerificationTest:
             self.logger.error(f"Error verifying uploaded files: {str(e)}", exc_info=True)
             return False
 
-    def run_all_verifications(self, reference_time: datetime) -> Dict[str, Dict[str, Any]]:
-        """Runs all verification checks and returns detailed results"""
+    def run_all_verifications(self, reference_time: datetime,
+                              max_workers: int = VERIFICATION_WORKERS) -> Dict[str, Dict[str, Any]]:
+        """Runs all verification checks concurrently and returns detailed results"""
         # Triple-check environment protection
         if not self._check_environment():
             self.logger.error("SAFETY CHECK: Cannot run verifications in production environment")
@@ -584,31 +590,41 @@ class RollbackVerificationTest:
         self.logger.info("Starting verification suite in isolated test environment")
         
         verifications = [
-            ('transaction_consistency', lambda: self.verify_transaction_consistency(reference_time)),
-            ('user_data_integrity', self.verify_user_data_integrity),
-            ('company_settings', self.verify_company_settings),
-            ('financial_data_integrity', lambda: self.verify_financial_data_integrity(reference_time)),
-            ('bank_account_integrity', lambda: self.verify_bank_account_integrity(reference_time)),
-            ('version_integrity', lambda: self.verify_version_integrity(reference_time)),
-            ('rate_limits', self.verify_rate_limits),
-            ('uploaded_files', self.verify_uploaded_files),
-            ('ai_features', self.verify_ai_features),
-            ('bank_statement_integrity', self.verify_bank_statement_integrity)
+            ('transaction_consistency', 'verify_transaction_consistency', (reference_time,)),
+            ('user_data_integrity', 'verify_user_data_integrity', ()),
+            ('company_settings', 'verify_company_settings', ()),
+            ('financial_data_integrity', 'verify_financial_data_integrity', (reference_time,)),
+            ('bank_account_integrity', 'verify_bank_account_integrity', (reference_time,)),
+            ('version_integrity', 'verify_version_integrity', (reference_time,)),
+            ('rate_limits', 'verify_rate_limits', ()),
+            ('uploaded_files', 'verify_uploaded_files', ()),
+            ('ai_features', 'verify_ai_features', ()),
+            ('bank_statement_integrity', 'verify_bank_statement_integrity', ())
         ]
-        
-        for name, verification in verifications:
-            start_time = datetime.utcnow()
-            success, error = self._safe_execute(verification.__name__)
-            end_time = datetime.utcnow()
-            
-            self.verification_results[name] = {
+
+        def run_verification(method_name: str, args: tuple) -> Dict[str, Any]:
+            # Each check gets its own app context and therefore its own session
+            with self.app.app_context():
+                start_time = datetime.utcnow()
+                success, error = self._safe_execute(method_name, *args)
+                end_time = datetime.utcnow()
+            return {
                 'success': success,
                 'timestamp': start_time,
                 'duration': (end_time - start_time).total_seconds(),
                 'error': error if error else None
             }
+
+        # The checks only read, so they run side by side
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {name: executor.submit(run_verification, method_name, args)
+                       for name, method_name, args in verifications}
+
+        for name, future in futures.items():
+            self.verification_results[name] = future.result()
+            error = self.verification_results[name]['error']
             
-            status = 'Passed' if success else 'Failed'
+            status = 'Passed' if self.verification_results[name]['success'] else 'Failed'
             self.logger.info(f"Verification {name}: {status}")
             if error:
                 self.logger.error(f"Error in {name}: {error}")
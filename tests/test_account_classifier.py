@@ -0,0 +1,77 @@
+"""AccountClassifier batches model saves and merges updates across workers"""
+
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.linear_model import SGDClassifier
+
+from account_classifier import (SAVE_BATCH_SIZE, AccountClassifier, AccountModelStore,
+                                build_features)
+
+USER_ID = 7
+RENT, SUPPLIES = 101, 102
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    store = AccountModelStore(str(tmp_path))
+    model = SGDClassifier(loss='log_loss', random_state=42)
+    model.fit(build_features(['LANDLORD RENT', 'STAPLES PAPER'], [None, None], [-900.0, -20.0]),
+              np.asarray([RENT, SUPPLIES]))
+    store.save(USER_ID, {'model': model, 'trained_at': datetime.utcnow(),
+                         'training_samples': 2, 'updates': 0})
+    return str(tmp_path)
+
+
+def _worker(model_dir):
+    """A classifier as another worker process would hold it"""
+    return AccountClassifier(AccountModelStore(model_dir))
+
+
+def _saved(model_dir):
+    return joblib.load(f'{model_dir}/user_{USER_ID}.joblib')
+
+
+def test_confirmations_are_saved_in_batches(model_dir):
+    classifier = _worker(model_dir)
+
+    for _ in range(SAVE_BATCH_SIZE - 1):
+        classifier.update(USER_ID, 'LANDLORD RENT', None, -900.0, RENT)
+    assert _saved(model_dir)['updates'] == 0
+
+    classifier.update(USER_ID, 'LANDLORD RENT', None, -900.0, RENT)
+    assert _saved(model_dir)['updates'] == SAVE_BATCH_SIZE
+
+
+def test_saved_coefficients_are_float32(model_dir):
+    classifier = _worker(model_dir)
+    classifier.update(USER_ID, 'STAPLES PAPER', None, -20.0, SUPPLIES)
+    classifier.flush()
+
+    assert _saved(model_dir)['model'].coef_.dtype == np.float32
+    assert _worker(model_dir).store.load(USER_ID)['model'].coef_.dtype == np.float64
+
+
+def test_workers_do_not_overwrite_each_others_updates(model_dir):
+    first, second = _worker(model_dir), _worker(model_dir)
+    first.update(USER_ID, 'LANDLORD RENT', None, -900.0, RENT)
+    second.update(USER_ID, 'STAPLES PAPER', None, -20.0, SUPPLIES)
+    second.update(USER_ID, 'STAPLES PAPER', None, -20.0, SUPPLIES)
+
+    first.flush()
+    second.flush()
+
+    assert _saved(model_dir)['updates'] == 3
+
+
+def test_reads_pick_up_a_model_saved_by_another_worker(model_dir):
+    reader, writer = _worker(model_dir), _worker(model_dir)
+    assert reader.predict(USER_ID, 'STAPLES PAPER', amount=-20.0)
+
+    for _ in range(SAVE_BATCH_SIZE):
+        writer.update(USER_ID, 'STAPLES PAPER', None, -20.0, SUPPLIES)
+    assert reader.predict(USER_ID, 'STAPLES PAPER', amount=-20.0)[0]['account_id'] == SUPPLIES
+
+    assert reader.store.load(USER_ID)['updates'] == SAVE_BATCH_SIZE
@@ -0,0 +1,100 @@
+"""AlertEvaluationEngine conditions, severities and deduplicated inserts"""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pandas as pd
+
+from alert_system import BALANCE_COLUMNS, OVERDUE_COLUMNS, TRANSACTION_COLUMNS, AlertEvaluationEngine
+from models import Account, AlertConfiguration, AlertHistory, Transaction, db
+from recurring_detection import amount_bands
+
+engine = AlertEvaluationEngine()
+
+
+def _config(alert_type, threshold=None, condition=None):
+    return SimpleNamespace(id=1, user_id=1, alert_type=alert_type, threshold=threshold, condition=condition)
+
+
+def _transactions(amounts, descriptions=None, days_ago=1):
+    now = datetime.utcnow()
+    return pd.DataFrame([
+        (i + 1, 1, now - timedelta(days=days_ago, minutes=len(amounts) - i), float(amount),
+         (descriptions or ['CARD PAYMENT'] * len(amounts))[i])
+        for i, amount in enumerate(amounts)
+    ], columns=TRANSACTION_COLUMNS)
+
+
+def _balances(*balances):
+    return pd.DataFrame([(i + 1, 1, f'Account {i + 1}', float(balance)) for i, balance in enumerate(balances)],
+                        columns=BALANCE_COLUMNS)
+
+
+def _empty_balances():
+    return pd.DataFrame(columns=BALANCE_COLUMNS)
+
+
+def test_transactions_above_the_threshold_are_flagged_with_severity():
+    alerts = engine.evaluate_configuration(_config('transaction', 100, 'above'),
+                                           _transactions([-50, -120, -400]), _empty_balances())
+
+    assert [(alert['transaction_id'], alert['severity']) for alert in alerts] == [(2, 'medium'), (3, 'high')]
+
+
+def test_balance_far_below_the_threshold_is_high():
+    alerts = engine.evaluate_configuration(_config('balance', 1000, 'below'),
+                                           _transactions([]), _balances(2000, 800, 100))
+
+    assert [(alert['account_id'], alert['severity']) for alert in alerts] == [(2, 'medium'), (3, 'high')]
+
+
+def test_equals_condition_is_never_high():
+    alerts = engine.evaluate_configuration(_config('balance', 500, 'equals'),
+                                           _transactions([]), _balances(500, 501))
+
+    assert [(alert['account_id'], alert['severity']) for alert in alerts] == [(1, 'medium')]
+
+
+def test_pattern_flags_a_jump_over_both_predecessors():
+    alerts = engine.evaluate_configuration(_config('pattern'), _transactions([-10, -12, -50, -60, -11]),
+                                           _empty_balances())
+
+    assert [alert['transaction_id'] for alert in alerts] == [3]
+
+
+def test_recent_payment_settles_an_overdue_recurring_entry():
+    now = datetime.utcnow()
+    last, due = now - timedelta(days=50), now - timedelta(days=20)
+    bands = amount_bands(pd.Series([-30.0, -12.0]))
+    overdue = pd.DataFrame([
+        (1, 'gym membership', bands[0], 'GYM MEMBERSHIP', 'monthly', -30.0, last, due),
+        (1, 'streaming service', bands[1], 'STREAMING SERVICE', 'monthly', -12.0, last, due),
+    ], columns=OVERDUE_COLUMNS)
+
+    alerts = engine.evaluate_configuration(_config('missing_payment'),
+                                           _transactions([-30], ['GYM MEMBERSHIP 0425']), _empty_balances(),
+                                           overdue)
+
+    assert len(alerts) == 1
+    assert "'STREAMING SERVICE'" in alerts[0]['message']
+
+
+def test_evaluate_batch_does_not_repeat_open_alerts(make_user):
+    user = make_user()
+    account = Account(name='Equipment', type='Expense', code=f'{user.id}-EQ', user_id=user.id)
+    db.session.add(account)
+    db.session.flush()
+    db.session.add(Transaction(user_id=user.id, account_id=account.id, amount=-900, description='LAPTOP',
+                               date=datetime.utcnow() - timedelta(days=2)))
+    config = AlertConfiguration(user_id=user.id, alert_type='transaction', threshold=500, condition='above',
+                                is_active=True)
+    db.session.add(config)
+    db.session.commit()
+
+    assert engine.evaluate_batch([user.id]) == 1
+    assert engine.evaluate_batch([user.id]) == 0
+
+    alert = AlertHistory.query.filter_by(user_id=user.id, alert_config_id=config.id).one()
+    assert alert.severity == 'high'
+    db.session.refresh(config)
+    assert config.last_triggered is not None
@@ -0,0 +1,112 @@
+"""Isolation Forest anomaly detection and its persisted per-user models"""
+
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+import anomaly_detection as anomaly_module
+from anomaly_detection import (MIN_NEW_SAMPLES_FOR_REFIT, MIN_TRAINING_SAMPLES, AnomalyDetectionService,
+                               AnomalyModelStore)
+from models import Transaction
+
+USER_ID = 11
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = AnomalyModelStore(str(tmp_path))
+    monkeypatch.setattr(anomaly_module, '_model_store', store)
+    return store
+
+
+@pytest.fixture
+def service(store):
+    return AnomalyDetectionService(USER_ID)
+
+
+def _frame(amounts, first_id=1, category='Supplies'):
+    start = datetime(2025, 1, 1)
+    return pd.DataFrame([{
+        'date': start + timedelta(days=offset),
+        'amount': float(amount),
+        'description': 'STATIONERY ORDER',
+        'category': category,
+        'account_id': 5,
+        'transaction_id': first_id + offset
+    } for offset, amount in enumerate(amounts)])
+
+
+def _regular(count, first_id=1):
+    return _frame([-50 - (offset % 5) for offset in range(count)], first_id=first_id)
+
+
+def test_too_little_history_fits_no_model(service, store):
+    df = _regular(MIN_TRAINING_SAMPLES - 1)
+
+    assert service._detect_statistical_anomalies(df) == []
+    assert store.load(USER_ID) is None
+
+
+def test_outlier_is_flagged(service):
+    df = _frame([-50 - (offset % 5) for offset in range(40)] + [-5000])
+
+    anomalies = service._detect_statistical_anomalies(df)
+
+    assert df['transaction_id'].iloc[-1] in [anomaly['transaction_id'] for anomaly in anomalies]
+    flagged = next(anomaly for anomaly in anomalies if anomaly['amount'] == -5000.0)
+    assert flagged['detection_method'] == 'statistical'
+
+
+def test_model_is_reused_until_enough_new_data(service):
+    df = _regular(40)
+    fitted = service.get_model(df)
+
+    few_new = pd.concat([df, _regular(MIN_NEW_SAMPLES_FOR_REFIT - 1, first_id=41)], ignore_index=True)
+    assert service.get_model(few_new) is fitted
+
+    enough_new = pd.concat([df, _regular(MIN_NEW_SAMPLES_FOR_REFIT, first_id=41)], ignore_index=True)
+    refitted = service.get_model(enough_new)
+    assert refitted is not fitted
+    assert refitted['n_samples'] == len(enough_new)
+
+
+def test_stale_model_is_refitted(service, store):
+    df = _regular(40)
+    fitted = service.get_model(df)
+    store.save(USER_ID, {**fitted, 'fitted_at': datetime.utcnow() - timedelta(days=31)})
+
+    assert service.get_model(df)['fitted_at'] > datetime.utcnow() - timedelta(minutes=1)
+
+
+def test_reads_pick_up_a_model_fitted_by_another_worker(service, store):
+    fitted = service.get_model(_regular(40))
+
+    AnomalyModelStore(store.model_dir).save(USER_ID, {**fitted, 'n_samples': 999})
+
+    assert service.get_model()['n_samples'] == 999
+
+
+def test_scoring_uses_the_cached_model_without_refitting(service, monkeypatch):
+    assert service.score_transactions([]) == []
+    service.get_model(_regular(40))
+    monkeypatch.setattr(service, '_fit_model', lambda df: pytest.fail('scoring must not refit'))
+
+    outlier = Transaction(id=100, user_id=USER_ID, date=datetime(2025, 1, 1), amount=-5000,
+                          description='STATIONERY ORDER', account_id=5)
+
+    anomalies = service.score_transactions([outlier])
+
+    assert [anomaly['transaction_id'] for anomaly in anomalies] == [100]
+
+
+def test_pattern_anomalies_use_per_category_statistics(service):
+    df = pd.concat([
+        _frame([-50] * 20 + [-500]),
+        _frame([-2000, -2100, -1900], first_id=100, category='Rent')
+    ], ignore_index=True)
+
+    anomalies = service._detect_pattern_anomalies(df)
+
+    assert [anomaly['transaction_id'] for anomaly in anomalies] == [21]
+    assert anomalies[0]['reason'] == 'Unusual amount for Supplies category'
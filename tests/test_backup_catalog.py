@@ -0,0 +1,46 @@
+"""BackupCatalog keeps up with the backups directory"""
+
+import json
+
+from utils.backup_catalog import STATUS_VERIFIED, BackupCatalog
+
+
+def _write_backup(directory, timestamp, mode='full'):
+    """A backup and its metadata as written without going through the catalog"""
+    if mode == 'incremental':
+        backup_file = directory / f'backup_{timestamp}.manifest.json'
+        backup_file.write_text(json.dumps({'tables': {}}))
+    else:
+        backup_file = directory / f'backup_{timestamp}.db'
+        backup_file.write_bytes(b'sqlite copy ' + timestamp.encode())
+    metadata = {'timestamp': timestamp, 'database': 'sqlite', 'mode': mode,
+                'size': backup_file.stat().st_size}
+    (directory / f'backup_{timestamp}_metadata.json').write_text(json.dumps(metadata))
+    return backup_file, metadata
+
+
+def test_opening_catalogues_backups_it_does_not_list(tmp_path):
+    _write_backup(tmp_path, '20260101_000000')
+    catalog = BackupCatalog(tmp_path)
+    assert len(catalog) == 1
+
+    _write_backup(tmp_path, '20260102_000000', mode='incremental')
+    _write_backup(tmp_path, '20260103_000000', mode='incremental')
+    reopened = BackupCatalog(tmp_path)
+
+    entries = reopened.entries()
+    assert [entry['metadata']['timestamp'] for entry in entries] == [
+        '20260101_000000', '20260102_000000', '20260103_000000'
+    ]
+    assert [entry['base_timestamp'] for entry in entries] == [None, None, '20260102_000000']
+
+
+def test_reopening_keeps_catalogued_entries(tmp_path):
+    backup_file, metadata = _write_backup(tmp_path, '20260101_000000')
+    catalog = BackupCatalog(tmp_path)
+    catalog.mark(metadata['timestamp'], STATUS_VERIFIED)
+
+    reopened = BackupCatalog(tmp_path)
+
+    assert reopened.reconcile() == 0
+    assert reopened.latest()['verification_status'] == STATUS_VERIFIED
@@ -0,0 +1,37 @@
+"""Request validation for /api/transactions/categorize"""
+
+import pytest
+
+CSRF_TOKEN = 'test-csrf-token'
+
+
+@pytest.fixture
+def api_client(app, make_user, login):
+    client = app.test_client()
+    login(client, make_user())
+    with client.session_transaction() as session:
+        session['csrf_token'] = CSRF_TOKEN
+    return client
+
+
+@pytest.mark.parametrize('body', [
+    [{'transaction_id': 1, 'account_id': 2}],
+    'categorize everything',
+    42,
+    {},
+    {'rule': ['description', 2]},
+])
+def test_non_object_json_is_rejected(api_client, body):
+    response = api_client.post('/api/transactions/categorize', json=body,
+                               headers={'X-CSRFToken': CSRF_TOKEN})
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_malformed_json_is_rejected(api_client):
+    response = api_client.post('/api/transactions/categorize', data='{"items": [',
+                               content_type='application/json', headers={'X-CSRFToken': CSRF_TOKEN})
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
@@ -0,0 +1,47 @@
+"""Financial context sent with chat messages"""
+
+from datetime import datetime, timedelta
+
+from chat.context_builder import FinancialContextBuilder, context_builder
+from models import Account, Transaction, db
+
+
+def test_top_categories_cover_the_current_month_only(make_user):
+    user = make_user()
+    rent = Account(name='Rent', type='Expense', code=f'{user.id}-RENT', user_id=user.id)
+    equipment = Account(name='Equipment', type='Expense', code=f'{user.id}-EQ', user_id=user.id)
+    db.session.add_all([rent, equipment])
+    db.session.flush()
+    now = datetime.utcnow()
+    db.session.add_all([
+        Transaction(user_id=user.id, date=now, amount=-800, description='RENT', account_id=rent.id),
+        Transaction(user_id=user.id, date=now, amount=-25, description='CARD PAYMENT'),
+        Transaction(user_id=user.id, date=now - timedelta(days=400), amount=-5000,
+                    description='LAPTOPS', account_id=equipment.id),
+    ])
+    db.session.commit()
+
+    context = context_builder.get_context(user.id)
+
+    assert context['expenses'] == 825.0
+    assert context['top_categories'] == [
+        {'category': 'Rent', 'amount': 800.0},
+        {'category': 'Uncategorized', 'amount': 25.0}
+    ]
+    assert 'Top Expense Categories This Month:\n- Rent: $800.00' in context_builder.to_prompt(context)
+
+
+def test_trends_compare_with_the_calendar_month_before():
+    summary = {
+        'monthly_labels': ['Jan 2025', 'Feb 2025', 'May 2025'],
+        'monthly_income': [1000.0, 1000.0, 1200.0],
+        'monthly_expenses': [400.0, 500.0, 300.0]
+    }
+
+    trends = FinancialContextBuilder._trends(summary)
+
+    assert [trend['month'] for trend in trends] == ['Mar 2025', 'Apr 2025', 'May 2025']
+    assert [trend['expenses'] for trend in trends] == [0.0, 0.0, 300.0]
+    # May follows an empty April, not February's 500
+    assert trends[-1]['expense_change_pct'] is None
+    assert trends[0]['expense_change_pct'] == -100.0
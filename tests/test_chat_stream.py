@@ -0,0 +1,84 @@
+"""Streaming chat replies against the local OpenAI stub"""
+
+import json
+import re
+from datetime import timedelta
+
+import pytest
+
+import nlp_utils
+from benchmarks.openai_stub import STUB_REPLY, OpenAIStubServer, StubSettings
+from chat.history import history_writer
+from chat.streaming import StreamLimiter
+from models import ChatMessage, ChatStreamSlot
+
+
+@pytest.fixture
+def openai_stub(monkeypatch):
+    with OpenAIStubServer(settings=StubSettings(latency=0.0, jitter=0.0)) as stub:
+        monkeypatch.setenv('OPENAI_BASE_URL', stub.base_url)
+        monkeypatch.setenv('OPENAI_API_KEY', 'stub')
+        # The client is cached per process; build one that talks to this stub
+        monkeypatch.setattr(nlp_utils, '_openai_client', None)
+        yield stub
+
+
+def _events(body):
+    """(event, data) pairs from a server-sent event stream"""
+    events = []
+    for frame in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in frame.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_stream_sends_tokens_and_saves_both_messages(app, make_user, login, openai_stub):
+    user = make_user()
+    client = app.test_client()
+    login(client, user)
+    page = client.get('/chat/interface').get_data(as_text=True)
+    token = re.search(r'name="csrf_token" value="([^"]+)"', page).group(1)
+
+    response = client.post('/chat/stream', json={'message': 'What did I spend on rent?'},
+                           headers={'X-CSRFToken': token})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    events = _events(response.get_data(as_text=True))
+    names = [name for name, _ in events]
+    assert names[0] == 'context'
+    assert names[-1] == 'done'
+    tokens = [data['content'] for name, data in events if name == 'token']
+    assert ''.join(tokens).strip() == STUB_REPLY
+    assert events[-1][1] == {'response': STUB_REPLY}
+    assert openai_stub.settings.stats()['requests']['chat.completions'] == 1
+    assert ChatStreamSlot.query.filter_by(user_id=user.id).filter(ChatStreamSlot.owner.isnot(None)).count() == 0
+
+    history_writer.flush()
+    messages = ChatMessage.query.filter_by(user_id=user.id).order_by(ChatMessage.id).all()
+    assert [(m.sender, m.content) for m in messages] == [
+        ('user', 'What did I spend on rent?'),
+        ('assistant', STUB_REPLY)
+    ]
+
+
+def test_stream_limit_is_shared_between_workers(make_user):
+    user = make_user()
+    first_worker, second_worker = StreamLimiter(limit=2), StreamLimiter(limit=2)
+
+    first = first_worker.acquire(user.id)
+    second = second_worker.acquire(user.id)
+    assert first and second
+    assert first_worker.acquire(user.id) is None
+    assert second_worker.acquire(user.id) is None
+
+    first_worker.release(first)
+    assert second_worker.acquire(user.id) is not None
+
+
+def test_slot_of_a_dead_stream_expires(make_user):
+    user = make_user()
+    crashed = StreamLimiter(limit=1, ttl=timedelta(seconds=-1))
+    assert crashed.acquire(user.id) is not None
+
+    assert StreamLimiter(limit=1).acquire(user.id) is not None
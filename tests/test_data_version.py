@@ -0,0 +1,83 @@
+"""Per-user data versions bumped by the flush hook and by bulk writes"""
+
+from datetime import datetime
+
+from sqlalchemy import insert, update
+
+from dashboard_service import dashboard_service
+from models import Transaction, db
+from utils.data_version import data_versions
+
+
+def _spend(user, amount=-20, description='COFFEE'):
+    return Transaction(user_id=user.id, date=datetime(2025, 3, 1), amount=amount, description=description)
+
+
+def test_orm_write_bumps_the_version_once(make_user):
+    user = make_user()
+    before = data_versions.version(user.id)
+
+    db.session.add_all([_spend(user), _spend(user)])
+    db.session.commit()
+
+    assert data_versions.version(user.id) == before + 1
+
+
+def test_unchanged_attribute_does_not_bump(make_user):
+    user = make_user()
+    transaction = _spend(user)
+    db.session.add(transaction)
+    db.session.commit()
+    before = data_versions.version(user.id)
+
+    transaction.description = transaction.description
+    db.session.commit()
+
+    assert data_versions.version(user.id) == before
+
+
+def test_bulk_write_bumps_only_when_told(make_user):
+    user = make_user()
+    db.session.add(_spend(user))
+    db.session.commit()
+    before = data_versions.version(user.id)
+
+    # Set-based statements bypass the unit of work and so the flush hook
+    db.session.execute(update(Transaction).where(Transaction.user_id == user.id).values(amount=-30))
+    db.session.commit()
+    assert data_versions.version(user.id) == before
+
+    db.session.execute(update(Transaction).where(Transaction.user_id == user.id).values(amount=-40))
+    data_versions.bump([user.id])
+    db.session.commit()
+    assert data_versions.version(user.id) == before + 1
+
+
+def test_rolled_back_write_leaves_the_version(make_user):
+    user = make_user()
+    before = data_versions.version(user.id)
+
+    db.session.add(_spend(user))
+    db.session.flush()
+    assert data_versions.version(user.id) == before + 1
+    db.session.rollback()
+
+    assert data_versions.version(user.id) == before
+
+
+def test_cached_dashboard_summary_rebuilds_when_the_version_moves(make_user):
+    user = make_user()
+    db.session.add(_spend(user))
+    db.session.commit()
+    assert dashboard_service.get_summary(user.id)['transaction_count'] == 1
+
+    row = dict(user_id=user.id, date=datetime(2025, 3, 2), amount=-15, description='TEA')
+    db.session.execute(insert(Transaction).values(**row))
+    db.session.commit()
+    # Nothing moved the version, so the cached summary is still served
+    assert dashboard_service.get_summary(user.id)['transaction_count'] == 1
+
+    db.session.execute(insert(Transaction).values(**row))
+    data_versions.bump([user.id])
+    db.session.commit()
+    assert dashboard_service.get_summary(user.id)['transaction_count'] == 3
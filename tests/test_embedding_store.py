@@ -0,0 +1,93 @@
+"""Embedding store invalidation and explained-only search"""
+
+from datetime import datetime
+
+from embedding_store import embedding_store
+from models import Transaction, db
+from predictive_features import PredictiveFeatures
+
+
+def _add(user, description):
+    transaction = Transaction(user_id=user.id, date=datetime(2025, 3, 1), amount=-20,
+                              description=description)
+    db.session.add(transaction)
+    db.session.commit()
+    return transaction
+
+
+def _neighbour_ids(user, text):
+    return [transaction_id for transaction_id, _ in embedding_store.search(user.id, text, k=5)]
+
+
+def test_deleted_transaction_is_not_returned(make_user):
+    user = make_user()
+    kept = _add(user, 'COSTA COFFEE LONDON')
+    deleted = _add(user, 'PRET A MANGER LONDON')
+    assert deleted.id in _neighbour_ids(user, 'PRET A MANGER LONDON')
+
+    db.session.delete(deleted)
+    db.session.commit()
+
+    neighbours = _neighbour_ids(user, 'PRET A MANGER LONDON')
+    assert deleted.id not in neighbours
+    assert kept.id in neighbours
+
+
+def test_edited_description_is_embedded_again(make_user):
+    user = make_user()
+    transaction = _add(user, 'AMAZON MARKETPLACE ORDER')
+    _add(user, 'TESCO SUPERSTORE')
+    before = dict(embedding_store.search(user.id, 'AMAZON MARKETPLACE ORDER', k=5))
+    assert before[transaction.id] > 0.99
+
+    transaction.description = 'SHELL PETROL STATION'
+    db.session.commit()
+
+    after = embedding_store.search(user.id, 'SHELL PETROL STATION', k=5)
+    assert after[0][0] == transaction.id
+    assert after[0][1] > 0.99
+    stale = dict(embedding_store.search(user.id, 'AMAZON MARKETPLACE ORDER', k=5))
+    assert stale.get(transaction.id, 0.0) < 0.5
+    # The old vector is dead, so the transaction appears once
+    neighbours = _neighbour_ids(user, 'SHELL PETROL STATION')
+    assert len(neighbours) == len(set(neighbours))
+
+
+def test_rolled_back_delete_keeps_vector(make_user):
+    user = make_user()
+    transaction = _add(user, 'VODAFONE MOBILE BILL')
+    assert transaction.id in _neighbour_ids(user, 'VODAFONE MOBILE BILL')
+
+    db.session.delete(transaction)
+    db.session.flush()
+    db.session.rollback()
+
+    assert transaction.id in _neighbour_ids(user, 'VODAFONE MOBILE BILL')
+
+
+def test_explained_only_search_skips_unexplained_neighbours(make_user):
+    user = make_user()
+    explained = Transaction(user_id=user.id, date=datetime(2025, 3, 1), amount=-20,
+                            description='AMAZON MKTPLACE ORDER', explanation='Office supplies')
+    db.session.add(explained)
+    db.session.add_all([Transaction(user_id=user.id, date=datetime(2025, 3, 1), amount=-20,
+                                    description=f'AMAZON MARKETPLACE ORDER {n}') for n in range(60)])
+    db.session.commit()
+
+    hits = embedding_store.search(user.id, 'AMAZON MARKETPLACE ORDER', k=50, explained_only=True)
+    assert [transaction_id for transaction_id, _ in hits] == [explained.id]
+
+    result = PredictiveFeatures().find_similar_transactions('AMAZON MARKETPLACE ORDER', user.id)
+    assert [match['id'] for match in result['similar_transactions']] == [explained.id]
+
+
+def test_adding_an_explanation_makes_a_transaction_searchable(make_user):
+    user = make_user()
+    transaction = _add(user, 'BRITISH GAS DIRECT DEBIT')
+    assert embedding_store.search(user.id, 'BRITISH GAS DIRECT DEBIT', explained_only=True) == []
+
+    transaction.explanation = 'Office heating'
+    db.session.commit()
+
+    hits = embedding_store.search(user.id, 'BRITISH GAS DIRECT DEBIT', explained_only=True)
+    assert [transaction_id for transaction_id, _ in hits] == [transaction.id]
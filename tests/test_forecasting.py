@@ -0,0 +1,48 @@
+"""Forecast confidence scores and the per-process fit cache"""
+
+from datetime import datetime
+
+import numpy as np
+
+from forecasting import ForecastEngine, fit_series_matrix, forecast_confidence, forecast_from_fit
+from models import Account, Transaction, db
+from utils.versioned_cache import VersionedCache
+
+
+def _confidence(values):
+    values = np.asarray(values, dtype=float)
+    fit = fit_series_matrix(values[None, :])[0]
+    return forecast_confidence(fit, forecast_from_fit(fit, horizon=6), values)
+
+
+def test_steady_spending_scores_higher_than_erratic_spending():
+    rng = np.random.default_rng(3)
+    steady = _confidence(-1000 + rng.normal(0, 10, 24))
+    erratic = _confidence(-1000 + rng.normal(0, 400, 24))
+
+    assert 0.0 <= erratic['overall_confidence'] < steady['overall_confidence'] <= 1.0
+    assert 0.0 <= erratic['reliability_score'] < steady['reliability_score'] <= 1.0
+
+
+def test_short_history_lowers_reliability():
+    values = [-1000.0, -1010.0, -990.0, -1005.0, -995.0, -1000.0] * 4
+
+    assert _confidence(values[:6])['reliability_score'] < _confidence(values)['reliability_score']
+
+
+def test_cache_keeps_only_the_most_recent_users(make_user, monkeypatch):
+    monkeypatch.setattr(ForecastEngine, '_cache', VersionedCache(2))
+    users = [make_user() for _ in range(3)]
+    for user in users:
+        account = Account(name='Rent', type='Expense', code=f'{user.id}-RENT', user_id=user.id)
+        db.session.add(account)
+        db.session.flush()
+        db.session.add_all([Transaction(user_id=user.id, account_id=account.id, amount=-500,
+                                        description='RENT', date=datetime(2024, month, 1))
+                            for month in range(1, 7)])
+    db.session.commit()
+
+    for user in users:
+        ForecastEngine(user.id).refresh()
+
+    assert list(ForecastEngine._cache) == [users[1].id, users[2].id]
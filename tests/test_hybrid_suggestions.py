@@ -0,0 +1,39 @@
+"""PredictiveEngine.get_hybrid_suggestions account suggestions"""
+
+from datetime import datetime, timedelta
+
+from models import Account, Transaction, db
+from predictive_utils import PredictiveEngine
+
+
+def _categorized_history(user):
+    rent = Account(name='Rent', type='Expense', code=f'{user.id}-RENT', user_id=user.id)
+    supplies = Account(name='Office Supplies', type='Expense', code=f'{user.id}-SUP', user_id=user.id)
+    db.session.add_all([rent, supplies])
+    db.session.flush()
+    start = datetime(2025, 1, 1)
+    for day in range(8):
+        db.session.add(Transaction(
+            user_id=user.id, date=start + timedelta(days=day), amount=-1200,
+            description=f'LANDLORD RENT PAYMENT {day}', explanation='Monthly rent', account_id=rent.id
+        ))
+        db.session.add(Transaction(
+            user_id=user.id, date=start + timedelta(days=day), amount=-35,
+            description=f'STAPLES STATIONERY {day}', explanation='Stationery', account_id=supplies.id
+        ))
+    db.session.commit()
+    return rent, supplies
+
+
+def test_hybrid_suggestions_include_account_from_local_classifier(make_user):
+    user = make_user()
+    rent, supplies = _categorized_history(user)
+
+    results = PredictiveEngine().get_hybrid_suggestions(
+        'STAPLES STATIONERY ORDER', -40.0, user.id, [rent, supplies]
+    )
+
+    assert results['ai_suggestions'], 'expected AI suggestions when no rule is confident'
+    suggestion = results['ai_suggestions'][0]
+    assert suggestion['account_suggestion'] == supplies.id
+    assert suggestion['features_used']['ASF'] is True
@@ -0,0 +1,154 @@
+"""iCountant pages and the categorization suggestion queue"""
+
+import re
+from datetime import datetime
+
+import pytest
+
+import icountant_queue as icountant_queue_module
+from icountant_queue import icountant_queue
+from models import Account, CategorizationSuggestion, Transaction, db
+from utils.data_version import data_versions
+
+
+@pytest.fixture
+def ledger(make_user):
+    user = make_user()
+    rent = Account(name='Rent', type='Expense', code=f'{user.id}-RENT', user_id=user.id)
+    sales = Account(name='Sales', type='Income', code=f'{user.id}-SALES', user_id=user.id)
+    transaction = Transaction(user_id=user.id, date=datetime(2025, 3, 1), amount=-950,
+                              description='LANDLORD STANDING ORDER')
+    db.session.add_all([rent, sales, transaction])
+    db.session.flush()
+    db.session.add(CategorizationSuggestion(
+        user_id=user.id, transaction_id=transaction.id, transaction_date=transaction.date,
+        account_id=rent.id, confidence=0.6, source='keyword_rule'
+    ))
+    db.session.commit()
+    return user, rent, sales, transaction
+
+
+def _page_token(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    return re.search(r'name="csrf_token" value="([^"]+)"', response.get_data(as_text=True)).group(1)
+
+
+def test_deleting_a_transaction_deletes_its_suggestion(ledger):
+    _, _, _, transaction = ledger
+    transaction_id = transaction.id
+
+    db.session.delete(transaction)
+    db.session.commit()
+
+    assert CategorizationSuggestion.query.filter_by(transaction_id=transaction_id).count() == 0
+
+
+def test_interface_categorizes_with_the_posted_account_id(app, ledger, login):
+    user, _, sales, transaction = ledger
+    client = app.test_client()
+    login(client, user)
+    token = _page_token(client, '/icountant_interface')
+
+    response = client.post('/icountant_interface', data={
+        'csrf_token': token, 'transaction_id': transaction.id, 'selected_account': sales.id
+    })
+
+    assert response.status_code == 302
+    db.session.expire_all()
+    assert db.session.get(Transaction, transaction.id).account_id == sales.id
+    assert CategorizationSuggestion.query.filter_by(transaction_id=transaction.id).count() == 0
+
+
+def test_interface_rejects_another_users_account(app, ledger, login, make_user):
+    user, _, _, transaction = ledger
+    stranger = make_user()
+    foreign = Account(name='Rent', type='Expense', code=f'{stranger.id}-RENT', user_id=stranger.id)
+    db.session.add(foreign)
+    db.session.commit()
+    client = app.test_client()
+    login(client, user)
+    token = _page_token(client, '/icountant_interface')
+
+    client.post('/icountant_interface', data={
+        'csrf_token': token, 'transaction_id': transaction.id, 'selected_account': foreign.id
+    })
+
+    db.session.expire_all()
+    assert db.session.get(Transaction, transaction.id).account_id is None
+
+
+def test_assistant_page_renders(app, ledger, login):
+    user = ledger[0]
+    client = app.test_client()
+    login(client, user)
+
+    assert client.get('/icountant').status_code == 200
+
+
+def _uncategorized(user, *descriptions):
+    transactions = [Transaction(user_id=user.id, date=datetime(2025, 4, day), amount=-40,
+                                description=description)
+                    for day, description in enumerate(descriptions, start=1)]
+    db.session.add_all(transactions)
+    db.session.commit()
+    return transactions
+
+
+def test_fill_calls_the_llm_outside_a_transaction(ledger, monkeypatch):
+    user, rent, _, _ = ledger
+    first, second = _uncategorized(user, 'MISC PAYMENT 101', 'MISC PAYMENT 202')
+    first_id, second_id, rent_id = first.id, second.id, rent.id
+    calls = []
+
+    def predict_account(description, explanation, accounts, user_id=None, amount=None):
+        assert not db.session().in_transaction()
+        if not calls:
+            # The user categorizes a transaction while the LLM is thinking
+            with db.engine.begin() as conn:
+                conn.execute(Transaction.__table__.update().where(
+                    Transaction.__table__.c.id == first_id).values(account_id=rent_id))
+        calls.append(description)
+        return True, '', [{'account': 'Rent', 'confidence': 0.7, 'reasoning': 'stub', 'source': 'ai'}]
+
+    monkeypatch.setattr(icountant_queue_module, 'predict_account', predict_account)
+    db.session.commit()
+
+    added = icountant_queue.fill(user.id)
+
+    assert calls == ['MISC PAYMENT 101', 'MISC PAYMENT 202']
+    assert added == 1
+    queued = {item.transaction_id: item for item in CategorizationSuggestion.query.filter_by(user_id=user.id)}
+    assert first_id not in queued
+    assert queued[second_id].account_id == rent_id
+    assert queued[second_id].source == 'ai'
+
+
+def test_fill_skips_users_whose_queue_is_full(ledger, monkeypatch):
+    user = ledger[0]
+    _uncategorized(user, 'MISC PAYMENT 303')
+    monkeypatch.setattr(icountant_queue_module, 'predict_account',
+                        lambda *args, **kwargs: pytest.fail('queue was already full'))
+
+    assert icountant_queue.fill(user.id, depth=1) == 0
+
+
+def test_accept_high_confidence_categorizes_only_confident_items(ledger):
+    user, rent, sales, low = ledger
+    confident = _uncategorized(user, 'CUSTOMER INVOICE 17')[0]
+    db.session.add(CategorizationSuggestion(
+        user_id=user.id, transaction_id=confident.id, transaction_date=confident.date,
+        account_id=sales.id, confidence=0.95, source='keyword_rule'
+    ))
+    db.session.commit()
+    version = data_versions.version(user.id)
+
+    assert icountant_queue.accept_high_confidence(user.id) == 1
+
+    db.session.expire_all()
+    assert db.session.get(Transaction, confident.id).account_id == sales.id
+    assert db.session.get(Transaction, confident.id).is_processed is True
+    assert db.session.get(Transaction, low.id).account_id is None
+    remaining = [item.transaction_id for item in CategorizationSuggestion.query.filter_by(user_id=user.id)]
+    assert remaining == [low.id]
+    assert data_versions.version(user.id) != version
@@ -0,0 +1,40 @@
+"""Chunk store locking between backups and garbage collection"""
+
+import threading
+
+from utils.incremental_backup import ChunkStore
+
+
+def test_garbage_collection_waits_for_a_backup_in_progress(tmp_path):
+    store = ChunkStore(tmp_path / 'chunks')
+    result = {}
+
+    def collect():
+        with store.locked(exclusive=True):
+            result['removed'] = store.collect_garbage(set())
+
+    with store.locked():
+        digest, _ = store.put(b'rows of a backup whose manifest is not written yet\n')
+        collector = threading.Thread(target=collect)
+        collector.start()
+        collector.join(timeout=0.5)
+        assert collector.is_alive()
+        assert store.find(digest) is not None
+
+    collector.join(timeout=5)
+    assert result == {'removed': 1}
+
+
+def test_backups_can_hold_the_lock_together(tmp_path):
+    store = ChunkStore(tmp_path / 'chunks')
+    entered = threading.Event()
+
+    def backup():
+        with store.locked():
+            entered.set()
+
+    with store.locked():
+        other = threading.Thread(target=backup)
+        other.start()
+        assert entered.wait(timeout=5)
+    other.join(timeout=5)
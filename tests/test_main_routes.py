@@ -0,0 +1,58 @@
+"""Forecast, alert and account suggestion routes on the main blueprint"""
+
+from datetime import datetime
+
+from models import Account, Transaction, db
+
+
+def _monthly_history(user, months=14):
+    account = Account(name='Utilities', type='Expense', code=f'{user.id}-UTIL', user_id=user.id)
+    db.session.add(account)
+    db.session.flush()
+    for month in range(months):
+        db.session.add(Transaction(
+            user_id=user.id, date=datetime(2024 + month // 12, month % 12 + 1, 5),
+            amount=-100 - month, description='ENERGY SUPPLIER DD', account_id=account.id
+        ))
+    db.session.commit()
+
+
+def test_expense_forecast_renders(app, make_user, login):
+    user = make_user()
+    _monthly_history(user)
+    client = app.test_client()
+    login(client, user)
+
+    response = client.get('/expense-forecast')
+
+    assert response.status_code == 200
+    assert b'Expense Forecasting' in response.data
+
+
+def test_check_alerts_returns_count(app, make_user, login):
+    user = make_user()
+    client = app.test_client()
+    login(client, user)
+
+    response = client.get('/alerts/check')
+
+    assert response.status_code == 200
+    assert response.get_json() == {'success': True, 'alerts_created': 0}
+
+
+def test_suggest_account_only_offers_the_users_accounts(app, make_user, login):
+    user, stranger = make_user(), make_user()
+    rent = Account(name='Rent', type='Expense', code=f'{user.id}-RENT', user_id=user.id)
+    db.session.add_all([rent, Account(name='Rent', type='Expense', code=f'{stranger.id}-RENT',
+                                      user_id=stranger.id)])
+    db.session.commit()
+    client = app.test_client()
+    login(client, user)
+    with client.session_transaction() as session:
+        session['csrf_token'] = 'test-csrf-token'
+
+    response = client.post('/analyze/suggest-account', json={'description': 'Monthly rent payment'},
+                           headers={'X-CSRFToken': 'test-csrf-token'})
+
+    assert response.status_code == 200
+    assert {suggestion['account_id'] for suggestion in response.get_json()} == {rent.id}
@@ -0,0 +1,170 @@
+"""GroupedSeries matches the per-group pattern statistics it replaced"""
+
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from utils.pattern_matching import PatternMatcher
+from utils.pattern_statistics import GroupedSeries
+
+
+def _groups(seed=7, count=25):
+    """Random groups of 1-12 positive amounts on unsorted, sometimes equal, dates"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    amount_groups, date_groups = [], []
+    for _ in range(count):
+        size = rng.randint(1, 12)
+        amount_groups.append([round(rng.uniform(5, 500), 2) for _ in range(size)])
+        date_groups.append([start + timedelta(days=rng.randint(0, 400), hours=rng.randint(0, 23))
+                            for _ in range(size)])
+    return amount_groups, date_groups
+
+
+def _by_date(amounts, dates):
+    pairs = sorted(zip(dates, amounts), key=lambda pair: pair[0])
+    return [amount for _, amount in pairs], [date for date, _ in pairs]
+
+
+# The per-group loops PatternMatcher used before the kernel
+
+def _mean(values):
+    return sum(values) / len(values)
+
+
+def _variance(values):
+    mean = _mean(values)
+    return sum((x - mean) ** 2 for x in values) / len(values)
+
+
+def _slope(values):
+    n = len(values)
+    if n < 2:
+        return 0.0
+    x_mean, y_mean = (n - 1) / 2, _mean(values)
+    numerator = sum((i - x_mean) * (values[i] - y_mean) for i in range(n))
+    denominator = sum((i - x_mean) ** 2 for i in range(n))
+    return numerator / denominator
+
+
+def _seasonality(values):
+    if len(values) < 4:
+        return 0.0
+    half = len(values) // 2
+    first, second = values[:half], values[half:2 * half]
+    norm_first = [x - _mean(first) for x in first]
+    norm_second = [x - _mean(second) for x in second]
+    denominator = (sum(x * x for x in norm_first) * sum(x * x for x in norm_second)) ** 0.5
+    if denominator == 0:
+        return 0.0
+    correlation = sum(a * b for a, b in zip(norm_first, norm_second)) / denominator
+    return max(0.0, min(1.0, (correlation + 1) / 2))
+
+
+def _intervals(dates):
+    return [(dates[i] - dates[i - 1]).days for i in range(1, len(dates))]
+
+
+@pytest.fixture(scope='module')
+def grouped():
+    amount_groups, date_groups = _groups()
+    series = GroupedSeries.from_groups(amount_groups, date_groups)
+    expected = [_by_date(amounts, dates) for amounts, dates in zip(amount_groups, date_groups)]
+    return series, expected
+
+
+def test_amount_statistics_match_the_per_group_loops(grouped):
+    series, expected = grouped
+
+    assert series.counts.tolist() == [len(amounts) for amounts, _ in expected]
+    assert series.mean() == pytest.approx([_mean(amounts) for amounts, _ in expected])
+    assert series.variance() == pytest.approx([_variance(amounts) for amounts, _ in expected])
+    assert series.first().tolist() == [amounts[0] for amounts, _ in expected]
+    assert series.last().tolist() == [amounts[-1] for amounts, _ in expected]
+    assert series.minimum().tolist() == [min(amounts) for amounts, _ in expected]
+    assert series.maximum().tolist() == [max(amounts) for amounts, _ in expected]
+    assert series.median_upper().tolist() == [sorted(amounts)[len(amounts) // 2] for amounts, _ in expected]
+    assert series.mean_relative_deviation() == pytest.approx(
+        [_mean([abs(x - _mean(amounts)) / _mean(amounts) for x in amounts]) for amounts, _ in expected])
+
+
+def test_trend_and_seasonality_match_the_per_group_loops(grouped):
+    series, expected = grouped
+
+    assert series.slope() == pytest.approx([_slope(amounts) for amounts, _ in expected], abs=1e-9)
+    assert series.half_correlation() == pytest.approx([_seasonality(amounts) for amounts, _ in expected])
+    assert series.last_rolling_mean(3) == pytest.approx([_mean(amounts[-3:]) for amounts, _ in expected])
+
+
+def test_interval_statistics_match_the_per_group_loops(grouped):
+    series, expected = grouped
+    stats = series.interval_stats()
+
+    for group, (_, dates) in enumerate(expected):
+        intervals = _intervals(dates)
+        assert stats['count'][group] == len(intervals)
+        if not intervals:
+            continue
+        mean = _mean(intervals)
+        assert stats['mean'][group] == pytest.approx(mean)
+        assert stats['variance'][group] == pytest.approx(_variance(intervals))
+        cv = _variance(intervals) ** 0.5 / mean if mean > 0 else float('inf')
+        assert stats['coefficient_variation'][group] == pytest.approx(cv)
+
+
+def test_empty_groups_are_kept_in_place():
+    series = GroupedSeries.from_groups([[10.0, 20.0], [], [5.0]])
+
+    assert series.counts.tolist() == [2, 0, 1]
+    assert series.mean().tolist() == [15.0, 0.0, 5.0]
+    assert np.isnan(series.first()[1])
+    assert series.interval_stats()['count'].tolist() == [1, 0, 0]
+
+
+def test_recurring_patterns_match_the_per_group_loop():
+    matcher = PatternMatcher()
+    start = datetime(2024, 1, 5)
+    monthly = [{'date': start + timedelta(days=30 * month + month % 2)} for month in range(8)]
+    # Unsorted input is analyzed in date order
+    monthly.reverse()
+
+    result = matcher.analyze_recurring_patterns(monthly)
+
+    intervals = _intervals(sorted(t['date'] for t in monthly))
+    assert result['is_recurring'] is True
+    assert result['suggested_frequency'] == 'monthly'
+    assert result['metrics']['sample_size'] == len(intervals)
+    assert result['metrics']['average_interval'] == pytest.approx(_mean(intervals))
+    assert result['metrics']['variance'] == pytest.approx(_variance(intervals))
+    assert matcher.analyze_recurring_patterns(monthly[:1]) == {'is_recurring': False, 'confidence': 0.0}
+
+
+def test_recurring_patterns_compute_only_interval_statistics(monkeypatch):
+    matcher = PatternMatcher()
+    monkeypatch.setattr(matcher, '_group_statistics',
+                        lambda series: pytest.fail('amount statistics are not needed'))
+    dates = [{'date': datetime(2024, 1, 1) + timedelta(days=7 * week)} for week in range(4)]
+
+    assert matcher.analyze_recurring_patterns(dates)['suggested_frequency'] == 'weekly'
+
+
+def test_pattern_results_match_the_per_group_loops():
+    matcher = PatternMatcher()
+    amount_groups, date_groups = _groups(seed=11, count=5)
+
+    for amounts, dates in zip(amount_groups, date_groups):
+        if len(amounts) < 2:
+            continue
+        sorted_amounts, _ = _by_date(amounts, dates)
+        stability = matcher.analyze_temporal_stability(amounts, dates)
+        advanced = matcher.calculate_advanced_metrics(amounts, dates)
+
+        assert stability['metrics']['avg_amount'] == pytest.approx(_mean(sorted_amounts))
+        assert stability['stability'] == pytest.approx(1 - min(1, _mean(
+            [abs(x - _mean(sorted_amounts)) / _mean(sorted_amounts) for x in sorted_amounts])))
+        assert advanced['metrics']['std_dev'] == pytest.approx(_variance(sorted_amounts) ** 0.5)
+        assert advanced['trend_strength'] == pytest.approx(
+            min(abs(_slope(sorted_amounts)) / (_mean(sorted_amounts) + 1e-6), 1.0))
+        assert advanced['seasonality_score'] == pytest.approx(_seasonality(sorted_amounts))
@@ -0,0 +1,148 @@
+"""Shared project scan, its per-file findings cache and the pooled audit checks"""
+
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from flask import g
+
+from utils.project_scan import FileFindingsCache, ProjectScan
+from utils.system_auditor import SystemAuditor
+
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / 'app.py').write_text('print("hello")\n')
+    (tmp_path / 'pkg').mkdir()
+    (tmp_path / 'pkg' / 'util.py').write_text('x = 1\r\ny = 2\r\n')
+    (tmp_path / 'pkg' / 'notes.txt').write_text('not python')
+    (tmp_path / '__pycache__').mkdir()
+    (tmp_path / '__pycache__' / 'stale.py').write_text('skipped')
+    return tmp_path
+
+
+class CountingAnalyzer:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, content):
+        self.calls.append(content)
+        return len(content.splitlines())
+
+
+def _touch(path, seconds):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 1_000_000_000))
+
+
+def test_scan_reads_python_sources_once(project):
+    scan = ProjectScan(str(project), FileFindingsCache())
+
+    assert sorted(os.path.relpath(path, project) for path in scan.python_files) == ['app.py', 'pkg/util.py']
+    assert os.path.join(str(project), 'pkg', 'notes.txt') in scan.files
+    assert scan.stats['read'] == 2 and scan.stats['reused'] == 0
+    assert scan.content(str(project / 'pkg' / 'util.py')) == 'x = 1\ny = 2\n'
+    assert scan.files_under(str(project / 'pkg')) == [
+        path for path in scan.files if path.startswith(str(project / 'pkg') + os.sep)]
+
+
+def test_findings_are_reused_while_the_content_hash_matches(project):
+    cache = FileFindingsCache()
+    analyze = CountingAnalyzer()
+    path = str(project / 'app.py')
+
+    first = ProjectScan(str(project), cache)
+    assert first.findings('lines', path, analyze) == 1
+    assert first.findings('lines', path, analyze) == 1
+
+    unchanged = ProjectScan(str(project), cache)
+    assert unchanged.stats['reused'] == 2 and unchanged.stats['read'] == 0
+    assert unchanged.findings('lines', path, analyze) == 1
+
+    # A new mtime means the file is read again, but the same hash keeps the findings
+    _touch(path, 5)
+    touched = ProjectScan(str(project), cache)
+    assert touched.stats['reused'] == 2
+    assert touched.findings('lines', path, analyze) == 1
+    assert len(analyze.calls) == 1
+
+    (project / 'app.py').write_text('print("hello")\nprint("again")\n')
+    _touch(path, 10)
+    edited = ProjectScan(str(project), cache)
+    assert edited.stats['read'] == 1
+    assert edited.findings('lines', path, analyze) == 2
+    assert len(analyze.calls) == 2
+
+
+def test_each_check_caches_its_own_findings(project):
+    scan = ProjectScan(str(project), FileFindingsCache())
+    path = str(project / 'app.py')
+
+    assert scan.findings('lines', path, CountingAnalyzer()) == 1
+    assert scan.findings('chars', path, len) == len('print("hello")\n')
+
+
+def test_deleted_files_are_pruned(project):
+    cache = FileFindingsCache()
+    ProjectScan(str(project), cache)
+    os.remove(project / 'pkg' / 'util.py')
+
+    scan = ProjectScan(str(project), cache)
+
+    assert [os.path.relpath(path, project) for path in scan.python_files] == ['app.py']
+    assert set(cache._entries) == {str(project / 'app.py')}
+
+
+def test_undecodable_files_have_no_content_or_findings(project):
+    (project / 'latin.py').write_bytes(b'name = "caf\xe9"\n')
+    scan = ProjectScan(str(project), FileFindingsCache())
+    path = str(project / 'latin.py')
+
+    assert scan.content(path) is None
+    assert scan.findings('lines', path, lambda content: pytest.fail('nothing to analyze')) is None
+
+
+def test_checks_run_concurrently_in_their_own_app_contexts(app_context):
+    auditor = SystemAuditor()
+    started = threading.Barrier(2, timeout=5)
+    contexts = []
+
+    def check():
+        # Both checks must be running at once to pass the barrier
+        started.wait()
+        g.marker = object()
+        contexts.append(g.marker)
+        return {'passed': True}
+
+    def failing():
+        started.wait()
+        raise RuntimeError('disk on fire')
+
+    results = auditor._run_checks('test', {'first': check, 'second': failing})
+
+    assert results['first']['passed'] is True
+    assert results['second']['passed'] is False
+    assert results['second']['details'] == {'error': 'disk on fire', 'check': 'second'}
+    assert all(result['duration'] >= 0 for result in results.values())
+    assert 'marker' not in g
+    assert len(contexts) == 1
+
+
+def test_checks_share_one_scan_per_audit(app_context, monkeypatch):
+    auditor = SystemAuditor()
+    scans = []
+
+    def project_scan(root, cache):
+        scans.append(root)
+        return SimpleNamespace(created=time.monotonic(), stats={})
+
+    monkeypatch.setattr('utils.system_auditor.ProjectScan', project_scan)
+
+    results = auditor._run_checks('test', {
+        name: (lambda: {'passed': auditor._project_scan() is not None}) for name in ('a', 'b', 'c', 'd')
+    })
+
+    assert all(result['passed'] for result in results.values())
+    assert scans == [auditor.root_dir]
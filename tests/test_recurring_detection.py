@@ -0,0 +1,116 @@
+"""Recurring payment period fitting and calendar lookups"""
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pandas as pd
+from sqlalchemy import event
+
+from models import Transaction, db
+from recurring_detection import detect_recurring, recurring_calendar
+
+AS_OF = datetime(2025, 7, 10)
+
+
+def _history(rows):
+    return pd.DataFrame([(date, amount, description, None) for date, amount, description in rows],
+                        columns=['date', 'amount', 'description', 'account_id'])
+
+
+def _monthly(description='NETFLIX.COM', amount=-15.99, months=6, day=3):
+    return [(datetime(2025, month, day), amount, f'{description} {month:02d}/25') for month in range(1, months + 1)]
+
+
+def test_monthly_series_keeps_its_day_of_month():
+    detected = detect_recurring(_history(_monthly()), as_of=AS_OF)
+
+    assert detected['frequency'].tolist() == ['monthly']
+    series = detected.iloc[0]
+    assert series['description_key'] == 'netflix com'
+    assert series['occurrence_count'] == 6
+    assert series['next_expected_date'] == pd.Timestamp(2025, 7, 3)
+
+
+def test_weekly_series_is_fitted():
+    start = datetime(2025, 5, 1)
+    rows = [(start + timedelta(days=7 * week), -40.0, 'GYM CLASS') for week in range(8)]
+
+    detected = detect_recurring(_history(rows), as_of=AS_OF)
+
+    assert detected['frequency'].tolist() == ['weekly']
+    assert detected.iloc[0]['interval_days'] == 7.0
+
+
+def test_irregular_and_cancelled_series_are_ignored():
+    irregular = [(datetime(2025, 1, 1) + timedelta(days=offset), -25.0, 'TAXI RIDE')
+                 for offset in (0, 3, 40, 41, 90, 150)]
+    cancelled = [(datetime(2024, month, 3), -9.99, 'OLD SUBSCRIPTION') for month in range(1, 7)]
+
+    assert detect_recurring(_history(irregular + cancelled), as_of=AS_OF).empty
+
+
+def test_different_amounts_form_separate_series():
+    rows = _monthly('COUNCIL TAX', -150.0) + _monthly('COUNCIL TAX', -20.0, day=15)
+
+    detected = detect_recurring(_history(rows), as_of=AS_OF)
+
+    assert sorted(detected['expected_amount'].tolist()) == [-150.0, -20.0]
+
+
+def _calendar(user):
+    db.session.add_all([
+        Transaction(user_id=user.id, date=date, amount=amount, description=description)
+        for date, amount, description in _monthly('SPOTIFY', -11.99) + _monthly('SPOTIFY', -250.0, day=20)
+    ])
+    db.session.commit()
+    assert recurring_calendar.refresh(user.id, as_of=AS_OF) == 2
+
+
+def test_match_finds_the_series_by_description_and_amount(make_user):
+    user = make_user()
+    _calendar(user)
+
+    assert recurring_calendar.match(user.id, 'SPOTIFY 08/25', -12.10)['expected_amount'] == -11.99
+    assert recurring_calendar.match(user.id, 'SPOTIFY 08/25', -250.0)['expected_amount'] == -250.0
+    assert recurring_calendar.match(user.id, 'SPOTIFY 08/25', -90.0) is None
+    assert recurring_calendar.match(user.id, 'SPOTIFY 08/25') is not None
+    assert recurring_calendar.match(user.id, 'UNKNOWN SHOP', -11.99) is None
+
+
+@contextmanager
+def _statements():
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield executed
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def test_calendar_version_is_read_once_per_request(app, make_user):
+    user = make_user()
+    _calendar(user)
+
+    # A fresh app context, as each real request gets, so g starts empty
+    with app.app_context(), app.test_request_context():
+        recurring_calendar.match(user.id, 'SPOTIFY 08/25', -11.99)
+        with _statements() as executed:
+            for _ in range(5):
+                recurring_calendar.match(user.id, 'SPOTIFY 08/25', -11.99)
+        assert executed == []
+
+        # Version and index are both read again once invalidated
+        recurring_calendar.invalidate(user.id)
+        with _statements() as executed:
+            recurring_calendar.match(user.id, 'SPOTIFY 08/25', -11.99)
+        assert sum('recurring_payments' in statement for statement in executed) == 2
+
+    # A new request reads the version again, but the index is still current
+    with app.app_context(), app.test_request_context():
+        with _statements() as executed:
+            recurring_calendar.match(user.id, 'SPOTIFY 08/25', -11.99)
+        assert sum('recurring_payments' in statement for statement in executed) == 1
@@ -0,0 +1,97 @@
+"""RestorePipeline replaces live tables only after the whole backup loads"""
+
+import pytest
+from sqlalchemy import Column, ForeignKey, Integer, MetaData, String, Table, create_engine, inspect, select
+
+from models import db
+from utils.data_version import data_versions
+from utils.incremental_backup import ChunkStore, IncrementalBackup
+from utils.restore_pipeline import RestorePipeline
+
+metadata = MetaData()
+accounts = Table('accounts', metadata,
+                 Column('id', Integer, primary_key=True),
+                 Column('name', String(50)))
+entries = Table('entries', metadata,
+                Column('id', Integer, primary_key=True),
+                Column('account_id', Integer, ForeignKey('accounts.id')),
+                Column('memo', String(50)))
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ledger.db'}")
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(accounts.insert(), [{'id': 1, 'name': 'Rent'}, {'id': 2, 'name': 'Sales'}])
+        conn.execute(entries.insert(), [{'id': i, 'account_id': 1 + i % 2, 'memo': f'entry {i}'}
+                                        for i in range(1, 51)])
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ChunkStore(tmp_path / 'chunks')
+
+
+def _contents(engine):
+    with engine.connect() as conn:
+        return {table.name: conn.execute(select(table).order_by(table.c.id)).all()
+                for table in (accounts, entries)}
+
+
+def _edit(engine):
+    with engine.begin() as conn:
+        conn.execute(entries.delete().where(entries.c.id > 40))
+        conn.execute(accounts.update().where(accounts.c.id == 1).values(name='Premises'))
+
+
+def test_restore_replaces_tables_with_the_backup(engine, store):
+    manifest = IncrementalBackup(engine, store).create()
+    backed_up = _contents(engine)
+    _edit(engine)
+
+    report = RestorePipeline(engine, store).run(manifest)
+
+    assert report['success'] is True
+    assert report['rows'] == 52
+    assert 'replace' in report['phases']
+    assert _contents(engine) == backed_up
+
+
+def test_failed_restore_leaves_tables_untouched(engine, store):
+    manifest = IncrementalBackup(engine, store).create()
+    _edit(engine)
+    edited = _contents(engine)
+    store.find(manifest['tables']['entries']['chunks'][-1]).unlink()
+
+    report = RestorePipeline(engine, store).run(manifest)
+
+    assert report['success'] is False
+    assert 'error' in report['tables']['entries']
+    assert 'replace' not in report['phases']
+    assert _contents(engine) == edited
+    assert sorted(inspect(engine).get_table_names()) == ['accounts', 'entries']
+
+
+def test_restore_moves_cache_versions_forward(app_context, make_user, tmp_path):
+    user = make_user()
+    data_versions.bump([user.id])
+    db.session.commit()
+    store = ChunkStore(tmp_path / 'app-chunks')
+    manifest = IncrementalBackup(db.engine, store).create()
+    # Writes after the backup move the live version past the backed-up one
+    for _ in range(3):
+        data_versions.bump([user.id])
+        db.session.commit()
+    with db.engine.connect() as conn:
+        before = data_versions.snapshot(conn)
+    db.session.remove()
+
+    report = RestorePipeline(db.engine, store, after_replace=data_versions.advance).run(manifest)
+
+    assert report['success'] is True
+    with db.engine.connect() as conn:
+        after = data_versions.snapshot(conn)
+    assert all(after[name] > version for name, version in before.items())
@@ -0,0 +1,126 @@
+"""Compiled keyword automaton and combined regex rules"""
+
+import random
+import re
+
+import pytest
+
+from utils.rule_engine import CompiledRuleSet, KeywordAutomaton
+
+
+def _keywords(automaton_keywords, text):
+    automaton = KeywordAutomaton(automaton_keywords)
+    return {automaton_keywords[i] for i in automaton.find(text)}
+
+
+def _rule(keyword, category, is_regex=False, priority=1):
+    return {'keyword': keyword, 'category': category, 'is_regex': is_regex, 'priority': priority}
+
+
+def test_automaton_reports_overlapping_keywords():
+    assert _keywords(['he', 'she', 'his', 'hers'], 'ushers') == {'he', 'she', 'hers'}
+    assert _keywords(['pay', 'payment', 'ment', 'men'], 'card payment') == {'pay', 'payment', 'ment', 'men'}
+    assert _keywords(['aa', 'aaa'], 'aa') == {'aa'}
+    assert _keywords(['abcd', 'bc'], 'abce') == {'bc'}
+
+
+def test_automaton_ignores_empty_keywords_and_reports_duplicates():
+    automaton = KeywordAutomaton(['', 'tax', 'tax'])
+
+    assert automaton.find('vat tax refund') == {1, 2}
+    assert automaton.find('') == set()
+
+
+def test_automaton_matches_substring_search():
+    rng = random.Random(3)
+    keywords = sorted({''.join(rng.choice('abc') for _ in range(rng.randint(1, 4))) for _ in range(30)})
+    automaton = KeywordAutomaton(keywords)
+
+    for _ in range(200):
+        text = ''.join(rng.choice('abcd') for _ in range(rng.randint(0, 20)))
+        assert {keywords[i] for i in automaton.find(text)} == {k for k in keywords if k in text}
+
+
+def test_keyword_rules_fold_case_and_match_inside_words():
+    ruleset = CompiledRuleSet([_rule('Amazon', 'Shopping'), _rule('rent', 'Rent')])
+
+    assert ruleset.matched_rule_ids('AMAZON MKTP UK') == [0]
+    # Keyword rules have always been substring matches
+    assert ruleset.matched_rule_ids('Current account fee') == [1]
+    assert ruleset.matched_rule_ids(None) == []
+
+
+def test_regex_rules_respect_word_boundaries():
+    ruleset = CompiledRuleSet([_rule(r'\brent\b', 'Rent', is_regex=True)])
+
+    assert ruleset.matched_rule_ids('Monthly RENT payment') == [0]
+    assert ruleset.matched_rule_ids('Current account fee') == []
+
+
+def test_combined_regex_reports_every_matching_rule():
+    ruleset = CompiledRuleSet([
+        _rule(r'^tfl', 'Travel', is_regex=True),
+        _rule(r'travel\b', 'Travel', is_regex=True),
+        _rule(r'\d{4}$', 'Card', is_regex=True),
+        _rule(r'TRAVEL CHARGE', 'Travel', is_regex=True),
+        _rule('travel', 'Travel')
+    ])
+
+    assert ruleset.matched_rule_ids('TFL TRAVEL CHARGE 1234') == [0, 1, 2, 3, 4]
+    assert ruleset.matched_rule_ids('TRAVELCARD') == [4]
+    assert ruleset.matched_rule_ids('paid to tfl card 12345') == [2]
+
+
+def test_regex_rules_with_groups_flags_or_errors_are_handled_separately():
+    ruleset = CompiledRuleSet([
+        _rule(r'(uber|lyft) trip', 'Travel', is_regex=True),
+        _rule(r'(?i)coffee', 'Meals', is_regex=True),
+        _rule(r'[unclosed', 'Broken', is_regex=True),
+        _rule(r'\btrip\b', 'Travel', is_regex=True)
+    ])
+
+    assert ruleset.matched_rule_ids('LYFT TRIP and a coffee') == [0, 1, 3]
+    assert ruleset.matched_rule_ids('[unclosed') == []
+
+
+def _reference_categories(rules, description):
+    """KeywordMatcher.find_matching_categories before rules were compiled"""
+    description = description.lower()
+    matches = []
+    for rule in sorted((r for r in rules if r['is_regex']), key=lambda r: r['priority'], reverse=True):
+        if re.search(rule['keyword'], description, re.IGNORECASE):
+            matches.append({'category': rule['category'], 'confidence': 0.9,
+                            'match_type': 'custom_rule', 'rule_priority': rule['priority']})
+    keywords = {}
+    for rule in rules:
+        if not rule['is_regex']:
+            keywords.setdefault(rule['category'], set()).add(rule['keyword'].lower())
+    for category, category_keywords in keywords.items():
+        matched = [k for k in category_keywords if k in description]
+        if matched:
+            matches.append({'category': category, 'confidence': min(len(matched) * 0.3, 0.8),
+                            'match_type': 'keyword', 'matched_keywords': sorted(matched)})
+    return matches
+
+
+@pytest.mark.parametrize('description', [
+    'TESCO STORES 2231', 'Tesco Express fuel', 'SHELL PETROL STATION', 'Starbucks coffee',
+    'Salary ACME LTD', 'shell tesco starbucks', 'nothing to see here'
+])
+def test_match_categories_agree_with_the_uncompiled_matcher(description):
+    rules = [
+        _rule('tesco', 'Groceries'), _rule('stores', 'Groceries'), _rule('Express', 'Groceries'),
+        _rule('shell', 'Fuel'), _rule('petrol', 'Fuel'), _rule('coffee', 'Meals'),
+        _rule(r'\bstarbucks\b', 'Meals', is_regex=True, priority=2),
+        _rule(r'salary|wages', 'Income', is_regex=True, priority=3)
+    ]
+
+    matches = CompiledRuleSet(rules).match_categories(description)
+    for match in matches:
+        if 'matched_keywords' in match:
+            match['matched_keywords'] = sorted(k.lower() for k in match['matched_keywords'])
+
+    def key(match):
+        return match['category'], match['match_type']
+
+    assert sorted(matches, key=key) == sorted(_reference_categories(rules, description), key=key)
@@ -0,0 +1,101 @@
+"""Keyword rules are recompiled in every worker when the shared version moves"""
+
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, update
+
+from models import CacheVersion, KeywordRule, db
+from utils.rule_engine import RuleEngine
+from utils.rule_manager import RULES_CACHE_NAME, RuleManager
+
+
+@pytest.fixture
+def keyword(app_context):
+    """A keyword no other rule matches; its rules are deactivated afterwards"""
+    keyword = f'vendor{uuid.uuid4().hex[:8]}'
+    yield keyword
+    KeywordRule.query.filter(KeywordRule.keyword.like(f'%{keyword}%')).update(
+        {KeywordRule.is_active: False}, synchronize_session=False)
+    db.session.commit()
+
+
+def _worker():
+    """A rule engine as another worker process would hold it"""
+    return RuleEngine(RuleManager())
+
+
+def _categories(engine, description):
+    return [match['category'] for match in engine.match(description)]
+
+
+@contextmanager
+def _statements():
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield executed
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def test_adding_a_rule_recompiles_other_workers_on_their_next_request(app, keyword):
+    reader, writer = _worker(), _worker()
+    with app.app_context(), app.test_request_context():
+        assert _categories(reader, f'{keyword} invoice') == []
+        compiled = reader.get_ruleset()
+
+        # The writer's request has its own g
+        with app.app_context(), app.test_request_context():
+            assert writer.rule_manager.add_rule(keyword, 'Supplies')
+        # The version read earlier in the reader's request still holds
+        assert reader.get_ruleset() is compiled
+
+    with app.app_context(), app.test_request_context():
+        assert _categories(reader, f'{keyword} invoice') == ['Supplies']
+        assert reader.get_ruleset() is not compiled
+
+
+def test_bumping_the_version_from_another_session_recompiles_the_rules(app, keyword):
+    reader = _worker()
+    with app.app_context(), app.test_request_context():
+        assert _categories(reader, keyword) == []
+
+    # Another process inserts a rule and bumps the shared version itself
+    with db.engine.begin() as conn:
+        conn.execute(KeywordRule.__table__.insert().values(
+            keyword=keyword, category='Software', priority=1, is_regex=False,
+            is_active=True, created_at=datetime.utcnow()))
+        table = CacheVersion.__table__
+        if not conn.execute(update(table).where(table.c.name == RULES_CACHE_NAME)
+                            .values(version=table.c.version + 1)).rowcount:
+            conn.execute(table.insert().values(name=RULES_CACHE_NAME, version=1))
+
+    with app.app_context(), app.test_request_context():
+        assert _categories(reader, keyword) == ['Software']
+
+
+def test_rules_are_not_reloaded_while_the_version_is_unchanged(app, keyword):
+    reader = _worker()
+    with app.app_context(), app.test_request_context():
+        compiled = reader.get_ruleset()
+
+    # A rule written without bumping the version is not picked up
+    with db.engine.begin() as conn:
+        conn.execute(KeywordRule.__table__.insert().values(
+            keyword=keyword, category='Software', priority=1, is_regex=False,
+            is_active=True, created_at=datetime.utcnow()))
+
+    with app.app_context(), app.test_request_context():
+        with _statements() as executed:
+            assert reader.get_ruleset() is compiled
+            assert reader.get_ruleset() is compiled
+        # Only the version is read, once
+        assert len(executed) == 1
+        assert 'cache_versions' in executed[0]
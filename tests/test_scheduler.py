@@ -0,0 +1,70 @@
+"""Job leases that let exactly one worker run each scheduled job"""
+
+import datetime
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from models import ScheduledJob, db
+from utils import scheduler as scheduler_module
+from utils.scheduler import acquire_lease, job_executed_listener, run_leased
+
+
+@pytest.fixture
+def job(app_context):
+    job = ScheduledJob(job_id=f'job_{uuid.uuid4().hex[:8]}', description='Test job', enabled=True,
+                       success_count=0, error_count=0)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def _as_worker(monkeypatch, name):
+    monkeypatch.setattr(scheduler_module, 'worker_id', lambda: name)
+
+
+def test_two_workers_cannot_both_hold_a_lease(job, monkeypatch):
+    _as_worker(monkeypatch, 'host-a:1')
+    assert acquire_lease(job.job_id)
+
+    _as_worker(monkeypatch, 'host-b:2')
+    assert not acquire_lease(job.job_id)
+
+    _as_worker(monkeypatch, 'host-a:1')
+    # The holder renews its own lease
+    assert acquire_lease(job.job_id)
+    db.session.refresh(job)
+    assert job.lease_owner == 'host-a:1'
+
+
+def test_expired_lease_is_taken_over(job, monkeypatch):
+    _as_worker(monkeypatch, 'host-a:1')
+    assert acquire_lease(job.job_id, ttl=datetime.timedelta(seconds=-1))
+
+    _as_worker(monkeypatch, 'host-b:2')
+    assert acquire_lease(job.job_id)
+    db.session.refresh(job)
+    assert job.lease_owner == 'host-b:2'
+
+
+def test_skipped_run_records_no_status(app, job, monkeypatch):
+    leased = SimpleNamespace(app=app)
+    calls = []
+    _as_worker(monkeypatch, 'host-a:1')
+    assert acquire_lease(job.job_id)
+
+    _as_worker(monkeypatch, 'host-b:2')
+    assert run_leased(leased, job.job_id, calls.append, 'run') is None
+    assert calls == []
+    # APScheduler still reports the skipped run as executed
+    monkeypatch.setattr(scheduler_module.scheduler, 'leased_job_ids', {job.job_id})
+    job_executed_listener(SimpleNamespace(job_id=job.job_id))
+    db.session.refresh(job)
+    assert (job.last_run, job.last_status, job.success_count) == (None, None, 0)
+
+    _as_worker(monkeypatch, 'host-a:1')
+    run_leased(leased, job.job_id, calls.append, 'run')
+    assert calls == ['run']
+    db.session.refresh(job)
+    assert (job.last_status, job.success_count) == ('success', 1)
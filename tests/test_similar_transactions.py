@@ -0,0 +1,78 @@
+"""find_similar_transactions over the description dictionary matches the per-row scan it replaced"""
+
+from types import SimpleNamespace
+
+import predictive_utils
+from predictive_utils import calculate_similarity, find_similar_transactions
+
+
+def _per_row_scan(description, transactions):
+    """The implementation before descriptions were deduplicated"""
+    text_threshold = predictive_utils.TEXT_THRESHOLD
+    semantic_threshold = predictive_utils.SEMANTIC_THRESHOLD
+    matches = []
+    description_lower = description.lower().strip()
+    frequency_map = {}
+    for transaction in transactions:
+        if not transaction.description:
+            continue
+        trans_desc = transaction.description.lower().strip()
+        frequency_map[trans_desc] = frequency_map.get(trans_desc, 0) + 1
+        similarity = calculate_similarity(description_lower, trans_desc)
+        if similarity >= text_threshold:
+            frequency_boost = min(0.1, frequency_map[trans_desc] / 10)
+            matches.append({
+                'transaction': transaction,
+                'similarity': min(0.99, similarity + frequency_boost),
+                'match_type': 'pattern',
+                'frequency': frequency_map[trans_desc]
+            })
+    for transaction in transactions:
+        if not transaction.explanation or transaction in [m['transaction'] for m in matches]:
+            continue
+        explanation_similarity = calculate_similarity(description_lower, transaction.explanation.lower().strip())
+        if explanation_similarity >= semantic_threshold:
+            matches.append({
+                'transaction': transaction,
+                'similarity': explanation_similarity * 0.9,
+                'match_type': 'semantic',
+                'frequency': frequency_map.get(transaction.description.lower().strip(), 0)
+            })
+    matches.sort(key=lambda x: (x['similarity'], x['frequency']), reverse=True)
+    return matches[:5]
+
+
+def _transaction(description, explanation=None):
+    return SimpleNamespace(description=description, explanation=explanation)
+
+
+HISTORY = [
+    _transaction('AMAZON MARKETPLACE'),
+    _transaction('TESCO STORES 2231', 'Office supplies'),
+    _transaction('amazon marketplace '),
+    _transaction('AMAZON MKTPLACE'),
+    _transaction('Amazon Marketplace', 'amazon marketplace order'),
+    _transaction('SHELL PETROL'),
+    _transaction('AMAZON MARKETPLACE'),
+    _transaction('OFFICE DEPOT', 'Amazon marketplace stationery'),
+    _transaction('AMAZON MKTPLACE'),
+]
+
+
+def _summary(matches):
+    return [(id(m['transaction']), round(m['similarity'], 6), m['match_type'], m['frequency'])
+            for m in matches]
+
+
+def test_results_match_the_per_row_scan():
+    for query in ['Amazon Marketplace', 'AMAZON MKTPLACE', 'office supplies', 'shell petrol']:
+        assert _summary(find_similar_transactions(query, HISTORY)) == \
+            _summary(_per_row_scan(query, HISTORY)), query
+
+
+def test_pattern_frequency_counts_occurrences_so_far():
+    matches = find_similar_transactions('amazon marketplace', HISTORY)
+
+    frequencies = {id(m['transaction']): m['frequency'] for m in matches if m['match_type'] == 'pattern'}
+    # The first, third, fifth and seventh rows share one description
+    assert [frequencies.get(id(HISTORY[row])) for row in (0, 2, 4, 6)] == [1, 2, 3, 4]
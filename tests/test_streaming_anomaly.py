@@ -0,0 +1,109 @@
+"""Insert-time anomaly scoring and its running statistics"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from models import Account, AlertConfiguration, AlertHistory, Transaction, db
+from streaming_anomaly import RecurringStat, streaming_scorer
+from utils.data_version import data_versions
+
+
+def _ledger(make_user):
+    user = make_user()
+    account = Account(name='Supplies', type='Expense', code=f'{user.id}-SUP', user_id=user.id)
+    db.session.add(account)
+    db.session.add(AlertConfiguration(user_id=user.id, alert_type='anomaly', is_active=True))
+    db.session.commit()
+    return user, account
+
+
+def _spend(user, account, amount, days_ago=1, description='STATIONERY ORDER'):
+    return Transaction(user_id=user.id, account_id=account.id, amount=amount, description=description,
+                       date=datetime.utcnow() - timedelta(days=days_ago))
+
+
+def _baseline(user, account):
+    for day, amount in enumerate([-50, -52, -48, -51, -49, -50, -53, -47]):
+        db.session.add(_spend(user, account, amount, days_ago=30 - day))
+        db.session.commit()
+
+
+def _alerts(user):
+    return AlertHistory.query.filter_by(user_id=user.id).order_by(AlertHistory.id).all()
+
+
+def _statistics(user, account):
+    stat = streaming_scorer._states[user.id].categories[account.id]
+    return stat.count, stat.mean, stat.variance
+
+
+def test_outlier_insert_raises_an_alert(make_user):
+    user, account = _ledger(make_user)
+    _baseline(user, account)
+    seen = len(_alerts(user))
+
+    outlier = _spend(user, account, -5000, description='LAPTOP PURCHASE')
+    db.session.add(outlier)
+    db.session.commit()
+
+    alerts = _alerts(user)[seen:]
+    assert len(alerts) == 1
+    assert alerts[0].severity == 'high'
+    assert f'(Transaction ID: {outlier.id})' in alerts[0].alert_message
+
+
+def test_rolled_back_inserts_leave_statistics_unchanged(make_user):
+    user, account = _ledger(make_user)
+    _baseline(user, account)
+    before = _statistics(user, account)
+    seen = len(_alerts(user))
+
+    db.session.add_all([_spend(user, account, -5000), _spend(user, account, -7000)])
+    db.session.flush()
+    db.session.rollback()
+
+    assert _statistics(user, account) == before
+    assert len(_alerts(user)) == seen
+
+
+def test_committed_inserts_are_folded_in(make_user):
+    user, account = _ledger(make_user)
+    _baseline(user, account)
+    count, _, _ = _statistics(user, account)
+
+    db.session.add(_spend(user, account, -51))
+    db.session.commit()
+
+    assert _statistics(user, account)[0] == count + 1
+
+
+def test_writes_from_elsewhere_rebuild_statistics(make_user):
+    user, account = _ledger(make_user)
+    _baseline(user, account)
+    count, _, _ = _statistics(user, account)
+
+    # Another worker's bulk insert, which this process never scored
+    db.session.execute(insert(Transaction.__table__).values(
+        user_id=user.id, account_id=account.id, amount=-49, description='STATIONERY ORDER',
+        date=datetime.utcnow() - timedelta(days=2)))
+    data_versions.bump([user.id])
+    db.session.commit()
+    db.session.add(_spend(user, account, -50))
+    db.session.commit()
+
+    assert _statistics(user, account)[0] == count + 2
+
+
+def test_backfilled_payment_does_not_move_the_recurring_cadence():
+    stat = RecurringStat()
+    start = datetime(2025, 1, 1)
+    for month in range(4):
+        stat.update(start + timedelta(days=30 * month), -100.0)
+    interval = (stat.interval_days.count, stat.interval_days.mean)
+
+    stat.update(datetime(2024, 6, 1), -100.0)
+
+    assert stat.last_date == start + timedelta(days=90)
+    assert (stat.interval_days.count, stat.interval_days.mean) == interval
+    assert stat.expected_next_date() == start + timedelta(days=120)
@@ -0,0 +1,45 @@
+"""Vectorized description normalizers agree with their scalar versions"""
+
+import pandas as pd
+import pytest
+
+from utils.text_normalization import (description_key, description_keys, normalize_description,
+                                      normalize_descriptions)
+
+DESCRIPTIONS = [
+    None,
+    '',
+    '   ',
+    'PAYMENT TO ACME LTD 12345',
+    'Trans from  Savings\t0042',
+    '  Costa Coffee #123, London  ',
+    'PRET-A-MANGER 17/03 REF 998877',
+    'payment to payment to twice 1',
+    'Café Noël – 2025',
+    'AMAZON MKTPLACE*2K4 AB12',
+    '12345',
+    'DD BRITISH GAS  ',
+    'x' * 250,
+]
+
+
+@pytest.mark.parametrize('description', DESCRIPTIONS)
+def test_normalize_descriptions_matches_normalize_description(description):
+    vectorized = normalize_descriptions(pd.Series([description], dtype=object))
+
+    assert vectorized.iloc[0] == normalize_description(description)
+
+
+@pytest.mark.parametrize('description', DESCRIPTIONS)
+def test_description_keys_matches_description_key(description):
+    vectorized = description_keys(pd.Series([description], dtype=object))
+
+    assert vectorized.iloc[0] == description_key(description)
+
+
+def test_whole_series_is_normalized_in_order():
+    series = pd.Series(DESCRIPTIONS, dtype=object)
+
+    assert normalize_descriptions(series).tolist() == [normalize_description(d) for d in DESCRIPTIONS]
+    assert description_keys(series).tolist() == [description_key(d) for d in DESCRIPTIONS]
+
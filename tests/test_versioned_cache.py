@@ -0,0 +1,37 @@
+"""Per-user cache entries served by data version, age and recency"""
+
+from datetime import datetime, timedelta
+
+from utils.versioned_cache import VersionedCache
+
+
+def test_entry_is_served_only_at_its_version():
+    cache = VersionedCache(size=4)
+    cache.put(1, 7, 'summary')
+
+    assert cache.get(1, 7) == 'summary'
+    assert cache.get(1, 8) is None
+    assert cache.latest(1) == 'summary'
+
+
+def test_entry_expires_after_the_ttl():
+    cache = VersionedCache(size=4, ttl=timedelta(minutes=5))
+    built = datetime(2025, 1, 1, 12, 0)
+    cache.put(1, 7, 'context', now=built)
+
+    assert cache.get(1, 7, now=built + timedelta(minutes=4)) == 'context'
+    assert cache.get(1, 7, now=built + timedelta(minutes=5)) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = VersionedCache(size=2)
+    cache.put(1, 1, 'a')
+    cache.put(2, 1, 'b')
+    cache.get(1, 1)
+    cache.put(3, 1, 'c')
+
+    assert list(cache) == [1, 3]
+    cache.invalidate(1)
+    assert list(cache) == [3]
+    cache.invalidate()
+    assert len(cache) == 0
@@ -135,6 +135,55 @@ class AuditService:
         
         return True
 
+    def log_bulk_activity(self,
+                          user_id: Optional[int],
+                          action: str,
+                          resource_type: str,
+                          entries: List[Dict],
+                          status: str = 'success') -> int:
+        """
+        Add one audit record per entry to the current session in a single insert
+
+        Unlike log_activity the records are not buffered or committed, so
+        they succeed or fail together with the bulk change they describe.
+
+        Args:
+            user_id: ID of the user performing the action
+            action: Type of action applied to every resource
+            resource_type: Type of the resources
+            entries: Dictionaries with resource_id and optional description
+                and additional_data
+            status: Status of the action
+
+        Returns:
+            int: Number of records added
+        """
+        if self._disabled or not entries:
+            return 0
+
+        from models import AuditLog, db
+
+        ip_address = user_agent = None
+        if has_request_context():
+            ip_address = request.remote_addr
+            user_agent = request.user_agent.string
+
+        now = datetime.utcnow()
+        db.session.bulk_insert_mappings(AuditLog, [{
+            'timestamp': now,
+            'user_id': user_id,
+            'action': action,
+            'resource_type': resource_type,
+            'resource_id': str(entry['resource_id']) if entry.get('resource_id') is not None else None,
+            'description': entry.get('description'),
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'status': status,
+            'additional_data': json.dumps(self._sanitize_data(entry['additional_data']))
+            if entry.get('additional_data') else None
+        } for entry in entries])
+        return len(entries)
+
     def _sanitize_data(self, data: Dict) -> Dict:
         """Remove sensitive information from data"""
         if not data:
@@ -0,0 +1,313 @@
+"""
+Backup Catalog
+A small SQLite index of every backup in the backups directory: timestamp,
+mode, size, checksum, the incremental backup it was built on and its last
+verification. Listing and closest-backup lookups read the index instead of
+scanning and parsing every metadata file, and verification only re-reads
+backup files that are new or have changed since they were last verified.
+Opening a catalog lists the directory and catalogues any backup written
+without it, so the index cannot silently fall behind the files.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILE_NAME = 'catalog.db'
+TIMESTAMP_FORMAT = '%Y%m%d_%H%M%S'
+CHECKSUM_BLOCK_SIZE = 1024 * 1024
+METADATA_SUFFIX = '_metadata.json'
+
+STATUS_UNVERIFIED = 'unverified'
+STATUS_VERIFIED = 'verified'
+STATUS_FAILED = 'failed'
+STATUS_MISSING = 'missing'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS backups (
+    timestamp TEXT PRIMARY KEY,
+    mode TEXT NOT NULL,
+    database TEXT,
+    file TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    checksum TEXT NOT NULL,
+    base_timestamp TEXT,
+    metadata TEXT NOT NULL,
+    file_size INTEGER NOT NULL,
+    file_mtime REAL NOT NULL,
+    verification_status TEXT NOT NULL DEFAULT 'unverified',
+    verified_at TEXT,
+    verification_error TEXT
+)
+"""
+
+
+def file_checksum(path: Path) -> str:
+    """SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(CHECKSUM_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class BackupCatalog:
+    """SQLite-backed index of the backups in one directory"""
+
+    def __init__(self, backup_dir: Path):
+        self.backup_dir = Path(backup_dir)
+        self.backup_dir.mkdir(exist_ok=True)
+        self.path = self.backup_dir / CATALOG_FILE_NAME
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(SCHEMA)
+        self.reconcile()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _entry(row: sqlite3.Row) -> Dict[str, Any]:
+        """Catalog row in the {'file', 'metadata'} shape list_backups has always returned"""
+        return {
+            'file': row['file'],
+            'metadata': json.loads(row['metadata']),
+            'checksum': row['checksum'],
+            'base_timestamp': row['base_timestamp'],
+            'verification_status': row['verification_status'],
+            'verified_at': row['verified_at']
+        }
+
+    def record(self, backup_file: Path, metadata: Dict[str, Any], base_timestamp: Optional[str] = None) -> None:
+        """
+        Add or replace a backup in the catalog
+
+        Args:
+            backup_file: The backup file (dump, SQLite copy or manifest)
+            metadata: Metadata written alongside the backup
+            base_timestamp: Incremental backup this one was built on, if any
+        """
+        backup_file = Path(backup_file)
+        stat = backup_file.stat()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO backups (timestamp, mode, database, file, size, checksum, "
+                "base_timestamp, metadata, file_size, file_mtime, verification_status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (metadata['timestamp'], metadata.get('mode', 'full'), metadata.get('database'),
+                 str(backup_file), metadata.get('size', stat.st_size), file_checksum(backup_file),
+                 base_timestamp, json.dumps(metadata), stat.st_size, stat.st_mtime, STATUS_UNVERIFIED)
+            )
+
+    def remove(self, timestamp: str) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM backups WHERE timestamp = ?", (timestamp,))
+
+    def entries(self, mode: Optional[str] = None) -> List[Dict[str, Any]]:
+        """All catalogued backups, oldest first"""
+        with self._connect() as conn:
+            if mode:
+                rows = conn.execute("SELECT * FROM backups WHERE mode = ? ORDER BY timestamp", (mode,))
+            else:
+                rows = conn.execute("SELECT * FROM backups ORDER BY timestamp")
+            return [self._entry(row) for row in rows]
+
+    def latest(self, mode: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            if mode:
+                row = conn.execute("SELECT * FROM backups WHERE mode = ? ORDER BY timestamp DESC LIMIT 1",
+                                   (mode,)).fetchone()
+            else:
+                row = conn.execute("SELECT * FROM backups ORDER BY timestamp DESC LIMIT 1").fetchone()
+        return self._entry(row) if row else None
+
+    def closest_before(self, target_timestamp: datetime) -> Optional[Dict[str, Any]]:
+        """
+        The newest backup taken at or before the target time
+
+        Timestamps sort chronologically as text, so this is a single
+        descending seek on the primary key index.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM backups WHERE timestamp <= ? ORDER BY timestamp DESC LIMIT 1",
+                (target_timestamp.strftime(TIMESTAMP_FORMAT),)
+            ).fetchone()
+        return self._entry(row) if row else None
+
+    def older_than(self, cutoff: datetime) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM backups WHERE timestamp < ? ORDER BY timestamp",
+                                (cutoff.strftime(TIMESTAMP_FORMAT),))
+            return [self._entry(row) for row in rows]
+
+    def mark(self, timestamp: str, status: str, error: Optional[str] = None) -> None:
+        """Record the outcome of verifying a backup (checksum check or verified restore)"""
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE backups SET verification_status = ?, verified_at = ?, verification_error = ? "
+                "WHERE timestamp = ?",
+                (status, datetime.now().isoformat(), error, timestamp)
+            )
+
+    def verify(self, chunk_exists=None) -> Dict[str, int]:
+        """
+        Check backup files against their recorded checksums
+
+        Only backups that are unverified, or whose file size or modification
+        time changed since they were catalogued, are read again.
+
+        Args:
+            chunk_exists: Optional callable telling whether an incremental
+                chunk digest is present in the chunk store
+
+        Returns:
+            Counts of backups per outcome: checked, skipped, verified,
+            failed and missing
+        """
+        counts = {'checked': 0, 'skipped': 0, STATUS_VERIFIED: 0, STATUS_FAILED: 0, STATUS_MISSING: 0}
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM backups ORDER BY timestamp").fetchall()
+
+        for row in rows:
+            path = Path(row['file'])
+            if not path.exists():
+                if row['verification_status'] != STATUS_MISSING:
+                    self.mark(row['timestamp'], STATUS_MISSING, 'Backup file not found')
+                counts[STATUS_MISSING] += 1
+                continue
+
+            stat = path.stat()
+            unchanged = stat.st_mtime == row['file_mtime'] and stat.st_size == row['file_size']
+            if unchanged and row['verification_status'] == STATUS_VERIFIED:
+                counts['skipped'] += 1
+                counts[STATUS_VERIFIED] += 1
+                continue
+
+            counts['checked'] += 1
+            error = None
+            if file_checksum(path) != row['checksum']:
+                error = 'Checksum mismatch'
+            elif row['mode'] == 'incremental' and chunk_exists is not None:
+                with open(path, 'r') as f:
+                    manifest = json.load(f)
+                missing = [digest for entry in manifest['tables'].values()
+                           for digest in entry['chunks'] if not chunk_exists(digest)]
+                if missing:
+                    error = f"{len(missing)} chunks missing"
+
+            status = STATUS_FAILED if error else STATUS_VERIFIED
+            self.mark(row['timestamp'], status, error)
+            counts[status] += 1
+
+        return counts
+
+    def reconcile(self) -> int:
+        """
+        Catalogue backups in the directory that the catalog does not list
+
+        Only the directory listing and the catalogued timestamps are
+        compared; metadata files are read just for backups that are new to
+        the catalog, such as those written by an older version or copied in.
+
+        Returns:
+            Number of backups added
+        """
+        with self._connect() as conn:
+            rows = conn.execute("SELECT timestamp, mode FROM backups").fetchall()
+        known = {row['timestamp'] for row in rows}
+        new_files = [path for path in self.backup_dir.glob(f'*{METADATA_SUFFIX}')
+                     if _metadata_timestamp(path) not in known]
+        if not new_files:
+            return 0
+
+        metadata_list = []
+        for metadata_file in new_files:
+            try:
+                with open(metadata_file, 'r') as f:
+                    metadata_list.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable backup metadata {metadata_file}: {str(e)}")
+
+        # Each incremental backup was built on the one before it
+        incrementals = sorted([row['timestamp'] for row in rows if row['mode'] == 'incremental']
+                              + [m['timestamp'] for m in metadata_list
+                                 if m.get('mode') == 'incremental' and m.get('timestamp')])
+        added = 0
+        for metadata in sorted(metadata_list, key=lambda m: m.get('timestamp', '')):
+            backup_file = self._backup_file(metadata)
+            if backup_file is None or metadata['timestamp'] in known:
+                continue
+            base = None
+            if metadata.get('mode') == 'incremental':
+                position = incrementals.index(metadata['timestamp'])
+                base = incrementals[position - 1] if position else None
+            try:
+                self.record(backup_file, metadata, base_timestamp=base)
+                added += 1
+            except OSError as e:
+                logger.warning(f"Could not catalogue backup {backup_file}: {str(e)}")
+
+        logger.info(f"Backup catalog picked up {added} backups from {self.backup_dir}")
+        return added
+
+    def rebuild(self) -> int:
+        """
+        Re-create the catalog from the metadata files in the backup directory
+
+        Verification results are discarded along with the old entries.
+
+        Returns:
+            Number of backups catalogued
+        """
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM backups")
+        return self.reconcile()
+
+    def _backup_file(self, metadata: Dict[str, Any]) -> Optional[Path]:
+        timestamp = metadata.get('timestamp')
+        if not timestamp:
+            return None
+        if metadata.get('mode') == 'incremental':
+            candidates = [f"backup_{timestamp}.manifest.json"]
+        elif metadata.get('database') == 'sqlite':
+            candidates = [f"backup_{timestamp}.db", f"sqlite_backup_{timestamp}.db"]
+        else:
+            candidates = [f"backup_{timestamp}.sql"]
+        for name in candidates:
+            path = self.backup_dir / name
+            if path.exists():
+                return path
+        return None
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM backups").fetchone()[0]
+
+
+def _metadata_timestamp(metadata_file: Path) -> str:
+    """Timestamp in a backup_<timestamp>_metadata.json file name"""
+    name = metadata_file.name[:-len(METADATA_SUFFIX)]
+    return name.rsplit('backup_', 1)[-1]
+
+
+def backup_age_days(entry: Dict[str, Any], now: Optional[datetime] = None) -> int:
+    """Whole days since a catalogued backup was taken"""
+    taken = datetime.strptime(entry['metadata']['timestamp'], TIMESTAMP_FORMAT)
+    return ((now or datetime.now()) - taken).days
+
@@ -3,24 +3,36 @@ import os
 import subprocess
 import sqlite3
 import json
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Optional, Any
-from flask_apscheduler import APScheduler
 from sqlalchemy import create_engine, text
 
+from utils.backup_catalog import STATUS_FAILED, STATUS_VERIFIED, BackupCatalog
+from utils.data_version import data_versions
+from utils.incremental_backup import CHUNK_DIR_NAME, ChunkStore, IncrementalBackup
+from utils.restore_pipeline import DEFAULT_RESTORE_JOBS, RestorePipeline
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 'full' keeps the pg_dump / SQLite copy; 'incremental' writes only changed
+# chunks and is opt-in, per manager or through the BACKUP_MODE setting
+DEFAULT_BACKUP_MODE = 'full'
+
 class DatabaseBackupManager:
     """Manages database backups and restorations"""
     
-    def __init__(self, database_url: str):
+    def __init__(self, database_url: str, mode: str = DEFAULT_BACKUP_MODE):
         """Initialize the backup manager with database configuration"""
         self.database_url = database_url
+        self.mode = mode
         self.backup_dir = Path('backups')
         self.backup_dir.mkdir(exist_ok=True)
+        self._chunk_store = None
+        self.catalog = BackupCatalog(self.backup_dir)
         
         # Parse database URL for pg_dump/pg_restore
         try:
@@ -54,11 +66,87 @@ class DatabaseBackupManager:
             logger.error(f"Database URL parsing failed: {str(e)}")
             raise
     
-    def create_backup(self) -> Optional[Dict[str, Any]]:
-        """Create a new database backup"""
+    @property
+    def chunk_store(self) -> ChunkStore:
+        if self._chunk_store is None:
+            self._chunk_store = ChunkStore(self.backup_dir / CHUNK_DIR_NAME)
+        return self._chunk_store
+
+    def _manifest_file(self, timestamp: str) -> Path:
+        return self.backup_dir / f"backup_{timestamp}.manifest.json"
+
+    def _load_manifest(self, backup: Dict[str, Any]) -> Dict[str, Any]:
+        with open(backup['file'], 'r') as f:
+            return json.load(f)
+
+    def _create_incremental_backup(self, timestamp: str) -> Optional[Dict[str, Any]]:
+        """Back up only the tables and chunks that changed since the last incremental backup"""
+        try:
+            previous = None
+            base = self.catalog.latest(mode='incremental')
+            if base:
+                try:
+                    previous = self._load_manifest(base)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Ignoring unreadable previous manifest: {str(e)}")
+                    base = None
+
+            manifest_file = self._manifest_file(timestamp)
+            # Until the manifest is written nothing references the new chunks,
+            # so garbage collection must wait for it
+            with self.chunk_store.locked():
+                engine = create_engine(self.database_url)
+                try:
+                    manifest = IncrementalBackup(engine, self.chunk_store).create(previous)
+                finally:
+                    engine.dispose()
+
+                with open(manifest_file, 'w') as f:
+                    json.dump(manifest, f)
+
+            stats = manifest['stats']
+            metadata = {
+                'timestamp': timestamp,
+                'database': self.db_info['database'],
+                'mode': 'incremental',
+                'size': stats['written_bytes'] + os.path.getsize(manifest_file),
+                'logical_size': stats['logical_bytes'],
+                'changed_tables': stats['changed_tables'],
+                'duration_seconds': stats['duration_seconds']
+            }
+            if self.db_info['database'] == 'sqlite':
+                metadata['path'] = self.db_info.get('path')
+
+            metadata_file = self.backup_dir / f"backup_{timestamp}_metadata.json"
+            with open(metadata_file, 'w') as f:
+                json.dump(metadata, f)
+            self.catalog.record(manifest_file, metadata,
+                                base_timestamp=base['metadata']['timestamp'] if previous else None)
+
+            logger.info(f"Incremental backup created: {manifest_file} "
+                        f"({len(stats['changed_tables'])} tables changed, {stats['written_bytes']} bytes written)")
+            return {
+                'file': str(manifest_file),
+                'metadata': metadata
+            }
+
+        except Exception as e:
+            logger.error(f"Incremental backup failed: {str(e)}")
+            return None
+
+    def create_backup(self, mode: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Create a new database backup
+
+        Args:
+            mode: 'incremental' or 'full'; defaults to the manager's mode
+        """
         try:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            
+
+            if (mode or self.mode) == 'incremental':
+                return self._create_incremental_backup(timestamp)
+
             # Check if this is SQLite or PostgreSQL
             if 'database' in self.db_info and self.db_info['database'] == 'sqlite':
                 # Handle SQLite backup
@@ -93,6 +181,7 @@ class DatabaseBackupManager:
                     metadata_file = self.backup_dir / f"backup_{timestamp}_metadata.json"
                     with open(metadata_file, 'w') as f:
                         json.dump(metadata, f)
+                    self.catalog.record(backup_file, metadata)
                     
                     logger.info(f"SQLite backup created successfully: {backup_file}")
                     return {
@@ -139,6 +228,7 @@ class DatabaseBackupManager:
                     metadata_file = self.backup_dir / f"backup_{timestamp}_metadata.json"
                     with open(metadata_file, 'w') as f:
                         json.dump(metadata, f)
+                    self.catalog.record(backup_file, metadata)
                     
                     logger.info(f"PostgreSQL backup created successfully: {backup_file}")
                     return {
@@ -153,113 +243,199 @@ class DatabaseBackupManager:
             logger.error(f"Error creating backup: {str(e)}")
             return None
     
-    def restore_to_timestamp(self, target_timestamp: datetime) -> bool:
+    def restore_to_timestamp(self, target_timestamp: datetime, jobs: Optional[int] = None) -> bool:
         """
         Restore database to the closest backup before the target timestamp
         
         Args:
             target_timestamp: Target datetime to restore to
+            jobs: Parallel restore jobs; defaults to DEFAULT_RESTORE_JOBS
             
         Returns:
             bool: True if restoration was successful
         """
+        return self.restore_with_report(target_timestamp, jobs=jobs)['success']
+
+    def restore_with_report(self, target_timestamp: datetime, jobs: Optional[int] = None,
+                            verify: bool = True) -> Dict[str, Any]:
+        """
+        Restore the closest backup before the target timestamp and report how it went
+
+        Args:
+            target_timestamp: Target datetime to restore to
+            jobs: Parallel restore jobs; defaults to DEFAULT_RESTORE_JOBS
+            verify: Verify each restored table against an incremental manifest
+
+        Returns:
+            Dictionary with success, the backup timestamp and mode, phase
+            timings in seconds and, for incremental backups, per-table rows,
+            timings and verification results
+        """
+        started = time.perf_counter()
+        jobs = jobs or DEFAULT_RESTORE_JOBS
+        report = {'success': False, 'backup': None, 'mode': None, 'jobs': jobs, 'tables': {}, 'phases': {}}
         try:
             # Find closest backup before target timestamp
             backup = self._find_closest_backup(target_timestamp)
+            report['phases']['locate'] = round(time.perf_counter() - started, 3)
             if not backup:
                 logger.error("No suitable backup found for restoration")
-                return False
+                return report
             
             backup_file = Path(backup['file'])
             if not backup_file.exists():
                 logger.error(f"Backup file not found: {backup_file}")
-                return False
+                return report
+
+            report['backup'] = backup['metadata']['timestamp']
+            report['mode'] = backup['metadata'].get('mode', 'full')
             
             # Check if this is a SQLite or PostgreSQL backup
             database_type = backup['metadata'].get('database', '')
-            
-            if database_type == 'sqlite':
-                # Handle SQLite restoration
-                try:
-                    # Determine destination path - use the path in metadata or fallback to default
-                    dest_path = backup['metadata'].get('path')
-                    if not dest_path:
-                        dest_path = os.path.join(os.getcwd(), 'instance', 'dev.db')
-                    
-                    # Make sure the directory exists
-                    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-                    
-                    # Connect to backup
-                    backup_conn = sqlite3.connect(str(backup_file))
-                    # Connect to destination (may or may not exist yet)
-                    dest_conn = sqlite3.connect(dest_path)
-                    
-                    # Backup from source to destination (reverse of create_backup)
-                    backup_conn.backup(dest_conn)
-                    
-                    # Close connections
-                    backup_conn.close()
-                    dest_conn.close()
-                    
-                    logger.info(f"Successfully restored SQLite DB from backup: {backup['metadata']['timestamp']}")
-                    return True
-                except Exception as e:
-                    logger.error(f"SQLite restoration failed: {str(e)}")
-                    return False
+
+            if report['mode'] == 'incremental':
+                pipeline_report = self._restore_incremental(backup, jobs, verify)
+                report.update(pipeline_report, phases=dict(report['phases'], **pipeline_report.get('phases', {})))
+                if verify:
+                    self.catalog.mark(report['backup'], STATUS_VERIFIED if report['success'] else STATUS_FAILED,
+                                      None if report['success'] else 'Verified restore failed')
             else:
-                # Handle PostgreSQL restoration
-                # Prepare pg_restore command
-                cmd = [
-                    'pg_restore',
-                    '--clean',
-                    '--if-exists',
-                    f"--host={self.db_info['host']}",
-                    f"--port={self.db_info['port']}",
-                    f"--username={self.db_info['user']}",
-                    f"--dbname={self.db_info['database']}",
-                    str(backup_file)
-                ]
-                
-                env = os.environ.copy()
-                env['PGPASSWORD'] = self.db_info['password']
-                
-                result = subprocess.run(cmd, env=env, capture_output=True, text=True)
-                
-                if result.returncode == 0:
-                    logger.info(f"Successfully restored PostgreSQL DB from backup: {backup['metadata']['timestamp']}")
-                    return True
+                restore_started = time.perf_counter()
+                database_url = self._restore_target_url(backup)
+                previous_versions = self._cache_versions(database_url)
+                if database_type == 'sqlite':
+                    report['success'] = self._restore_sqlite_copy(backup_file, backup)
+                    report['jobs'] = 1
                 else:
-                    logger.error(f"PostgreSQL restore failed: {result.stderr}")
-                    return False
-                
+                    report['success'] = self._pg_restore(backup_file, backup, jobs)
+                if report['success']:
+                    self._advance_cache_versions(database_url, previous_versions)
+                report['phases']['restore'] = round(time.perf_counter() - restore_started, 3)
+
         except Exception as e:
             logger.error(f"Error during restoration: {str(e)}")
-            return False
-    
-    def _find_closest_backup(self, target_timestamp: datetime) -> Optional[Dict[str, Any]]:
-        """Find the closest backup before the target timestamp"""
+            report['success'] = False
+
+        report['phases']['total'] = round(time.perf_counter() - started, 3)
+        return report
+
+    def _restore_sqlite_copy(self, backup_file: Path, backup: Dict[str, Any]) -> bool:
+        """Copy a full SQLite backup over the database file"""
         try:
-            backups = self.list_backups()
-            if not backups:
-                return None
+            # Determine destination path - use the path in metadata or fallback to default
+            dest_path = backup['metadata'].get('path')
+            if not dest_path:
+                dest_path = os.path.join(os.getcwd(), 'instance', 'dev.db')
             
-            closest_backup = None
-            smallest_diff = timedelta.max
+            # Make sure the directory exists
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
             
-            for backup in backups:
-                backup_time = datetime.strptime(
-                    backup['metadata']['timestamp'],
-                    '%Y%m%d_%H%M%S'
-                )
-                
-                if backup_time <= target_timestamp:
-                    diff = target_timestamp - backup_time
-                    if diff < smallest_diff:
-                        smallest_diff = diff
-                        closest_backup = backup
+            # Connect to backup
+            backup_conn = sqlite3.connect(str(backup_file))
+            # Connect to destination (may or may not exist yet)
+            dest_conn = sqlite3.connect(dest_path)
+            
+            # Backup from source to destination (reverse of create_backup)
+            backup_conn.backup(dest_conn)
             
-            return closest_backup
+            # Close connections
+            backup_conn.close()
+            dest_conn.close()
             
+            logger.info(f"Successfully restored SQLite DB from backup: {backup['metadata']['timestamp']}")
+            return True
+        except Exception as e:
+            logger.error(f"SQLite restoration failed: {str(e)}")
+            return False
+
+    def _pg_restore(self, backup_file: Path, backup: Dict[str, Any], jobs: int) -> bool:
+        """Restore a full pg_dump backup, loading tables and indexes in parallel jobs"""
+        # Custom-format dumps support parallel restore
+        cmd = [
+            'pg_restore',
+            '--clean',
+            '--if-exists',
+            f"--jobs={jobs}",
+            f"--host={self.db_info['host']}",
+            f"--port={self.db_info['port']}",
+            f"--username={self.db_info['user']}",
+            f"--dbname={self.db_info['database']}",
+            str(backup_file)
+        ]
+        
+        env = os.environ.copy()
+        env['PGPASSWORD'] = self.db_info['password']
+        
+        result = subprocess.run(cmd, env=env, capture_output=True, text=True)
+        
+        if result.returncode == 0:
+            logger.info(f"Successfully restored PostgreSQL DB from backup: {backup['metadata']['timestamp']}")
+            return True
+        else:
+            logger.error(f"PostgreSQL restore failed: {result.stderr}")
+            return False
+    
+    def _restore_target_url(self, backup: Dict[str, Any]) -> str:
+        """Database a backup is restored into"""
+        if backup['metadata'].get('database') == 'sqlite':
+            dest_path = backup['metadata'].get('path') or os.path.join(os.getcwd(), 'instance', 'dev.db')
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            return f"sqlite:///{dest_path}"
+        return self.database_url
+
+    def _cache_versions(self, database_url: str) -> Dict[str, int]:
+        """Cache versions in the target before a full restore overwrites them"""
+        engine = create_engine(database_url)
+        try:
+            with engine.connect() as conn:
+                return data_versions.snapshot(conn)
+        except Exception as e:
+            logger.warning(f"Could not read cache versions before restoring: {str(e)}")
+            return {}
+        finally:
+            engine.dispose()
+
+    def _advance_cache_versions(self, database_url: str, previous: Dict[str, int]) -> None:
+        """Move cache versions past their pre-restore values so no worker serves a stale cache"""
+        engine = create_engine(database_url)
+        try:
+            with engine.begin() as conn:
+                data_versions.advance(conn, previous)
+        except Exception as e:
+            logger.error(f"Could not advance cache versions after restoring: {str(e)}")
+        finally:
+            engine.dispose()
+
+    def _restore_incremental(self, backup: Dict[str, Any], jobs: int, verify: bool = True) -> Dict[str, Any]:
+        """Reassemble an incremental backup's chunks into the database"""
+        try:
+            database_url = self._restore_target_url(backup)
+            manifest = self._load_manifest(backup)
+            engine = create_engine(database_url)
+            try:
+                report = RestorePipeline(engine, self.chunk_store, jobs=jobs,
+                                         after_replace=data_versions.advance).run(manifest, verify=verify)
+            finally:
+                engine.dispose()
+
+            if report['success']:
+                logger.info(f"Restored {report['rows']} rows in {len(report['tables'])} tables "
+                            f"from incremental backup {backup['metadata']['timestamp']} "
+                            f"with {report['jobs']} jobs: {report['phases']}")
+            else:
+                failures = {name: result.get('error') or result.get('verify_error')
+                            for name, result in report['tables'].items()
+                            if result.get('error') or not result.get('verified', True)}
+                logger.error(f"Incremental restoration failed or did not verify: {failures}")
+            return report
+        except Exception as e:
+            logger.error(f"Incremental restoration failed: {str(e)}")
+            return {'success': False, 'tables': {}, 'phases': {}}
+
+    def _find_closest_backup(self, target_timestamp: datetime) -> Optional[Dict[str, Any]]:
+        """Find the closest backup before the target timestamp"""
+        try:
+            return self.catalog.closest_before(target_timestamp)
         except Exception as e:
             logger.error(f"Error finding closest backup: {str(e)}")
             return None
@@ -293,37 +469,7 @@ class DatabaseBackupManager:
     def list_backups(self) -> List[Dict[str, Any]]:
         """List all available backups with their metadata"""
         try:
-            backups = []
-            for metadata_file in self.backup_dir.glob('*_metadata.json'):
-                with open(metadata_file, 'r') as f:
-                    metadata = json.load(f)
-                
-                # Check if this is SQLite or PostgreSQL backup
-                database_type = metadata.get('database', '')
-                
-                if database_type == 'sqlite':
-                    # For SQLite backups, check .db extension
-                    backup_file = self.backup_dir / f"backup_{metadata['timestamp']}.db"
-                else:
-                    # For PostgreSQL backups, check .sql extension
-                    backup_file = self.backup_dir / f"backup_{metadata['timestamp']}.sql"
-                
-                # Also check for alternative naming - for backward compatibility
-                if not backup_file.exists():
-                    # Try sqlite_backup_ prefix for SQLite backups
-                    alt_backup_file = self.backup_dir / f"sqlite_backup_{metadata['timestamp']}.db"
-                    if alt_backup_file.exists():
-                        backup_file = alt_backup_file
-                
-                # Only add if the backup file actually exists
-                if backup_file.exists():
-                    backups.append({
-                        'file': str(backup_file),
-                        'metadata': metadata
-                    })
-            
-            return sorted(backups, key=lambda x: x['metadata']['timestamp'])
-            
+            return self.catalog.entries()
         except Exception as e:
             logger.error(f"Error listing backups: {str(e)}")
             return []
@@ -331,41 +477,51 @@ class DatabaseBackupManager:
     def cleanup_old_backups(self, keep_days=7):
         """Remove backups older than specified days"""
         try:
-            cutoff_date = datetime.now().timestamp() - (keep_days * 24 * 60 * 60)
-            for backup in self.list_backups():
-                backup_time = datetime.strptime(
-                    backup['metadata']['timestamp'],
-                    '%Y%m%d_%H%M%S'
-                ).timestamp()
+            for backup in self.catalog.older_than(datetime.now() - timedelta(days=keep_days)):
+                backup_file = Path(backup['file'])
+                metadata_file = self.backup_dir / f"backup_{backup['metadata']['timestamp']}_metadata.json"
                 
-                if backup_time < cutoff_date:
-                    backup_file = Path(backup['file'])
-                    metadata_file = self.backup_dir / f"{backup_file.stem}_metadata.json"
+                if backup_file.exists():
+                    backup_file.unlink()
+                if metadata_file.exists():
+                    metadata_file.unlink()
+                self.catalog.remove(backup['metadata']['timestamp'])
                     
-                    if backup_file.exists():
-                        backup_file.unlink()
-                    if metadata_file.exists():
-                        metadata_file.unlink()
-                        
-                    logger.info(f"Removed old backup: {backup_file}")
+                logger.info(f"Removed old backup: {backup_file}")
+
+            # Chunks are shared, so only those no remaining manifest uses can go;
+            # the exclusive lock waits out backups still writing theirs
+            with self.chunk_store.locked(exclusive=True):
+                referenced = set()
+                for manifest_file in self.backup_dir.glob('backup_*.manifest.json'):
+                    with open(manifest_file, 'r') as f:
+                        for entry in json.load(f)['tables'].values():
+                            referenced.update(entry['chunks'])
+                removed = self.chunk_store.collect_garbage(referenced)
+            if removed:
+                logger.info(f"Removed {removed} unreferenced backup chunks")
                     
         except Exception as e:
             logger.error(f"Error cleaning up old backups: {str(e)}")
 
-def init_backup_scheduler(app):
-    """Initialize the backup scheduler"""
-    scheduler = APScheduler()
-    
-    # Configure scheduler
-    app.config['SCHEDULER_API_ENABLED'] = True
-    app.config['SCHEDULER_EXECUTORS'] = {
-        'default': {'type': 'threadpool', 'max_workers': 5}
-    }
-    
-    scheduler.init_app(app)
+def init_backup_scheduler(app, scheduler=None):
+    """
+    Initialize the backup jobs
+
+    Args:
+        app: Flask application instance
+        scheduler: Scheduler to register with; defaults to the application's
+            scheduler, whose leases keep backups to one worker
+    """
+    if scheduler is None:
+        scheduler = getattr(app, 'apscheduler', None)
+    if scheduler is None:
+        from utils.scheduler import init_scheduler
+        scheduler = init_scheduler(app)
     
     # Create backup manager instance
-    backup_manager = DatabaseBackupManager(app.config['SQLALCHEMY_DATABASE_URI'])
+    backup_manager = DatabaseBackupManager(app.config['SQLALCHEMY_DATABASE_URI'],
+                                           mode=app.config.get('BACKUP_MODE', DEFAULT_BACKUP_MODE))
     
     # Add jobs
     scheduler.add_job(
@@ -373,7 +529,9 @@ def init_backup_scheduler(app):
         func=backup_manager.create_backup,
         trigger='cron',
         hour=0,  # Run at midnight
-        minute=0
+        minute=0,
+        replace_existing=True,
+        name='Daily Database Backup'
     )
     
     scheduler.add_job(
@@ -381,9 +539,10 @@ def init_backup_scheduler(app):
         func=backup_manager.cleanup_old_backups,
         trigger='cron',
         hour=1,  # Run at 1 AM
-        minute=0
+        minute=0,
+        replace_existing=True,
+        name='Backup Cleanup'
     )
     
-    scheduler.start()
     logger.info("Backup scheduler initialized")
     return scheduler
@@ -6,6 +6,8 @@ import logging
 import secrets
 from functools import wraps
 from flask import request, session, abort, current_app
+from flask_wtf.csrf import validate_csrf
+from wtforms import ValidationError
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -27,10 +29,14 @@ def validate_csrf_token(token):
         logger.warning("CSRF validation failed: Session token missing")
         return False
     
-    # Add debug logging
+    # Templates render Flask-WTF's signed form of the session token, since
+    # CSRFProtect replaces the csrf_token template global
     if token != session_token:
-        logger.warning(f"CSRF token mismatch: {token[:10]}... != {session_token[:10]}...")
-        return False
+        try:
+            validate_csrf(token)
+        except ValidationError:
+            logger.warning(f"CSRF token mismatch: {token[:10]}... != {session_token[:10]}...")
+            return False
     
     return True
 
@@ -66,7 +72,8 @@ def init_csrf(app):
         
         # Only check for POST/PUT/PATCH/DELETE
         if request.method in ['POST', 'PUT', 'PATCH', 'DELETE']:
-            token = request.form.get('csrf_token')
+            # JSON APIs send the token in a header
+            token = request.form.get('csrf_token') or request.headers.get('X-CSRFToken')
             if not validate_csrf_token(token):
                 logger.error(f"CSRF validation failed for {request.endpoint}")
                 abort(400, "The CSRF session token is missing or invalid.")
@@ -0,0 +1,154 @@
+"""
+Per-User Data Versions
+
+A CacheVersion row per user ('user_data:<id>') that is incremented in the
+same database transaction as any flush touching that user's transactions or
+accounts. Caches of derived data (dashboard aggregates, forecasts, chat
+context) remember the version they were built at and rebuild exactly when it
+moves, in every worker process, for the price of one primary-key lookup.
+
+Set-based writes that bypass the ORM unit of work (Query.update, Core
+statements) must call data_versions.bump() themselves. Restores, which
+replace data underneath every cache at once, call advance().
+"""
+
+import logging
+from datetime import datetime
+from itertools import chain
+from typing import Dict, Iterable, Optional
+
+from flask import g, has_app_context, has_request_context
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from models import db, Account, CacheVersion, Transaction, User
+
+logger = logging.getLogger(__name__)
+
+VERSION_NAME_PREFIX = 'user_data:'
+# Models whose changes invalidate a user's derived data
+TRACKED_MODELS = (Transaction, Account)
+# Request-scoped memo so each user's version is read at most once per request
+_REQUEST_VERSIONS_ATTR = '_user_data_versions'
+
+
+def version_name(user_id: int) -> str:
+    return f'{VERSION_NAME_PREFIX}{user_id}'
+
+
+class DataVersionTracker:
+    """Maintains and reads the per-user data versions"""
+
+    def __init__(self):
+        self._listeners_registered = False
+
+    def init_app(self, app):
+        """Register the session hook that bumps versions on every flush"""
+        if not self._listeners_registered:
+            event.listen(Session, 'after_flush', self._bump_flushed)
+            self._listeners_registered = True
+
+    def _bump_flushed(self, session: Session, flush_context) -> None:
+        """Bump the version of every user whose tracked rows this flush changed"""
+        user_ids = set()
+        for obj in chain(session.new, session.dirty, session.deleted):
+            if not isinstance(obj, TRACKED_MODELS) or obj.user_id is None:
+                continue
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+            user_ids.add(obj.user_id)
+        if user_ids:
+            self.bump(user_ids, session.connection())
+
+    def bump(self, user_ids: Iterable[int], connection=None) -> None:
+        """
+        Increment users' versions as part of the current transaction
+
+        Args:
+            user_ids: Users whose derived data changed
+            connection: Connection of the transaction making the change;
+                defaults to the current session's
+        """
+        connection = connection or db.session.connection()
+        table = CacheVersion.__table__
+        now = datetime.utcnow()
+        # Sorted so concurrent bumps always lock rows in the same order
+        for user_id in sorted(set(user_ids)):
+            name = version_name(user_id)
+            increment = update(table).where(table.c.name == name).values(
+                version=table.c.version + 1, updated_at=now
+            )
+            if connection.execute(increment).rowcount:
+                continue
+            try:
+                with connection.begin_nested():
+                    connection.execute(insert(table).values(name=name, version=1, updated_at=now))
+            except IntegrityError:
+                # Another worker created the row first
+                connection.execute(increment)
+
+        if has_app_context():
+            memo = g.get(_REQUEST_VERSIONS_ATTR)
+            if memo:
+                for user_id in user_ids:
+                    memo.pop(user_id, None)
+
+    def snapshot(self, connection) -> Dict[str, int]:
+        """Every cache version by name, e.g. to read them before a restore"""
+        table = CacheVersion.__table__
+        return {name: version for name, version in connection.execute(select(table.c.name, table.c.version))}
+
+    def advance(self, connection, previous: Optional[Dict[str, int]] = None) -> None:
+        """
+        Move every cache version past its current value and its value in
+        previous, giving each user a version row
+
+        After a restore, a worker that cached something at version N must
+        never see N again, even when the restored rows carry older versions.
+
+        Args:
+            connection: Connection of the restoring transaction
+            previous: Versions read before the restore replaced the table
+        """
+        table = CacheVersion.__table__
+        now = datetime.utcnow()
+        current = self.snapshot(connection)
+        previous = previous or {}
+        user_ids = connection.execute(select(User.__table__.c.id)).scalars()
+        user_names = [version_name(user_id) for user_id in user_ids]
+        for name in sorted(set(current) | set(previous) | set(user_names)):
+            version = max(current.get(name, 0), previous.get(name, 0)) + 1
+            if name in current:
+                connection.execute(update(table).where(table.c.name == name).values(version=version, updated_at=now))
+            else:
+                connection.execute(insert(table).values(name=name, version=version, updated_at=now))
+
+    def version(self, user_id: int) -> Optional[int]:
+        """
+        A user's current data version, read at most once per request
+
+        Returns:
+            The version (0 before the first change), or None when it cannot
+            be read, in which case callers should not trust their caches
+        """
+        memo = None
+        if has_request_context():
+            memo = g.setdefault(_REQUEST_VERSIONS_ATTR, {})
+            if user_id in memo:
+                return memo[user_id]
+
+        try:
+            version = db.session.query(CacheVersion.version).filter_by(
+                name=version_name(user_id)
+            ).scalar() or 0
+        except SQLAlchemyError as e:
+            logger.error(f"Database error reading data version for user {user_id}: {str(e)}")
+            return None
+
+        if memo is not None:
+            memo[user_id] = version
+        return version
+
+
+data_versions = DataVersionTracker()
@@ -0,0 +1,145 @@
+"""
+Description Dictionary
+
+Interns transaction descriptions so matchers work on unique normalized
+descriptions instead of individual rows. Bank descriptions repeat heavily, so
+a history of thousands of rows usually collapses to a few hundred entries;
+each raw string is normalized once and similarity is scored once per entry.
+"""
+
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from utils.fuzzy_scoring import CandidateFilter
+
+
+def default_normalize(description: str) -> str:
+    """Case- and edge-whitespace-insensitive description key"""
+    return (description or '').lower().strip()
+
+
+@dataclass
+class DescriptionEntry:
+    """One unique normalized description and what is known about it"""
+    id: int
+    key: str
+    # Rows in the whole working set with this key, not a running count
+    frequency: int = 0
+    rows: List[int] = field(default_factory=list)
+    explanations: Counter = field(default_factory=Counter)
+    accounts: Counter = field(default_factory=Counter)
+
+    def top_explanation(self) -> Optional[str]:
+        """Most frequent explanation given to this description, if any"""
+        return self.explanations.most_common(1)[0][0] if self.explanations else None
+
+    def account_distribution(self) -> Dict[Any, float]:
+        """Share of rows assigned to each account"""
+        total = sum(self.accounts.values())
+        return {account: count / total for account, count in self.accounts.items()} if total else {}
+
+
+class DescriptionDictionary:
+    """Maps each unique normalized description of a working set to an entry"""
+
+    def __init__(self, normalize: Callable[[str], str] = default_normalize):
+        """
+        Args:
+            normalize: Function producing the key descriptions are grouped by
+        """
+        self.normalize = normalize
+        self.entries: List[DescriptionEntry] = []
+        self._ids_by_key: Dict[str, int] = {}
+        # Raw strings seen so far, so repeats skip normalization entirely
+        self._ids_by_raw: Dict[str, int] = {}
+        self._row_count = 0
+        self._candidate_filter: Optional[CandidateFilter] = None
+
+    @classmethod
+    def from_records(cls, records: Iterable[Any], normalize: Callable[[str], str] = default_normalize,
+                     description: str = 'description', explanation: str = 'explanation',
+                     account: str = 'account_id', key: Optional[str] = None) -> 'DescriptionDictionary':
+        """
+        Build a dictionary over dictionaries or model objects
+
+        Args:
+            records: Transaction dicts or objects, in row order
+            normalize: Key function for descriptions
+            description, explanation, account: Field names read from each record
+            key: Optional field holding an already normalized description
+        """
+        dictionary = cls(normalize)
+        for record in records:
+            if isinstance(record, dict):
+                dictionary.add(record.get(description), record.get(explanation), record.get(account),
+                               record.get(key) if key else None)
+            else:
+                dictionary.add(getattr(record, description, None), getattr(record, explanation, None),
+                               getattr(record, account, None), getattr(record, key, None) if key else None)
+        return dictionary
+
+    def add(self, description: Optional[str], explanation: Optional[str] = None,
+            account: Any = None, key: Optional[str] = None) -> int:
+        """
+        Intern the next row's description and return its entry id
+
+        Args:
+            description: Raw description
+            explanation: Explanation given to the row, if any
+            account: Account the row is assigned to, if any
+            key: Precomputed normalized description; computed when omitted
+        """
+        raw = description or ''
+        entry_id = self._ids_by_raw.get(raw)
+        if entry_id is None:
+            if key is None:
+                key = self.normalize(raw)
+            entry_id = self._ids_by_key.get(key)
+            if entry_id is None:
+                entry_id = len(self.entries)
+                self._ids_by_key[key] = entry_id
+                self.entries.append(DescriptionEntry(entry_id, key))
+                self._candidate_filter = None
+            self._ids_by_raw[raw] = entry_id
+
+        entry = self.entries[entry_id]
+        entry.frequency += 1
+        entry.rows.append(self._row_count)
+        if explanation:
+            entry.explanations[explanation] += 1
+        if account:
+            entry.accounts[account] += 1
+        self._row_count += 1
+        return entry_id
+
+    def get(self, description: str) -> Optional[DescriptionEntry]:
+        """Entry whose key matches description once normalized"""
+        entry_id = self._ids_by_raw.get(description or '')
+        if entry_id is None:
+            entry_id = self._ids_by_key.get(self.normalize(description or ''))
+        return self.entries[entry_id] if entry_id is not None else None
+
+    def candidate_filter(self) -> CandidateFilter:
+        """Fuzzy-match prefilter over the entry keys, built once per set of entries"""
+        if self._candidate_filter is None:
+            self._candidate_filter = CandidateFilter([entry.key for entry in self.entries])
+        return self._candidate_filter
+
+    def row_keys(self) -> List[str]:
+        """Normalized key of every interned row, in row order"""
+        keys = [''] * self._row_count
+        for entry in self.entries:
+            for row in entry.rows:
+                keys[row] = entry.key
+        return keys
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[DescriptionEntry]:
+        return iter(self.entries)
+
+    @property
+    def row_count(self) -> int:
+        return self._row_count
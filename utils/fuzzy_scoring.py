@@ -0,0 +1,202 @@
+"""
+Fuzzy Scoring
+
+Threshold-aware string similarity. Matchers only need a score when it clears
+a threshold, so instead of computing every full edit distance the candidates
+are first screened with vectorized length and character-histogram bounds and
+the survivors are scored with a Levenshtein distance that stops as soon as it
+exceeds the largest distance that could still pass.
+"""
+
+import math
+from difflib import SequenceMatcher
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from Levenshtein import distance
+
+# Characters are folded into this many histogram buckets; collisions only
+# loosen the bounds, they never reject a string that could match
+HISTOGRAM_BUCKETS = 64
+# Strings shorter than this fraction of the other never match
+MIN_LENGTH_RATIO = 0.5
+
+
+def _score(edit_distance: int, min_len: int, max_len: int) -> float:
+    """Length-penalized similarity for a known edit distance"""
+    similarity = 1 - (edit_distance / max_len)
+    length_similarity = min_len / max_len
+    final_similarity = similarity * (0.8 + 0.2 * length_similarity)
+    return max(0.0, min(1.0, final_similarity))
+
+
+def levenshtein_similarity(str1: str, str2: str) -> float:
+    """Normalized Levenshtein similarity with a penalty for differing lengths"""
+    if not str1 or not str2:
+        return 0.0
+    if str1 == str2:
+        return 1.0
+
+    len1, len2 = len(str1), len(str2)
+    max_len, min_len = max(len1, len2), min(len1, len2)
+    if min_len / max_len < MIN_LENGTH_RATIO:
+        return 0.0
+
+    return _score(distance(str1, str2), min_len, max_len)
+
+
+def max_distance(threshold: float, len1: int, len2: int) -> int:
+    """Largest edit distance for which levenshtein_similarity can still reach threshold"""
+    max_len, min_len = max(len1, len2), min(len1, len2)
+    allowed = max_len * (1 - threshold / (0.8 + 0.2 * (min_len / max_len)))
+    # Small tolerance so float rounding never rejects a pair sitting exactly on the threshold
+    return math.floor(allowed + 1e-9)
+
+
+def bounded_levenshtein_similarity(str1: str, str2: str, threshold: float) -> float:
+    """
+    levenshtein_similarity when it is at least threshold, otherwise 0.0
+
+    The distance computation gives up once it passes max_distance, so
+    clearly different strings cost far less than a full distance.
+    """
+    if not str1 or not str2:
+        return 0.0
+    if str1 == str2:
+        return 1.0
+
+    len1, len2 = len(str1), len(str2)
+    max_len, min_len = max(len1, len2), min(len1, len2)
+    if min_len / max_len < MIN_LENGTH_RATIO:
+        return 0.0
+
+    cutoff = max_distance(threshold, len1, len2)
+    if cutoff < max_len - min_len:
+        return 0.0
+    edit_distance = distance(str1, str2, score_cutoff=cutoff)
+    if edit_distance > cutoff:
+        return 0.0
+
+    similarity = _score(edit_distance, min_len, max_len)
+    return similarity if similarity >= threshold else 0.0
+
+
+def ratio_at_least(str1: str, str2: str, threshold: float) -> float:
+    """
+    SequenceMatcher ratio when it is at least threshold, otherwise 0.0
+
+    Uses difflib's own length and character-count upper bounds before the
+    full matching-blocks computation.
+    """
+    if not str1 or not str2:
+        return 0.0
+    matcher = SequenceMatcher(None, str1, str2)
+    if matcher.real_quick_ratio() < threshold or matcher.quick_ratio() < threshold:
+        return 0.0
+    ratio = matcher.ratio()
+    return ratio if ratio >= threshold else 0.0
+
+
+def _histograms(texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Lengths and bucketed character counts of every text, without a Python loop per character"""
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+    codes = np.frombuffer(''.join(texts).encode('utf-32-le'), dtype=np.uint32)
+    owners = np.repeat(np.arange(len(texts)), lengths)
+    flat = owners * HISTOGRAM_BUCKETS + (codes % HISTOGRAM_BUCKETS)
+    counts = np.bincount(flat, minlength=len(texts) * HISTOGRAM_BUCKETS)
+    return lengths, counts.reshape(len(texts), HISTOGRAM_BUCKETS).astype(np.int16)
+
+
+class CandidateFilter:
+    """Vectorized prefilter over a fixed list of strings"""
+
+    def __init__(self, texts: Sequence[str]):
+        self.texts = list(texts)
+        if self.texts:
+            self.lengths, self.histograms = _histograms(self.texts)
+        else:
+            self.lengths = np.zeros(0, dtype=np.int64)
+            self.histograms = np.zeros((0, HISTOGRAM_BUCKETS), dtype=np.int16)
+
+    def _length_bounds(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        shorter = np.minimum(self.lengths, len(query))
+        longer = np.maximum(self.lengths, len(query))
+        return shorter, longer
+
+    def _histogram_difference(self, query: str, indices: np.ndarray) -> np.ndarray:
+        """Total absolute bucket difference between query and each indexed text"""
+        _, query_histogram = _histograms([query])
+        return np.abs(self.histograms[indices].astype(np.int32) - query_histogram[0]).sum(axis=1)
+
+    def levenshtein_candidates(self, query: str, threshold: float) -> np.ndarray:
+        """
+        Indices of texts whose levenshtein_similarity to query may reach threshold
+
+        The edit distance is at least the length difference and at least the
+        larger one-sided character-count difference, which is half the total
+        difference plus half the length difference. The cheap length bound
+        runs over every text; histograms are only compared for survivors.
+        """
+        if not query or not self.texts:
+            return np.zeros(0, dtype=np.int64)
+        shorter, longer = self._length_bounds(query)
+        safe_longer = np.maximum(longer, 1)
+        length_ratio = shorter / safe_longer
+        allowed = np.floor(safe_longer * (1 - threshold / (0.8 + 0.2 * length_ratio)) + 1e-9)
+        length_gap = longer - shorter
+
+        indices = np.flatnonzero((self.lengths > 0) & (length_ratio >= MIN_LENGTH_RATIO)
+                                 & (length_gap <= allowed))
+        lower_bound = (self._histogram_difference(query, indices) + length_gap[indices]) // 2
+        return indices[lower_bound <= allowed[indices]]
+
+    def ratio_candidates(self, query: str, threshold: float) -> np.ndarray:
+        """
+        Indices of texts whose SequenceMatcher ratio to query may reach threshold
+
+        Matched characters can exceed neither the shorter length nor the
+        shared character counts (half the summed lengths minus half the
+        total count difference).
+        """
+        if not query or not self.texts:
+            return np.zeros(0, dtype=np.int64)
+        shorter, _ = self._length_bounds(query)
+        total = self.lengths + len(query)
+        indices = np.flatnonzero((self.lengths > 0) & (2.0 * shorter >= threshold * total))
+        shared = (total[indices] - self._histogram_difference(query, indices)) / 2
+        return indices[2.0 * shared >= threshold * total[indices]]
+
+
+def levenshtein_matches(query: str, texts: Sequence[str], threshold: float,
+                        candidate_filter: CandidateFilter = None) -> List[Tuple[int, float]]:
+    """
+    Texts whose levenshtein_similarity to query is at least threshold
+
+    Args:
+        query: String to match
+        texts: Strings to search
+        threshold: Minimum similarity
+        candidate_filter: Prebuilt filter over texts, reused across queries
+
+    Returns:
+        (index, similarity) pairs in index order
+    """
+    candidate_filter = candidate_filter or CandidateFilter(texts)
+    matches = []
+    for index in candidate_filter.levenshtein_candidates(query, threshold):
+        similarity = bounded_levenshtein_similarity(query, texts[index], threshold)
+        if similarity:
+            matches.append((int(index), similarity))
+    return matches
+
+
+def ratio_matches(query: str, texts: Sequence[str], threshold: float,
+                  candidate_filter: CandidateFilter = None) -> List[Tuple[int, float]]:
+    """Texts whose SequenceMatcher ratio to query is at least threshold, as (index, ratio) pairs"""
+    candidate_filter = candidate_filter or CandidateFilter(texts)
+    matches = []
+    for index in candidate_filter.ratio_candidates(query, threshold):
+        ratio = ratio_at_least(query, texts[index], threshold)
+        if ratio:
+            matches.append((int(index), ratio))
+    return matches
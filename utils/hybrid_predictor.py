@@ -4,6 +4,8 @@ Hybrid prediction module combining multiple approaches for account suggestions
 import logging
 from typing import List, Dict, Any
 
+from utils.rule_engine import CompiledRuleSet
+
 class HybridPredictor:
     """
     Combines multiple prediction approaches to provide account suggestions:
@@ -40,6 +42,9 @@ class HybridPredictor:
             {'keyword': 'insurance', 'account_name': 'Insurance Expense', 'confidence': 0.85},
             {'keyword': 'internet', 'account_name': 'Internet Expense', 'confidence': 0.8}
         ]
+        self.keyword_ruleset = CompiledRuleSet([
+            dict(rule, category=rule['account_name']) for rule in self.keyword_rules
+        ])
     
     def get_keyword_suggestions(self, description: str) -> List[Dict]:
         """Get suggestions based on keyword matching"""
@@ -48,16 +53,11 @@ class HybridPredictor:
             if not description:
                 return []
                 
-            suggestions = []
-            for rule in self.keyword_rules:
-                if rule['keyword'] in description:
-                    suggestions.append({
-                        'category': rule['account_name'],
-                        'confidence': rule['confidence'],
-                        'match_type': 'keyword'
-                    })
-                    
-            return suggestions
+            return [{
+                'category': rule['account_name'],
+                'confidence': rule['confidence'],
+                'match_type': 'keyword'
+            } for rule in self.keyword_ruleset.matched_rules(description)]
             
         except Exception as e:
             self.logger.error(f"Error in keyword suggestions: {str(e)}")
@@ -0,0 +1,454 @@
+"""
+Incremental Database Backups
+Dumps tables as ordered JSON rows split into content-defined chunks, stored
+once each under their SHA-256 in a compressed chunk store shared by every
+backup. Tables whose change signature (row count, highest id, latest
+updated_at) matches the previous backup are not read at all, so backup time
+and size follow the amount of change rather than the size of the database.
+
+Every table is read inside one transaction; on PostgreSQL it is a
+SERIALIZABLE READ ONLY DEFERRABLE one, the snapshot pg_dump uses, so parent
+and child rows in a backup always agree. Backups hold a shared lock on the
+chunk store while they write chunks and their manifest, and garbage
+collection holds it exclusively, so chunks of a backup in progress are never
+collected.
+"""
+
+import base64
+import fcntl
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time as time_module
+import zlib
+from contextlib import contextmanager
+from datetime import date, datetime, time
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import MetaData, func, inspect, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+CHUNK_DIR_NAME = 'chunks'
+# Content-defined chunking: a chunk ends after a row whose hash matches the
+# mask once it has reached the minimum size, or unconditionally at the maximum
+MIN_CHUNK_BYTES = 16 * 1024
+MAX_CHUNK_BYTES = 256 * 1024
+BOUNDARY_MASK = 0xFF
+ZSTD_LEVEL = 3
+GZIP_LEVEL = 6
+CHANGE_TRACKING_COLUMN = 'updated_at'
+# Rows per INSERT while restoring
+RESTORE_BATCH_SIZE = 1000
+MANIFEST_FORMAT = 1
+LOCK_FILE_NAME = '.lock'
+# Execution options giving a backup one consistent snapshot of the database
+SNAPSHOT_OPTIONS = {
+    'postgresql': {'isolation_level': 'SERIALIZABLE', 'postgresql_readonly': True,
+                   'postgresql_deferrable': True},
+    'mysql': {'isolation_level': 'REPEATABLE READ'},
+}
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'$d': value.isoformat()}
+    if isinstance(value, time):
+        return {'$t': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'$dec': str(value)}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {'$b64': base64.b64encode(bytes(value)).decode()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and len(value) == 1:
+        (tag, raw), = value.items()
+        if tag == '$dt':
+            return datetime.fromisoformat(raw)
+        if tag == '$d':
+            return date.fromisoformat(raw)
+        if tag == '$t':
+            return time.fromisoformat(raw)
+        if tag == '$dec':
+            return Decimal(raw)
+        if tag == '$b64':
+            return base64.b64decode(raw)
+    return value
+
+
+def encode_row(values: Iterable[Any]) -> bytes:
+    """One row as a JSON line, values in column order"""
+    return json.dumps([_encode_value(v) for v in values], separators=(',', ':')).encode() + b'\n'
+
+
+def decode_row(line: bytes, columns: List[str]) -> Dict[str, Any]:
+    return dict(zip(columns, (_decode_value(v) for v in json.loads(line))))
+
+
+def chunk_lines(lines: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Group row lines into content-defined chunks
+
+    Boundaries depend only on the rows themselves, so inserting or changing
+    a row alters the chunk holding it and leaves the others byte-identical.
+    """
+    buffer: List[bytes] = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= MAX_CHUNK_BYTES or (size >= MIN_CHUNK_BYTES and zlib.crc32(line) & BOUNDARY_MASK == 0):
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+class ChunkStore:
+    """Content-addressed, compressed chunk files shared by all incremental backups"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.codec = 'zst' if ZSTD_AVAILABLE else 'gz'
+
+    def _path(self, digest: str, codec: str) -> Path:
+        return self.root / digest[:2] / f"{digest}.{codec}"
+
+    @contextmanager
+    def locked(self, exclusive: bool = False):
+        """
+        Hold the store's lock across processes
+
+        Backups take it shared while writing chunks and their manifest;
+        garbage collection takes it exclusively, from reading the manifests
+        to deleting chunks.
+        """
+        with open(self.root / LOCK_FILE_NAME, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def find(self, digest: str) -> Optional[Path]:
+        for codec in ('zst', 'gz'):
+            path = self._path(digest, codec)
+            if path.exists():
+                return path
+        return None
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == 'zst':
+            return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+    def put(self, data: bytes) -> Tuple[str, int]:
+        """
+        Store a chunk unless an identical one is already stored
+
+        Returns:
+            Tuple of (digest, bytes written); bytes written is 0 for a
+            chunk that was deduplicated
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        if self.find(digest):
+            return digest, 0
+        path = self._path(digest, self.codec)
+        path.parent.mkdir(exist_ok=True)
+        payload = self._compress(data)
+        temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(temp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(temp_path, path)
+        return digest, len(payload)
+
+    def get(self, digest: str) -> bytes:
+        """Decompressed chunk contents, checked against their digest"""
+        path = self.find(digest)
+        if path is None:
+            raise FileNotFoundError(f"Backup chunk {digest} is missing")
+        with open(path, 'rb') as f:
+            payload = f.read()
+        if path.suffix == '.zst':
+            if not ZSTD_AVAILABLE:
+                raise RuntimeError(f"Chunk {digest} is zstd-compressed but zstandard is not installed")
+            data = zstandard.ZstdDecompressor().decompress(payload)
+        else:
+            data = gzip.decompress(payload)
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Backup chunk {digest} is corrupt")
+        return data
+
+    def collect_garbage(self, referenced: Set[str]) -> int:
+        """
+        Delete chunks no remaining backup refers to; returns the number removed
+
+        The caller must hold locked(exclusive=True) from before it read the
+        manifests that referenced was built from.
+        """
+        removed = 0
+        for path in self.root.glob('*/*.*'):
+            if path.suffix == '.tmp':
+                continue
+            if path.name.split('.', 1)[0] not in referenced:
+                path.unlink()
+                removed += 1
+        return removed
+
+
+class IncrementalBackup:
+    """Creates and restores chunked table dumps for one database"""
+
+    def __init__(self, engine: Engine, store: ChunkStore):
+        self.engine = engine
+        self.store = store
+
+    def _reflect(self, conn, only: Optional[List[str]] = None) -> MetaData:
+        metadata = MetaData()
+        metadata.reflect(bind=conn, only=only)
+        return metadata
+
+    @staticmethod
+    def _order_columns(table) -> List:
+        primary_key = list(table.primary_key.columns)
+        return primary_key or list(table.columns)
+
+    def _signature(self, conn, table) -> Optional[List]:
+        """Cheap change marker, or None when the table has no updated_at to trust"""
+        if CHANGE_TRACKING_COLUMN not in table.columns:
+            return None
+        aggregates = [func.count(), func.max(table.columns[CHANGE_TRACKING_COLUMN])]
+        primary_key = list(table.primary_key.columns)
+        if len(primary_key) == 1:
+            aggregates.append(func.max(primary_key[0]))
+        row = conn.execute(select(*aggregates).select_from(table)).one()
+        return [_encode_value(value) for value in row]
+
+    def _table_chunks(self, conn, table) -> Iterator[Tuple[bytes, int]]:
+        """The table's rows as (chunk, row count) pairs in backup order"""
+        result = conn.execution_options(stream_results=True, yield_per=RESTORE_BATCH_SIZE).execute(
+            select(table).order_by(*self._order_columns(table))
+        )
+        # JSON escapes newlines inside values, so each line is exactly one row
+        for data in chunk_lines(encode_row(row) for row in result):
+            yield data, data.count(b'\n')
+
+    def _dump_table(self, conn, table) -> Dict:
+        columns = [column.name for column in table.columns]
+        chunks, rows, logical, written = [], 0, 0, 0
+        for data, count in self._table_chunks(conn, table):
+            digest, stored = self.store.put(data)
+            chunks.append(digest)
+            rows += count
+            logical += len(data)
+            written += stored
+
+        return {
+            'columns': columns,
+            'rows': rows,
+            'chunks': chunks,
+            'logical_bytes': logical,
+            'written_bytes': written
+        }
+
+    def verify_table(self, conn, table, entry: Dict) -> Optional[str]:
+        """
+        Compare a table's current contents with its manifest entry
+
+        Rows are re-encoded exactly as a backup would, so matching chunk
+        digests prove the table holds the backed-up rows.
+
+        Returns:
+            None when the table matches, otherwise a description of the mismatch
+        """
+        digests, rows = [], 0
+        for data, count in self._table_chunks(conn, table):
+            digests.append(hashlib.sha256(data).hexdigest())
+            rows += count
+        if rows != entry['rows']:
+            return f"expected {entry['rows']} rows, found {rows}"
+        if digests != entry['chunks']:
+            return "restored rows differ from the backup"
+        return None
+
+    def _schema(self, table) -> List[str]:
+        statements = [str(CreateTable(table).compile(dialect=self.engine.dialect)).strip()]
+        statements.extend(str(CreateIndex(index).compile(dialect=self.engine.dialect)).strip()
+                          for index in table.indexes)
+        return statements
+
+    def create(self, previous: Optional[Dict] = None) -> Dict:
+        """
+        Back up every table, reusing unchanged tables from the previous manifest
+
+        Args:
+            previous: Manifest of the previous incremental backup, if any
+
+        Returns:
+            The new manifest; 'stats' summarizes what was read and written
+        """
+        started = time_module.perf_counter()
+        previous_tables = (previous or {}).get('tables', {})
+        tables, changed, written, logical = {}, [], 0, 0
+
+        with self.engine.connect() as conn, self._snapshot(conn).begin():
+            metadata = self._reflect(conn)
+            for table in metadata.sorted_tables:
+                signature = self._signature(conn, table)
+                earlier = previous_tables.get(table.name)
+                if signature is not None and earlier and earlier.get('signature') == signature:
+                    tables[table.name] = dict(earlier, written_bytes=0)
+                    continue
+
+                entry = self._dump_table(conn, table)
+                entry['signature'] = signature
+                entry['schema'] = self._schema(table)
+                tables[table.name] = entry
+                written += entry['written_bytes']
+                if not earlier or earlier.get('chunks') != entry['chunks']:
+                    changed.append(table.name)
+
+            logical = sum(entry['logical_bytes'] for entry in tables.values())
+
+        return {
+            'format': MANIFEST_FORMAT,
+            'dialect': self.engine.dialect.name,
+            'table_order': list(tables),
+            'tables': tables,
+            'stats': {
+                'changed_tables': changed,
+                'written_bytes': written,
+                'logical_bytes': logical,
+                'duration_seconds': round(time_module.perf_counter() - started, 3)
+            }
+        }
+
+    def _snapshot(self, conn):
+        """conn set up so one transaction sees every table at the same point in time"""
+        options = SNAPSHOT_OPTIONS.get(conn.dialect.name)
+        if options:
+            conn.execution_options(**options)
+        return conn
+
+    def iter_rows(self, entry: Dict, chunks: Optional[Iterable[bytes]] = None) -> Iterator[Dict]:
+        """
+        Decode an entry's rows
+
+        Args:
+            entry: Table entry from a manifest
+            chunks: The entry's chunk contents if already being fetched
+                elsewhere; read from the store in order otherwise
+        """
+        if chunks is None:
+            chunks = (self.store.get(digest) for digest in entry['chunks'])
+        for data in chunks:
+            for line in data.splitlines():
+                yield decode_row(line, entry['columns'])
+
+    def create_missing(self, conn, manifest: Dict) -> List:
+        """
+        Create the manifest's tables that the target lacks
+
+        Returns:
+            The manifest's tables, reflected from the target, parents first
+        """
+        existing = set(inspect(conn).get_table_names())
+        for name in manifest['table_order']:
+            if name not in existing:
+                for statement in manifest['tables'][name].get('schema', []):
+                    conn.execute(text(statement))
+
+        metadata = self._reflect(conn, only=manifest['table_order'])
+        return [table for table in metadata.sorted_tables if table.name in manifest['tables']]
+
+    def prepare(self, conn, manifest: Dict) -> List:
+        """
+        Create missing tables and empty the backed-up ones
+
+        Returns:
+            The manifest's tables, reflected from the target, parents first
+        """
+        ordered = self.create_missing(conn, manifest)
+        for table in reversed(ordered):
+            conn.execute(table.delete())
+        return ordered
+
+    def load_table(self, conn, table, rows: Iterable[Dict]) -> int:
+        """Insert rows in batches; returns the number inserted"""
+        batch, count = [], 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= RESTORE_BATCH_SIZE:
+                conn.execute(table.insert(), batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            conn.execute(table.insert(), batch)
+            count += len(batch)
+        self._reset_sequence(conn, table)
+        return count
+
+    def replace_from(self, conn, tables: List, sources: Dict[str, Any]) -> None:
+        """
+        Empty tables and refill each from the source table of the same name
+
+        Args:
+            tables: Target tables, parents first
+            sources: Tables with the same columns, keyed by target name
+        """
+        for table in reversed(tables):
+            conn.execute(table.delete())
+        for table in tables:
+            source = sources[table.name]
+            conn.execute(table.insert().from_select(
+                [column.name for column in source.columns], select(source)
+            ))
+            self._reset_sequence(conn, table)
+
+    def restore(self, manifest: Dict) -> Dict[str, int]:
+        """
+        Replace the contents of every backed-up table in one transaction
+
+        Tables missing from the target are created from the saved schema;
+        tables not in the manifest are left untouched.
+
+        Returns:
+            Rows restored per table
+        """
+        restored = {}
+        with self.engine.begin() as conn:
+            for table in self.prepare(conn, manifest):
+                entry = manifest['tables'][table.name]
+                restored[table.name] = self.load_table(conn, table, self.iter_rows(entry))
+
+        return restored
+
+    def _reset_sequence(self, conn, table) -> None:
+        """Move a PostgreSQL serial past the restored ids"""
+        primary_key = list(table.primary_key.columns)
+        if conn.dialect.name != 'postgresql' or len(primary_key) != 1:
+            return
+        column = primary_key[0].name
+        quote = conn.dialect.identifier_preparer.quote
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence(:table, :column), "
+            f"COALESCE((SELECT MAX({quote(column)}) FROM {quote(table.name)}), 0) + 1, false) "
+            f"WHERE pg_get_serial_sequence(:table, :column) IS NOT NULL"
+        ), {'table': quote(table.name), 'column': column})
@@ -0,0 +1,122 @@
+"""
+Per-User Model Store
+joblib persistence for fitted per-user models with an in-process cache.
+Every access compares the cached copy with the file's inode and modification
+time, so a model that another worker refit or updated is reloaded instead of
+being served stale, and writers hold a per-user file lock so a
+read-modify-write in one process cannot interleave with another's.
+"""
+
+import fcntl
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+import joblib
+
+logger = logging.getLogger(__name__)
+
+
+class ModelStore:
+    """
+    Stores one joblib file per user under model_dir
+
+    Subclasses can override encode/decode to change what is written to disk,
+    e.g. to compact weights; decode returning None discards the file.
+    """
+
+    def __init__(self, model_dir: str, kind: str = 'model'):
+        self.model_dir = model_dir
+        self.kind = kind
+        # user_id -> (file signature, decoded model state)
+        self._cache: Dict[int, Tuple[Tuple[int, int], Dict]] = {}
+        self._lock = threading.Lock()
+        self._user_locks: Dict[int, threading.Lock] = {}
+
+    def _path(self, user_id: int) -> str:
+        return os.path.join(self.model_dir, f'user_{user_id}.joblib')
+
+    def _signature(self, user_id: int) -> Optional[Tuple[int, int]]:
+        # Saves replace the file, so the inode changes even within one mtime tick
+        try:
+            stat = os.stat(self._path(user_id))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def encode(self, model_state: Dict) -> Dict:
+        """State as written to disk"""
+        return model_state
+
+    def decode(self, model_state: Dict) -> Optional[Dict]:
+        """State as read from disk, or None to discard it"""
+        return model_state
+
+    @contextmanager
+    def locked(self, user_id: int):
+        """Serialize writers to one user's model across threads and processes"""
+        with self._lock:
+            user_lock = self._user_locks.setdefault(user_id, threading.Lock())
+        os.makedirs(self.model_dir, exist_ok=True)
+        with user_lock:
+            with open(self._path(user_id) + '.lock', 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self, user_id: int) -> Optional[Dict]:
+        """
+        A user's model state, reloaded from disk when the file has changed
+
+        Returns the same object on every call until the file changes, so
+        callers can tell a reload apart from their own cached copy.
+        """
+        signature = self._signature(user_id)
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if signature is None:
+                self._cache.pop(user_id, None)
+                return None
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+        path = self._path(user_id)
+        try:
+            model_state = self.decode(joblib.load(path))
+        except Exception as e:
+            logger.warning(f"Discarding unreadable {self.kind} {path}: {str(e)}")
+            return None
+        if model_state is None:
+            return None
+        with self._lock:
+            self._cache[user_id] = (signature, model_state)
+        return model_state
+
+    def write(self, user_id: int, model_state: Dict) -> None:
+        """Write a user's model state; the caller must hold locked(user_id)"""
+        try:
+            tmp_path = self._path(user_id) + '.tmp'
+            joblib.dump(self.encode(model_state), tmp_path)
+            os.replace(tmp_path, self._path(user_id))
+        except Exception as e:
+            logger.error(f"Error persisting {self.kind} for user {user_id}: {str(e)}")
+            return
+        with self._lock:
+            self._cache[user_id] = (self._signature(user_id), model_state)
+
+    def save(self, user_id: int, model_state: Dict) -> None:
+        """Persist a user's model state to disk and memory"""
+        with self.locked(user_id):
+            self.write(user_id, model_state)
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop a user's model so the next access refits it"""
+        with self._lock:
+            self._cache.pop(user_id, None)
+        try:
+            os.remove(self._path(user_id))
+        except FileNotFoundError:
+            pass
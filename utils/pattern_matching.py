@@ -1,14 +1,20 @@
-import re
+import math
 from typing import List, Dict, Optional, Tuple
-from Levenshtein import distance
 import logging
 from collections import defaultdict
 from datetime import datetime
-import statistics
 from difflib import SequenceMatcher
 
+from utils.description_dictionary import DescriptionDictionary, DescriptionEntry
+from utils.fuzzy_scoring import levenshtein_matches, levenshtein_similarity, ratio_matches
+from utils.pattern_statistics import GroupedSeries
+from utils.text_normalization import normalize_description, normalize_text
+
 logger = logging.getLogger(__name__)
 
+# Trailing window used for the recent mean in advanced metrics
+ROLLING_WINDOW = 3
+
 class PatternMatcher:
     def __init__(self):
         self.exact_matches_cache = {}
@@ -19,58 +25,43 @@ class PatternMatcher:
         self.patterns = {}
 
     def preprocess_description(self, description: str) -> str:
-        """Standardize transaction description for matching"""
-        if not description:
-            return ""
-        try:
-            # Convert to lowercase and remove extra spaces
-            processed = description.lower().strip()
-            # Remove common prefixes/suffixes that don't affect meaning
-            processed = re.sub(r'^(payment to |payment from |trans to |trans from )', '', processed)
-            # Remove special characters but keep spaces
-            processed = re.sub(r'[^\w\s-]', '', processed)
-            # Standardize spaces
-            processed = re.sub(r'\s+', ' ', processed)
-            # Remove trailing numbers (often reference numbers)
-            processed = re.sub(r'\s+\d+$', '', processed)
-            logger.debug(f"Preprocessed description: '{description}' -> '{processed}'")
-            return processed
-        except Exception as e:
-            logger.error(f"Error preprocessing description '{description}': {str(e)}")
-            return description.lower().strip()
+        """Standardize transaction description for matching (memoized)"""
+        return normalize_description(description)
         
     def calculate_similarity(self, str1: str, str2: str) -> float:
         """
         Calculate similarity score between two strings using enhanced Levenshtein distance
         with length normalization and preprocessing
         """
-        if not str1 or not str2:
-            return 0.0
-            
-        # Handle exact matches efficiently
-        if str1 == str2:
-            return 1.0
-            
-        # Length-based early filtering
-        len1, len2 = len(str1), len(str2)
-        max_len = max(len1, len2)
-        min_len = min(len1, len2)
-        
-        # If length difference is too large, strings are likely very different
-        if max_len == 0 or min_len / max_len < 0.5:
-            return 0.0
-            
-        # Calculate normalized Levenshtein distance
-        leven_dist = distance(str1, str2)
-        similarity = 1 - (leven_dist / max_len)
-        
-        # Apply length difference penalty
-        length_similarity = min_len / max_len
-        final_similarity = similarity * (0.8 + 0.2 * length_similarity)
-        
-        return max(0.0, min(1.0, final_similarity))
+        return levenshtein_similarity(str1, str2)
+
+    def build_dictionary(self, historical_data: List[Dict]) -> DescriptionDictionary:
+        """
+        Intern the preprocessed descriptions of historical_data, in row order
+
+        Rows carrying a stored normalized_description are not normalized again.
+        """
+        return DescriptionDictionary.from_records(
+            historical_data, self.preprocess_description, account='account_name',
+            key='normalized_description'
+        )
+
+    def _similar_entries(self, processed_desc: str,
+                         dictionary: DescriptionDictionary) -> List[Tuple[DescriptionEntry, float]]:
+        """
+        Entries at least min_similarity_score similar, scoring each unique description once
+
+        Only the threshold matters here, so candidates are prefiltered and
+        scored with an edit distance bounded by the threshold.
+        """
+        matches = levenshtein_matches(
+            processed_desc, [entry.key for entry in dictionary], self.min_similarity_score,
+            dictionary.candidate_filter()
+        )
+        return [(dictionary.entries[index], similarity) for index, similarity in matches]
         
-    def find_exact_matches(self, description: str, historical_data: List[Dict]) -> List[Dict]:
+    def find_exact_matches(self, description: str, historical_data: List[Dict],
+                           dictionary: Optional[DescriptionDictionary] = None) -> List[Dict]:
         """Find exact matches in historical transactions"""
         try:
             processed_desc = self.preprocess_description(description)
@@ -80,26 +71,27 @@ class PatternMatcher:
 
             matches = []
             match_count = 0
+            dictionary = dictionary or self.build_dictionary(historical_data)
+            entry = dictionary.get(description)
             
-            for transaction in historical_data:
-                hist_desc = self.preprocess_description(transaction.get('description', ''))
-                if hist_desc == processed_desc:
-                    match_count += 1
-                    confidence = 1.0
+            for row in (entry.rows if entry else []):
+                transaction = historical_data[row]
+                match_count += 1
+                confidence = 1.0
                     
-                    # Adjust confidence based on frequency and amount similarity
-                    if 'amount' in transaction:
-                        matches.append({
-                            'confidence': confidence,
-                            'match_type': 'exact',
-                            'transaction': transaction,
-                            'match_details': {
-                                'preprocessed_description': processed_desc,
-                                'original_description': description,
-                                'matched_description': transaction.get('description', ''),
-                                'frequency': match_count
-                            }
-                        })
+                # Adjust confidence based on frequency and amount similarity
+                if 'amount' in transaction:
+                    matches.append({
+                        'confidence': confidence,
+                        'match_type': 'exact',
+                        'transaction': transaction,
+                        'match_details': {
+                            'preprocessed_description': processed_desc,
+                            'original_description': description,
+                            'matched_description': transaction.get('description', ''),
+                            'frequency': match_count
+                        }
+                    })
                     
             if matches:
                 logger.info(f"Found {len(matches)} exact matches for description '{description}'")
@@ -112,40 +104,50 @@ class PatternMatcher:
             logger.error(f"Error finding exact matches for '{description}': {str(e)}")
             return []
         
-    def find_fuzzy_matches(self, description: str, historical_data: List[Dict]) -> List[Dict]:
+    def find_fuzzy_matches(self, description: str, historical_data: List[Dict],
+                           dictionary: Optional[DescriptionDictionary] = None) -> List[Dict]:
         """
         Find similar transactions using enhanced fuzzy matching with detailed metadata
         """
         processed_desc = self.preprocess_description(description)
         if not processed_desc:
             return []
+
+        dictionary = dictionary or self.build_dictionary(historical_data)
+        matched_rows = sorted(
+            (row, entry.key, similarity)
+            for entry, similarity in self._similar_entries(processed_desc, dictionary)
+            for row in entry.rows
+        )
+
+        amounts_by_description = defaultdict(list)
+        if matched_rows:
+            for t in historical_data:
+                amounts_by_description[t.get('description')].append(t.get('amount', 0))
             
         matches = []
-        for transaction in historical_data:
-            processed_hist = self.preprocess_description(transaction.get('description', ''))
-            similarity = self.calculate_similarity(processed_desc, processed_hist)
-            
-            if similarity >= self.min_similarity_score:
-                # Calculate additional confidence factors
-                amount_similarity = 1.0
-                if 'amount' in transaction:
-                    amount_similarity = self._calculate_amount_similarity(
-                        transaction.get('amount', 0),
-                        [t.get('amount', 0) for t in historical_data if t.get('description') == transaction.get('description')]
-                    )
+        for row, processed_hist, similarity in matched_rows:
+            transaction = historical_data[row]
+            # Calculate additional confidence factors
+            amount_similarity = 1.0
+            if 'amount' in transaction:
+                amount_similarity = self._calculate_amount_similarity(
+                    transaction.get('amount', 0),
+                    amounts_by_description[transaction.get('description')]
+                )
                 
-                matches.append({
-                    'confidence': similarity,
-                    'match_type': 'fuzzy',
-                    'transaction': transaction,
-                    'match_metadata': {
-                        'similarity_score': similarity,
-                        'processed_description': processed_desc,
-                        'matched_description': processed_hist,
-                        'amount_similarity': amount_similarity,
-                        'combined_score': (similarity * 0.7 + amount_similarity * 0.3)
-                    }
-                })
+            matches.append({
+                'confidence': similarity,
+                'match_type': 'fuzzy',
+                'transaction': transaction,
+                'match_metadata': {
+                    'similarity_score': similarity,
+                    'processed_description': processed_desc,
+                    'matched_description': processed_hist,
+                    'amount_similarity': amount_similarity,
+                    'combined_score': (similarity * 0.7 + amount_similarity * 0.3)
+                }
+            })
                 
         # Sort by combined score and confidence
         matches.sort(key=lambda x: (
@@ -184,8 +186,8 @@ class PatternMatcher:
             'seasonality_analysis': defaultdict(list)
         }
         
-        for transaction in transactions:
-            desc = self.preprocess_description(transaction.get('description', ''))
+        row_keys = self.build_dictionary(transactions).row_keys()
+        for transaction, desc in zip(transactions, row_keys):
             explanation = transaction.get('explanation')
             amount = transaction.get('amount')
             account = transaction.get('account_name')
@@ -206,45 +208,46 @@ class PatternMatcher:
                     'account': account
                 })
         
-        # Calculate statistical metrics for patterns
-        for desc, temporal_data in pattern_analysis['temporal_patterns'].items():
-            if len(temporal_data) >= 2:
-                amounts = [t['amount'] for t in temporal_data]
-                # Basic statistical metrics
-                pattern_analysis['statistical_metrics'][desc] = {
-                    'mean': sum(amounts) / len(amounts),
-                    'variance': sum((x - (sum(amounts) / len(amounts))) ** 2 for x in amounts) / len(amounts),
-                    'frequency': len(temporal_data),
-                    'date_range': {
-                        'first': min(t['date'] for t in temporal_data),
-                        'last': max(t['date'] for t in temporal_data)
-                    }
+        # Calculate statistical metrics for every repeated description in one batch
+        groups = [(desc, data) for desc, data in pattern_analysis['temporal_patterns'].items() if len(data) >= 2]
+        if not groups:
+            return pattern_analysis
+
+        amount_groups = [[t['amount'] for t in data] for _, data in groups]
+        date_groups = [[t['date'] for t in data] for _, data in groups]
+        series = GroupedSeries.from_groups(amount_groups, date_groups)
+        stats = self._group_statistics(series)
+        first_dates, last_dates = series.bounds([date for dates in date_groups for date in dates])
+
+        for index, (desc, temporal_data) in enumerate(groups):
+            pattern_analysis['statistical_metrics'][desc] = {
+                'mean': stats['mean'][index],
+                'variance': stats['variance'][index],
+                'frequency': len(temporal_data),
+                'date_range': {
+                    'first': first_dates[index],
+                    'last': last_dates[index]
                 }
-                
-                # Analyze recurring patterns
-                recurring_analysis = self.analyze_recurring_patterns(temporal_data)
-                if recurring_analysis['is_recurring']:
-                    pattern_analysis['recurring_patterns'][desc].append(recurring_analysis)
-                    
-                # Analyze temporal stability
-                dates = [t['date'] for t in temporal_data]
-                stability_analysis = self.analyze_temporal_stability(amounts, dates)
-                pattern_analysis['periodicity_analysis'][desc] = stability_analysis
-                
-                # Calculate advanced metrics
-                advanced_metrics = self.calculate_advanced_metrics(amounts, dates)
-                pattern_analysis['advanced_metrics'][desc] = advanced_metrics
-                pattern_analysis['pattern_confidence'][desc] = advanced_metrics['reliability_score']
-                
-                # Analyze seasonality if enough data points
-                if len(temporal_data) >= 4:
-                    seasonality_score = self._detect_seasonality(amounts, dates)
-                    pattern_analysis['seasonality_analysis'][desc] = {
-                        'score': seasonality_score,
-                        'dates': dates,
-                        'amounts': amounts
-                    }
-                
+            }
+
+            recurring_analysis = self._recurring_result(stats, index)
+            if recurring_analysis['is_recurring']:
+                pattern_analysis['recurring_patterns'][desc].append(recurring_analysis)
+
+            pattern_analysis['periodicity_analysis'][desc] = self._stability_result(stats, index)
+
+            advanced_metrics = self._advanced_result(stats, index, first_dates[index], last_dates[index])
+            pattern_analysis['advanced_metrics'][desc] = advanced_metrics
+            pattern_analysis['pattern_confidence'][desc] = advanced_metrics['reliability_score']
+
+            # Seasonality is only meaningful with enough data points
+            if len(temporal_data) >= 4:
+                pattern_analysis['seasonality_analysis'][desc] = {
+                    'score': stats['seasonality'][index],
+                    'dates': date_groups[index],
+                    'amounts': amount_groups[index]
+                }
+
         return pattern_analysis
         
     def suggest_from_patterns(self, 
@@ -260,18 +263,22 @@ class PatternMatcher:
                 logger.warning("Empty description, cannot generate suggestions")
                 return []
             
+            # Every matcher below works over the same unique descriptions
+            dictionary = self.build_dictionary(historical_data)
+
             # Get frequency patterns first for efficiency
-            frequency_patterns = self.analyze_frequency_patterns(historical_data)
+            frequency_patterns = self.analyze_frequency_patterns(historical_data, dictionary)
             freq_match = frequency_patterns.get(processed_desc, {})
             
             # Get amount patterns
             amount_patterns = self.detect_amount_patterns(
                 {'description': description, 'amount': amount},
-                historical_data
+                historical_data,
+                dictionary
             )
             
             # Look for exact matches first - highest confidence
-            exact_matches = self.find_exact_matches(description, historical_data)
+            exact_matches = self.find_exact_matches(description, historical_data, dictionary)
             if exact_matches:
                 for match in exact_matches:
                     # Enhanced confidence scoring for exact matches
@@ -297,7 +304,7 @@ class PatternMatcher:
                 
             # If no exact matches, try fuzzy matching
             if not exact_matches:
-                fuzzy_matches = self.find_fuzzy_matches(description, historical_data)
+                fuzzy_matches = self.find_fuzzy_matches(description, historical_data, dictionary)
                 for match in fuzzy_matches:
                     # Calculate fuzzy match confidence
                     base_confidence = match['confidence']
@@ -431,64 +438,45 @@ class PatternMatcher:
         
         return min(final_confidence, 1.0)
         
-    def analyze_frequency_patterns(self, transactions: List[Dict]) -> Dict:
+    def analyze_frequency_patterns(self, transactions: List[Dict],
+                                   dictionary: Optional[DescriptionDictionary] = None) -> Dict:
         """Analyze transaction frequency patterns"""
-        # Initialize with proper typing for collections
-        frequency_patterns: Dict[str, Dict] = {}
-        
-        for transaction in transactions:
-            desc = self.preprocess_description(transaction.get('description', ''))
-            amount = transaction.get('amount', 0)
-            date = transaction.get('date')
-            account = transaction.get('account_name')
-            
-            if desc:
-                if desc not in frequency_patterns:
-                    frequency_patterns[desc] = {
-                        'count': 0,
-                        'amounts': [],
-                        'dates': [],
-                        'accounts': set()
-                    }
-                pattern = frequency_patterns[desc]
-                pattern['count'] = pattern['count'] + 1
-                if amount is not None:
-                    pattern['amounts'].append(amount)
-                if date:
-                    pattern['dates'].append(date)
-                if account:
-                    pattern['accounts'].add(account)
-                
-        # Calculate frequency metrics
+        dictionary = dictionary or self.build_dictionary(transactions)
+
+        # Only repeated descriptions are considered
         patterns = {}
-        for desc, data in frequency_patterns.items():
-            if data['count'] >= 2:  # Only consider repeated transactions
-                patterns[desc] = {
-                    'frequency': data['count'],
-                    'amount_stats': {
-                        'min': min(data['amounts']) if data['amounts'] else 0,
-                        'max': max(data['amounts']) if data['amounts'] else 0,
-                        'avg': sum(data['amounts']) / len(data['amounts']) if data['amounts'] else 0
-                    },
-                    'accounts': list(data['accounts']),
-                    'confidence': min(data['count'] / 10, 0.9)  # Cap at 0.9
-                }
+        for entry in dictionary:
+            if not entry.key or entry.frequency < 2:
+                continue
+            amounts = [
+                transactions[row].get('amount', 0) for row in entry.rows
+                if transactions[row].get('amount', 0) is not None
+            ]
+            patterns[entry.key] = {
+                'frequency': entry.frequency,
+                'amount_stats': {
+                    'min': min(amounts) if amounts else 0,
+                    'max': max(amounts) if amounts else 0,
+                    'avg': sum(amounts) / len(amounts) if amounts else 0
+                },
+                'accounts': list(entry.accounts),
+                'confidence': min(entry.frequency / 10, 0.9)  # Cap at 0.9
+            }
                 
         return patterns
         
-    def detect_amount_patterns(self, transaction: Dict, historical_data: List[Dict]) -> Dict:
+    def detect_amount_patterns(self, transaction: Dict, historical_data: List[Dict],
+                               dictionary: Optional[DescriptionDictionary] = None) -> Dict:
         """Detect patterns in transaction amounts"""
         amount = transaction.get('amount', 0)
         description = self.preprocess_description(transaction.get('description', ''))
+        dictionary = dictionary or self.build_dictionary(historical_data)
         
         # Group similar transactions
-        similar_transactions = [
-            t for t in historical_data
-            if self.calculate_similarity(
-                description,
-                self.preprocess_description(t.get('description', ''))
-            ) >= self.min_similarity_score
-        ]
+        similar_rows = sorted(
+            row for entry, _ in self._similar_entries(description, dictionary) for row in entry.rows
+        )
+        similar_transactions = [historical_data[row] for row in similar_rows]
         
         if not similar_transactions:
             return {'confidence': 0, 'patterns': {}}
@@ -517,51 +505,71 @@ class PatternMatcher:
             }
         }
         
+    @staticmethod
+    def _interval_statistics(series: GroupedSeries) -> Dict[str, list]:
+        """Run only the interval kernel, for callers that need no amount statistics"""
+        intervals = series.interval_stats()
+        return {
+            'interval_count': intervals['count'].tolist(),
+            'interval_mean': intervals['mean'].tolist(),
+            'interval_variance': intervals['variance'].tolist(),
+            'interval_cv': intervals['coefficient_variation'].tolist()
+        }
+
+    def _group_statistics(self, series: GroupedSeries) -> Dict[str, list]:
+        """Run every statistics kernel once over a grouped series"""
+        results = {
+            'count': series.counts,
+            'mean': series.mean(),
+            'variance': series.variance(),
+            'median': series.median_upper(),
+            'first': series.first(),
+            'last': series.last(),
+            'min': series.minimum(),
+            'max': series.maximum(),
+            'slope': series.slope(),
+            'relative_deviation': series.mean_relative_deviation(),
+            'seasonality': series.half_correlation(),
+            'recent_mean': series.last_rolling_mean(ROLLING_WINDOW)
+        }
+        # Plain Python scalars are much cheaper to index one group at a time
+        stats = {key: values.tolist() for key, values in results.items()}
+        stats.update(self._interval_statistics(series))
+        return stats
+
     def analyze_recurring_patterns(self, temporal_data: List[Dict]) -> Dict:
         """Analyze recurring patterns in temporal transaction data"""
         if not temporal_data or len(temporal_data) < 2:
             return {'is_recurring': False, 'confidence': 0.0}
-            
-        # Sort transactions by date
-        sorted_data = sorted(temporal_data, key=lambda x: x['date'])
-        
-        # Calculate time intervals between transactions
-        intervals = []
-        for i in range(1, len(sorted_data)):
-            interval = (sorted_data[i]['date'] - sorted_data[i-1]['date']).days
-            intervals.append(interval)
-            
-        if not intervals:
+
+        series = GroupedSeries.single([0.0] * len(temporal_data), [t['date'] for t in temporal_data])
+        return self._recurring_result(self._interval_statistics(series), 0)
+
+    def _recurring_result(self, stats: Dict[str, list], group: int) -> Dict:
+        """Build the recurring pattern result for one group from kernel output"""
+        sample_size = stats['interval_count'][group]
+        if not sample_size:
             return {'is_recurring': False, 'confidence': 0.0}
-            
-        # Analyze interval patterns
-        avg_interval = sum(intervals) / len(intervals)
-        variance = sum((x - avg_interval) ** 2 for x in intervals) / len(intervals)
-        std_dev = variance ** 0.5
-        
-        # Calculate coefficient of variation (CV) to measure regularity
-        cv = std_dev / avg_interval if avg_interval > 0 else float('inf')
-        
-        # Determine if pattern is recurring based on CV
-        is_recurring = cv < 0.5  # Less variation suggests more regular pattern
-        
-        # Calculate confidence based on regularity and sample size
+
+        avg_interval = stats['interval_mean'][group]
+        cv = stats['interval_cv'][group]
+
+        # Less variation suggests more regular pattern; more samples increase confidence
         base_confidence = max(0, 1 - cv) if cv < 1 else 0
-        sample_size_factor = min(len(intervals) / 6, 1)  # More samples increase confidence
-        confidence = base_confidence * sample_size_factor
-        
+        sample_size_factor = min(sample_size / 6, 1)
+
         return {
-            'is_recurring': is_recurring,
-            'confidence': confidence,
+            'is_recurring': cv < 0.5,
+            'confidence': base_confidence * sample_size_factor,
             'metrics': {
                 'average_interval': avg_interval,
-                'variance': variance,
+                'variance': stats['interval_variance'][group],
                 'coefficient_variation': cv,
-                'sample_size': len(intervals)
+                'sample_size': sample_size
             },
             'suggested_frequency': self._suggest_frequency(avg_interval)
         }
-        
+
     def _suggest_frequency(self, avg_interval: float) -> str:
         """Suggest transaction frequency based on average interval"""
         if avg_interval < 2:
@@ -576,43 +584,42 @@ class PatternMatcher:
             return 'quarterly'
         else:
             return 'annually'
-            
+
     def analyze_temporal_stability(self, amounts: List[float], dates: List[datetime]) -> Dict:
         """Analyze the stability of transaction amounts over time"""
         if not amounts or not dates or len(amounts) != len(dates):
             return {'stability': 0.0, 'trend': 'unknown'}
-            
-        # Sort by date
-        amount_date_pairs = sorted(zip(dates, amounts), key=lambda x: x[0])
-        sorted_amounts = [pair[1] for pair in amount_date_pairs]
-        
-        # Calculate trend
-        if len(sorted_amounts) >= 2:
-            trend_direction = sorted_amounts[-1] - sorted_amounts[0]
-            if abs(trend_direction) < 0.01 * sorted_amounts[0]:
+
+        series = GroupedSeries.single(amounts, dates)
+        return self._stability_result(self._group_statistics(series), 0)
+
+    def _stability_result(self, stats: Dict[str, list], group: int) -> Dict:
+        """Build the temporal stability result for one group from kernel output"""
+        trend = 'unknown'
+        stability_score = 0.0
+
+        if stats['count'][group] >= 2:
+            first_amount = stats['first'][group]
+            trend_direction = stats['last'][group] - first_amount
+            if abs(trend_direction) < 0.01 * first_amount:
                 trend = 'stable'
             else:
                 trend = 'increasing' if trend_direction > 0 else 'decreasing'
-        else:
-            trend = 'unknown'
-            
-        # Calculate stability score
-        if len(sorted_amounts) >= 2:
-            avg = sum(sorted_amounts) / len(sorted_amounts)
-            relative_variations = [abs(x - avg) / avg for x in sorted_amounts]
-            stability_score = 1 - min(1, sum(relative_variations) / len(relative_variations))
-        else:
-            stability_score = 0.0
-            
+
+            relative_deviation = stats['relative_deviation'][group]
+            if not math.isnan(relative_deviation):
+                stability_score = 1 - min(1, relative_deviation)
+
         return {
             'stability': stability_score,
             'trend': trend,
             'metrics': {
-                'min_amount': min(sorted_amounts),
-                'max_amount': max(sorted_amounts),
-                'avg_amount': sum(sorted_amounts) / len(sorted_amounts)
+                'min_amount': stats['min'][group],
+                'max_amount': stats['max'][group],
+                'avg_amount': stats['mean'][group]
             }
         }
+
     def calculate_advanced_metrics(self, amounts: List[float], dates: List[datetime]) -> Dict:
         """Calculate advanced statistical metrics for transaction patterns with enhanced historical analysis"""
         if not amounts or not dates or len(amounts) != len(dates):
@@ -623,85 +630,12 @@ class PatternMatcher:
                 'reliability_score': 0.0,
                 'historical_metrics': {}
             }
-            
+
         try:
-            # Sort by date for time-series analysis
-            amount_date_pairs = sorted(zip(dates, amounts), key=lambda x: x[0])
-            sorted_amounts = [pair[1] for pair in amount_date_pairs]
-            sorted_dates = [pair[0] for pair in amount_date_pairs]
-            
-            # Calculate enhanced historical statistics
-            mean_amount = sum(sorted_amounts) / len(sorted_amounts)
-            deviations = [x - mean_amount for x in sorted_amounts]
-            variance = sum(d * d for d in deviations) / len(deviations)
-            std_dev = variance ** 0.5 if variance > 0 else 0
-            
-            # Calculate rolling statistics for trend detection
-            window_size = min(3, len(sorted_amounts))
-            rolling_means = []
-            for i in range(len(sorted_amounts) - window_size + 1):
-                window = sorted_amounts[i:i + window_size]
-                rolling_means.append(sum(window) / len(window))
-                
-            # Calculate month-over-month changes
-            monthly_changes = []
-            if len(sorted_dates) >= 2:
-                for i in range(1, len(sorted_dates)):
-                    days_diff = (sorted_dates[i] - sorted_dates[i-1]).days
-                    if 25 <= days_diff <= 35:  # Approximately monthly
-                        change = (sorted_amounts[i] - sorted_amounts[i-1]) / sorted_amounts[i-1]
-                        monthly_changes.append(change)
-            
-            # Calculate trend strength using linear regression approximation
-            n = len(sorted_amounts)
-            if n >= 2:
-                x = list(range(n))
-                x_mean = sum(x) / n
-                y_mean = mean_amount
-                
-                # Calculate slope using least squares
-                numerator = sum((x[i] - x_mean) * (sorted_amounts[i] - y_mean) for i in range(n))
-                denominator = sum((x[i] - x_mean) ** 2 for i in range(n))
-                slope = numerator / denominator if denominator != 0 else 0
-                
-                # Normalize trend strength to [0, 1]
-                trend_strength = min(abs(slope) / (mean_amount + 1e-6), 1.0)
-            else:
-                trend_strength = 0.0
-                
-            # Calculate pattern strength based on regularity
-            if std_dev > 0:
-                pattern_strength = 1.0 - min(std_dev / mean_amount, 1.0)
-            else:
-                pattern_strength = 1.0 if len(sorted_amounts) > 1 else 0.0
-                
-            # Calculate seasonality score
-            seasonality_score = self._detect_seasonality(sorted_amounts, sorted_dates)
-            
-            # Calculate overall reliability score
-            sample_size_factor = min(len(sorted_amounts) / 12, 1.0)  # More samples increase reliability
-            time_span_factor = min((sorted_dates[-1] - sorted_dates[0]).days / 365, 1.0)
-            reliability_score = (sample_size_factor * 0.4 + 
-                              pattern_strength * 0.3 +
-                              (1 - trend_strength) * 0.2 +  # Less trend means more stable pattern
-                              seasonality_score * 0.1)
-            
-            return {
-                'seasonality_score': seasonality_score,
-                'trend_strength': trend_strength,
-                'pattern_strength': pattern_strength,
-                'reliability_score': reliability_score,
-                'metrics': {
-                    'mean': mean_amount,
-                    'std_dev': std_dev,
-                    'sample_size': len(sorted_amounts),
-                    'date_range': {
-                        'start': sorted_dates[0],
-                        'end': sorted_dates[-1]
-                    }
-                }
-            }
-            
+            series = GroupedSeries.single(amounts, dates)
+            starts, ends = series.bounds(dates)
+            return self._advanced_result(self._group_statistics(series), 0, starts[0], ends[0])
+
         except Exception as e:
             logger.error(f"Error calculating advanced metrics: {str(e)}")
             return {
@@ -710,356 +644,62 @@ class PatternMatcher:
                 'pattern_strength': 0.0,
                 'reliability_score': 0.0
             }
-            
-    def _detect_seasonality(self, amounts: List[float], dates: List[datetime]) -> float:
-        """Detect seasonal patterns in transaction amounts"""
-        if len(amounts) < 4:  # Need at least 4 points to detect seasonality
-            return 0.0
-
-        try:
-            # Sort data by date
-            amount_date_pairs = sorted(zip(dates, amounts), key=lambda x: x[0])
-            sorted_amounts = [pair[1] for pair in amount_date_pairs]
-
-            # Calculate basic seasonal metrics
-            total_periods = len(sorted_amounts)
-            half_period = total_periods // 2
-
-            # Compare first and second half patterns
-            first_half = sorted_amounts[:half_period]
-            second_half = sorted_amounts[half_period:2*half_period]
-
-            if not first_half or not second_half:
-                return 0.0
-
-            # Calculate correlation between halves
-            mean_first = sum(first_half) / len(first_half)
-            mean_second = sum(second_half) / len(second_half)
-
-            # Normalize amounts for comparison
-            norm_first = [x - mean_first for x in first_half]
-            norm_second = [x - mean_second for x in second_half]
-
-            # Calculate correlation coefficient
-            correlation = sum(a * b for a, b in zip(norm_first, norm_second))
-            denominators = (sum(x * x for x in norm_first) * sum(x * x for x in norm_second)) ** 0.5
-
-            if denominators == 0:
-                return 0.0
-
-            correlation_coefficient = correlation / denominators
-
-            # Scale to [0, 1] range and return
-            return max(0.0, min(1.0, (correlation_coefficient + 1) / 2))
-
-        except Exception as e:
-            logger.error(f"Error detecting seasonality: {str(e)}")
-            return 0.0
 
-    def calculate_historical_confidence(self, transaction_data: List[Dict]) -> Dict:
-        """Calculate confidence scores for historical transaction patterns"""
-        try:
-            if not transaction_data:
-                return {
-                    'confidence_score': 0.0,
-                    'pattern_metrics': {},
-                    'sample_size': 0
-                }
-
-            amounts = [t.get('amount', 0.0) for t in transaction_data if t.get('amount') is not None]
-            dates = [t.get('date') for t in transaction_data if t.get('date') is not None]
-
-            if not amounts or not dates:
-                return {
-                    'confidence_score': 0.0,
-                    'pattern_metrics': {},
-                    'sample_size': 0
-                }
+    def _advanced_result(self, stats: Dict[str, list], group: int,
+                         start: datetime, end: datetime) -> Dict:
+        """Build the advanced metrics result for one group from kernel output"""
+        sample_size = stats['count'][group]
+        mean_amount = stats['mean'][group]
+        variance = stats['variance'][group]
+        std_dev = variance ** 0.5 if variance > 0 else 0
+
+        # Trend strength from the least-squares slope, normalized to [0, 1]
+        if sample_size >= 2:
+            trend_strength = min(abs(stats['slope'][group]) / (mean_amount + 1e-6), 1.0)
+        else:
+            trend_strength = 0.0
 
-            # Calculate basic statistics
-            mean_amount = sum(amounts) / len(amounts)
-            sorted_amounts= sorted(amounts)
-            median_amount = sorted_amounts[len(amounts) // 2]
+        # Pattern strength based on regularity
+        if std_dev > 0:
+            pattern_strength = 1.0 - min(std_dev / mean_amount, 1.0) if mean_amount else 0.0
+        else:
+            pattern_strength = 1.0 if sample_size > 1 else 0.0
 
-            # Calculate variance and standard deviation
-            variance = sum((x - mean_amount) ** 2 for x in amounts) / len(amounts)
-            std_dev = variance ** 0.5 if variance > 0 else 0
+        seasonality_score = stats['seasonality'][group]
 
-            # Calculate seasonality score
-            seasonality_score = self._detect_seasonality(amounts, dates)
+        sample_size_factor = min(sample_size / 12, 1.0)  # More samples increase reliability
+        reliability_score = (sample_size_factor * 0.4 +
+                             pattern_strength * 0.3 +
+                             (1 - trend_strength) * 0.2 +  # Less trend means more stable pattern
+                             seasonality_score * 0.1)
 
-            # Calculate overall metrics
-            metrics = {
+        return {
+            'seasonality_score': seasonality_score,
+            'trend_strength': trend_strength,
+            'pattern_strength': pattern_strength,
+            'reliability_score': reliability_score,
+            'metrics': {
                 'mean': mean_amount,
-                'median': median_amount,
                 'std_dev': std_dev,
-                'seasonality': seasonality_score,
-                'sample_size': len(amounts),
+                'recent_mean': stats['recent_mean'][group],
+                'sample_size': sample_size,
                 'date_range': {
-                    'start': min(dates),
-                    'end': max(dates)
+                    'start': start,
+                    'end': end
                 }
             }
-
-            # Calculate confidence score based on various factors
-            sample_size_factor = min(len(amounts) / 10, 1.0)  # More samples increase confidence
-            stability_factor = 1.0 - min(std_dev / (abs(mean_amount) + 1e-6), 1.0)  # Less variance means more confidence
-            seasonality_factor = seasonality_score
-
-            confidence_score = (
-                sample_size_factor * 0.4 +    # 40% weight on sample size
-                stability_factor * 0.4 +      # 40% weight on stability
-                seasonality_factor * 0.2      # 20% weight on seasonality
-            )
-
-            return {
-                'confidence_score': confidence_score,
-                'pattern_metrics': metrics,
-                'sample_size': len(amounts)
-            }
-
-        except Exception as e:
-            logger.error(f"Error calculating historical confidence: {str(e)}")
-            return {
-                'confidence_score': 0.0,
-                'pattern_metrics': {},
-                'sample_size': 0
-            }
-
-    def analyze_recurring_patterns(self, temporal_data: List[Dict]) -> Dict:
-        """Analyze recurring patterns in temporal transaction data"""
-        if not temporal_data or len(temporal_data) < 2:
-            return {'is_recurring': False, 'confidence': 0.0}
-            
-        # Sort transactions by date
-        sorted_data = sorted(temporal_data, key=lambda x: x['date'])
-        
-        # Calculate time intervals between transactions
-        intervals = []
-        for i in range(1, len(sorted_data)):
-            interval = (sorted_data[i]['date'] - sorted_data[i-1]['date']).days
-            intervals.append(interval)
-            
-        if not intervals:
-            return {'is_recurring': False, 'confidence': 0.0}
-            
-        # Analyze interval patterns
-        avg_interval = sum(intervals) / len(intervals)
-        variance = sum((x - avg_interval) ** 2 for x in intervals) / len(intervals)
-        std_dev = variance ** 0.5
-        
-        # Calculate coefficient of variation (CV) to measure regularity
-        cv = std_dev / avg_interval if avg_interval > 0 else float('inf')
-        
-        # Determine if pattern is recurring based on CV
-        is_recurring = cv < 0.5  # Less variation suggests more regular pattern
-        
-        # Calculate confidence based on regularity and sample size
-        base_confidence = max(0, 1 - cv) if cv < 1 else 0
-        sample_size_factor = min(len(intervals) / 6, 1)  # More samples increase confidence
-        confidence = base_confidence * sample_size_factor
-        
-        return {
-            'is_recurring': is_recurring,
-            'confidence': confidence,
-            'metrics': {
-                'average_interval': avg_interval,
-                'variance': variance,
-                'coefficient_variation': cv,
-                'sample_size': len(intervals)
-            },
-            'suggested_frequency': self._suggest_frequency(avg_interval)
-        }
-        
-    def _suggest_frequency(self, avg_interval: float) -> str:
-        """Suggest transaction frequency based on average interval"""
-        if avg_interval < 2:
-            return 'daily'
-        elif avg_interval < 8:
-            return 'weekly'
-        elif avg_interval < 15:
-            return 'biweekly'
-        elif avg_interval < 32:
-            return 'monthly'
-        elif avg_interval < 95:
-            return 'quarterly'
-        else:
-            return 'annually'
-            
-    def analyze_temporal_stability(self, amounts: List[float], dates: List[datetime]) -> Dict:
-        """Analyze the stability of transaction amounts over time"""
-        if not amounts or not dates or len(amounts) != len(dates):
-            return {'stability': 0.0, 'trend': 'unknown'}
-            
-        # Sort by date
-        amount_date_pairs = sorted(zip(dates, amounts), key=lambda x: x[0])
-        sorted_amounts = [pair[1] for pair in amount_date_pairs]
-        
-        # Calculate trend
-        if len(sorted_amounts) >= 2:
-            trend_direction = sorted_amounts[-1] - sorted_amounts[0]
-            if abs(trend_direction) < 0.01 * sorted_amounts[0]:
-                trend = 'stable'
-            else:
-                trend = 'increasing' if trend_direction > 0 else 'decreasing'
-        else:
-            trend = 'unknown'
-            
-        # Calculate stability score
-        if len(sorted_amounts) >= 2:
-            avg = sum(sorted_amounts) / len(sorted_amounts)
-            relative_variations = [abs(x - avg) / avg for x in sorted_amounts]
-            stability_score = 1 - min(1, sum(relative_variations) / len(relative_variations))
-        else:
-            stability_score = 0.0
-            
-        return {
-            'stability': stability_score,
-            'trend': trend,
-            'metrics': {
-                'min_amount': min(sorted_amounts),
-                'max_amount': max(sorted_amounts),
-                'avg_amount': sum(sorted_amounts) / len(sorted_amounts)
-            }
         }
-    def calculate_advanced_metrics(self, amounts: List[float], dates: List[datetime]) -> Dict:
-        """Calculate advanced statistical metrics for transaction patterns with enhanced historical analysis"""
-        if not amounts or not dates or len(amounts) != len(dates):
-            return {
-                'seasonality_score': 0.0,
-                'trend_strength': 0.0,
-                'pattern_strength': 0.0,
-                'reliability_score': 0.0,
-                'historical_metrics': {}
-            }
-            
-        try:
-            # Sort by date for time-series analysis
-            amount_date_pairs = sorted(zip(dates, amounts), key=lambda x: x[0])
-            sorted_amounts = [pair[1] for pair in amount_date_pairs]
-            sorted_dates = [pair[0] for pair in amount_date_pairs]
-            
-            # Calculate enhanced historical statistics
-            mean_amount = sum(sorted_amounts) / len(sorted_amounts)
-            deviations = [x - mean_amount for x in sorted_amounts]
-            variance = sum(d * d for d in deviations) / len(deviations)
-            std_dev = variance ** 0.5 if variance > 0 else 0
-            
-            # Calculate rolling statistics for trend detection
-            window_size = min(3, len(sorted_amounts))
-            rolling_means = []
-            for i in range(len(sorted_amounts) - window_size + 1):
-                window = sorted_amounts[i:i + window_size]
-                rolling_means.append(sum(window) / len(window))
-                
-            # Calculate month-over-month changes
-            monthly_changes = []
-            if len(sorted_dates) >= 2:
-                for i in range(1, len(sorted_dates)):
-                    days_diff = (sorted_dates[i] - sorted_dates[i-1]).days
-                    if 25 <= days_diff <= 35:  # Approximately monthly
-                        change = (sorted_amounts[i] - sorted_amounts[i-1]) / sorted_amounts[i-1]
-                        monthly_changes.append(change)
-            
-            # Calculate trend strength using linear regression approximation
-            n = len(sorted_amounts)
-            if n >= 2:
-                x = list(range(n))
-                x_mean = sum(x) / n
-                y_mean = mean_amount
-                
-                # Calculate slope using least squares
-                numerator = sum((x[i] - x_mean) * (sorted_amounts[i] - y_mean) for i in range(n))
-                denominator = sum((x[i] - x_mean) ** 2 for i in range(n))
-                slope = numerator / denominator if denominator != 0 else 0
-                
-                # Normalize trend strength to [0, 1]
-                trend_strength = min(abs(slope) / (mean_amount + 1e-6), 1.0)
-            else:
-                trend_strength = 0.0
-                
-            # Calculate pattern strength based on regularity
-            if std_dev > 0:
-                pattern_strength = 1.0 - min(std_dev / mean_amount, 1.0)
-            else:
-                pattern_strength = 1.0 if len(sorted_amounts) > 1 else 0.0
-                
-            # Calculate seasonality score
-            seasonality_score = self._detect_seasonality(sorted_amounts, sorted_dates)
-            
-            # Calculate overall reliability score
-            sample_size_factor = min(len(sorted_amounts) / 12, 1.0)  # More samples increase reliability
-            time_span_factor = min((sorted_dates[-1] - sorted_dates[0]).days / 365, 1.0)
-            reliability_score = (sample_size_factor * 0.4 + 
-                              pattern_strength * 0.3 +
-                              (1 - trend_strength) * 0.2 +  # Less trend means more stable pattern
-                              seasonality_score * 0.1)
-            
-            return {
-                'seasonality_score': seasonality_score,
-                'trend_strength': trend_strength,
-                'pattern_strength': pattern_strength,
-                'reliability_score': reliability_score,
-                'metrics': {
-                    'mean': mean_amount,
-                    'std_dev': std_dev,
-                    'sample_size': len(sorted_amounts),
-                    'date_range': {
-                        'start': sorted_dates[0],
-                        'end': sorted_dates[-1]
-                    }
-                }
-            }
-            
-        except Exception as e:
-            logger.error(f"Error calculating advanced metrics: {str(e)}")
-            return {
-                'seasonality_score': 0.0,
-                'trend_strength': 0.0,
-                'pattern_strength': 0.0,
-                'reliability_score': 0.0
-            }
-            
+
     def _detect_seasonality(self, amounts: List[float], dates: List[datetime]) -> float:
         """Detect seasonal patterns in transaction amounts"""
         if len(amounts) < 4:  # Need at least 4 points to detect seasonality
             return 0.0
 
         try:
-            # Sort data by date
-            amount_date_pairs = sorted(zip(dates, amounts), key=lambda x: x[0])
-            sorted_amounts = [pair[1] for pair in amount_date_pairs]
-
-            # Calculate basic seasonal metrics
-            total_periods = len(sorted_amounts)
-            half_period = total_periods // 2
-
-            # Compare first and second half patterns
-            first_half = sorted_amounts[:half_period]
-            second_half = sorted_amounts[half_period:2*half_period]
-
-            if not first_half or not second_half:
-                return 0.0
-
-            # Calculate correlation between halves
-            mean_first = sum(first_half) / len(first_half)
-            mean_second = sum(second_half) / len(second_half)
-
-            # Normalize amounts for comparison
-            norm_first = [x - mean_first for x in first_half]
-            norm_second = [x - mean_second for x in second_half]
-
-            # Calculate correlation coefficient
-            correlation = sum(a * b for a, b in zip(norm_first, norm_second))
-            denominators = (sum(x * x for x in norm_first) * sum(x * x for x in norm_second)) ** 0.5
-
-            if denominators == 0:
-                return 0.0
-
-            correlation_coefficient = correlation / denominators
-
-            # Scale to [0, 1] range and return
-            return max(0.0, min(1.0, (correlation_coefficient + 1) / 2))
+            # Amounts and dates are paired positionally, extra items on either side are ignored
+            size = min(len(amounts), len(dates))
+            series = GroupedSeries.single(amounts[:size], dates[:size])
+            return float(series.half_correlation()[0])
 
         except Exception as e:
             logger.error(f"Error detecting seasonality: {str(e)}")
@@ -1085,22 +725,15 @@ class PatternMatcher:
                     'sample_size': 0
                 }
 
-            # Calculate basic statistics
-            mean_amount = sum(amounts) / len(amounts)
-            sorted_amounts = sorted(amounts)
-            median_amount = sorted_amounts[len(amounts) // 2]
-
-            # Calculate variance and standard deviation
-            variance = sum((x - mean_amount) ** 2 for x in amounts) / len(amounts)
+            stats = self._group_statistics(GroupedSeries.single(amounts))
+            mean_amount = stats['mean'][0]
+            variance = stats['variance'][0]
             std_dev = variance ** 0.5 if variance > 0 else 0
-
-            # Calculate seasonality score
             seasonality_score = self._detect_seasonality(amounts, dates)
 
-            # Calculate overall metrics
             metrics = {
                 'mean': mean_amount,
-                'median': median_amount,
+                'median': stats['median'][0],
                 'std_dev': std_dev,
                 'seasonality': seasonality_score,
                 'sample_size': len(amounts),
@@ -1134,6 +767,7 @@ class PatternMatcher:
                 'pattern_metrics': {},
                 'sample_size': 0
             }
+
     def find_similar_explanations(self, description: str, explanations: List[Dict]) -> List[Dict]:
         """Enhanced Explanation Recognition Feature"""
         matches = []
@@ -1144,19 +778,22 @@ class PatternMatcher:
             # Normalize description
             desc_normalized = self._normalize_text(description)
 
-            for exp in explanations:
+            # Score each unique description once, then report every row using it
+            dictionary = DescriptionDictionary.from_records(explanations, self._normalize_text)
+            matched_rows = []
+            for index, similarity in ratio_matches(desc_normalized, [entry.key for entry in dictionary],
+                                                   self.min_similarity, dictionary.candidate_filter()):
+                matched_rows.extend((row, similarity) for row in dictionary.entries[index].rows)
+
+            for row, similarity in sorted(matched_rows):
+                exp = explanations[row]
                 if not exp.get('description'):
                     continue
-
-                exp_normalized = self._normalize_text(exp['description'])
-                similarity = self._calculate_similarity(desc_normalized, exp_normalized)
-
-                if similarity >= self.min_similarity:
-                    matches.append({
-                        'explanation': exp.get('explanation', ''),
-                        'similarity': similarity,
-                        'original_description': exp.get('description', '')
-                    })
+                matches.append({
+                    'explanation': exp.get('explanation', ''),
+                    'similarity': similarity,
+                    'original_description': exp.get('description', '')
+                })
 
             # Sort by similarity score
             matches.sort(key=lambda x: x['similarity'], reverse=True)
@@ -1167,12 +804,8 @@ class PatternMatcher:
             return []
 
     def _normalize_text(self, text: str) -> str:
-        """Normalize text for comparison"""
-        if not text:
-            return ""
-        # Convert to lowercase and remove special characters
-        text = re.sub(r'[^\w\s]', '', text.lower())
-        return text.strip()
+        """Normalize text for comparison (memoized)"""
+        return normalize_text(text)
 
     def _calculate_similarity(self, text1: str, text2: str) -> float:
         """Calculate text similarity using SequenceMatcher"""
@@ -0,0 +1,222 @@
+"""
+Pattern Statistics Kernel
+
+NumPy implementations of the statistics used by PatternMatcher. Observations
+for any number of description groups are held in flat arrays sorted by group
+and date, and every per-group reduction is a single np.bincount pass, so a
+whole ledger is analyzed with a fixed number of array operations.
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MICROSECONDS_PER_DAY = 86_400_000_000
+
+
+def to_timestamps(dates: Iterable) -> np.ndarray:
+    """Convert dates or datetimes to int64 microseconds since the epoch"""
+    return np.asarray(list(dates), dtype='datetime64[us]').astype(np.int64)
+
+
+class GroupedSeries:
+    """Amount/date observations for many groups, sorted by group then date"""
+
+    def __init__(self, group_ids: Sequence[int], amounts: Sequence[float],
+                 dates: Optional[Sequence] = None, num_groups: Optional[int] = None):
+        """
+        Args:
+            group_ids: Group index (0..num_groups-1) of each observation
+            amounts: Observation amounts
+            dates: Observation dates; when omitted input order is kept
+            num_groups: Total number of groups, including empty ones
+        """
+        group_ids = np.asarray(group_ids, dtype=np.int64)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        timestamps = to_timestamps(dates) if dates is not None else np.arange(len(amounts), dtype=np.int64)
+
+        # lexsort is stable, so ties on date keep input order like sorted() did
+        order = np.lexsort((timestamps, group_ids))
+        self.order = order
+        self.group_ids = group_ids[order]
+        self.amounts = amounts[order]
+        self.timestamps = timestamps[order]
+
+        if num_groups is None:
+            num_groups = int(self.group_ids[-1]) + 1 if len(self.group_ids) else 0
+        self.num_groups = num_groups
+        self.counts = np.bincount(self.group_ids, minlength=num_groups)
+        self.starts = np.cumsum(self.counts) - self.counts
+        self.ends = self.starts + self.counts - 1
+        self.positions = np.arange(len(self.amounts)) - self.starts[self.group_ids]
+
+    @classmethod
+    def from_groups(cls, amount_groups: List[Sequence[float]],
+                    date_groups: Optional[List[Sequence]] = None) -> 'GroupedSeries':
+        """Build from one amount list (and optionally one date list) per group"""
+        lengths = [len(group) for group in amount_groups]
+        group_ids = np.repeat(np.arange(len(amount_groups)), lengths)
+        amounts = [amount for group in amount_groups for amount in group]
+        dates = [date for group in date_groups for date in group] if date_groups is not None else None
+        return cls(group_ids, amounts, dates, num_groups=len(amount_groups))
+
+    @classmethod
+    def single(cls, amounts: Sequence[float], dates: Optional[Sequence] = None) -> 'GroupedSeries':
+        """Build a series holding a single group"""
+        return cls(np.zeros(len(amounts), dtype=np.int64), amounts, dates, num_groups=1)
+
+    def _group_sum(self, values: np.ndarray, group_ids: Optional[np.ndarray] = None) -> np.ndarray:
+        ids = self.group_ids if group_ids is None else group_ids
+        return np.bincount(ids, weights=values, minlength=self.num_groups)
+
+    @staticmethod
+    def _divide(numerator: np.ndarray, denominator: np.ndarray, fill: float = 0.0) -> np.ndarray:
+        out = np.full(np.broadcast(numerator, denominator).shape, fill, dtype=np.float64)
+        np.divide(numerator, denominator, out=out, where=denominator != 0)
+        return out
+
+    def mean(self) -> np.ndarray:
+        return self._divide(self._group_sum(self.amounts), self.counts)
+
+    def variance(self) -> np.ndarray:
+        """Population variance of each group"""
+        deviations = self.amounts - self.mean()[self.group_ids]
+        return self._divide(self._group_sum(deviations * deviations), self.counts)
+
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance())
+
+    def _pick(self, values: np.ndarray, index: np.ndarray) -> np.ndarray:
+        """Take values[index[g]] for every non-empty group g, NaN elsewhere"""
+        out = np.full(self.num_groups, np.nan)
+        present = self.counts > 0
+        out[present] = values[index[present]]
+        return out
+
+    def bounds(self, values: Sequence) -> Tuple[list, list]:
+        """
+        First and last item of `values` for each group once sorted by date
+
+        Args:
+            values: Per-observation values in the original input order (e.g. dates)
+
+        Returns:
+            Tuple of (first, last) lists, one item per group (None for empty groups)
+        """
+        ordered = np.empty(len(self.order), dtype=object)
+        ordered[:] = list(values)
+        ordered = ordered[self.order]
+        present = self.counts > 0
+        first = np.full(self.num_groups, None, dtype=object)
+        last = np.full(self.num_groups, None, dtype=object)
+        first[present] = ordered[self.starts[present]]
+        last[present] = ordered[self.ends[present]]
+        return first.tolist(), last.tolist()
+
+    def first(self) -> np.ndarray:
+        return self._pick(self.amounts, self.starts)
+
+    def last(self) -> np.ndarray:
+        return self._pick(self.amounts, self.ends)
+
+    def minimum(self) -> np.ndarray:
+        values = np.full(self.num_groups, np.nan)
+        present = self.counts > 0
+        if present.any():
+            values[present] = np.minimum.reduceat(self.amounts, self.starts[present])
+        return values
+
+    def maximum(self) -> np.ndarray:
+        values = np.full(self.num_groups, np.nan)
+        present = self.counts > 0
+        if present.any():
+            values[present] = np.maximum.reduceat(self.amounts, self.starts[present])
+        return values
+
+    def median_upper(self) -> np.ndarray:
+        """Element at index n // 2 of each sorted group (the upper median)"""
+        by_value = np.lexsort((self.amounts, self.group_ids))
+        return self._pick(self.amounts[by_value], self.starts + self.counts // 2)
+
+    def slope(self) -> np.ndarray:
+        """Least-squares slope of amount against position within the group"""
+        x_mean = (self.counts - 1) / 2.0
+        x_centered = self.positions - x_mean[self.group_ids]
+        y_centered = self.amounts - self.mean()[self.group_ids]
+        numerator = self._group_sum(x_centered * y_centered)
+        denominator = self.counts * (self.counts.astype(np.float64) ** 2 - 1) / 12.0
+        return self._divide(numerator, denominator)
+
+    def rolling_mean(self, window: int) -> np.ndarray:
+        """
+        Trailing rolling mean at every observation, computed from cumulative sums
+
+        Windows shrink to the observations available at the start of a group.
+        """
+        cumulative = np.concatenate(([0.0], np.cumsum(self.amounts)))
+        index = np.arange(len(self.amounts))
+        width = np.minimum(self.positions + 1, window)
+        return (cumulative[index + 1] - cumulative[index + 1 - width]) / width
+
+    def last_rolling_mean(self, window: int) -> np.ndarray:
+        """Mean of the last `window` observations of each group"""
+        return self._pick(self.rolling_mean(window), self.ends)
+
+    def mean_relative_deviation(self) -> np.ndarray:
+        """Mean of |x - mean| / mean per group; NaN where the mean is zero"""
+        means = self.mean()
+        safe_means = np.where(means != 0, means, np.nan)
+        relative = np.abs(self.amounts - means[self.group_ids]) / safe_means[self.group_ids]
+        return self._divide(self._group_sum(relative), self.counts, fill=np.nan)
+
+    def half_correlation(self, min_points: int = 4) -> np.ndarray:
+        """
+        Seasonality score from the correlation between each group's first and
+        second halves, scaled to [0, 1]
+        """
+        half = self.counts // 2
+        group_half = half[self.group_ids]
+        in_first = self.positions < group_half
+        in_second = (self.positions >= group_half) & (self.positions < 2 * group_half)
+
+        mean_first = self._divide(self._group_sum(np.where(in_first, self.amounts, 0.0)), half)
+        mean_second = self._divide(self._group_sum(np.where(in_second, self.amounts, 0.0)), half)
+
+        # Pair every first-half observation with the one `half` positions later
+        first_index = np.flatnonzero(in_first)
+        first_groups = self.group_ids[first_index]
+        a = self.amounts[first_index] - mean_first[first_groups]
+        b = self.amounts[first_index + group_half[first_index]] - mean_second[first_groups]
+
+        covariance = self._group_sum(a * b, first_groups)
+        scale = np.sqrt(self._group_sum(a * a, first_groups) * self._group_sum(b * b, first_groups))
+        correlation = self._divide(covariance, scale, fill=np.nan)
+
+        scores = np.clip((correlation + 1) / 2, 0.0, 1.0)
+        scores[np.isnan(correlation) | (self.counts < min_points)] = 0.0
+        return scores
+
+    def interval_stats(self) -> Dict[str, np.ndarray]:
+        """
+        Whole-day gaps between consecutive observations of each group
+
+        Returns:
+            Dictionary of per-group arrays: count, mean, variance and
+            coefficient_variation (inf when the mean gap is not positive)
+        """
+        same_group = self.group_ids[1:] == self.group_ids[:-1]
+        gaps = np.diff(self.timestamps)[same_group] // MICROSECONDS_PER_DAY
+        gap_groups = self.group_ids[1:][same_group]
+        gaps = gaps.astype(np.float64)
+
+        count = np.bincount(gap_groups, minlength=self.num_groups)
+        mean = self._divide(self._group_sum(gaps, gap_groups), count)
+        deviations = gaps - mean[gap_groups]
+        variance = self._divide(self._group_sum(deviations * deviations, gap_groups), count)
+        cv = self._divide(np.sqrt(variance), np.where(mean > 0, mean, 0.0), fill=np.inf)
+        return {
+            'count': count,
+            'mean': mean,
+            'variance': variance,
+            'coefficient_variation': cv
+        }
@@ -0,0 +1,129 @@
+"""
+Project File Scan
+One walk of the project tree shared by the system audit checks. Python
+sources are read and hashed once per scan, files whose size and modification
+time are unchanged are not read at all, and per-file findings are cached
+against the content hash so unchanged files reuse the previous result.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Directories that never contain project sources
+SKIPPED_DIRS = {'.git', '__pycache__'}
+# A scan younger than this is reused, so all checks of one audit share a walk
+SCAN_MAX_AGE = 60.0
+
+
+class FileFindingsCache:
+    """Content and per-check findings of source files, keyed by path and content hash"""
+
+    def __init__(self):
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, path: str, stat: os.stat_result) -> Dict[str, Any]:
+        """
+        Entry for a file as it is now
+
+        The file is read only when its size or mtime changed; if the content
+        hash still matches, the cached findings are kept.
+        """
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry and entry['signature'] == signature:
+            entry['reused'] = True
+            return entry
+
+        with open(path, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        if entry and entry['digest'] == digest:
+            entry = dict(entry, signature=signature, reused=True)
+        else:
+            try:
+                # Same text a text-mode read gives, universal newlines included
+                content = raw.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+            except UnicodeDecodeError as e:
+                logger.error(f"Error reading {path}: {e}")
+                content = None
+            entry = {'signature': signature, 'digest': digest, 'content': content,
+                     'findings': {}, 'reused': False}
+        with self._lock:
+            self._entries[path] = entry
+        return entry
+
+    def prune(self, paths: set) -> None:
+        """Forget files that no longer exist"""
+        with self._lock:
+            for path in set(self._entries) - paths:
+                del self._entries[path]
+
+
+class ProjectScan:
+    """Snapshot of the project's files from a single directory walk"""
+
+    def __init__(self, root_dir: str, cache: FileFindingsCache):
+        self.root_dir = root_dir
+        self.cache = cache
+        self.created = time.monotonic()
+        self.files: List[str] = []
+        self.python_files: List[str] = []
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self.stats = {'files': 0, 'python_files': 0, 'read': 0, 'reused': 0}
+
+        started = time.perf_counter()
+        for root, dirs, files in os.walk(root_dir):
+            dirs[:] = [d for d in dirs if d not in SKIPPED_DIRS]
+            for file_name in files:
+                file_path = os.path.join(root, file_name)
+                self.files.append(file_path)
+                if not file_name.endswith('.py'):
+                    continue
+                try:
+                    entry = cache.load(file_path, os.stat(file_path))
+                except OSError as e:
+                    logger.error(f"Error checking file {file_path}: {e}")
+                    continue
+                self.python_files.append(file_path)
+                self._entries[file_path] = entry
+                self.stats['reused' if entry['reused'] else 'read'] += 1
+
+        cache.prune(set(self._entries))
+        self.stats['files'] = len(self.files)
+        self.stats['python_files'] = len(self.python_files)
+        self.stats['seconds'] = round(time.perf_counter() - started, 3)
+
+    def content(self, path: str) -> Optional[str]:
+        """Text of a scanned Python file, or None if it could not be decoded"""
+        entry = self._entries.get(path)
+        return entry['content'] if entry else None
+
+    def files_under(self, directory: str) -> List[str]:
+        prefix = os.path.join(directory, '')
+        return [path for path in self.files if path.startswith(prefix)]
+
+    def findings(self, check: str, path: str, analyze: Callable[[str], Any]) -> Any:
+        """
+        Result of analyze(content) for a file, computed once per content hash
+
+        Args:
+            check: Name of the check, so each check caches separately
+            path: Scanned Python file
+            analyze: Function of the file's text returning the file's findings
+        """
+        entry = self._entries[path]
+        findings = entry['findings']
+        if check not in findings:
+            findings[check] = analyze(entry['content']) if entry['content'] is not None else None
+        return findings[check]
+
+
+file_findings_cache = FileFindingsCache()
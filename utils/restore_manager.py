@@ -1,4 +1,5 @@
 import logging
+import time
 from datetime import datetime, timedelta
 from typing import Dict, Any
 from .backup_manager import DatabaseBackupManager
@@ -43,112 +44,21 @@ def execute_verified_restore(app, days: int = 6, target_minute: int = 59, target
         # Initialize verification suite
         verification = RollbackVerificationTest(app)
 
-        # Execute restoration  - Modified to handle duplicate links
-        with backup_manager.get_connection() as conn:
-            try:
-                # Backup existing data
-                conn.execute("""
-                    -- Backup Chart of Accounts
-                    CREATE TABLE IF NOT EXISTS chart_of_accounts_backup AS
-                    SELECT DISTINCT ON (link) *
-                    FROM account 
-                    WHERE category IN ('Assets', 'Liabilities', 'Equity', 'Income', 'Expenses')
-                    ORDER BY link, updated_at DESC;
-
-                    -- Backup Transactions
-                    CREATE TABLE IF NOT EXISTS transactions_backup AS
-                    SELECT t.*, 
-                           a.link as account_link,
-                           a.category as account_category,
-                           a.name as account_name
-                    FROM transaction t
-                    LEFT JOIN account a ON t.account_id = a.id
-                    WHERE t.created_at >= NOW() - INTERVAL '6 days';
-                """)
-
-                # Handle duplicate links
-                conn.execute("""
-                    CREATE OR REPLACE FUNCTION generate_unique_link(base_link text) 
-                    RETURNS text AS $$
-                    DECLARE
-                        counter integer := 1;
-                        new_link text;
-                    BEGIN
-                        new_link := base_link;
-                        WHILE EXISTS (SELECT 1 FROM account WHERE link = new_link) LOOP
-                            new_link := base_link || '_' || counter;
-                            counter := counter + 1;
-                        END LOOP;
-                        RETURN new_link;
-                    END;
-                    $$ LANGUAGE plpgsql;
-
-                    -- Function to ensure transaction integrity
-                    CREATE OR REPLACE FUNCTION ensure_transaction_integrity() 
-                    RETURNS trigger AS $$
-                    BEGIN
-                        -- Ensure account exists
-                        IF NEW.account_id IS NOT NULL AND 
-                           NOT EXISTS (SELECT 1 FROM account WHERE id = NEW.account_id) THEN
-                            RAISE EXCEPTION 'Invalid account_id: %', NEW.account_id;
-                        END IF;
-                        RETURN NEW;
-                    END;
-                    $$ LANGUAGE plpgsql;
-
-                    -- Create trigger for transaction integrity
-                    DROP TRIGGER IF EXISTS check_transaction_integrity ON transaction;
-                    CREATE TRIGGER check_transaction_integrity
-                    BEFORE INSERT OR UPDATE ON transaction
-                    FOR EACH ROW
-                    EXECUTE FUNCTION ensure_transaction_integrity();
-                """)
-
-                # Restore accounts with unique links
-                conn.execute("""
-                    INSERT INTO account (
-                        link, name, category, sub_category, user_id, 
-                        is_active, created_at, updated_at
-                    )
-                    SELECT 
-                        generate_unique_link(link), name, category, 
-                        sub_category, user_id, is_active, 
-                        CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
-                    FROM chart_of_accounts_backup
-                    ON CONFLICT (link) DO UPDATE 
-                    SET 
-                        name = EXCLUDED.name,
-                        category = EXCLUDED.category,
-                        sub_category = EXCLUDED.sub_category,
-                        is_active = EXCLUDED.is_active,
-                        updated_at = CURRENT_TIMESTAMP;
-
-                    -- Restore transactions with proper account linkage
-                    INSERT INTO transaction (
-                        date, description, amount, category,
-                        user_id, account_id, file_id,
-                        ai_category, ai_confidence, ai_explanation,
-                        created_at, updated_at
-                    )
-                    SELECT 
-                        tb.date, tb.description, tb.amount, tb.category,
-                        tb.user_id,
-                        a.id as account_id,
-                        tb.file_id,
-                        tb.ai_category, tb.ai_confidence, tb.ai_explanation,
-                        CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
-                    FROM transactions_backup tb
-                    LEFT JOIN account a ON a.link = tb.account_link
-                    ON CONFLICT DO NOTHING;
-                """)
-
-                logger.info("Database tables and Chart of Accounts restored with unique links")
-            except Exception as db_error:
-                logger.error(f"Error during restoration: {str(db_error)}")
-                raise
+        # Restore tables in parallel jobs, verifying each against its backup as it loads
+        restore_report = backup_manager.restore_with_report(target_timestamp)
+        if not restore_report['success']:
+            return {
+                'status': 'error',
+                'message': 'Restoration failed or did not verify',
+                'timestamp': datetime.now(),
+                'target_timestamp': target_timestamp,
+                'restore_report': restore_report
+            }
 
         # Run verification suite
+        verification_started = time.perf_counter()
         verification_results = verification.run_all_verifications(target_timestamp)
+        timings = dict(restore_report['phases'], suite=round(time.perf_counter() - verification_started, 3))
 
         # Aggregate results
         success = all(result['success'] for result in verification_results.values())
@@ -158,7 +68,9 @@ def execute_verified_restore(app, days: int = 6, target_minute: int = 59, target
             'message': 'Restoration completed successfully' if success else 'Restoration completed with warnings',
             'timestamp': datetime.now(),
             'target_timestamp': target_timestamp,
-            'verification_results': verification_results
+            'verification_results': verification_results,
+            'restore_report': restore_report,
+            'timings': timings
         }
 
     except Exception as e:
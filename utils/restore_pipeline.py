@@ -0,0 +1,211 @@
+"""
+Parallel Restore Pipeline
+Restores an incremental backup without touching the live tables until the
+whole backup has loaded: every table loads into its own staging table,
+concurrently on separate connections with chunk decompression running ahead
+of the inserts, and is verified against the manifest as soon as it has
+loaded. Only when every table loaded and verified are the live tables
+replaced from the staging tables, in one transaction.
+
+That last step is a copy, not a rename: each live table is emptied and
+refilled with INSERT ... SELECT from its staging table, so every row is
+written a second time. Renaming would be cheaper but would leave foreign
+keys, indexes and sequences attached to the old tables.
+
+Cache versions are bookkeeping, not data. Restoring them would move them
+backwards, and a worker holding a cache entry built at version N before the
+restore would serve it again once new writes bring the row back to N. So
+the live cache_versions table is kept, and every version in it is moved
+forward in the same transaction as the copy.
+"""
+
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+from sqlalchemy import Column, MetaData, Table
+from sqlalchemy.engine import Engine
+
+from utils.incremental_backup import ChunkStore, IncrementalBackup
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESTORE_JOBS = min(4, os.cpu_count() or 1)
+# Chunks decompressed ahead of the inserts for each table
+PREFETCH_CHUNKS = 4
+# Appended to a table's name for the table its backup is loaded into
+STAGING_SUFFIX = '__restore'
+# Tables whose live rows a restore keeps instead of replacing
+PRESERVED_TABLES = frozenset({'cache_versions'})
+
+
+def _prefetched(executor: ThreadPoolExecutor, fetch: Callable[[str], bytes],
+                digests: Iterable[str], depth: int = PREFETCH_CHUNKS) -> Iterator[bytes]:
+    """Yield fetch(digest) in order while up to depth later fetches run in the background"""
+    pending: deque = deque()
+    for digest in digests:
+        pending.append(executor.submit(fetch, digest))
+        if len(pending) > depth:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def staging_table(table: Table, metadata: MetaData) -> Table:
+    """
+    Copy of a table's columns and primary key under a staging name
+
+    Foreign keys, indexes and defaults are left out: every row is loaded
+    explicitly and tables load in any order.
+    """
+    return Table(
+        f"{table.name}{STAGING_SUFFIX}", metadata,
+        *[Column(column.name, column.type, primary_key=column.primary_key, autoincrement=False)
+          for column in table.columns]
+    )
+
+
+class RestorePipeline:
+    """Restores one manifest into a database with parallel loading and verification"""
+
+    def __init__(self, engine: Engine, store: ChunkStore, jobs: int = DEFAULT_RESTORE_JOBS,
+                 after_replace: Optional[Callable] = None):
+        """
+        Args:
+            engine: Target database
+            store: Chunk store the manifest refers to
+            jobs: Tables loaded concurrently
+            after_replace: Called with the connection of the replacing
+                transaction once the live tables hold the backup, e.g. to
+                move cache versions forward
+        """
+        self.engine = engine
+        self.backup = IncrementalBackup(engine, store)
+        self.after_replace = after_replace
+        # SQLite allows one writer at a time, so loading stays sequential there
+        self.jobs = 1 if engine.dialect.name == 'sqlite' else max(1, jobs)
+
+    def _load(self, table, entry: Dict, decoder: ThreadPoolExecutor) -> Dict:
+        started = time.perf_counter()
+        chunks = _prefetched(decoder, self.backup.store.get, entry['chunks'])
+        with self.engine.begin() as conn:
+            rows = self.backup.load_table(conn, table, self.backup.iter_rows(entry, chunks))
+        return {'rows': rows, 'load_seconds': round(time.perf_counter() - started, 3)}
+
+    def _verify(self, table, entry: Dict) -> Dict:
+        started = time.perf_counter()
+        with self.engine.connect() as conn:
+            error = self.backup.verify_table(conn, table, entry)
+        return {
+            'verified': error is None,
+            'verify_error': error,
+            'verify_seconds': round(time.perf_counter() - started, 3)
+        }
+
+    def _load_staged(self, manifest: Dict, staged: Dict[str, Table], verify: bool,
+                     results: Dict[str, Dict], phases: Dict[str, float]) -> bool:
+        """Load and verify every staging table; returns whether all of them succeeded"""
+        load_started = time.perf_counter()
+        verifications: Dict[Future, str] = {}
+        failed = False
+        with ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix='restore-load') as loader, \
+                ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix='restore-decode') as decoder, \
+                ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix='restore-verify') as verifier:
+            loads = {loader.submit(self._load, table, manifest['tables'][name], decoder): name
+                     for name, table in staged.items()}
+            while loads:
+                done, _ = wait(loads, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = loads.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        logger.error(f"Error restoring table {name}: {str(e)}")
+                        results[name] = {'rows': 0, 'error': str(e)}
+                        failed = True
+                        continue
+                    if verify:
+                        verifications[verifier.submit(self._verify, staged[name], manifest['tables'][name])] = name
+                if failed:
+                    # The restore is abandoned; loads that have not started are skipped
+                    for future in list(loads):
+                        if future.cancel():
+                            loads.pop(future)
+            phases['load'] = round(time.perf_counter() - load_started, 3)
+
+            verify_started = time.perf_counter()
+            for future, name in verifications.items():
+                try:
+                    results[name].update(future.result())
+                except Exception as e:
+                    logger.error(f"Error verifying table {name}: {str(e)}")
+                    results[name].update({'verified': False, 'verify_error': str(e)})
+            phases['verify'] = round(time.perf_counter() - verify_started, 3)
+
+        return not failed and len(results) == len(staged) and all(
+            result.get('verified', True) for result in results.values()
+        )
+
+    def run(self, manifest: Dict, verify: bool = True) -> Dict:
+        """
+        Restore every table in the manifest
+
+        Missing tables are created first. The backup then loads into staging
+        tables; the live tables are emptied and refilled from them in a
+        single transaction only after every table has loaded and verified,
+        so a failed restore leaves the database as it was. Tables in
+        PRESERVED_TABLES keep their live rows.
+
+        Args:
+            manifest: Incremental backup manifest
+            verify: Compare each restored table with the manifest
+
+        Returns:
+            Dictionary with success, jobs, per-table results and phase
+            timings in seconds (prepare, load, verify, replace, total);
+            verify is the time spent on verification after the last table
+            finished loading, and replace is only present when the live
+            tables were replaced
+        """
+        started = time.perf_counter()
+        phases: Dict[str, float] = {}
+        results: Dict[str, Dict] = {}
+        staging = MetaData()
+
+        with self.engine.begin() as conn:
+            ordered = [table for table in self.backup.create_missing(conn, manifest)
+                       if table.name not in PRESERVED_TABLES]
+            staged = {table.name: staging_table(table, staging) for table in ordered}
+            # Left behind by an interrupted restore
+            staging.drop_all(conn, checkfirst=True)
+            staging.create_all(conn)
+        phases['prepare'] = round(time.perf_counter() - started, 3)
+
+        try:
+            success = self._load_staged(manifest, staged, verify, results, phases)
+            if success:
+                replace_started = time.perf_counter()
+                try:
+                    with self.engine.begin() as conn:
+                        self.backup.replace_from(conn, ordered, staged)
+                        if self.after_replace is not None:
+                            self.after_replace(conn)
+                    phases['replace'] = round(time.perf_counter() - replace_started, 3)
+                except Exception as e:
+                    logger.error(f"Error replacing tables from the restored copies: {str(e)}")
+                    success = False
+        finally:
+            with self.engine.begin() as conn:
+                staging.drop_all(conn, checkfirst=True)
+
+        phases['total'] = round(time.perf_counter() - started, 3)
+        return {
+            'success': success,
+            'jobs': self.jobs,
+            'rows': sum(result['rows'] for result in results.values()),
+            'tables': results,
+            'phases': phases
+        }
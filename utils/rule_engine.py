@@ -0,0 +1,231 @@
+"""
+Keyword Rule Engine
+
+Compiles keyword rules into a single Aho-Corasick automaton and regex rules
+into one combined pattern, so matching a description costs one pass over its
+characters no matter how many rules are active.
+"""
+
+import logging
+import re
+import threading
+import warnings
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from utils.rule_manager import RuleManager
+
+logger = logging.getLogger(__name__)
+
+# Confidence assigned to regex rule matches and per matched keyword (capped)
+REGEX_RULE_CONFIDENCE = 0.9
+KEYWORD_CONFIDENCE_STEP = 0.3
+MAX_KEYWORD_CONFIDENCE = 0.8
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton reporting which keywords occur in a text"""
+
+    def __init__(self, keywords: Iterable[str]):
+        """
+        Args:
+            keywords: Keywords to match; their position is the id reported by find()
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[tuple] = [()]
+
+        for index, keyword in enumerate(keywords):
+            if keyword:
+                self._insert(keyword, index)
+        self._build_failure_links()
+
+    def _insert(self, keyword: str, index: int) -> None:
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        self._output[state] += (index,)
+
+    def _build_failure_links(self) -> None:
+        # Breadth-first so every failure target is finished before it is used
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, child in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] += self._output[self._fail[child]]
+                queue.append(child)
+
+    def find(self, text: str) -> Set[int]:
+        """Ids of every keyword that occurs in text as a substring"""
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class CompiledRuleSet:
+    """Immutable compiled form of a list of keyword and regex rules"""
+
+    def __init__(self, rules: List[Dict]):
+        """
+        Args:
+            rules: Rule dictionaries with 'keyword' and 'category' and optionally
+                'priority' and 'is_regex'; extra keys are kept for callers
+        """
+        self.rules = list(rules)
+        keyword_rules = [i for i, rule in enumerate(self.rules) if not rule.get('is_regex')]
+        self._keyword_rule_ids = keyword_rules
+        self._automaton = KeywordAutomaton(self.rules[i]['keyword'].lower() for i in keyword_rules)
+
+        self._combined_regex = None
+        self._separate_regexes = []
+        self._compile_regex_rules([i for i, rule in enumerate(self.rules) if rule.get('is_regex')])
+
+    def _compile_regex_rules(self, rule_ids: List[int]) -> None:
+        """
+        Merge regex rules into one pattern of optional lookaheads
+
+        A plain alternation would only report the leftmost match, so each rule
+        becomes an optional lookahead with its own named group; one match call
+        then reveals every rule that matches. Rules with their own groups or
+        inline flags cannot be nested this way and are searched separately.
+        """
+        parts = []
+        for rule_id in rule_ids:
+            pattern = self.rules[rule_id]['keyword']
+            try:
+                compiled = re.compile(pattern, re.IGNORECASE)
+            except re.error as e:
+                logger.error(f"Invalid regex pattern '{pattern}': {str(e)}")
+                continue
+
+            part = f'(?:(?=[\\s\\S]*?(?P<r{rule_id}>{pattern})))?'
+            if compiled.groups == 0 and self._compiles(part):
+                parts.append(part)
+            else:
+                self._separate_regexes.append((rule_id, compiled))
+
+        if parts:
+            self._combined_regex = re.compile(''.join(parts), re.IGNORECASE)
+
+    @staticmethod
+    def _compiles(pattern: str) -> bool:
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                re.compile(pattern, re.IGNORECASE)
+            return True
+        except (re.error, DeprecationWarning, FutureWarning):
+            return False
+
+    def matched_rule_ids(self, description: str) -> List[int]:
+        """Indices of every rule matching description, in rule order"""
+        text = (description or '').lower()
+        matched = {self._keyword_rule_ids[i] for i in self._automaton.find(text)}
+
+        if self._combined_regex is not None:
+            groups = self._combined_regex.match(text).groupdict()
+            matched.update(int(name[1:]) for name, value in groups.items() if value is not None)
+        for rule_id, compiled in self._separate_regexes:
+            if compiled.search(text):
+                matched.add(rule_id)
+
+        return sorted(matched)
+
+    def matched_rules(self, description: str) -> List[Dict]:
+        """Every rule matching description, in rule order"""
+        return [self.rules[i] for i in self.matched_rule_ids(description)]
+
+    def match_categories(self, description: str) -> List[Dict]:
+        """
+        Category matches in the KeywordMatcher result format
+
+        Regex rules yield one match each; keyword rules are grouped by category
+        with confidence growing with the number of matched keywords.
+        """
+        matches = []
+        keywords_by_category = defaultdict(list)
+
+        for rule in self.matched_rules(description):
+            if rule.get('is_regex'):
+                matches.append({
+                    'category': rule['category'],
+                    'confidence': REGEX_RULE_CONFIDENCE,
+                    'match_type': 'custom_rule',
+                    'rule_priority': rule.get('priority', 1)
+                })
+            else:
+                keywords_by_category[rule['category']].append(rule['keyword'])
+
+        for category, keywords in keywords_by_category.items():
+            matches.append({
+                'category': category,
+                'confidence': min(len(keywords) * KEYWORD_CONFIDENCE_STEP, MAX_KEYWORD_CONFIDENCE),
+                'match_type': 'keyword',
+                'matched_keywords': keywords
+            })
+
+        return sorted(matches, key=lambda x: x.get('confidence', 0), reverse=True)
+
+
+class RuleEngine:
+    """Serves a CompiledRuleSet for the active KeywordRules, rebuilt when they change"""
+
+    def __init__(self, rule_manager: Optional[RuleManager] = None):
+        self.rule_manager = rule_manager or RuleManager()
+        self._ruleset = CompiledRuleSet([])
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def get_ruleset(self) -> CompiledRuleSet:
+        """Current compiled rules; a rebuild swaps in a new set in one assignment"""
+        rules = self.rule_manager.get_active_rules()
+        version = self.rule_manager.version
+        if version == self._version:
+            return self._ruleset
+
+        with self._lock:
+            if version != self._version:
+                # Readers keep using the previous set until the new one is complete
+                self._ruleset = CompiledRuleSet(rules)
+                self._version = version
+                logger.info(f"Compiled {len(rules)} keyword rules (version {version})")
+            return self._ruleset
+
+    def match(self, description: str) -> List[Dict]:
+        """Category matches for description against the active rules"""
+        return self.get_ruleset().match_categories(description)
+
+    def warm(self) -> None:
+        """
+        Compile the active rules now
+
+        Called during app creation so that, when the app is preloaded before
+        workers fork, every worker starts from the parent's compiled set and
+        only rebuilds once the shared rules version moves.
+        """
+        try:
+            self.get_ruleset()
+        except Exception as e:
+            logger.error(f"Error compiling keyword rules: {str(e)}")
+
+
+# Process-wide engine shared by all matchers
+rule_engine = RuleEngine()
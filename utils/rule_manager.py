@@ -2,18 +2,62 @@ from typing import List, Dict, Optional
 import re
 import logging
 from datetime import datetime
+from flask import g, has_request_context
 from sqlalchemy.exc import SQLAlchemyError
-from models import db, KeywordRule
+from models import db, KeywordRule, CacheVersion
 
 logger = logging.getLogger(__name__)
 
+# CacheVersion row shared by every worker process
+RULES_CACHE_NAME = 'keyword_rules'
+# Request-scoped memo so the shared version is read at most once per request
+_REQUEST_VERSION_ATTR = '_keyword_rules_version'
+
 class RuleManager:
     """Manages the storage and retrieval of keyword-based rules"""
     
     def __init__(self):
         self._cached_rules = None
         self._cache_timestamp = None
-        self.cache_lifetime = 300  # 5 minutes cache lifetime
+        # Shared version the cached rules were loaded at; rules are reloaded
+        # exactly when the shared version moves, with no time-based expiry
+        self._loaded_shared_version = None
+        # Local counter bumped whenever the loaded rules actually change, so
+        # compiled matchers know when to rebuild
+        self.version = 0
+
+    def invalidate_cache(self):
+        """Force the next get_active_rules call to reload from the database"""
+        self._loaded_shared_version = None
+        if has_request_context():
+            g.pop(_REQUEST_VERSION_ATTR, None)
+
+    def shared_version(self) -> Optional[int]:
+        """Current cross-process rules version, read at most once per request"""
+        if has_request_context() and _REQUEST_VERSION_ATTR in g:
+            return g.get(_REQUEST_VERSION_ATTR)
+
+        try:
+            version = db.session.query(CacheVersion.version).filter_by(
+                name=RULES_CACHE_NAME
+            ).scalar() or 0
+        except SQLAlchemyError as e:
+            logger.error(f"Database error reading rules version: {str(e)}")
+            # Keep serving the rules already loaded
+            return self._loaded_shared_version
+
+        if has_request_context():
+            setattr(g, _REQUEST_VERSION_ATTR, version)
+        return version
+
+    def _bump_shared_version(self):
+        """Increment the shared rules version as part of the current transaction"""
+        updated = CacheVersion.query.filter_by(name=RULES_CACHE_NAME).update({
+            CacheVersion.version: CacheVersion.version + 1,
+            CacheVersion.updated_at: datetime.utcnow()
+        }, synchronize_session=False)
+        if not updated:
+            db.session.add(CacheVersion(name=RULES_CACHE_NAME, version=1))
         
     def add_rule(self, keyword: str, category: str, priority: int = 1,
                  is_regex: bool = False, is_active: bool = True) -> bool:
@@ -31,8 +75,10 @@ class RuleManager:
                     return False
             
             # Create new rule
+            # Regex patterns keep their case, e.g. \D and \d differ
+            keyword = keyword.strip() if is_regex else keyword.lower().strip()
             rule = KeywordRule(
-                keyword=keyword.lower().strip(),
+                keyword=keyword,
                 category=category.strip(),
                 priority=priority,
                 is_regex=is_regex,
@@ -41,10 +87,10 @@ class RuleManager:
             )
             
             db.session.add(rule)
+            self._bump_shared_version()
             db.session.commit()
             
-            # Invalidate cache
-            self._cached_rules = None
+            self.invalidate_cache()
             return True
             
         except SQLAlchemyError as e:
@@ -53,10 +99,11 @@ class RuleManager:
             return False
             
     def get_active_rules(self) -> List[Dict]:
-        """Get all active rules with caching"""
-        if (self._cached_rules is not None and 
-            self._cache_timestamp is not None and
-            (datetime.utcnow() - self._cache_timestamp).total_seconds() < self.cache_lifetime):
+        """Get all active rules, reloading only when the shared version has moved"""
+        shared_version = self.shared_version()
+        if (self._cached_rules is not None and
+            self._loaded_shared_version is not None and
+            shared_version == self._loaded_shared_version):
             return self._cached_rules
             
         try:
@@ -64,7 +111,7 @@ class RuleManager:
                 KeywordRule.priority.desc()
             ).all()
             
-            self._cached_rules = [
+            refreshed = [
                 {
                     'id': rule.id,
                     'keyword': rule.keyword,
@@ -75,13 +122,17 @@ class RuleManager:
                 }
                 for rule in rules
             ]
+            if refreshed != self._cached_rules:
+                self.version += 1
+            self._cached_rules = refreshed
             self._cache_timestamp = datetime.utcnow()
+            self._loaded_shared_version = shared_version
             
             return self._cached_rules
             
         except SQLAlchemyError as e:
             logger.error(f"Database error fetching rules: {str(e)}")
-            return []
+            return self._cached_rules or []
             
     def deactivate_rule(self, rule_id: int) -> bool:
         """
@@ -92,8 +143,9 @@ class RuleManager:
             rule = KeywordRule.query.get(rule_id)
             if rule:
                 rule.is_active = False
+                self._bump_shared_version()
                 db.session.commit()
-                self._cached_rules = None
+                self.invalidate_cache()
                 return True
             return False
             
@@ -111,8 +163,9 @@ class RuleManager:
             rule = KeywordRule.query.get(rule_id)
             if rule:
                 rule.priority = new_priority
+                self._bump_shared_version()
                 db.session.commit()
-                self._cached_rules = None
+                self.invalidate_cache()
                 return True
             return False
             
@@ -133,6 +186,7 @@ class RuleManager:
                 'active_rules': active_rules,
                 'regex_rules': regex_rules,
                 'cached_rules': len(self._cached_rules) if self._cached_rules else 0,
+                'shared_version': self._loaded_shared_version,
                 'cache_age': (datetime.utcnow() - self._cache_timestamp).total_seconds()
                 if self._cache_timestamp else None
             }
@@ -5,19 +5,208 @@ Provides centralized scheduling capabilities for the application
 with comprehensive error handling and monitoring.
 """
 
+import atexit
+import functools
 import logging
 import datetime
+import os
+import socket
+import threading
 import pytz
 from flask_apscheduler import APScheduler
 from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR
 from apscheduler.job import Job
 from models import db, ScheduledJob
+from sqlalchemy import or_, update
 from sqlalchemy.exc import SQLAlchemyError
 
 logger = logging.getLogger(__name__)
 
+# A worker's lease on a job expires if it is not renewed within this time
+LEASE_TTL = datetime.timedelta(seconds=90)
+# Seconds between lease renewals by the worker holding them
+HEARTBEAT_INTERVAL = 30
+# Seconds of random delay for interval and cron jobs that set no jitter of their own
+DEFAULT_JOB_JITTER = 15
+# Per-job execution policy columns on ScheduledJob that override add_job arguments
+POLICY_COLUMNS = ('max_instances', 'misfire_grace_time', 'jitter')
+
+
+def worker_id():
+    """host:pid of this process; read at call time since workers fork after import"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def acquire_lease(job_id, ttl=LEASE_TTL):
+    """
+    Take or renew this worker's lease on a job
+
+    The lease is granted only if it is free, expired or already ours, in a
+    single conditional UPDATE so two workers can never both win it.
+
+    Args:
+        job_id: ID of the job
+        ttl: Lease duration
+
+    Returns:
+        True if this worker holds the lease and should run the job
+    """
+    now = datetime.datetime.utcnow()
+    owner = worker_id()
+    try:
+        result = db.session.execute(update(ScheduledJob).where(
+            ScheduledJob.job_id == job_id,
+            ScheduledJob.enabled.isnot(False),
+            or_(
+                ScheduledJob.lease_owner.is_(None),
+                ScheduledJob.lease_owner == owner,
+                ScheduledJob.lease_expires_at < now
+            )
+        ).values(lease_owner=owner, lease_expires_at=now + ttl, heartbeat_at=now))
+        db.session.commit()
+        return result.rowcount == 1
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Failed to acquire lease for job {job_id}: {e}")
+        return False
+
+
+def renew_leases(ttl=LEASE_TTL):
+    """Extend every lease this worker holds; returns the number renewed"""
+    now = datetime.datetime.utcnow()
+    try:
+        result = db.session.execute(update(ScheduledJob).where(
+            ScheduledJob.lease_owner == worker_id()
+        ).values(lease_expires_at=now + ttl, heartbeat_at=now))
+        db.session.commit()
+        return result.rowcount
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Failed to renew job leases: {e}")
+        return 0
+
+
+def release_leases():
+    """Give up this worker's leases so another worker can take over at once"""
+    try:
+        result = db.session.execute(update(ScheduledJob).where(
+            ScheduledJob.lease_owner == worker_id()
+        ).values(lease_owner=None, lease_expires_at=None))
+        db.session.commit()
+        return result.rowcount
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Failed to release job leases: {e}")
+        return 0
+
+
+def run_leased(leased_scheduler, job_id, func, *args, **kwargs):
+    """
+    Run a job only in the worker holding its lease
+
+    Args:
+        leased_scheduler: Scheduler the job belongs to
+        job_id: ID of the job
+        func: The job's function
+    """
+    with leased_scheduler.app.app_context():
+        if not acquire_lease(job_id):
+            logger.debug(f"Job {job_id} is leased by another worker or disabled; skipping this run")
+            return None
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            update_job_status(job_id, 'failed', str(e))
+            raise
+        update_job_status(job_id, 'success')
+        return result
+
+
+class LeasedScheduler(APScheduler):
+    """
+    Scheduler that runs each job in exactly one worker process
+
+    Every worker schedules every job, but a run only proceeds in the worker
+    holding the job's lease in ScheduledJob. Leases are sticky: the holder
+    renews them from a heartbeat thread, so interval jobs keep one phase.
+    When the holder stops, its leases expire and the next worker whose
+    trigger fires takes the job over. With SCHEDULER_MODE = 'local' jobs run
+    in every process as before.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.mode = 'leased'
+        self.leased_job_ids = set()
+        self._heartbeat_stop = threading.Event()
+        self._heartbeat_thread = None
+
+    def init_app(self, app):
+        self.mode = app.config.get('SCHEDULER_MODE', 'leased')
+        super().init_app(app)
+
+    def _apply_policy(self, job_id, kwargs):
+        """Ensure the job has a ScheduledJob row and merge the row's execution policy into kwargs"""
+        with self.app.app_context():
+            try:
+                db_job = ScheduledJob.query.filter_by(job_id=job_id).first()
+                if not db_job:
+                    db_job = ScheduledJob(
+                        job_id=job_id,
+                        description=kwargs.get('name') or f"Job {job_id}",
+                        enabled=True
+                    )
+                    db.session.add(db_job)
+                    db.session.commit()
+                for column in POLICY_COLUMNS:
+                    value = getattr(db_job, column)
+                    if value is not None:
+                        kwargs[column] = value
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                logger.error(f"Failed to load policy for job {job_id}: {e}")
+
+        # Spread runs so workers and jobs do not all hit the database on the same second
+        if kwargs.get('trigger') in ('interval', 'cron'):
+            kwargs.setdefault('jitter', DEFAULT_JOB_JITTER)
+        return kwargs
+
+    def add_job(self, id, func, **kwargs):
+        if self.mode != 'leased':
+            return super().add_job(id, func, **kwargs)
+
+        kwargs = self._apply_policy(id, dict(kwargs))
+        self.leased_job_ids.add(id)
+        return super().add_job(id, functools.partial(run_leased, self, id, func), **kwargs)
+
+    def start(self, paused=False):
+        super().start(paused=paused)
+        if self.mode == 'leased' and self._heartbeat_thread is None:
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat, name='job-lease-heartbeat',
+                                                      daemon=True)
+            self._heartbeat_thread.start()
+            atexit.register(self.release_leases)
+
+    def _heartbeat(self):
+        while not self._heartbeat_stop.wait(HEARTBEAT_INTERVAL):
+            with self.app.app_context():
+                renew_leases()
+
+    def release_leases(self):
+        self._heartbeat_stop.set()
+        with self.app.app_context():
+            released = release_leases()
+        if released:
+            logger.info(f"Released {released} job leases held by {worker_id()}")
+
+    def shutdown(self, wait=True):
+        if self.mode == 'leased' and self._heartbeat_thread is not None:
+            self.release_leases()
+        super().shutdown(wait=wait)
+
+
 # Initialize scheduler
-scheduler = APScheduler()
+scheduler = LeasedScheduler()
 
 def init_scheduler(app):
     """
@@ -52,6 +241,9 @@ def job_executed_listener(event):
     """
     try:
         job_id = event.job_id
+        # Leased runs record their own status, skipped runs none
+        if job_id in scheduler.leased_job_ids:
+            return
         update_job_status(job_id, 'success')
     except Exception as e:
         logger.error(f"Error in job executed listener: {e}")
@@ -68,7 +260,8 @@ def job_error_listener(event):
         exception = event.exception
         traceback = event.traceback
         
-        update_job_status(job_id, 'failed', str(exception))
+        if job_id not in scheduler.leased_job_ids:
+            update_job_status(job_id, 'failed', str(exception))
         
         # Log the error
         logger.error(f"Job {job_id} failed: {exception}\n{traceback}")
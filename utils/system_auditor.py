@@ -15,14 +15,103 @@ import re
 import sys
 import sqlite3
 import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
 
+from flask import current_app, has_app_context
+
 from models import db, ErrorLog, Transaction, UploadedFile, User, Account
+from utils.backup_catalog import STATUS_FAILED, STATUS_MISSING, BackupCatalog, backup_age_days
+from utils.incremental_backup import CHUNK_DIR_NAME, ChunkStore
+from utils.project_scan import SCAN_MAX_AGE, ProjectScan, file_findings_cache
 from sqlalchemy import text, inspect
 from sqlalchemy.exc import SQLAlchemyError
 
 logger = logging.getLogger(__name__)
 
+# Checks of one category that run at the same time
+CHECK_WORKERS = 4
+
+SENSITIVE_PATTERNS = [
+    r'password\s*=\s*[\'"][^\'"]+[\'"]',
+    r'api_key\s*=\s*[\'"][^\'"]+[\'"]',
+    r'secret\s*=\s*[\'"][^\'"]+[\'"]',
+    r'token\s*=\s*[\'"][^\'"]+[\'"]',
+    r'credit_card\s*=\s*[\'"][^\'"]+[\'"]',
+    r'Authorization: Bearer\s+[^\'"\s]+'
+]
+CACHE_MODULES = ['flask_caching', 'cachetools', 'pylibmc', 'redis']
+CACHE_USAGE_PATTERNS = [
+    r'@cache\.',
+    r'cache\.set',
+    r'cache\.get',
+    r'cache\.delete',
+    r'cache\[',
+    r'cache\['
+]
+
+
+# Per-file analyzers: pure functions of a file's text, so their results can be
+# cached against the content hash and reused while the file is unchanged
+
+def _sensitive_print_lines(content):
+    """(line number, pattern) for print calls that look like they print secrets"""
+    issues = []
+    for line_num, line in enumerate(content.split('\n'), 1):
+        if 'print(' in line:
+            for pattern in SENSITIVE_PATTERNS:
+                if re.search(pattern, line, re.IGNORECASE):
+                    issues.append((line_num, pattern))
+    return issues
+
+
+def _query_issues(content):
+    """Potential N+1 queries and relationship queries without joins"""
+    issues = []
+    lines = content.split('\n')
+    for i, line in enumerate(lines):
+        # Check for potential N+1 queries (loop with query inside)
+        if 'for' in line and 'in' in line:
+            # Check next few lines for query
+            for j in range(1, min(5, len(lines) - i)):
+                next_line = lines[i + j]
+                if any(query_pattern in next_line for query_pattern in ['.query.', '.filter(', '.filter_by(', '.get(']):
+                    issues.append({
+                        'line': i + 1,
+                        'issue': 'Potential N+1 query issue',
+                        'code': line + '\n' + next_line
+                    })
+                    break
+
+        # Check for inefficient queries
+        if '.all()' in line and not any(join_pattern in line for join_pattern in ['.join(', '.outerjoin(']):
+            context = '\n'.join(lines[max(0, i-2):min(len(lines), i+3)])
+            if any(relationship_pattern in context for relationship_pattern in ['relationship', 'backref']):
+                issues.append({
+                    'line': i + 1,
+                    'issue': 'Query without explicit join for relationship',
+                    'code': context
+                })
+    return issues
+
+
+def _cache_type(content):
+    """Cache library imported by a file, 'manual' for a dict cache, else None"""
+    for module in CACHE_MODULES:
+        if f"import {module}" in content or f"from {module}" in content:
+            return module
+    if 'cache = {}' in content or 'cache = dict()' in content:
+        return 'manual'
+    return None
+
+
+def _cache_usage_count(content):
+    return sum(len(re.findall(pattern, content)) for pattern in CACHE_USAGE_PATTERNS)
+
+
 class SystemAuditor:
     """
     System Auditor that performs comprehensive checks on the application
@@ -56,6 +145,8 @@ class SystemAuditor:
             'backup_integrity': self._check_backup_integrity,
             'file_integrity': self._check_file_integrity
         }
+        self._scan = None
+        self._scan_lock = threading.Lock()
         
     def check_security(self):
         """
@@ -65,26 +156,7 @@ class SystemAuditor:
             Dictionary with security check results
         """
         logger.info("Running security audit checks")
-        results = {}
-        
-        for check_name, check_func in self.security_checks.items():
-            try:
-                logger.debug(f"Running security check: {check_name}")
-                results[check_name] = check_func()
-            except Exception as e:
-                logger.error(f"Error in security check {check_name}: {e}")
-                results[check_name] = {
-                    'passed': False,
-                    'severity': 'medium',
-                    'description': f"Error running security check: {check_name}",
-                    'recommendation': "Investigate the error and fix the underlying issue",
-                    'details': {
-                        'error': str(e),
-                        'check': check_name
-                    }
-                }
-                
-        return results
+        return self._run_checks('security', self.security_checks)
     
     def check_performance(self):
         """
@@ -94,26 +166,7 @@ class SystemAuditor:
             Dictionary with performance check results
         """
         logger.info("Running performance audit checks")
-        results = {}
-        
-        for check_name, check_func in self.performance_checks.items():
-            try:
-                logger.debug(f"Running performance check: {check_name}")
-                results[check_name] = check_func()
-            except Exception as e:
-                logger.error(f"Error in performance check {check_name}: {e}")
-                results[check_name] = {
-                    'passed': False,
-                    'severity': 'medium',
-                    'description': f"Error running performance check: {check_name}",
-                    'recommendation': "Investigate the error and fix the underlying issue",
-                    'details': {
-                        'error': str(e),
-                        'check': check_name
-                    }
-                }
-                
-        return results
+        return self._run_checks('performance', self.performance_checks)
     
     def check_data_integrity(self):
         """
@@ -123,27 +176,58 @@ class SystemAuditor:
             Dictionary with data integrity check results
         """
         logger.info("Running data integrity audit checks")
-        results = {}
-        
-        for check_name, check_func in self.integrity_checks.items():
+        return self._run_checks('integrity', self.integrity_checks)
+    
+    def _project_scan(self):
+        """Shared walk of the project tree; reused by every check of an audit run"""
+        with self._scan_lock:
+            if self._scan is None or time.monotonic() - self._scan.created > SCAN_MAX_AGE:
+                self._scan = ProjectScan(self.root_dir, file_findings_cache)
+                logger.debug(f"Project scan: {self._scan.stats}")
+            return self._scan
+
+    def _run_checks(self, kind, checks):
+        """
+        Run independent checks in a thread pool
+
+        Each check runs in its own application context, so database checks
+        get their own session. Every result gets the check's duration.
+
+        Args:
+            kind: Check category used in log and error messages
+            checks: Mapping of check name to check function
+
+        Returns:
+            Dictionary of check name to result
+        """
+        app = current_app._get_current_object() if has_app_context() else None
+
+        def run(check_name, check_func):
+            started = time.perf_counter()
             try:
-                logger.debug(f"Running integrity check: {check_name}")
-                results[check_name] = check_func()
+                logger.debug(f"Running {kind} check: {check_name}")
+                with app.app_context() if app is not None else nullcontext():
+                    result = check_func()
             except Exception as e:
-                logger.error(f"Error in integrity check {check_name}: {e}")
-                results[check_name] = {
+                logger.error(f"Error in {kind} check {check_name}: {e}")
+                result = {
                     'passed': False,
                     'severity': 'medium',
-                    'description': f"Error running integrity check: {check_name}",
+                    'description': f"Error running {kind} check: {check_name}",
                     'recommendation': "Investigate the error and fix the underlying issue",
                     'details': {
                         'error': str(e),
                         'check': check_name
                     }
                 }
-                
-        return results
-    
+            result['duration'] = round(time.perf_counter() - started, 3)
+            return result
+
+        with ThreadPoolExecutor(max_workers=min(CHECK_WORKERS, len(checks)) or 1) as executor:
+            futures = {check_name: executor.submit(run, check_name, check_func)
+                       for check_name, check_func in checks.items()}
+        return {check_name: future.result() for check_name, future in futures.items()}
+
     # Security Checks
     
     def _check_password_policy(self):
@@ -378,14 +462,7 @@ class SystemAuditor:
         log_issues = []
         
         log_files = [f for f in os.listdir(log_dir) if f.endswith('.log')]
-        sensitive_patterns = [
-            r'password\s*=\s*[\'"][^\'"]+[\'"]',
-            r'api_key\s*=\s*[\'"][^\'"]+[\'"]',
-            r'secret\s*=\s*[\'"][^\'"]+[\'"]',
-            r'token\s*=\s*[\'"][^\'"]+[\'"]',
-            r'credit_card\s*=\s*[\'"][^\'"]+[\'"]',
-            r'Authorization: Bearer\s+[^\'"\s]+'
-        ]
+        sensitive_patterns = SENSITIVE_PATTERNS
         
         for log_file in log_files:
             log_path = os.path.join(log_dir, log_file)
@@ -406,26 +483,15 @@ class SystemAuditor:
         
         # Check code for print statements with sensitive data
         code_issues = []
-        
-        for root, dirs, files in os.walk(self.root_dir):
-            for file_name in files:
-                if file_name.endswith('.py'):
-                    file_path = os.path.join(root, file_name)
-                    try:
-                        with open(file_path, 'r') as f:
-                            line_num = 0
-                            for line in f:
-                                line_num += 1
-                                if 'print(' in line:
-                                    for pattern in sensitive_patterns:
-                                        if re.search(pattern, line, re.IGNORECASE):
-                                            code_issues.append({
-                                                'file': os.path.relpath(file_path, self.root_dir),
-                                                'line': line_num,
-                                                'pattern': pattern
-                                            })
-                    except Exception as e:
-                        logger.error(f"Error checking code file {file_path}: {e}")
+        scan = self._project_scan()
+        
+        for file_path in scan.python_files:
+            for line_num, pattern in scan.findings('sensitive_data', file_path, _sensitive_print_lines) or []:
+                code_issues.append({
+                    'file': os.path.relpath(file_path, self.root_dir),
+                    'line': line_num,
+                    'pattern': pattern
+                })
         
         total_issues = len(log_issues) + len(code_issues)
         
@@ -836,42 +902,11 @@ class SystemAuditor:
         """
         # Check Python files for potential N+1 query issues and inefficient queries
         query_issues = []
+        scan = self._project_scan()
         
-        for root, dirs, files in os.walk(self.root_dir):
-            for file_name in files:
-                if file_name.endswith('.py'):
-                    file_path = os.path.join(root, file_name)
-                    try:
-                        with open(file_path, 'r') as f:
-                            content = f.read()
-                            lines = content.split('\n')
-                            for i, line in enumerate(lines):
-                                # Check for potential N+1 queries (loop with query inside)
-                                if 'for' in line and 'in' in line:
-                                    # Check next few lines for query
-                                    for j in range(1, min(5, len(lines) - i)):
-                                        next_line = lines[i + j]
-                                        if any(query_pattern in next_line for query_pattern in ['.query.', '.filter(', '.filter_by(', '.get(']):
-                                            query_issues.append({
-                                                'file': os.path.relpath(file_path, self.root_dir),
-                                                'line': i + 1,
-                                                'issue': 'Potential N+1 query issue',
-                                                'code': line + '\n' + next_line
-                                            })
-                                            break
-                                
-                                # Check for inefficient queries
-                                if '.all()' in line and not any(join_pattern in line for join_pattern in ['.join(', '.outerjoin(']):
-                                    context = '\n'.join(lines[max(0, i-2):min(len(lines), i+3)])
-                                    if any(relationship_pattern in context for relationship_pattern in ['relationship', 'backref']):
-                                        query_issues.append({
-                                            'file': os.path.relpath(file_path, self.root_dir),
-                                            'line': i + 1,
-                                            'issue': 'Query without explicit join for relationship',
-                                            'code': context
-                                        })
-                    except Exception as e:
-                        logger.error(f"Error checking file {file_path}: {e}")
+        for file_path in scan.python_files:
+            for issue in scan.findings('query_performance', file_path, _query_issues) or []:
+                query_issues.append(dict(issue, file=os.path.relpath(file_path, self.root_dir)))
         
         if not query_issues:
             return {
@@ -971,36 +1006,17 @@ class SystemAuditor:
             Check results dictionary
         """
         # Check for cache implementation
-        cache_modules = ['flask_caching', 'cachetools', 'pylibmc', 'redis']
+        cache_modules = CACHE_MODULES
         cache_found = False
         cache_type = None
+        scan = self._project_scan()
         
         # Check imports in Python files
-        for root, dirs, files in os.walk(self.root_dir):
-            if cache_found:
+        for file_path in scan.python_files:
+            cache_type = scan.findings('cache_type', file_path, _cache_type)
+            if cache_type:
+                cache_found = True
                 break
-                
-            for file_name in files:
-                if file_name.endswith('.py'):
-                    file_path = os.path.join(root, file_name)
-                    try:
-                        with open(file_path, 'r') as f:
-                            content = f.read()
-                            for module in cache_modules:
-                                if f"import {module}" in content or f"from {module}" in content:
-                                    cache_found = True
-                                    cache_type = module
-                                    break
-                            
-                            # Also check for manual caching
-                            if not cache_found and ('cache = {}' in content or 'cache = dict()' in content):
-                                cache_found = True
-                                cache_type = 'manual'
-                            
-                            if cache_found:
-                                break
-                    except Exception as e:
-                        logger.error(f"Error checking file {file_path}: {e}")
         
         # Check for cache configuration in config
         config_path = os.path.join(self.root_dir, 'config.py')
@@ -1014,28 +1030,10 @@ class SystemAuditor:
         
         # Check for cache usage in code
         if cache_found:
-            cache_usage_patterns = [
-                r'@cache\.',
-                r'cache\.set',
-                r'cache\.get',
-                r'cache\.delete',
-                r'cache\[',
-                r'cache\['
-            ]
-            
-            cache_usage_count = 0
-            
-            for root, dirs, files in os.walk(self.root_dir):
-                for file_name in files:
-                    if file_name.endswith('.py'):
-                        file_path = os.path.join(root, file_name)
-                        try:
-                            with open(file_path, 'r') as f:
-                                content = f.read()
-                                for pattern in cache_usage_patterns:
-                                    cache_usage_count += len(re.findall(pattern, content))
-                        except Exception as e:
-                            logger.error(f"Error checking file {file_path}: {e}")
+            cache_usage_count = sum(
+                scan.findings('cache_usage', file_path, _cache_usage_count) or 0
+                for file_path in scan.python_files
+            )
         
             if cache_usage_count > 0:
                 return {
@@ -1355,17 +1353,20 @@ class SystemAuditor:
                 }
             }
         
-        # Check backup files
+        # The catalog lists backups without scanning, and re-checks only new or changed files
+        catalog = BackupCatalog(Path(backup_dir))
+        verification = catalog.verify(chunk_exists=ChunkStore(Path(backup_dir) / CHUNK_DIR_NAME).find)
         backup_files = []
-        for file_name in os.listdir(backup_dir):
-            if file_name.endswith('.db') or file_name.endswith('.sql'):
-                file_path = os.path.join(backup_dir, file_name)
-                backup_files.append({
-                    'name': file_name,
-                    'path': file_path,
-                    'size': os.path.getsize(file_path),
-                    'modified': datetime.datetime.fromtimestamp(os.path.getmtime(file_path)).isoformat()
-                })
+        now = datetime.datetime.now()
+        for entry in catalog.entries():
+            backup_files.append({
+                'name': os.path.basename(entry['file']),
+                'path': entry['file'],
+                'mode': entry['metadata'].get('mode', 'full'),
+                'size': entry['metadata'].get('size', 0),
+                'days_old': backup_age_days(entry, now),
+                'verification_status': entry['verification_status']
+            })
         
         if not backup_files:
             return {
@@ -1379,14 +1380,7 @@ class SystemAuditor:
             }
         
         # Check for recent backups
-        now = datetime.datetime.now()
-        recent_backups = []
-        for backup in backup_files:
-            modified = datetime.datetime.fromisoformat(backup['modified'])
-            days_old = (now - modified).days
-            backup['days_old'] = days_old
-            if days_old <= 7:  # Consider backups within last week as recent
-                recent_backups.append(backup)
+        recent_backups = [backup for backup in backup_files if backup['days_old'] <= 7]  # Within last week
         
         if not recent_backups:
             return {
@@ -1401,11 +1395,17 @@ class SystemAuditor:
                 }
             }
         
-        # Check for very small backups (potential corruption)
+        # Check for failed checksums, missing files and very small backups (potential corruption)
         problematic_backups = []
         for backup in backup_files:
-            # Flag suspiciously small backups
-            if backup['size'] < 1024:  # Smaller than 1 KB
+            if backup['verification_status'] in (STATUS_FAILED, STATUS_MISSING):
+                problematic_backups.append({
+                    'name': backup['name'],
+                    'size': backup['size'],
+                    'issue': f"Verification {backup['verification_status']}"
+                })
+            # Flag suspiciously small full backups; unchanged incremental backups are meant to be small
+            elif backup['mode'] != 'incremental' and backup['size'] < 1024:  # Smaller than 1 KB
                 problematic_backups.append({
                     'name': backup['name'],
                     'size': backup['size'],
@@ -1421,7 +1421,8 @@ class SystemAuditor:
                 'details': {
                     'problematic_backups': problematic_backups,
                     'backup_count': len(backup_files),
-                    'recent_backups': len(recent_backups)
+                    'recent_backups': len(recent_backups),
+                    'verification': verification
                 }
             }
         
@@ -1432,7 +1433,8 @@ class SystemAuditor:
             'details': {
                 'backup_count': len(backup_files),
                 'recent_backups': len(recent_backups),
-                'backup_files': [b['name'] for b in recent_backups]
+                'backup_files': [b['name'] for b in recent_backups],
+                'verification': verification
             }
         }
     
@@ -1477,11 +1479,7 @@ class SystemAuditor:
                 })
             
             # Check for orphaned files on disk
-            disk_files = []
-            for root, dirs, files in os.walk(uploads_dir):
-                for file_name in files:
-                    file_path = os.path.join(root, file_name)
-                    disk_files.append(file_path)
+            disk_files = self._project_scan().files_under(uploads_dir)
             
             orphaned_files = [f for f in disk_files if f not in db_files]
             
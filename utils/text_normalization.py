@@ -0,0 +1,84 @@
+"""
+Text Normalization
+
+Shared description and text normalizers. Patterns are compiled once, scalar
+normalizers are memoized with a bounded LRU cache because bank descriptions
+repeat heavily, and the description normalizers have pandas counterparts
+that normalize a whole Series with vectorized string operations.
+"""
+
+import re
+from functools import lru_cache
+from typing import Optional
+
+import pandas as pd
+
+# Distinct strings remembered by each memoized normalizer
+NORMALIZE_CACHE_SIZE = 65536
+# Longest text passed on to API prompts
+MAX_CLEAN_TEXT_LENGTH = 1000
+
+_TRANSFER_PREFIX = re.compile(r'^(payment to |payment from |trans to |trans from )')
+_SPECIAL_CHARS = re.compile(r'[^\w\s-]')
+_PUNCTUATION = re.compile(r'[^\w\s]')
+_WHITESPACE = re.compile(r'\s+')
+_TRAILING_REFERENCE = re.compile(r'\s+\d+$')
+_NON_LETTERS = re.compile(r'[^a-z\s]+')
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_description(description: Optional[str]) -> str:
+    """
+    Standardize a transaction description for matching
+
+    Lowercases, drops transfer prefixes and punctuation (keeping hyphens),
+    collapses whitespace and removes a trailing reference number. This is the
+    form stored in Transaction.normalized_description.
+    """
+    if not description:
+        return ''
+    processed = _TRANSFER_PREFIX.sub('', description.lower().strip())
+    processed = _WHITESPACE.sub(' ', _SPECIAL_CHARS.sub('', processed))
+    return _TRAILING_REFERENCE.sub('', processed)
+
+
+def normalize_descriptions(descriptions: pd.Series) -> pd.Series:
+    """Vectorized normalize_description over a Series"""
+    return (descriptions.fillna('')
+            .str.lower()
+            .str.strip()
+            .str.replace(_TRANSFER_PREFIX, '', regex=True)
+            .str.replace(_SPECIAL_CHARS, '', regex=True)
+            .str.replace(_WHITESPACE, ' ', regex=True)
+            .str.replace(_TRAILING_REFERENCE, '', regex=True))
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def description_key(description: Optional[str]) -> str:
+    """Letters-only key so every occurrence of a payment shares one key despite dates and references"""
+    text = _NON_LETTERS.sub(' ', (description or '').lower())
+    return _WHITESPACE.sub(' ', text).strip()[:200]
+
+
+def description_keys(descriptions: pd.Series) -> pd.Series:
+    """Vectorized description_key over a Series"""
+    return (descriptions.fillna('')
+            .str.lower()
+            .str.replace(_NON_LETTERS, ' ', regex=True)
+            .str.replace(_WHITESPACE, ' ', regex=True)
+            .str.strip()
+            .str.slice(0, 200))
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_text(text: Optional[str]) -> str:
+    """Lowercase text with punctuation removed, for free-text comparison"""
+    if not text:
+        return ''
+    return _PUNCTUATION.sub('', text.lower()).strip()
+
+
+def clean_text(text, max_length: int = MAX_CLEAN_TEXT_LENGTH) -> str:
+    """Collapse whitespace and truncate text before it is sent to an API"""
+    cleaned = ' '.join(str(text).split())
+    return cleaned[:max_length]
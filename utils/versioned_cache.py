@@ -0,0 +1,68 @@
+"""
+Versioned Per-User Cache
+A bounded, thread-safe LRU of per-user values, each tagged with the data
+version it was built at. A value is served only while the caller's current
+version matches (and, with a TTL, while it is fresh), so every cache keyed
+on data_versions invalidates itself the same way in every worker.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Hashable, Iterator, Optional
+
+
+class VersionedCache:
+    """LRU of values keyed by user, served while their data version is current"""
+
+    def __init__(self, size: int, ttl: Optional[timedelta] = None):
+        """
+        Args:
+            size: Entries kept before the least recently used is dropped
+            ttl: Optional age after which an entry is no longer served
+        """
+        self.size = size
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Hashable, Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Any, now: Optional[datetime] = None) -> Optional[Any]:
+        """The value cached for key if it was built at version and has not expired"""
+        now = now or datetime.utcnow()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['version'] != version:
+                return None
+            if self.ttl is not None and now - entry['built_at'] >= self.ttl:
+                return None
+            self._entries.move_to_end(key)
+            return entry['value']
+
+    def latest(self, key: Hashable) -> Optional[Any]:
+        """The value last cached for key whatever its version, e.g. to rebuild incrementally"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry['value'] if entry else None
+
+    def put(self, key: Hashable, version: Any, value: Any, now: Optional[datetime] = None) -> None:
+        """Cache value for key as built at version, evicting the least recently used"""
+        with self._lock:
+            self._entries[key] = {'version': version, 'built_at': now or datetime.utcnow(), 'value': value}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop one key, or every entry"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        with self._lock:
+            return iter(list(self._entries))